@@ -90,6 +90,7 @@ arrayStatement
 expression
     : atom
     | expression LBRACK expression RBRACK
+    | expression LBRACK expression COMMA expression RBRACK
     | expression LBRACK expression COLON expression RBRACK
     | expression DOT LENGTH
     | expression (INC | DEC)
@@ -112,6 +113,7 @@ atom
     | functionCall
     | LBRACK (expression (COMMA expression)*)? RBRACK
     | NEW type LBRACK atom RBRACK
+    | NEW type LBRACK atom COMMA atom RBRACK
     ;
 
 typeCast
@@ -121,6 +123,7 @@ typeCast
 type
     : INT | FLOAT | BOOL | STRING
     | type LBRACK RBRACK
+    | type LBRACK COMMA RBRACK
     ;
 
 literal
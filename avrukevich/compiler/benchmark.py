@@ -0,0 +1,309 @@
+"""Compiles MathPL programs and measures the modules with the headless runner.
+
+Each source is compiled to .wasm with the given compiler flags and run
+--runs times by wasm_runner/headless.js under node (which must be on PATH).
+The report lists the median and minimum time of `_start`, the instructions
+retired per run (only when `perf` can count them), the peak size of linear
+memory and the size of the binary.  Without arguments the examples in
+../examples/correct_examples and ../examples/extra_task_examples are used.
+
+The programs in ../examples/runtime_error_examples are not measured; they
+are run once with the flags listed in RUNTIME_CHECKS and must stop with the
+expected error after printing their output so far.  Likewise the programs
+in ../examples/memory_examples are run once with the flags listed in
+MEMORY_CHECKS and must print the expected output without letting linear
+memory grow past a limit.  These checks run with the default sources and
+are also used by run_examples.py.
+
+For CI, --save writes the results as JSON, and --baseline compares the
+median times with an earlier --save file; with --max-regression the exit
+code is non-zero when a program got slower by more than that percentage.
+"""
+
+import os
+import sys
+import json
+import shlex
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES_DIRS = [
+    os.path.join(BASE_DIR, "..", "examples", "correct_examples"),
+    os.path.join(BASE_DIR, "..", "examples", "extra_task_examples"),
+]
+HEADLESS_RUNNER = os.path.join(BASE_DIR, "wasm_runner", "headless.js")
+RUNTIME_ERRORS_DIR = os.path.join(BASE_DIR, "..", "examples", "runtime_error_examples")
+MEMORY_DIR = os.path.join(BASE_DIR, "..", "examples", "memory_examples")
+
+# (source, compiler flags, part of the error message or None for any trap,
+#  output printed before the error)
+RUNTIME_CHECKS = [
+    ("length_mismatch.txt", [], None, "before the mismatch\n"),
+    ("length_mismatch.txt", ["--no-simd"], "Array length mismatch", "before the mismatch\n"),
+]
+
+# (source, compiler flags, peak linear memory limit in bytes, expected output)
+MEMORY_CHECKS = [
+    ("array_argument.txt", [], 1 << 20, "24000000\n"),
+    ("array_argument.txt", ["--inline-threshold", "0"], 1 << 20, "24000000\n"),
+]
+
+MODULE_NAME = "mathpl_compiler"
+DEFAULT_INPUTS = ["5", "3.5"]
+
+
+def log(msg):
+    print(f"[BENCH] {msg}")
+
+
+def collect_files(paths):
+    """Source files of `paths`; the *error_examples* files in directories are skipped."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(
+                os.path.join(path, f) for f in os.listdir(path)
+                if f.endswith((".mpl", ".txt")) and "error" not in f
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def compile_files(files, out_root, flags=()):
+    """Compiles `files` to .wasm under `out_root` and returns {source: wasm path}.
+
+    Sources from different directories may share a name, so every directory
+    gets its own output directory.  Returns None if any file fails.
+    """
+    groups = {}
+    for path in files:
+        groups.setdefault(os.path.dirname(os.path.abspath(path)), []).append(path)
+
+    wasm_paths = {}
+    for index, group in enumerate(groups.values()):
+        out_dir = os.path.join(out_root, str(index))
+        cmd = [
+            sys.executable, "-m", MODULE_NAME, *group,
+            "-o", out_dir, "--wasm", "--no-cache", *flags
+        ]
+        if len(group) > 1:
+            cmd += ["-j", str(os.cpu_count() or 1)]
+        result = subprocess.run(cmd, cwd=BASE_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stdout, end="")
+            return None
+        for path in group:
+            name = os.path.splitext(os.path.basename(path))[0] + ".wasm"
+            wasm_paths[path] = os.path.join(out_dir, name)
+    return wasm_paths
+
+
+def run_headless(wasm_path, runs, inputs):
+    """Report of headless.js --json for one module, or None if it could not run."""
+    cmd = ["node", HEADLESS_RUNNER, wasm_path, "--runs", str(runs), "--json"]
+    for text in inputs:
+        cmd += ["--input", text]
+    result = subprocess.run(cmd, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    if result.returncode not in (0, 1):
+        print(result.stderr, end="")
+        return None
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        # node died on an uncaught exception before printing the report
+        print(result.stderr, end="")
+        return None
+
+
+def check_runtime_errors():
+    """Runs RUNTIME_CHECKS and returns the number of failed checks."""
+    failed = 0
+    with tempfile.TemporaryDirectory() as out_root:
+        for index, (name, flags, message, output) in enumerate(RUNTIME_CHECKS):
+            label = " ".join([name, *flags])
+            source = os.path.join(RUNTIME_ERRORS_DIR, name)
+            wasm_paths = compile_files([source], os.path.join(out_root, str(index)), flags)
+            report = run_headless(wasm_paths[source], 1, []) if wasm_paths else None
+            if report is None:
+                problem = "could not be compiled or run"
+            elif report["trap"] is None:
+                problem = "did not stop with an error"
+            elif message is not None and message not in report["trap"]:
+                problem = f"stopped with '{report['trap']}', expected '{message}'"
+            elif report["output"] != output:
+                problem = f"printed {report['output']!r}, expected {output!r}"
+            else:
+                log(f"Runtime check passed: {label} ({report['trap']})")
+                continue
+            log(f"Runtime check FAILED: {label} {problem}")
+            failed += 1
+    return failed
+
+
+def check_peak_memory():
+    """Runs MEMORY_CHECKS and returns the number of failed checks."""
+    failed = 0
+    with tempfile.TemporaryDirectory() as out_root:
+        for index, (name, flags, limit, output) in enumerate(MEMORY_CHECKS):
+            label = " ".join([name, *flags])
+            source = os.path.join(MEMORY_DIR, name)
+            wasm_paths = compile_files([source], os.path.join(out_root, str(index)), flags)
+            report = run_headless(wasm_paths[source], 1, []) if wasm_paths else None
+            if report is None:
+                problem = "could not be compiled or run"
+            elif report["trap"] is not None:
+                problem = f"stopped with '{report['trap']}'"
+            elif report["output"] != output:
+                problem = f"printed {report['output']!r}, expected {output!r}"
+            elif report["peak_memory_bytes"] > limit:
+                problem = f"peak memory {report['peak_memory_bytes']} B, limit {limit} B"
+            else:
+                log(f"Memory check passed: {label} ({report['peak_memory_bytes']} B)")
+                continue
+            log(f"Memory check FAILED: {label} {problem}")
+            failed += 1
+    return failed
+
+
+def perf_available():
+    if shutil.which("perf") is None:
+        return False
+    result = subprocess.run(
+        ["perf", "stat", "-x", ",", "-e", "instructions:u", "--", "true"],
+        capture_output=True, text=True
+    )
+    return result.returncode == 0 and _parse_instructions(result.stderr) is not None
+
+
+def _parse_instructions(perf_output):
+    for line in perf_output.splitlines():
+        fields = line.split(",")
+        if len(fields) > 2 and fields[2].startswith("instructions"):
+            return int(fields[0]) if fields[0].isdigit() else None
+    return None
+
+
+def count_instructions(wasm_path, runs, inputs):
+    """Instructions retired per `_start` call, measured with `perf stat`.
+
+    The count of a process also includes the startup of node and the
+    compilation of the module, so a process with one run is subtracted
+    from a process with `runs` runs.
+    """
+    if runs < 2:
+        return None
+    counts = []
+    for n in (1, runs):
+        cmd = [
+            "perf", "stat", "-x", ",", "-e", "instructions:u", "--",
+            "node", HEADLESS_RUNNER, wasm_path, "--runs", str(n), "--json"
+        ]
+        for text in inputs:
+            cmd += ["--input", text]
+        result = subprocess.run(cmd, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+        count = _parse_instructions(result.stderr)
+        if count is None:
+            return None
+        counts.append(count)
+    return max(counts[1] - counts[0], 0) // (runs - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of compiled MathPL programs")
+    parser.add_argument("sources", nargs="*", default=EXAMPLES_DIRS, help="Source files or directories (default: the examples)")
+    parser.add_argument("--runs", type=int, default=10, help="Number of _start calls per module (default: %(default)s)")
+    parser.add_argument("--flags", default="", help="Compiler options, e.g. --flags=\"--no-simd --native-math\"")
+    parser.add_argument("--input", action="append", default=None, help="Answer to input(), in order (default: 5 and 3.5)")
+    parser.add_argument("--save", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare the median times with a file written by --save")
+    parser.add_argument("--max-regression", type=float, default=None, help="With --baseline, fail if a program is slower by more than this percentage")
+    args = parser.parse_args()
+
+    if shutil.which("node") is None:
+        log("ERROR: node was not found on PATH.")
+        sys.exit(1)
+    if args.runs < 1:
+        log("ERROR: --runs must be positive.")
+        sys.exit(1)
+
+    inputs = args.input if args.input is not None else DEFAULT_INPUTS
+    files = collect_files(args.sources)
+    if not files:
+        log("No source files found.")
+        sys.exit(1)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    use_perf = perf_available()
+    if not use_perf:
+        log("perf is not available: instructions retired are not reported.")
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as out_root:
+        wasm_paths = compile_files(files, out_root, shlex.split(args.flags))
+        if wasm_paths is None:
+            log("ERROR: compilation failed.")
+            sys.exit(1)
+
+        print(
+            f"{'program':<48} {'median ms':>10} {'min ms':>9} {'instr/run':>12} "
+            f"{'peak mem':>9} {'size':>7}  status"
+        )
+        for path in files:
+            label = os.path.relpath(path, BASE_DIR)
+            wasm_path = wasm_paths[path]
+            report = run_headless(wasm_path, args.runs, inputs)
+            if report is None:
+                print(f"{label:<48} {'failed':>10}")
+                results[label] = None
+                continue
+
+            instructions = count_instructions(wasm_path, args.runs, inputs) if use_perf else None
+            result = {
+                "median_ms": report["run_ms"]["median"],
+                "min_ms": report["run_ms"]["min"],
+                "instructions": instructions,
+                "peak_memory_bytes": report["peak_memory_bytes"],
+                "wasm_bytes": os.path.getsize(wasm_path),
+                "trap": report["trap"],
+            }
+            results[label] = result
+
+            status = "ok" if result["trap"] is None else f"trap: {result['trap']}"
+            previous = baseline.get(label)
+            if previous:
+                change = (result["median_ms"] / previous["median_ms"] - 1) * 100 if previous["median_ms"] else 0.0
+                status += f", {change:+.1f}% vs baseline"
+                if args.max_regression is not None and change > args.max_regression:
+                    regressions.append(label)
+            instr = f"{instructions:>12}" if instructions is not None else f"{'-':>12}"
+            print(
+                f"{label:<48} {result['median_ms']:>10.3f} {result['min_ms']:>9.3f} {instr} "
+                f"{result['peak_memory_bytes'] // 1024:>6} KiB {result['wasm_bytes']:>7}  {status}"
+            )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"flags": args.flags, "runs": args.runs, "results": results}, f, indent=2)
+        log(f"Results written to '{args.save}'.")
+
+    failed_checks = check_runtime_errors() + check_peak_memory() if args.sources is EXAMPLES_DIRS else 0
+
+    if any(result is None for result in results.values()) or failed_checks:
+        sys.exit(1)
+    if regressions:
+        log(f"Slower than the baseline by more than {args.max_regression}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
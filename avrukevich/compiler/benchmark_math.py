@@ -0,0 +1,69 @@
+"""Compares the imported (JavaScript Math) and --native-math builds of programs.
+
+Every source is compiled twice to .wasm, and both modules are run by
+wasm_runner/headless.js under node, which must be on PATH.  The script
+prints the time of one `_start` call (the median of --runs runs), the size
+of both binaries and whether the outputs are the same.  Without arguments the examples in
+../examples/correct_examples and ../examples/extra_task_examples are used.
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+from benchmark import BASE_DIR, EXAMPLES_DIRS, DEFAULT_INPUTS, log, collect_files, compile_files, run_headless
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of --native-math against the Math imports")
+    parser.add_argument("sources", nargs="*", default=EXAMPLES_DIRS, help="Source files or directories (default: the examples)")
+    parser.add_argument("--runs", type=int, default=20, help="Number of _start calls per module (default: %(default)s)")
+    parser.add_argument("--input", action="append", default=None, help="Answer to input(), in order (default: 5 and 3.5)")
+    args = parser.parse_args()
+
+    if shutil.which("node") is None:
+        log("ERROR: node was not found on PATH.")
+        sys.exit(1)
+
+    inputs = args.input if args.input is not None else DEFAULT_INPUTS
+    files = collect_files(args.sources)
+    if not files:
+        log("No source files found.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        builds = {}
+        for mode, flags in (("imports", []), ("native", ["--native-math"])):
+            builds[mode] = compile_files(files, os.path.join(work_dir, mode), flags)
+            if builds[mode] is None:
+                log(f"ERROR: compilation failed ({mode}).")
+                sys.exit(1)
+
+        print(f"{'program':<48} {'imports ms':>11} {'native ms':>10} {'speedup':>8} {'size':>13}  output")
+        for path in files:
+            reports, sizes = [], []
+            for mode in ("imports", "native"):
+                sizes.append(os.path.getsize(builds[mode][path]))
+                reports.append(run_headless(builds[mode][path], args.runs, inputs))
+
+            label = os.path.relpath(path, BASE_DIR)
+            if None in reports:
+                print(f"{label:<48} {'failed':>11}")
+                continue
+            imports, native = reports
+            imports_ms, native_ms = imports["run_ms"]["median"], native["run_ms"]["median"]
+            speedup = imports_ms / native_ms if native_ms else float("inf")
+            same = (imports["output"], imports["trap"]) == (native["output"], native["trap"])
+            status = "same" if same else "DIFFERENT"
+            if imports["trap"]:
+                status += f" (trap: {imports['trap']})"
+            print(
+                f"{label:<48} {imports_ms:>11.3f} {native_ms:>10.3f} {speedup:>7.2f}x "
+                f"{sizes[0]:>6}/{sizes[1]:<6}  {status}"
+            )
+
+
+if __name__ == "__main__":
+    main()
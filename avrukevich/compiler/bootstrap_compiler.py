@@ -1,8 +1,6 @@
 import os
 import sys
-import platform
 import urllib.request
-import tarfile
 import subprocess
 import venv
 
@@ -18,8 +16,6 @@ GRAMMAR_FILE = os.path.join(BASE_DIR, "GrammarMathPL.g4")
 ANTLR_JAR = os.path.join(BASE_DIR, "antlr-4.13.2-complete.jar")
 
 ANTLR_URL = "https://www.antlr.org/download/antlr-4.13.2-complete.jar"
-WABT_VERSION = "1.0.35"
-WABT_BASE_URL = f"https://github.com/WebAssembly/wabt/releases/download/{WABT_VERSION}/"
 
 
 def log(msg):
@@ -78,41 +74,6 @@ def download_tools():
     if not os.path.exists(ANTLR_JAR):
         log(f"Downloading {os.path.basename(ANTLR_JAR)}...")
         urllib.request.urlretrieve(ANTLR_URL, ANTLR_JAR)
-    
-    exe_name = "wat2wasm.exe" if os.name == 'nt' else "wat2wasm"
-    exe_path = os.path.join(BASE_DIR, exe_name)
-
-    if os.path.exists(exe_path):
-        return
-
-    system = platform.system().lower()
-    if "windows" in system: filename = f"wabt-{WABT_VERSION}-windows.tar.gz"
-    elif "linux" in system: filename = f"wabt-{WABT_VERSION}-ubuntu.tar.gz"
-    elif "darwin" in system: filename = f"wabt-{WABT_VERSION}-macos.tar.gz"
-    else: 
-        log("Can't recognize OS for wat2wasm.")
-        return
-
-    archive_path = os.path.join(BASE_DIR, filename)
-    
-    log(f"Downloading {filename}...")
-    try:
-        urllib.request.urlretrieve(WABT_BASE_URL + filename, archive_path)
-    except Exception as e:
-        log(f"Error while downloading: {e}")
-        sys.exit(1)
-    
-    log("Unpacking wat2wasm...")
-    with tarfile.open(archive_path, "r:gz") as tar:
-        member = next((m for m in tar.getmembers() if m.name.endswith(f"/bin/{exe_name}")), None)
-        if member:
-            member.name = exe_name 
-            tar.extract(member, path=BASE_DIR)
-    
-    if os.path.exists(archive_path): os.remove(archive_path)
-    
-    if os.name != 'nt': 
-        os.chmod(exe_path, 0o755)
 
 
 def generate_parser():
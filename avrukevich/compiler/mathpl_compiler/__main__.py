@@ -1,13 +1,29 @@
+import os
 import sys
+import time
 import argparse
 
+from .cache import DEFAULT_LIMIT_BYTES
+from .inlining import DEFAULT_THRESHOLD as DEFAULT_INLINE_THRESHOLD
+from .batch import collect_sources, compile_batch, conflicting_outputs, print_report
 from .pipeline import compile_source
 
 
 def main():
     parser = argparse.ArgumentParser(description="MathPL Compiler")
     
-    parser.add_argument("source_file", help="Path to the source .mpl file")
+    parser.add_argument(
+        "sources",
+        nargs="+",
+        help="Source .mpl files or directories to compile (directories are searched for .mpl/.txt files)"
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used when compiling several files (default: 1)"
+    )
     
     parser.add_argument(
         "-o", "--output", 
@@ -18,18 +34,117 @@ def main():
     parser.add_argument(
         "--wasm", 
         action="store_true", 
-        help="Compile the resulting .wat file to binary .wasm using wat2wasm"
+        help="Emit a binary .wasm module instead of the .wat text"
+    )
+
+    parser.add_argument(
+        "--keep-wat",
+        action="store_true",
+        help="With --wasm, also write the .wat text as a debug artifact"
+    )
+
+    parser.add_argument(
+        "--no-simd",
+        action="store_true",
+        help="Import array operations from the host instead of generating in-module SIMD kernels"
+    )
+
+    parser.add_argument(
+        "--no-opt",
+        action="store_true",
+        help="Skip constant folding and strength reduction before code generation"
+    )
+
+    parser.add_argument(
+        "--no-peephole",
+        action="store_true",
+        help="Emit the generated instructions as is, without the peephole pass"
+    )
+
+    parser.add_argument(
+        "--no-fusion",
+        action="store_true",
+        help="Call one array kernel per operator instead of fusing whole-array expressions into one loop"
+    )
+
+    parser.add_argument(
+        "--no-tree-shake",
+        action="store_true",
+        help="Keep every import, runtime helper and static string even if the program never uses them"
+    )
+
+    parser.add_argument(
+        "--native-math",
+        action="store_true",
+        help="Compile sin, cos, tan, asin, acos, atan, ln, log and ^ into the module instead of importing them from JavaScript's Math"
+    )
+
+    parser.add_argument(
+        "--inline-threshold",
+        type=int,
+        default=DEFAULT_INLINE_THRESHOLD,
+        help="Inline calls to user functions whose body has at most this many instructions; 0 disables inlining (default: %(default)s)"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always compile from scratch, without reading or updating the compilation cache"
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory of the compilation cache (default: $MATHPL_CACHE_DIR or ~/.cache/mathpl_compiler)"
+    )
+
+    parser.add_argument(
+        "--cache-limit",
+        type=int,
+        default=DEFAULT_LIMIT_BYTES // (1024 * 1024),
+        help="Size limit of the compilation cache in MiB; least recently used entries are evicted (default: %(default)s)"
     )
 
     args = parser.parse_args()
 
-    success = compile_source(
-        file_path=args.source_file, 
-        output_dir=args.output, 
-        to_wasm=args.wasm
+    options = dict(
+        to_wasm=args.wasm,
+        keep_wat=args.keep_wat,
+        simd_kernels=not args.no_simd,
+        optimize=not args.no_opt,
+        peephole=not args.no_peephole,
+        fuse_arrays=not args.no_fusion,
+        tree_shake=not args.no_tree_shake,
+        native_math=args.native_math,
+        inline_threshold=args.inline_threshold,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_limit=args.cache_limit * 1024 * 1024
     )
 
-    if not success:
+    if len(args.sources) == 1 and not os.path.isdir(args.sources[0]):
+        success = compile_source(file_path=args.sources[0], output_dir=args.output, **options)
+        if not success:
+            sys.exit(1)
+        return
+
+    sources = collect_sources(args.sources, args.output)
+    if not sources:
+        print("No source files found.")
+        sys.exit(1)
+
+    conflicts = conflicting_outputs(sources)
+    if conflicts:
+        print("Error: several sources would be compiled to the same output file:")
+        for stem, files in conflicts.items():
+            print(f"  {stem}.*: {', '.join(files)}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = compile_batch(sources, jobs=args.jobs, **options)
+    print_report(results, time.perf_counter() - start)
+
+    if not all(result.success for result in results):
         sys.exit(1)
     
 
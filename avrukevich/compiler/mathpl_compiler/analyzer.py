@@ -74,6 +74,7 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
                 'str_to_float', return_type=types.FLOAT, param_types=[types.STRING]
             ),
         }
+        self.built_in_names = frozenset(_built_in_functions)
         global_scope = self.symbol_table[0]
         global_scope.update(_built_in_functions)
 
@@ -117,10 +118,27 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
         
         if type_node.LBRACK():
             element_type = self._type_from_node(type_node.type_())
+            if type_node.COMMA():
+                return types.MatrixType(element_type)
             return types.ArrayType(element_type)
             
         return types.UNKNOWN
 
+    def _matrix_element_type(self, access_ctx) -> types.MathPLType:
+        """Type of ``m[i, j]``, reporting a non-matrix target or non-INT indices."""
+        matrix_expr = access_ctx.expression(0)
+        matrix_type = self.visit(matrix_expr)
+        for index_expr in access_ctx.expression()[1:]:
+            t_index = self.visit(index_expr)
+            if t_index != types.INT:
+                self.error_listener.semanticError(index_expr, f"Array index must be INT, got '{t_index.name}'")
+
+        if not isinstance(matrix_type, types.MatrixType):
+            if matrix_type != types.UNKNOWN:
+                self.error_listener.semanticError(matrix_expr, f"Type '{matrix_type.name}' is not a two-dimensional array")
+            return types.UNKNOWN
+        return matrix_type.element_type
+
     def visitProgram(self, ctx:GrammarMathPLParser.ProgramContext):
         self.visitChildren(ctx)
 
@@ -254,8 +272,7 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
             if var_symbol is None:
                 return types.UNKNOWN
             
-            if not isinstance(var_symbol.type, types.PrimitiveType) and \
-               not isinstance(var_symbol.type, types.ArrayType):
+            if not isinstance(var_symbol.type, (types.PrimitiveType, types.ArrayType, types.MatrixType)):
                 self.error_listener.semanticError(
                     left_expr, 
                     f"'{var_name}' cannot be assigned to (it is a {var_symbol.category.name})"
@@ -264,20 +281,35 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
             
             target_type = var_symbol.type
             
+        elif left_expr.LBRACK() and left_expr.COMMA():
+            target_type = self._matrix_element_type(left_expr)
+            if target_type == types.UNKNOWN:
+                return types.UNKNOWN
+
         elif left_expr.LBRACK() and not left_expr.COLON():
             array_expr = left_expr.expression(0)
             index_expr = left_expr.expression(1)
             
             arr_type = self.visit(array_expr)
-            if not isinstance(arr_type, types.ArrayType):
+            if isinstance(arr_type, types.MatrixType):
+                # m[i] is a view of row i: its elements can be updated, but it cannot be replaced
+                if op_text == '=':
+                    self.error_listener.semanticError(left_expr, "Cannot assign to a row of a two-dimensional array; assign its elements instead")
+                    return types.UNKNOWN
+                idx_type = self.visit(index_expr)
+                if idx_type != types.INT:
+                    self.error_listener.semanticError(index_expr, "Array index must be INT")
+                target_type = types.ArrayType(arr_type.element_type)
+                left_expr.type = target_type
+            elif not isinstance(arr_type, types.ArrayType):
                 self.error_listener.semanticError(array_expr, f"Cannot assign to index: '{arr_type.name}' is not an array")
                 return types.UNKNOWN
-            
-            idx_type = self.visit(index_expr)
-            if idx_type != types.INT:
-                self.error_listener.semanticError(index_expr, "Array index must be INT")
-            
-            target_type = arr_type.element_type
+            else:
+                idx_type = self.visit(index_expr)
+                if idx_type != types.INT:
+                    self.error_listener.semanticError(index_expr, "Array index must be INT")
+
+                target_type = arr_type.element_type
             
         else:
             self.error_listener.semanticError(left_expr, "Invalid assignment target. Can only assign to variables or array elements.")
@@ -450,6 +482,9 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
                 target_expr.atom().variable().symbol_info = var_symbol
                 target_type = var_symbol.type
         
+        elif target_expr.LBRACK() and target_expr.COMMA():
+            target_type = self._matrix_element_type(target_expr)
+
         elif target_expr.LBRACK() and not target_expr.COLON():
             arr_type = self.visit(target_expr.expression(0))
             idx_type = self.visit(target_expr.expression(1))
@@ -524,10 +559,29 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
             ctx.type = result_type
             return result_type
 
+        if ctx.LBRACK() and ctx.COMMA():
+            result_type = self._matrix_element_type(ctx)
+            ctx.type = result_type
+            return result_type
+
         if ctx.LBRACK():
             target_expr = ctx.expression(0)
             target_type = self.visit(target_expr)
-            
+
+            if isinstance(target_type, types.MatrixType):
+                if ctx.COLON():
+                    self.error_listener.semanticError(ctx, "Two-dimensional arrays cannot be sliced; slice a row 'm[i][a:b]' instead")
+                    ctx.type = types.UNKNOWN
+                    return types.UNKNOWN
+                index_expr = ctx.expression(1)
+                t_index = self.visit(index_expr)
+                if t_index != types.INT:
+                    self.error_listener.semanticError(index_expr, f"Array index must be INT, got '{t_index.name}'")
+                # m[i] is row i itself, not a copy
+                result_type = types.ArrayType(target_type.element_type)
+                ctx.type = result_type
+                return result_type
+
             if not isinstance(target_type, types.ArrayType):
                 self.error_listener.semanticError(target_expr, f"Type '{target_type.name}' is not an array")
                 ctx.type = types.UNKNOWN
@@ -560,7 +614,7 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
             target_expr = ctx.expression(0)
             target_type = self.visit(target_expr)
             
-            if not isinstance(target_type, types.ArrayType) and target_type != types.STRING:
+            if not isinstance(target_type, (types.ArrayType, types.MatrixType)) and target_type != types.STRING:
                 self.error_listener.semanticError(ctx, f"Property 'length' is undefined for type '{target_type.name}'")
             
             result_type = types.INT
@@ -745,8 +799,7 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
             symbol = self._resolve_symbol(var_name, ctx)
             if symbol is None:
                 result_type = types.UNKNOWN
-            elif isinstance(symbol.type, types.PrimitiveType) \
-                or isinstance(symbol.type, types.ArrayType):
+            elif isinstance(symbol.type, (types.PrimitiveType, types.ArrayType, types.MatrixType)):
                 ctx.variable().symbol_info = symbol
                 result_type = symbol.type
             else:
@@ -782,16 +835,19 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
         elif ctx.NEW():
             target_type = self._type_from_node(ctx.type_())
             
-            size_atom = ctx.atom()
-            size_type = self.visit(size_atom)
-            
-            if size_type != types.INT:
-                self.error_listener.semanticError(
-                    size_atom,
-                    f"Array size must be INT, got '{size_type.name}'"
-                )
+            for size_atom in ctx.atom():
+                size_type = self.visit(size_atom)
+
+                if size_type != types.INT:
+                    self.error_listener.semanticError(
+                        size_atom,
+                        f"Array size must be INT, got '{size_type.name}'"
+                    )
             
-            result_type = types.ArrayType(target_type)
+            if ctx.COMMA():
+                result_type = types.MatrixType(target_type)
+            else:
+                result_type = types.ArrayType(target_type)
         
         ctx.type = result_type
         return result_type
@@ -804,6 +860,9 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
             if not isinstance(target_type, types.ArrayType):
                 self.error_listener.semanticError(target_expr, f"Method 'append' is undefined for type '{target_type.name}'")
                 return
+            if target_expr.LBRACK() and isinstance(target_expr.expression(0).type, types.MatrixType):
+                self.error_listener.semanticError(target_expr, "Rows of a two-dimensional array have a fixed length and cannot be appended to")
+                return
             
             val_expr = ctx.expression(1)
             val_type = self.visit(val_expr)
@@ -855,13 +914,14 @@ class MathPLSemanticAnalyzer(GrammarMathPLVisitor):
             raw_text = ctx.getText()
             str_value = eval(raw_text)
             if str_value not in self.string_literals:
-                address = self.memory_offset_counter
-                byte_length = len(str_value.encode('utf-8')) + 1
+                # Length-prefixed layout: [len:i32][utf-8 bytes], 4-byte aligned
+                address = (self.memory_offset_counter + 3) & ~3
+                byte_length = 4 + len(str_value.encode('utf-8'))
                 self.string_literals[str_value] = {
                     'address': address,
                     'length': byte_length
                 }
-                self.memory_offset_counter += byte_length
+                self.memory_offset_counter = address + byte_length
             ctx.address = self.string_literals[str_value]['address']
         
         ctx.type = result_type
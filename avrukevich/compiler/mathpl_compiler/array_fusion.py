@@ -0,0 +1,128 @@
+"""Fused loops for whole-array arithmetic expressions.
+
+Without fusion ``a + b * 2.0 - d`` runs one kernel per operator and every
+kernel allocates its own result array.  The generator instead evaluates the
+leaves of the expression once, runs the length checks the kernels would
+have run, and emits a single loop that computes each element on the stack
+and stores it straight into the destination array.
+
+A tree is a nested tuple:
+
+* ``("array", local)`` -- an array leaf whose pointer is in an i32 local;
+* ``("scalar", local)`` -- a scalar leaf held in a local of the element type;
+* ``(op, left, right)`` -- ``op`` is one of ``array_kernels.ARITHMETIC_OPS``.
+
+Scalars only ever appear as the right operand, as the analyzer requires.
+"""
+
+from .array_kernels import ARITHMETIC_OPS, _ELEMENTS, _scalar_op, _vector_op
+
+
+def op_count(tree) -> int:
+    if tree[0] in ARITHMETIC_OPS:
+        return 1 + op_count(tree[1]) + op_count(tree[2])
+    return 0
+
+
+def _scalar_leaves(tree) -> list:
+    if tree[0] == "scalar":
+        return [tree[1]]
+    if tree[0] in ARITHMETIC_OPS:
+        return _scalar_leaves(tree[1]) + _scalar_leaves(tree[2])
+    return []
+
+
+def _vectorizable(tree, suffix: str) -> bool:
+    if tree[0] in ARITHMETIC_OPS:
+        return (_vector_op(suffix, tree[0]) is not None
+                and _vectorizable(tree[1], suffix) and _vectorizable(tree[2], suffix))
+    return True
+
+
+def _emit_element(emit, tree, suffix: str, offset: str, splats: dict | None) -> None:
+    # Pushes one element of the tree: a scalar when ``splats`` is None,
+    # otherwise a v128 holding the lanes that start at ``offset``.
+    kind = tree[0]
+    if kind == "array":
+        emit(f'local.get {tree[1]}')
+        emit(f'local.get {offset}')
+        emit('i32.add')
+        emit('v128.load offset=8' if splats is not None else f'{_ELEMENTS[suffix][0]}.load offset=8')
+    elif kind == "scalar":
+        emit(f'local.get {splats[tree[1]] if splats is not None else tree[1]}')
+    else:
+        _emit_element(emit, tree[1], suffix, offset, splats)
+        _emit_element(emit, tree[2], suffix, offset, splats)
+        emit(_vector_op(suffix, kind) if splats is not None else _scalar_op(suffix, kind))
+
+
+def emit_fused_loop(emit, tree, suffix: str, dst: str, length: str, label: str,
+                    new_local, simd: bool = True) -> None:
+    """Emits the loop that stores ``tree`` element by element into the array in ``dst``.
+
+    ``length`` is an i32 local with the element count, ``new_local(wat_type)``
+    returns a free local of that type and ``label`` prefixes the block labels.
+    Without ``simd`` (or when an operator has no vector form, like integer
+    division) the whole array is handled by the scalar loop.
+    """
+    wat_type, size, shift, lanes = _ELEMENTS[suffix]
+    offset = new_local("i32")
+    end = new_local("i32")
+
+    # Locals are shared between expressions, so the offset starts from zero explicitly.
+    emit('i32.const 0')
+    emit(f'local.set {offset}')
+
+    if simd and _vectorizable(tree, suffix):
+        splats = {}
+        for scalar in _scalar_leaves(tree):
+            splats[scalar] = new_local("v128")
+            emit(f'local.get {scalar}')
+            emit(f'{"i32x4" if suffix == "i32" else "f64x2"}.splat')
+            emit(f'local.set {splats[scalar]}')
+
+        emit(f'local.get {length}')
+        emit(f'i32.const {-lanes}')
+        emit('i32.and')
+        emit(f'i32.const {shift}')
+        emit('i32.shl')
+        emit(f'local.set {end}')
+
+        emit(f'(block {label}_vec_done (loop {label}_vec')
+        emit(f'local.get {offset}')
+        emit(f'local.get {end}')
+        emit('i32.ge_u')
+        emit(f'br_if {label}_vec_done')
+        emit(f'local.get {dst}')
+        emit(f'local.get {offset}')
+        emit('i32.add')
+        _emit_element(emit, tree, suffix, offset, splats)
+        emit('v128.store offset=8')
+        emit(f'local.get {offset}')
+        emit('i32.const 16')
+        emit('i32.add')
+        emit(f'local.set {offset}')
+        emit(f'br {label}_vec')
+        emit('))')
+
+    emit(f'local.get {length}')
+    emit(f'i32.const {shift}')
+    emit('i32.shl')
+    emit(f'local.set {end}')
+
+    emit(f'(block {label}_tail_done (loop {label}_tail')
+    emit(f'local.get {offset}')
+    emit(f'local.get {end}')
+    emit('i32.ge_u')
+    emit(f'br_if {label}_tail_done')
+    emit(f'local.get {dst}')
+    emit(f'local.get {offset}')
+    emit('i32.add')
+    _emit_element(emit, tree, suffix, offset, None)
+    emit(f'{wat_type}.store offset=8')
+    emit(f'local.get {offset}')
+    emit(f'i32.const {size}')
+    emit('i32.add')
+    emit(f'local.set {offset}')
+    emit(f'br {label}_tail')
+    emit('))')
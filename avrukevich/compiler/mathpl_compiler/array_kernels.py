@@ -0,0 +1,207 @@
+"""In-module WAT kernels for element-wise array operations.
+
+Arrays are laid out as ``[cap:i32, len:i32, data...]``, so element ``i``
+lives at ``ptr + 8 + i * size``.  Every kernel walks the data with a
+``v128`` loop (2 lanes for f64, 4 lanes for i32) and finishes the remainder
+with a scalar tail.  Length mismatches trap with ``unreachable``, the same
+way ``$check_bounds`` reports an invalid index.
+
+The kernels keep the names of the old ``env`` imports (``$arr_add_i32``,
+``$arr_mul_scalar_f64``, ...), so call sites do not depend on whether the
+module carries its own kernels or imports them from the host.
+"""
+
+# element type suffix -> (wat scalar type, element size, log2(size), lanes)
+_ELEMENTS = {
+    "i32": ("i32", 4, 2, 4),
+    "f64": ("f64", 8, 3, 2),
+}
+
+ARITHMETIC_OPS = ("add", "sub", "mul", "div")
+COMPARISON_OPS = {"gt": "i32.gt_s", "gte": "i32.ge_s", "lt": "i32.lt_s", "lte": "i32.le_s"}
+
+
+def _scalar_op(suffix: str, op: str) -> str:
+    if suffix == "i32" and op == "div":
+        return "i32.div_s"
+    return f"{suffix}.{op}"
+
+
+def _vector_op(suffix: str, op: str) -> str | None:
+    # There is no integer division in the SIMD proposal.
+    if suffix == "i32" and op == "div":
+        return None
+    if suffix == "i32":
+        return f"i32x4.{op}"
+    return f"f64x2.{op}"
+
+
+def kernel_imports() -> list:
+    """Returns the ``env`` import lines used when the kernels live in the host."""
+    lines = []
+    for name in COMPARISON_OPS:
+        lines.append(f'(import "env" "arr_{name}" (func $arr_{name} (param i32 i32) (result i32)))')
+    for suffix in _ELEMENTS:
+        for op in ARITHMETIC_OPS:
+            lines.append(f'(import "env" "arr_{op}_{suffix}" (func $arr_{op}_{suffix} (param i32 i32) (result i32)))')
+    for suffix, (wat_type, _, _, _) in _ELEMENTS.items():
+        for op in ARITHMETIC_OPS:
+            lines.append(f'(import "env" "arr_{op}_scalar_{suffix}" (func $arr_{op}_scalar_{suffix} (param i32 {wat_type}) (result i32)))')
+    for suffix in _ELEMENTS:
+        for op in ARITHMETIC_OPS:
+            lines.append(f'(import "env" "arr_{op}_assign_{suffix}" (func $arr_{op}_assign_{suffix} (param i32 i32)))')
+    for suffix, (wat_type, _, _, _) in _ELEMENTS.items():
+        for op in ARITHMETIC_OPS:
+            lines.append(f'(import "env" "arr_{op}_assign_scalar_{suffix}" (func $arr_{op}_assign_scalar_{suffix} (param i32 {wat_type})))')
+    return lines
+
+
+def emit_array_kernels(emit) -> None:
+    """Emits every array kernel through ``emit`` (``WatCodeGenerator._add_line``)."""
+    for name, wat_op in COMPARISON_OPS.items():
+        _emit_comparison(emit, name, wat_op)
+    for suffix in _ELEMENTS:
+        for op in ARITHMETIC_OPS:
+            _emit_kernel(emit, suffix, op, scalar=False, in_place=False)
+            _emit_kernel(emit, suffix, op, scalar=True, in_place=False)
+            _emit_kernel(emit, suffix, op, scalar=False, in_place=True)
+            _emit_kernel(emit, suffix, op, scalar=True, in_place=True)
+
+
+def _emit_comparison(emit, name: str, wat_op: str) -> None:
+    # Array ordering compares lengths, as the host implementation did.
+    emit(f'(func $arr_{name} (param $a i32) (param $b i32) (result i32)', 1)
+    emit('local.get $a')
+    emit('i32.load offset=4')
+    emit('local.get $b')
+    emit('i32.load offset=4')
+    emit(wat_op)
+    emit(')', -1)
+
+
+def _emit_kernel(emit, suffix: str, op: str, scalar: bool, in_place: bool) -> None:
+    wat_type, size, shift, lanes = _ELEMENTS[suffix]
+    vector_op = _vector_op(suffix, op)
+
+    name = f"$arr_{op}"
+    if in_place:
+        name += "_assign"
+    if scalar:
+        name += "_scalar"
+    name += f"_{suffix}"
+
+    rhs_type = wat_type if scalar else "i32"
+    result = "" if in_place else " (result i32)"
+    emit(f'(func {name} (param $a i32) (param $b {rhs_type}){result}', 1)
+    emit('(local $len i32) (local $dst i32) (local $off i32) (local $end i32)')
+    if scalar and vector_op:
+        emit('(local $splat v128)')
+
+    emit('local.get $a')
+    emit('i32.load offset=4')
+    emit('local.set $len')
+
+    if not scalar:
+        emit('local.get $b')
+        emit('i32.load offset=4')
+        emit('local.get $len')
+        emit('i32.ne')
+        emit('(if (then unreachable))')
+
+    if in_place:
+        emit('local.get $a')
+        emit('local.set $dst')
+    else:
+        emit('local.get $len')
+        emit(f'i32.const {shift}')
+        emit('i32.shl')
+        emit('i32.const 8')
+        emit('i32.add')
+        emit('call $malloc')
+        emit('local.set $dst')
+        emit('local.get $dst')
+        emit('local.get $len')
+        emit('i32.store')
+        emit('local.get $dst')
+        emit('local.get $len')
+        emit('i32.store offset=4')
+
+    if vector_op:
+        if scalar:
+            emit('local.get $b')
+            emit(f'{"i32x4" if suffix == "i32" else "f64x2"}.splat')
+            emit('local.set $splat')
+
+        # Byte offset where the whole-vector part of the data ends.
+        emit('local.get $len')
+        emit(f'i32.const {-lanes}')
+        emit('i32.and')
+        emit(f'i32.const {shift}')
+        emit('i32.shl')
+        emit('local.set $end')
+
+        emit('(block $vec_done (loop $vec')
+        emit('local.get $off')
+        emit('local.get $end')
+        emit('i32.ge_u')
+        emit('br_if $vec_done')
+        emit('local.get $dst')
+        emit('local.get $off')
+        emit('i32.add')
+        emit('local.get $a')
+        emit('local.get $off')
+        emit('i32.add')
+        emit('v128.load offset=8')
+        if scalar:
+            emit('local.get $splat')
+        else:
+            emit('local.get $b')
+            emit('local.get $off')
+            emit('i32.add')
+            emit('v128.load offset=8')
+        emit(vector_op)
+        emit('v128.store offset=8')
+        emit('local.get $off')
+        emit('i32.const 16')
+        emit('i32.add')
+        emit('local.set $off')
+        emit('br $vec')
+        emit('))')
+
+    # Scalar tail (the whole array when there is no vector form).
+    emit('local.get $len')
+    emit(f'i32.const {shift}')
+    emit('i32.shl')
+    emit('local.set $end')
+
+    emit('(block $tail_done (loop $tail')
+    emit('local.get $off')
+    emit('local.get $end')
+    emit('i32.ge_u')
+    emit('br_if $tail_done')
+    emit('local.get $dst')
+    emit('local.get $off')
+    emit('i32.add')
+    emit('local.get $a')
+    emit('local.get $off')
+    emit('i32.add')
+    emit(f'{wat_type}.load offset=8')
+    if scalar:
+        emit('local.get $b')
+    else:
+        emit('local.get $b')
+        emit('local.get $off')
+        emit('i32.add')
+        emit(f'{wat_type}.load offset=8')
+    emit(_scalar_op(suffix, op))
+    emit(f'{wat_type}.store offset=8')
+    emit('local.get $off')
+    emit(f'i32.const {size}')
+    emit('i32.add')
+    emit('local.set $off')
+    emit('br $tail')
+    emit('))')
+
+    if not in_place:
+        emit('local.get $dst')
+    emit(')', -1)
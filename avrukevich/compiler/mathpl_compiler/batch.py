@@ -0,0 +1,90 @@
+import io
+import os
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from .pipeline import compile_source, output_stem
+
+SOURCE_EXTENSIONS = (".mpl", ".txt")
+
+
+class BatchSource(NamedTuple):
+    file_path: str
+    # None writes the artifacts next to the source
+    output_dir: str | None
+
+
+class BatchResult(NamedTuple):
+    file_path: str
+    success: bool
+    seconds: float
+    log: str
+
+
+def collect_sources(paths: list, output_dir: str | None = None) -> list:
+    """Expands directories into their MathPL sources; files are kept as given.
+
+    With ``output_dir`` the sources found in a directory ``d`` are written
+    to ``output_dir/<name of d>`` and the files given directly to
+    ``output_dir`` itself.
+    """
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            target_dir = None
+            if output_dir:
+                target_dir = os.path.join(output_dir, os.path.basename(os.path.abspath(path)))
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if name.endswith(SOURCE_EXTENSIONS) and os.path.isfile(full_path):
+                    sources.append(BatchSource(full_path, target_dir))
+        else:
+            sources.append(BatchSource(path, output_dir))
+    return sources
+
+
+def conflicting_outputs(sources: list) -> dict:
+    """{output path without extension: sources} for outputs shared by several sources."""
+    by_output = {}
+    for source in sources:
+        stem = os.path.normcase(os.path.abspath(output_stem(source.file_path, source.output_dir)))
+        by_output.setdefault(stem, []).append(source.file_path)
+    return {stem: files for stem, files in by_output.items() if len(files) > 1}
+
+
+def _compile_one(source: BatchSource, options: dict) -> BatchResult:
+    # Runs in a worker process; the ANTLR modules are imported once per worker
+    # together with this module, not once per file.
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        try:
+            success = compile_source(source.file_path, output_dir=source.output_dir, **options)
+        except Exception as e:
+            print(f"Internal compiler error: {e!r}")
+            success = False
+    return BatchResult(source.file_path, success, time.perf_counter() - start, output.getvalue())
+
+
+def compile_batch(sources: list, jobs: int = 1, **options) -> list:
+    """Compiles every ``BatchSource`` with ``compile_source(**options)`` on
+    ``jobs`` worker processes and returns the results in input order."""
+    if jobs <= 1 or len(sources) <= 1:
+        return [_compile_one(source, options) for source in sources]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_compile_one, sources, [options] * len(sources)))
+
+
+def print_report(results: list, total_seconds: float) -> None:
+    for result in results:
+        status = "OK" if result.success else "FAIL"
+        print(f" [{status}] {result.file_path} ({result.seconds:.3f}s)")
+        if not result.success:
+            print("      " + result.log.rstrip().replace("\n", "\n      "))
+    failed = sum(1 for result in results if not result.success)
+    print(
+        f"Result: Successful {len(results) - failed} out of {len(results)}, "
+        f"failed {failed}. Total time: {total_seconds:.3f}s"
+    )
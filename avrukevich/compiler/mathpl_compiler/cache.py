@@ -0,0 +1,125 @@
+"""Content-addressed on-disk cache of compilation outputs.
+
+An entry is keyed by the SHA-256 of the source text, the compiler version
+and the code generation options, and holds the produced artifacts
+(``module.wat`` and/or ``module.wasm``).  The compiler version is a hash of
+the compiler's own sources and grammar, so any change to the compiler
+invalidates the old entries.  When the cache grows past its size limit the
+least recently used entries are evicted.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mathpl_compiler")
+DEFAULT_LIMIT_BYTES = 256 * 1024 * 1024
+
+ARTIFACT_NAME = "module"
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_GRAMMAR_FILE = os.path.join(os.path.dirname(_PACKAGE_DIR), "GrammarMathPL.g4")
+
+_compiler_version = None
+
+
+def compiler_version() -> str:
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256()
+        sources = sorted(
+            os.path.join(_PACKAGE_DIR, name)
+            for name in os.listdir(_PACKAGE_DIR) if name.endswith(".py")
+        )
+        if os.path.isfile(_GRAMMAR_FILE):
+            sources.append(_GRAMMAR_FILE)
+        for path in sources:
+            digest.update(os.path.basename(path).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+
+def cache_key(source: bytes, options: dict) -> str:
+    key_data = json.dumps({
+        "source": hashlib.sha256(source).hexdigest(),
+        "compiler": compiler_version(),
+        "options": options,
+    }, sort_keys=True)
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+
+class CompilationCache:
+    def __init__(self, cache_dir: str | None = None, limit_bytes: int = DEFAULT_LIMIT_BYTES):
+        self.cache_dir = cache_dir or os.environ.get("MATHPL_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.limit_bytes = limit_bytes
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key: str) -> dict | None:
+        """Returns ``{extension: content}`` for a cached entry, or None."""
+        entry_dir = self._entry_dir(key)
+        try:
+            artifacts = {}
+            for name in os.listdir(entry_dir):
+                extension = os.path.splitext(name)[1]
+                with open(os.path.join(entry_dir, name), "rb") as f:
+                    artifacts[extension] = f.read()
+            # Mark as recently used for the eviction order
+            os.utime(entry_dir)
+        except OSError:
+            return None
+        return artifacts or None
+
+    def store(self, key: str, artifacts: dict) -> None:
+        """Stores ``{extension: content}``; concurrent writers of one key are harmless."""
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+        parent = os.path.dirname(entry_dir)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        try:
+            for extension, content in artifacts.items():
+                with open(os.path.join(tmp_dir, ARTIFACT_NAME + extension), "wb") as f:
+                    f.write(content)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cache fits its limit."""
+        entries = []
+        total = 0
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name.startswith(".tmp-"):
+                    continue
+                entry_dir = os.path.join(prefix_dir, name)
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                    entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+                except OSError:
+                    continue
+                total += size
+
+        entries.sort()
+        for _, size, entry_dir in entries:
+            if total <= self.limit_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            try:
+                os.rmdir(os.path.dirname(entry_dir))
+            except OSError:
+                pass
@@ -0,0 +1,66 @@
+"""Bookkeeping for inlining small user functions at their call sites.
+
+The generator emits every user function before the code that can call it
+(functions must be defined before they are used), and remembers the size of
+each body in instructions.  A call to a function at or below the threshold
+is then emitted as the function body itself, visited again with its locals
+moved to fresh ``$var_N`` indices of the caller and ``return`` turned into a
+branch to a block that yields the result.
+
+The scratch locals every function declares (``$ptr_tmp``, ``$idx_tmp``, ...)
+may be live in the caller around the call, as in ``a[f(i)]``, so an inlined
+body uses its own copies, suffixed with the inlining depth.
+"""
+
+import re
+from typing import NamedTuple
+
+
+DEFAULT_THRESHOLD = 20
+
+SCRATCH_LOCALS = {
+    "$ptr_tmp": "i32",
+    "$idx_tmp": "i32",
+    "$size_tmp": "i32",
+    "$len_tmp": "i32",
+    "$temp_addr": "i32",
+    "$tmp_val_i32": "i32",
+    "$tmp_val_f64": "f64",
+}
+
+_SCRATCH_PATTERN = re.compile(
+    "(" + "|".join(re.escape(name) for name in SCRATCH_LOCALS) + r")(?![\w.$])"
+)
+# Lines that only open or close a structured instruction or declare something
+_NOT_INSTRUCTION = re.compile(r"^(\)+|\((if|then|else|block|loop|local)\b.*|;;.*)$")
+
+
+class InlineCandidate(NamedTuple):
+    definition: object   # FunctionDefinitionContext
+    size: int
+    param_indices: list
+    local_types: dict    # {local index: WAT type}, parameters included
+
+
+class InlinedCall(NamedTuple):
+    caller: str
+    callee: str
+    line: int
+    column: int
+    size: int
+
+
+def count_instructions(lines: list) -> int:
+    return sum(1 for line in lines if line.strip() and not _NOT_INSTRUCTION.match(line.strip()))
+
+
+def rename_scratch(lines: list, depth: int, used: set) -> list:
+    """Renames the scratch locals in ``lines`` to their copies for ``depth``.
+
+    The names of the copies that occur are added to ``used``.
+    """
+    def rename(match):
+        name = f"{match.group(1)}_{depth}"
+        used.add(name)
+        return name
+    return [_SCRATCH_PATTERN.sub(rename, line) for line in lines]
@@ -0,0 +1,2889 @@
+"""In-module WAT implementations of the math builtins.
+
+By default ``sin``, ``cos``, ``tan``, ``asin``, ``acos``, ``atan``, ``ln``,
+``log`` and ``^`` call the host's ``Math`` functions.  With native math the
+module defines ``$sin``, ``$cos``, ``$tan``, ``$asin``, ``$acos``,
+``$atan``, ``$ln``, ``$log`` and ``$pow`` itself, so call sites are
+unchanged and a numeric loop never leaves WebAssembly.
+
+The functions are a port of fdlibm 5.3, which is also what V8 uses for
+these ``Math`` functions: the argument is reduced to a small interval
+(multiples of pi/2 with a three-part Cody-Waite constant up to 2^20 * pi/2,
+Payne-Hanek with the bits of 2/pi beyond; ``x = 2^k * m`` for the
+logarithms) and a minimax polynomial or rational approximation is
+evaluated there.  The arithmetic is the same operation for operation, so
+sin, cos, tan, asin, acos, atan, ln and log return exactly what V8's
+``Math`` returns.  V8's ``Math.pow`` is not fdlibm; ``$pow`` differs from it
+by one unit in the last place in about 1% of random arguments.
+
+Maximum error in units in the last place (ulp) against a 60-digit
+reference, over 10^5 random arguments per function (|x| up to 1e22 for
+sin, cos and tan, 2^-1000..2^1000 and the neighbourhood of 1 for ln and
+log, x in [1e-3, 1e3] and y in [-50, 50] for pow):
+
+    sin     0.80    asin    0.83    ln      0.62
+    cos     0.82    acos    0.88    log     1.58 (near x = 1)
+    tan     0.81    atan    0.81    pow     0.81 (Math.pow: 0.94)
+
+The reduction needs ``TABLE_SIZE`` bytes of constant tables (the 24-bit
+chunks of 2/pi, the high words of n * pi/2 and pi/2 split into 24-bit
+parts) and ``SCRATCH_SIZE`` bytes of scratch memory for the Payne-Hanek
+arrays; the generator reserves both next to the static strings.
+"""
+
+import struct
+
+# (WAT function, JavaScript Math function, parameter count)
+_MATH_IMPORTS = (
+    ("$pow", "Math.pow", 2),
+    ("$sin", "Math.sin", 1),
+    ("$cos", "Math.cos", 1),
+    ("$tan", "Math.tan", 1),
+    ("$asin", "Math.asin", 1),
+    ("$acos", "Math.acos", 1),
+    ("$atan", "Math.atan", 1),
+    ("$ln", "Math.log", 1),
+    ("$log", "Math.log10", 1),
+)
+
+# 2/pi in 24-bit chunks
+_TWO_OVER_PI = (
+    0xA2F983, 0x6E4E44, 0x1529FC, 0x2757D1, 0xF534DD, 0xC0DB62,
+    0x95993C, 0x439041, 0xFE5163, 0xABDEBB, 0xC561B7, 0x246E3A,
+    0x424DD2, 0xE00649, 0x2EEA09, 0xD1921C, 0xFE1DEB, 0x1CB129,
+    0xA73EE8, 0x8235F5, 0x2EBB44, 0x84E99C, 0x7026B4, 0x5F7E41,
+    0x3991D6, 0x398353, 0x39F49C, 0x845F8B, 0xBDF928, 0x3B1FF8,
+    0x97FFDE, 0x05980F, 0xEF2F11, 0x8B5A0A, 0x6D1F6D, 0x367ECF,
+    0x27CB09, 0xB74F46, 0x3F669E, 0x5FEA2D, 0x7527BA, 0xC7EBE5,
+    0xF17B3D, 0x0739F7, 0x8A5292, 0xEA6BFB, 0x5FB11F, 0x8D5D08,
+    0x560330, 0x46FC7B, 0x6BABF0, 0xCFBC20, 0x9AF436, 0x1DA9E3,
+    0x91615E, 0xE61B08, 0x659985, 0x5F14A0, 0x68408D, 0xFFD880,
+    0x4D7327, 0x310606, 0x1556CA, 0x73A8C9, 0x60E27B, 0xC08C6B,
+)
+# High words of n * pi/2 for n = 1..32; near them the medium reduction
+# loses bits and takes the longer path
+_NPIO2_HW = (
+    0x3FF921FB, 0x400921FB, 0x4012D97C, 0x401921FB,
+    0x401F6A7A, 0x4022D97C, 0x4025FDBB, 0x402921FB,
+    0x402C463A, 0x402F6A7A, 0x4031475C, 0x4032D97C,
+    0x40346B9C, 0x4035FDBB, 0x40378FDB, 0x403921FB,
+    0x403AB41B, 0x403C463A, 0x403DD85A, 0x403F6A7A,
+    0x40407E4C, 0x4041475C, 0x4042106C, 0x4042D97C,
+    0x4043A28C, 0x40446B9C, 0x404534AC, 0x4045FDBB,
+    0x4046C6CB, 0x40478FDB, 0x404858EB, 0x404921FB,
+)
+# pi/2 split into doubles of 24 bits each
+_PIO2_PARTS = (
+    1.570796251296997, 7.549789415861596e-08, 5.390302529957765e-15,
+    3.282003415807913e-22, 1.270655753080676e-29,
+)
+
+_TWO_OVER_PI_OFFSET = 0
+_NPIO2_HW_OFFSET = _TWO_OVER_PI_OFFSET + 4 * len(_TWO_OVER_PI)
+_PIO2_PARTS_OFFSET = _NPIO2_HW_OFFSET + 4 * len(_NPIO2_HW)
+TABLE_SIZE = _PIO2_PARTS_OFFSET + 8 * len(_PIO2_PARTS)
+
+# Payne-Hanek arrays: f, q and fq (f64) and iq (i32) with 20 entries, and
+# the three 24-bit chunks of the argument (f64)
+_F_OFFSET = 0
+_Q_OFFSET = _F_OFFSET + 160
+_FQ_OFFSET = _Q_OFFSET + 160
+_IQ_OFFSET = _FQ_OFFSET + 160
+_TX_OFFSET = _IQ_OFFSET + 80
+SCRATCH_SIZE = _TX_OFFSET + 24
+
+# sin(x) ~ x + x^3 * (S1 + x^2 * (S2 + ...)) on [-pi/4, pi/4]
+_SIN = (
+    "-1.66666666666666324348e-01", "8.33333333332248946124e-03", "-1.98412698298579493134e-04",
+    "2.75573137070700676789e-06", "-2.50507602534068634195e-08", "1.58969099521155010221e-10",
+)
+# cos(x) ~ 1 - x^2/2 + x^4 * (C1 + x^2 * (C2 + ...)) on [-pi/4, pi/4]
+_COS = (
+    "4.16666666666666019037e-02", "-1.38888888888741095749e-03", "2.48015872894767294178e-05",
+    "-2.75573143513906633035e-07", "2.08757232129817482790e-09", "-1.13596475577881948265e-11",
+)
+# tan(x) ~ x + x^3 * (T0 + x^2 * (T1 + ...)) on [-0.67434, 0.67434]
+_TAN = (
+    "3.33333333333334091986e-01", "1.33333333333201242699e-01", "5.39682539762260521377e-02",
+    "2.18694882948595424599e-02", "8.86323982359930005737e-03", "3.59207910759131235356e-03",
+    "1.45620945432529025516e-03", "5.88041240820264096874e-04", "2.46463134818469906812e-04",
+    "7.81794442939557092300e-05", "7.14072491382608190305e-05", "-1.85586374855275456654e-05",
+    "2.59073051863633712884e-05",
+)
+# asin(x) ~ x + x * p(x^2) / q(x^2) on [-0.5, 0.5]
+_ASIN_P = (
+    "1.66666666666666657415e-01", "-3.25565818622400915405e-01", "2.01212532134862925881e-01",
+    "-4.00555345006794114027e-02", "7.91534994289814532176e-04", "3.47933107596021167570e-05",
+)
+_ASIN_Q = (
+    "1.0", "-2.40339491173441421878e+00", "2.02094576023350569471e+00",
+    "-6.88283971605453293030e-01", "7.70381505559019352791e-02",
+)
+# atan(x) ~ x - x^3 * (aT0 + x^2 * (aT1 + ...)) on [-7/16, 7/16]
+_ATAN = (
+    "3.33333333333329318027e-01", "-1.99999999998764832476e-01", "1.42857142725034663711e-01",
+    "-1.11111104054623557880e-01", "9.09088713343650656196e-02", "-7.69187620504482999495e-02",
+    "6.66107313738753120669e-02", "-5.83357013379057348645e-02", "4.97687799461593236017e-02",
+    "-3.65315727442169155270e-02", "1.62858201153657823623e-02",
+)
+# atan of the breakpoints 0.5, 1, 1.5 and infinity, split into hi + lo
+_ATAN_BREAKPOINTS = (
+    ("4.63647609000806093515e-01", "2.26987774529616870924e-17"),
+    ("7.85398163397448278999e-01", "3.06161699786838301793e-17"),
+    ("9.82793723247329054082e-01", "1.39033110312309984516e-17"),
+    ("1.57079632679489655800e+00", "6.12323399573676603587e-17"),
+)
+# log(1 + f) ~ f - s * (f - R(s^2)) with s = f / (2 + f) and
+# R(z) = Lg1 * z + Lg2 * z^2 + ... + Lg7 * z^7
+_LOG = (
+    "6.666666666666735130e-01", "3.999999999940941908e-01", "2.857142874366239149e-01",
+    "2.222219843214978396e-01", "1.818357216161805012e-01", "1.531383769920937332e-01",
+    "1.479819860511658591e-01",
+)
+# log(x) of pow: like _LOG, with L1 = 3/5 for the extra precision of s^2
+_POW_LOG = (
+    "5.99999999999994648725e-01", "4.28571428578550184252e-01", "3.33333329818377432918e-01",
+    "2.72728123808534006489e-01", "2.30660745775561754067e-01", "2.06975017800338417784e-01",
+)
+# exp(r) ~ 1 + r + r * c(r) / (2 - c(r)) with c(r) = r - r^2 * (P1 + r^2 * (P2 + ...))
+_POW_EXP = (
+    "1.66666666666666019037e-01", "-2.77777777770155933842e-03", "6.61375632143793436117e-05",
+    "-1.65339022054652515390e-06", "4.13813679705723846039e-08",
+)
+
+_PIO4 = "7.85398163397448278999e-01"
+_PIO4_LO = "3.06161699786838301793e-17"
+_INV_PIO2 = "6.36619772367581382433e-01"
+# pi/2 = PIO2_1 + PIO2_2 + PIO2_3 + PIO2_3T, the first three with 33 bits;
+# PIO2_nT is the rest after PIO2_n
+_PIO2_1 = "1.57079632673412561417e+00"
+_PIO2_1T = "6.07710050650619224932e-11"
+_PIO2_2 = "6.07710050630396597660e-11"
+_PIO2_2T = "2.02226624879595063154e-21"
+_PIO2_3 = "2.02226624871116645580e-21"
+_PIO2_3T = "8.47842766036889956997e-32"
+_PIO2_HI = "1.57079632679489655800e+00"
+_PIO2_LO = "6.12323399573676603587e-17"
+_PI = "3.14159265358979311600e+00"
+_LN2_HI = "6.93147180369123816490e-01"
+_LN2_LO = "1.90821492927058770002e-10"
+_INV_LN10 = "4.34294481903251816668e-01"
+_LOG10_2_HI = "3.01029995663611771306e-01"
+_LOG10_2_LO = "3.69423907715893078616e-13"
+_TWO_54 = "1.80143985094819840000e+16"
+_TWO_53 = "9007199254740992.0"
+_TWO_24 = "16777216.0"
+_TWO_M24 = "5.9604644775390625e-08"
+# pow: log2(1.5) = DP_H + DP_L, 2/(3 ln 2) = CP = CP_H + CP_L,
+# 1/ln 2 = IVLN2 = IVLN2_H + IVLN2_L and ln 2 = LG2 = LG2_H + LG2_L
+_DP_H = "5.84962487220764160156e-01"
+_DP_L = "1.35003920212974897128e-08"
+_CP = "9.61796693925975554329e-01"
+_CP_H = "9.61796700954437255859e-01"
+_CP_L = "-7.02846165095275826516e-09"
+_IVLN2 = "1.44269504088896338700e+00"
+_IVLN2_H = "1.44269502162933349609e+00"
+_IVLN2_L = "1.92596299112661746887e-08"
+_LG2 = "6.93147180559945286227e-01"
+_LG2_H = "6.93147182464599609375e-01"
+_LG2_L = "-1.90465429995776804525e-09"
+# -(1024 - log2(ovfl + 0.5 ulp)): the rounding margin of the overflow check
+_OVT = "8.0085662595372944372e-17"
+
+
+def table_bytes() -> bytes:
+    """Returns the ``TABLE_SIZE`` bytes of the reduction tables."""
+    return (struct.pack(f"<{len(_TWO_OVER_PI)}i", *_TWO_OVER_PI)
+            + struct.pack(f"<{len(_NPIO2_HW)}I", *_NPIO2_HW)
+            + struct.pack(f"<{len(_PIO2_PARTS)}d", *_PIO2_PARTS))
+
+
+def math_imports() -> list:
+    """Returns the ``js`` import lines of the host's ``Math`` functions."""
+    lines = []
+    for name, js_name, param_count in _MATH_IMPORTS:
+        params = " ".join(["f64"] * param_count)
+        lines.append(f'(import "js" "{js_name}" (func {name} (param {params}) (result f64)))')
+    return lines
+
+
+def emit_native_math(emit, tables: int, scratch: int) -> None:
+    """Emits the math functions through ``emit`` (``WatCodeGenerator._add_line``).
+
+    ``tables`` is the address of ``table_bytes()`` and ``scratch`` the
+    address of ``SCRATCH_SIZE`` reserved bytes.
+    """
+    # Reduced argument of $math_rem_pio2: y0 + y1
+    emit('(global $math_y0 (mut f64) (f64.const 0))')
+    emit('(global $math_y1 (mut f64) (f64.const 0))')
+    _emit_kernels(emit)
+    _emit_rem_pio2(emit, tables)
+    _emit_rem_pio2_large(emit, tables, scratch)
+    _emit_trig(emit)
+    _emit_inverse_trig(emit)
+    _emit_log(emit)
+    _emit_pow(emit)
+
+
+# --- Helpers ---
+
+def _emit_high_word(emit, local: str) -> None:
+    emit(f'local.get {local}')
+    emit('i64.reinterpret_f64')
+    emit('i64.const 32')
+    emit('i64.shr_u')
+    emit('i32.wrap_i64')
+
+
+def _emit_low_word(emit, local: str) -> None:
+    emit(f'local.get {local}')
+    emit('i64.reinterpret_f64')
+    emit('i32.wrap_i64')
+
+
+def _emit_from_high_word(emit) -> None:
+    # i32 high word -> f64 with a zero low word
+    emit('i64.extend_i32_u')
+    emit('i64.const 32')
+    emit('i64.shl')
+    emit('f64.reinterpret_i64')
+
+
+def _emit_with_low_word(emit, local: str) -> None:
+    # i32 high word -> f64 with the low word of ``local``
+    emit('i64.extend_i32_u')
+    emit('i64.const 32')
+    emit('i64.shl')
+    emit(f'local.get {local}')
+    emit('i64.reinterpret_f64')
+    emit('i64.const 0xFFFFFFFF')
+    emit('i64.and')
+    emit('i64.or')
+    emit('f64.reinterpret_i64')
+
+
+def _emit_clear_low_word(emit) -> None:
+    # Keeps the high word: the upper 21 bits of the mantissa
+    emit('i64.reinterpret_f64')
+    emit('i64.const 0xFFFFFFFF00000000')
+    emit('i64.and')
+    emit('f64.reinterpret_i64')
+
+
+def _emit_pow2(emit) -> None:
+    # i32 exponent in [-1022, 1023] -> 2^exponent
+    emit('i32.const 1023')
+    emit('i32.add')
+    emit('i64.extend_i32_u')
+    emit('i64.const 52')
+    emit('i64.shl')
+    emit('f64.reinterpret_i64')
+
+
+def _emit_poly(emit, var: str, coeffs: tuple) -> None:
+    # coeffs[0] + var * (coeffs[1] + var * (...)), as fdlibm writes it
+    emit(f'f64.const {coeffs[-1]}')
+    for coeff in reversed(coeffs[:-1]):
+        emit(f'local.get {var}')
+        emit('f64.mul')
+        emit(f'f64.const {coeff}')
+        emit('f64.add')
+
+
+def _emit_abs_high_word(emit, local: str, target: str) -> None:
+    _emit_high_word(emit, local)
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit(f'local.set {target}')
+
+
+# --- Kernels on [-pi/4, pi/4]; the argument is y0 + y1 with |y1| tiny ---
+
+def _emit_kernels(emit) -> None:
+    # $iy = 0 when y1 is known to be zero
+    emit('(func $math_k_sin (param $x f64) (param $y f64) (param $iy i32) (result f64)', 1)
+    emit('(local $z f64) (local $v f64) (local $r f64)')
+    _emit_high_word(emit, '$x')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('i32.const 0x3E400000') # |x| < 2^-27
+    emit('i32.lt_u')
+    emit('(if (then local.get $x return))')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.set $v')
+    _emit_poly(emit, '$z', _SIN[1:])
+    emit('local.set $r')
+    emit('local.get $iy')
+    emit('i32.eqz')
+    emit('(if (then', 1)
+    # x + v * (S1 + z * r)
+    emit('local.get $x')
+    emit('local.get $v')
+    emit(f'f64.const {_SIN[0]}')
+    emit('local.get $z')
+    emit('local.get $r')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('return')
+    emit('))', -1)
+    # x - ((z * (0.5 * y - v * r) - y) - v * S1)
+    emit('local.get $x')
+    emit('local.get $z')
+    emit('f64.const 0.5')
+    emit('local.get $y')
+    emit('f64.mul')
+    emit('local.get $v')
+    emit('local.get $r')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('local.get $y')
+    emit('f64.sub')
+    emit('local.get $v')
+    emit(f'f64.const {_SIN[0]}')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit(')', -1)
+
+    emit('(func $math_k_cos (param $x f64) (param $y f64) (result f64)', 1)
+    emit('(local $ix i32) (local $z f64) (local $r f64) (local $qx f64)')
+    _emit_abs_high_word(emit, '$x', '$ix')
+    emit('local.get $ix')
+    emit('i32.const 0x3E400000') # |x| < 2^-27
+    emit('i32.lt_u')
+    emit('(if (then f64.const 1 return))')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.tee $z')
+    _emit_poly(emit, '$z', _COS)
+    emit('f64.mul')
+    emit('local.set $r')
+    # 1 - (0.5 * z - (z * r - x * y)) loses bits for |x| >= 0.3, so
+    # (1 - qx) - ((0.5 * z - qx) - (z * r - x * y)) with qx ~ x^2 / 4
+    emit('f64.const 0')
+    emit('local.set $qx')
+    emit('local.get $ix')
+    emit('i32.const 0x3FD33333')
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit('f64.const 0.28125')
+    emit('local.get $ix')
+    emit('i32.const 0x00200000')
+    emit('i32.sub')
+    _emit_from_high_word(emit)
+    emit('local.get $ix')
+    emit('i32.const 0x3FE90000')
+    emit('i32.gt_u')
+    emit('select')
+    emit('local.set $qx')
+    emit('))', -1)
+    emit('f64.const 1')
+    emit('local.get $qx')
+    emit('f64.sub')
+    emit('f64.const 0.5')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('local.get $qx')
+    emit('f64.sub')
+    emit('local.get $z')
+    emit('local.get $r')
+    emit('f64.mul')
+    emit('local.get $x')
+    emit('local.get $y')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit(')', -1)
+
+    # tan(x + y) for $iy = 1, -1 / tan(x + y) for $iy = -1
+    emit('(func $math_k_tan (param $x f64) (param $y f64) (param $iy i32) (result f64)', 1)
+    emit('(local $hx i32) (local $ix i32) (local $big i32)')
+    emit('(local $z f64) (local $w f64) (local $r f64) (local $v f64) (local $s f64) (local $a f64) (local $t f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.set $ix')
+    emit('(block $invert', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3E300000') # |x| < 2^-28
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    _emit_low_word(emit, '$x')
+    emit('i32.or')
+    emit('local.get $iy')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('i32.or')
+    emit('i32.eqz')
+    emit('(if (then f64.const 1 local.get $x f64.abs f64.div return))')
+    emit('local.get $iy')
+    emit('i32.const 1')
+    emit('i32.eq')
+    emit('(if (then local.get $x return))')
+    emit('local.get $y')
+    emit('local.set $r')
+    emit('local.get $x')
+    emit('local.get $y')
+    emit('f64.add')
+    emit('local.set $w')
+    emit('br $invert')
+    emit('))', -1)
+    # Near pi/4 use tan(pi/4 - x) = (1 - tan(x)) / (1 + tan(x))
+    emit('local.get $ix')
+    emit('i32.const 0x3FE59428') # |x| >= 0.6744
+    emit('i32.ge_u')
+    emit('local.tee $big')
+    emit('(if (then', 1)
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $x')
+    emit('f64.neg')
+    emit('local.set $x')
+    emit('local.get $y')
+    emit('f64.neg')
+    emit('local.set $y')
+    emit('))', -1)
+    emit(f'f64.const {_PIO4}')
+    emit('local.get $x')
+    emit('f64.sub')
+    emit(f'f64.const {_PIO4_LO}')
+    emit('local.get $y')
+    emit('f64.sub')
+    emit('f64.add')
+    emit('local.set $x')
+    emit('f64.const 0')
+    emit('local.set $y')
+    emit('))', -1)
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('local.set $w')
+    # Odd and even coefficients separately, in w = x^4
+    _emit_poly(emit, '$w', _TAN[1::2])
+    emit('local.set $r')
+    emit('local.get $z')
+    _emit_poly(emit, '$w', _TAN[2::2])
+    emit('f64.mul')
+    emit('local.set $v')
+    emit('local.get $z')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.set $s')
+    # r = y + z * (s * (r + v) + y) + T0 * s
+    emit('local.get $y')
+    emit('local.get $z')
+    emit('local.get $s')
+    emit('local.get $r')
+    emit('local.get $v')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('local.get $y')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('f64.add')
+    emit(f'f64.const {_TAN[0]}')
+    emit('local.get $s')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $r')
+    emit('local.get $x')
+    emit('local.get $r')
+    emit('f64.add')
+    emit('local.set $w')
+    emit('local.get $big')
+    emit('(if (then', 1)
+    # sign(x) * (iy - 2 * (x - (w * w / (w + iy) - r)))
+    emit('i32.const 1')
+    emit('local.get $hx')
+    emit('i32.const 30')
+    emit('i32.shr_s')
+    emit('i32.const 2')
+    emit('i32.and')
+    emit('i32.sub')
+    emit('f64.convert_i32_s')
+    emit('local.get $iy')
+    emit('f64.convert_i32_s')
+    emit('local.tee $v')
+    emit('f64.const 2')
+    emit('local.get $x')
+    emit('local.get $w')
+    emit('local.get $w')
+    emit('f64.mul')
+    emit('local.get $w')
+    emit('local.get $v')
+    emit('f64.add')
+    emit('f64.div')
+    emit('local.get $r')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $iy')
+    emit('i32.const 1')
+    emit('i32.eq')
+    emit('(if (then local.get $w return))')
+    emit(')', -1)
+    # -1 / w computed as t + a * (s + t * v) with t, z the high halves of a, w
+    emit('local.get $w')
+    _emit_clear_low_word(emit)
+    emit('local.set $z')
+    emit('local.get $r')
+    emit('local.get $z')
+    emit('local.get $x')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $v')
+    emit('f64.const -1')
+    emit('local.get $w')
+    emit('f64.div')
+    emit('local.tee $a')
+    _emit_clear_low_word(emit)
+    emit('local.set $t')
+    emit('f64.const 1')
+    emit('local.get $t')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $s')
+    emit('local.get $t')
+    emit('local.get $a')
+    emit('local.get $s')
+    emit('local.get $t')
+    emit('local.get $v')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('f64.add')
+    emit(')', -1)
+
+
+# --- Argument reduction: x = n * pi/2 + (y0 + y1) ---
+
+def _emit_medium_step(emit, part: str, tail: str, min_loss: int) -> None:
+    # When y0 = r - w lost more than ``min_loss`` bits, subtract the next
+    # 33 bits of n * pi/2 from r
+    emit('local.get $j')
+    _emit_high_word(emit, '$y0')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('i32.const 0x7FF')
+    emit('i32.and')
+    emit('i32.sub')
+    emit(f'i32.const {min_loss}')
+    emit('i32.gt_s')
+    emit('(if (then', 1)
+    emit('local.get $r')
+    emit('local.set $t')
+    emit('local.get $fn')
+    emit(f'f64.const {part}')
+    emit('f64.mul')
+    emit('local.set $w')
+    emit('local.get $t')
+    emit('local.get $w')
+    emit('f64.sub')
+    emit('local.set $r')
+    emit('local.get $fn')
+    emit(f'f64.const {tail}')
+    emit('f64.mul')
+    emit('local.get $t')
+    emit('local.get $r')
+    emit('f64.sub')
+    emit('local.get $w')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $w')
+    emit('local.get $r')
+    emit('local.get $w')
+    emit('f64.sub')
+    emit('local.set $y0')
+
+
+def _emit_rem_pio2(emit, tables: int) -> None:
+    # Returns n and sets $math_y0 + $math_y1; requires pi/4 < |x| < inf
+    emit('(func $math_rem_pio2 (param $x f64) (result i32)', 1)
+    emit('(local $hx i32) (local $ix i32) (local $n i32) (local $j i32)')
+    emit('(local $z f64) (local $t f64) (local $fn f64) (local $r f64) (local $w f64) (local $y0 f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.set $ix')
+
+    # |x| < 3pi/4: n = +-1 with 33 + 53 bits of pi/2, or 33 + 33 + 53 bits
+    # when x is close to pi/2
+    emit('local.get $ix')
+    emit('i32.const 0x4002D97C')
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    for positive in (True, False):
+        op = 'f64.sub' if positive else 'f64.add'
+        if positive:
+            emit('local.get $hx')
+            emit('i32.const 0')
+            emit('i32.gt_s')
+            emit('(if (then', 1)
+        emit('local.get $x')
+        emit(f'f64.const {_PIO2_1}')
+        emit(op)
+        emit('local.set $z')
+        emit('local.get $ix')
+        emit('i32.const 0x3FF921FB')
+        emit('i32.eq')
+        emit('(if (then', 1)
+        emit('local.get $z')
+        emit(f'f64.const {_PIO2_2}')
+        emit(op)
+        emit('local.set $z')
+        emit(f'f64.const {_PIO2_2T}')
+        emit('local.set $t')
+        emit(')(else', 0)
+        emit(f'f64.const {_PIO2_1T}')
+        emit('local.set $t')
+        emit('))', -1)
+        emit('local.get $z')
+        emit('local.get $t')
+        emit(op)
+        emit('global.set $math_y0')
+        emit('local.get $z')
+        emit('global.get $math_y0')
+        emit('f64.sub')
+        emit('local.get $t')
+        emit(op)
+        emit('global.set $math_y1')
+        emit('i32.const 1' if positive else 'i32.const -1')
+        emit('return')
+        if positive:
+            emit('))', -1)
+    emit('))', -1)
+
+    emit('local.get $ix')
+    emit('i32.const 0x413921FB') # |x| <= 2^19 * pi
+    emit('i32.le_u')
+    emit('(if (then', 1)
+    emit('local.get $x')
+    emit('f64.abs')
+    emit('local.tee $t')
+    emit(f'f64.const {_INV_PIO2}')
+    emit('f64.mul')
+    emit('f64.const 0.5')
+    emit('f64.add')
+    emit('i32.trunc_f64_s')
+    emit('local.tee $n')
+    emit('f64.convert_i32_s')
+    emit('local.set $fn')
+    emit('local.get $t')
+    emit('local.get $fn')
+    emit(f'f64.const {_PIO2_1}')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.set $r')
+    emit('local.get $fn')
+    emit(f'f64.const {_PIO2_1T}')
+    emit('f64.mul')
+    emit('local.set $w')
+    emit('local.get $r')
+    emit('local.get $w')
+    emit('f64.sub')
+    emit('local.set $y0')
+    emit('(block $reduced', 1)
+    # Far from the multiples of pi/2 in the table the first step is exact enough
+    emit('local.get $n')
+    emit('i32.const 32')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $n')
+    emit('i32.const 2')
+    emit('i32.shl')
+    emit(f'i32.load offset={tables + _NPIO2_HW_OFFSET - 4}')
+    emit('local.get $ix')
+    emit('i32.ne')
+    emit('br_if $reduced')
+    emit('))', -1)
+    emit('local.get $ix')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('local.set $j')
+    _emit_medium_step(emit, _PIO2_2, _PIO2_2T, 16)
+    _emit_medium_step(emit, _PIO2_3, _PIO2_3T, 49)
+    emit('))', -1)
+    emit('))', -1)
+    emit(')', -1)
+    emit('local.get $y0')
+    emit('global.set $math_y0')
+    emit('local.get $r')
+    emit('local.get $y0')
+    emit('f64.sub')
+    emit('local.get $w')
+    emit('f64.sub')
+    emit('global.set $math_y1')
+    emit(')(else', 0)
+    emit('local.get $x')
+    emit('call $math_rem_pio2_large')
+    emit('local.set $n')
+    emit('))', -1)
+
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('global.get $math_y0')
+    emit('f64.neg')
+    emit('global.set $math_y0')
+    emit('global.get $math_y1')
+    emit('f64.neg')
+    emit('global.set $math_y1')
+    emit('i32.const 0')
+    emit('local.get $n')
+    emit('i32.sub')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $n')
+    emit(')', -1)
+
+
+def _emit_load(emit, wat_type: str, address: int) -> None:
+    # Element of the array at ``address``; the index is on the stack
+    emit('i32.const 3' if wat_type == 'f64' else 'i32.const 2')
+    emit('i32.shl')
+    emit(f'{wat_type}.load offset={address}')
+
+
+def _emit_element_address(emit, wat_type: str) -> None:
+    # Index on the stack -> byte offset; store with offset=<array address>
+    emit('i32.const 3' if wat_type == 'f64' else 'i32.const 2')
+    emit('i32.shl')
+
+
+def _emit_q_sum(emit, tables: int, scratch: int, label: str) -> None:
+    # q[i] = sum(tx[j] * f[jx + i - j] for j in 0..jx)
+    emit('f64.const 0')
+    emit('local.set $fw')
+    emit('i32.const 0')
+    emit('local.set $j')
+    emit(f'(block {label}_done (loop {label}', 1)
+    emit('local.get $j')
+    emit('local.get $jx')
+    emit('i32.gt_s')
+    emit(f'br_if {label}_done')
+    emit('local.get $fw')
+    emit('local.get $j')
+    _emit_load(emit, 'f64', scratch + _TX_OFFSET)
+    emit('local.get $jx')
+    emit('local.get $i')
+    emit('i32.add')
+    emit('local.get $j')
+    emit('i32.sub')
+    _emit_load(emit, 'f64', scratch + _F_OFFSET)
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $fw')
+    emit('local.get $j')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $j')
+    emit(f'br {label}')
+    emit('))', -1)
+    emit('local.get $i')
+    _emit_element_address(emit, 'f64')
+    emit('local.get $fw')
+    emit(f'f64.store offset={scratch + _Q_OFFSET}')
+
+
+def _emit_rem_pio2_large(emit, tables: int, scratch: int) -> None:
+    # fdlibm's __kernel_rem_pio2 for double precision (jk = jp = 4): the
+    # product of |x| with the bits of 2/pi that matter for the result,
+    # computed in 24-bit chunks.  Returns n mod 8 and sets $math_y0 + $math_y1
+    # for |x|; the caller applies the sign.
+    f_arr = scratch + _F_OFFSET
+    q_arr = scratch + _Q_OFFSET
+    fq_arr = scratch + _FQ_OFFSET
+    iq_arr = scratch + _IQ_OFFSET
+    tx_arr = scratch + _TX_OFFSET
+    jk = 4
+
+    emit('(func $math_rem_pio2_large (param $x f64) (result i32)', 1)
+    emit('(local $ix i32) (local $e0 i32) (local $jx i32) (local $jv i32) (local $q0 i32) (local $jz i32)')
+    emit('(local $n i32) (local $ih i32) (local $carry i32) (local $i i32) (local $j i32) (local $k i32)')
+    emit('(local $z f64) (local $fw f64)')
+    _emit_abs_high_word(emit, '$x', '$ix')
+
+    # |x| = z * 2^e0 with z in [2^23, 2^24), split into three 24-bit chunks
+    emit('local.get $ix')
+    emit('local.get $ix')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('i32.const 1046')
+    emit('i32.sub')
+    emit('local.tee $e0')
+    emit('i32.const 20')
+    emit('i32.shl')
+    emit('i32.sub')
+    _emit_with_low_word(emit, '$x')
+    emit('local.set $z')
+    for index in range(2):
+        emit('i32.const 0')
+        emit('local.get $z')
+        emit('f64.trunc')
+        emit('local.tee $fw')
+        emit(f'f64.store offset={tx_arr + 8 * index}')
+        emit('local.get $z')
+        emit('local.get $fw')
+        emit('f64.sub')
+        emit(f'f64.const {_TWO_24}')
+        emit('f64.mul')
+        emit('local.set $z')
+    emit('i32.const 0')
+    emit('local.get $z')
+    emit(f'f64.store offset={tx_arr + 16}')
+    # jx + 1 = number of chunks without the trailing zeros
+    emit('i32.const 2')
+    emit('local.set $jx')
+    emit('(block $chunks_done (loop $chunks', 1)
+    emit('local.get $jx')
+    _emit_load(emit, 'f64', tx_arr)
+    emit('f64.const 0')
+    emit('f64.ne')
+    emit('br_if $chunks_done')
+    emit('local.get $jx')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $jx')
+    emit('br $chunks')
+    emit('))', -1)
+
+    # jv = index of the first chunk of 2/pi needed, q0 = its exponent
+    emit('local.get $e0')
+    emit('i32.const 3')
+    emit('i32.sub')
+    emit('i32.const 24')
+    emit('i32.div_s')
+    emit('local.tee $jv')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then i32.const 0 local.set $jv))')
+    emit('local.get $e0')
+    emit('local.get $jv')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('i32.const 24')
+    emit('i32.mul')
+    emit('i32.sub')
+    emit('local.set $q0')
+
+    # f[i] = two_over_pi[jv - jx + i] (0 before the start) for i in 0..jx + jk
+    emit('local.get $jv')
+    emit('local.get $jx')
+    emit('i32.sub')
+    emit('local.set $j')
+    emit('i32.const 0')
+    emit('local.set $i')
+    emit('(block $f_done (loop $f_next', 1)
+    emit('local.get $i')
+    emit('local.get $jx')
+    emit(f'i32.const {jk}')
+    emit('i32.add')
+    emit('i32.gt_s')
+    emit('br_if $f_done')
+    emit('local.get $i')
+    _emit_element_address(emit, 'f64')
+    emit('local.get $j')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (result f64) (then f64.const 0) (else', 1)
+    emit('local.get $j')
+    _emit_load(emit, 'i32', tables + _TWO_OVER_PI_OFFSET)
+    emit('f64.convert_i32_s')
+    emit('))', -1)
+    emit(f'f64.store offset={f_arr}')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $i')
+    emit('local.get $j')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $j')
+    emit('br $f_next')
+    emit('))', -1)
+
+    # q[i] for i in 0..jk
+    emit('i32.const 0')
+    emit('local.set $i')
+    emit('(block $q_done (loop $q_next', 1)
+    emit('local.get $i')
+    emit(f'i32.const {jk}')
+    emit('i32.gt_s')
+    emit('br_if $q_done')
+    _emit_q_sum(emit, tables, scratch, '$q_sum')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $i')
+    emit('br $q_next')
+    emit('))', -1)
+
+    emit(f'i32.const {jk}')
+    emit('local.set $jz')
+    emit('(loop $recompute', 1)
+    # Distill q[jz..0] into the 24-bit integers iq[0..jz-1], most significant first
+    emit('i32.const 0')
+    emit('local.set $i')
+    emit('local.get $jz')
+    emit('local.tee $j')
+    _emit_load(emit, 'f64', q_arr)
+    emit('local.set $z')
+    emit('(block $distill_done (loop $distill', 1)
+    emit('local.get $j')
+    emit('i32.const 0')
+    emit('i32.le_s')
+    emit('br_if $distill_done')
+    emit(f'f64.const {_TWO_M24}')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('f64.trunc')
+    emit('local.set $fw')
+    emit('local.get $i')
+    _emit_element_address(emit, 'i32')
+    emit('local.get $z')
+    emit(f'f64.const {_TWO_24}')
+    emit('local.get $fw')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('i32.trunc_f64_s')
+    emit(f'i32.store offset={iq_arr}')
+    emit('local.get $j')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.tee $j')
+    _emit_load(emit, 'f64', q_arr)
+    emit('local.get $fw')
+    emit('f64.add')
+    emit('local.set $z')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $i')
+    emit('br $distill')
+    emit('))', -1)
+
+    # n = integer part of z * 2^q0 mod 8, z = the fraction
+    emit('local.get $z')
+    emit('local.get $q0')
+    _emit_pow2(emit)
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('f64.const 8')
+    emit('local.get $z')
+    emit('f64.const 0.125')
+    emit('f64.mul')
+    emit('f64.floor')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.tee $z')
+    emit('i32.trunc_f64_s')
+    emit('local.set $n')
+    emit('local.get $z')
+    emit('local.get $n')
+    emit('f64.convert_i32_s')
+    emit('f64.sub')
+    emit('local.set $z')
+
+    # ih > 0 when the fraction is >= 0.5 (2 when taken from z itself)
+    emit('i32.const 0')
+    emit('local.set $ih')
+    emit('local.get $jz')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $k') # index of the last chunk
+    emit('local.get $q0')
+    emit('i32.const 0')
+    emit('i32.gt_s')
+    emit('(if (then', 1)
+    emit('local.get $k')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('i32.const 24')
+    emit('local.get $q0')
+    emit('i32.sub')
+    emit('i32.shr_s')
+    emit('local.tee $i')
+    emit('local.get $n')
+    emit('i32.add')
+    emit('local.set $n')
+    emit('local.get $k')
+    _emit_element_address(emit, 'i32')
+    emit('local.get $k')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('local.get $i')
+    emit('i32.const 24')
+    emit('local.get $q0')
+    emit('i32.sub')
+    emit('i32.shl')
+    emit('i32.sub')
+    emit('local.tee $j')
+    emit(f'i32.store offset={iq_arr}')
+    emit('local.get $j')
+    emit('i32.const 23')
+    emit('local.get $q0')
+    emit('i32.sub')
+    emit('i32.shr_s')
+    emit('local.set $ih')
+    emit(')(else', 0)
+    emit('local.get $q0')
+    emit('i32.eqz')
+    emit('(if (then', 1)
+    emit('local.get $k')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('i32.const 23')
+    emit('i32.shr_s')
+    emit('local.set $ih')
+    emit(')(else', 0)
+    emit('local.get $z')
+    emit('f64.const 0.5')
+    emit('f64.ge')
+    emit('i32.const 1')
+    emit('i32.shl')
+    emit('local.set $ih')
+    emit('))', -1)
+    emit('))', -1)
+
+    emit('local.get $ih')
+    emit('i32.const 0')
+    emit('i32.gt_s')
+    emit('(if (then', 1)
+    # Round up: n + 1 and the fraction becomes 1 - fraction, i.e. iq = 2^24*jz - iq
+    emit('local.get $n')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $n')
+    emit('i32.const 0')
+    emit('local.set $carry')
+    emit('i32.const 0')
+    emit('local.set $i')
+    emit('(block $complement_done (loop $complement', 1)
+    emit('local.get $i')
+    emit('local.get $jz')
+    emit('i32.ge_s')
+    emit('br_if $complement_done')
+    emit('local.get $i')
+    _emit_element_address(emit, 'i32')
+    emit('local.get $i')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('local.set $j')
+    emit('local.get $carry')
+    emit('(if (result i32) (then', 1)
+    emit('i32.const 0xFFFFFF')
+    emit('local.get $j')
+    emit('i32.sub')
+    emit(')(else', 0)
+    emit('local.get $j')
+    emit('(if (then i32.const 1 local.set $carry))')
+    emit('i32.const 0x1000000')
+    emit('local.get $j')
+    emit('i32.sub')
+    emit('i32.const 0')
+    emit('local.get $j')
+    emit('select')
+    emit('))', -1)
+    emit(f'i32.store offset={iq_arr}')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $i')
+    emit('br $complement')
+    emit('))', -1)
+    # Keep only the fraction bits of the last chunk
+    emit('local.get $q0')
+    emit('i32.const 1')
+    emit('i32.eq')
+    emit('local.get $q0')
+    emit('i32.const 2')
+    emit('i32.eq')
+    emit('i32.or')
+    emit('(if (then', 1)
+    emit('local.get $jz')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.tee $k')
+    _emit_element_address(emit, 'i32')
+    emit('local.get $k')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('i32.const 0x7FFFFF')
+    emit('local.get $q0')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('i32.shr_u')
+    emit('i32.and')
+    emit(f'i32.store offset={iq_arr}')
+    emit('))', -1)
+    emit('local.get $ih')
+    emit('i32.const 2')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('f64.const 1')
+    emit('local.get $z')
+    emit('f64.sub')
+    emit('local.set $z')
+    emit('local.get $carry')
+    emit('(if (then', 1)
+    emit('local.get $z')
+    emit('local.get $q0')
+    _emit_pow2(emit)
+    emit('f64.sub')
+    emit('local.set $z')
+    emit('))', -1)
+    emit('))', -1)
+    emit('))', -1)
+
+    # A zero fraction may only mean that more bits of 2/pi are needed
+    emit('local.get $z')
+    emit('f64.const 0')
+    emit('f64.eq')
+    emit('(if (then', 1)
+    emit('i32.const 0')
+    emit('local.set $j')
+    emit('local.get $jz')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $i')
+    emit('(block $zero_done (loop $zero', 1)
+    emit('local.get $i')
+    emit(f'i32.const {jk}')
+    emit('i32.lt_s')
+    emit('br_if $zero_done')
+    emit('local.get $j')
+    emit('local.get $i')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('i32.or')
+    emit('local.set $j')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $i')
+    emit('br $zero')
+    emit('))', -1)
+    emit('local.get $j')
+    emit('i32.eqz')
+    emit('(if (then', 1)
+    # k = number of extra chunks needed
+    emit('i32.const 1')
+    emit('local.set $k')
+    emit('(block $extra_done (loop $extra', 1)
+    emit(f'i32.const {jk}')
+    emit('local.get $k')
+    emit('i32.sub')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('br_if $extra_done')
+    emit('local.get $k')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $k')
+    emit('br $extra')
+    emit('))', -1)
+    emit('local.get $jz')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $i')
+    emit('(block $more_done (loop $more', 1)
+    emit('local.get $i')
+    emit('local.get $jz')
+    emit('local.get $k')
+    emit('i32.add')
+    emit('i32.gt_s')
+    emit('br_if $more_done')
+    emit('local.get $jx')
+    emit('local.get $i')
+    emit('i32.add')
+    _emit_element_address(emit, 'f64')
+    emit('local.get $jv')
+    emit('local.get $i')
+    emit('i32.add')
+    _emit_load(emit, 'i32', tables + _TWO_OVER_PI_OFFSET)
+    emit('f64.convert_i32_s')
+    emit(f'f64.store offset={f_arr}')
+    _emit_q_sum(emit, tables, scratch, '$more_sum')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $i')
+    emit('br $more')
+    emit('))', -1)
+    emit('local.get $jz')
+    emit('local.get $k')
+    emit('i32.add')
+    emit('local.set $jz')
+    emit('br $recompute')
+    emit('))', -1)
+    emit('))', -1)
+    emit(')', -1)
+
+    # Chop off the zero chunks, or store the last bits of the fraction
+    emit('local.get $z')
+    emit('f64.const 0')
+    emit('f64.eq')
+    emit('(if (then', 1)
+    emit('(loop $chop', 1)
+    emit('local.get $jz')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $jz')
+    emit('local.get $q0')
+    emit('i32.const 24')
+    emit('i32.sub')
+    emit('local.set $q0')
+    emit('local.get $jz')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('i32.eqz')
+    emit('br_if $chop')
+    emit(')', -1)
+    emit(')(else', 0)
+    emit('local.get $z')
+    emit('i32.const 0')
+    emit('local.get $q0')
+    emit('i32.sub')
+    _emit_pow2(emit)
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit(f'f64.const {_TWO_24}')
+    emit('f64.ge')
+    emit('(if (then', 1)
+    emit(f'f64.const {_TWO_M24}')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('f64.trunc')
+    emit('local.set $fw')
+    emit('local.get $jz')
+    _emit_element_address(emit, 'i32')
+    emit('local.get $z')
+    emit(f'f64.const {_TWO_24}')
+    emit('local.get $fw')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('i32.trunc_f64_s')
+    emit(f'i32.store offset={iq_arr}')
+    emit('local.get $jz')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $jz')
+    emit('local.get $q0')
+    emit('i32.const 24')
+    emit('i32.add')
+    emit('local.set $q0')
+    emit('local.get $fw')
+    emit('local.set $z')
+    emit('))', -1)
+    emit('local.get $jz')
+    _emit_element_address(emit, 'i32')
+    emit('local.get $z')
+    emit('i32.trunc_f64_s')
+    emit(f'i32.store offset={iq_arr}')
+    emit('))', -1)
+
+    # q[i] = iq[i] * 2^(q0 - 24 * (jz - i)), then fq = pi/2 * q
+    emit('local.get $q0')
+    _emit_pow2(emit)
+    emit('local.set $fw')
+    emit('local.get $jz')
+    emit('local.set $i')
+    emit('(block $scale_done (loop $scale', 1)
+    emit('local.get $i')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('br_if $scale_done')
+    emit('local.get $i')
+    _emit_element_address(emit, 'f64')
+    emit('local.get $fw')
+    emit('local.get $i')
+    _emit_load(emit, 'i32', iq_arr)
+    emit('f64.convert_i32_s')
+    emit('f64.mul')
+    emit(f'f64.store offset={q_arr}')
+    emit('local.get $fw')
+    emit(f'f64.const {_TWO_M24}')
+    emit('f64.mul')
+    emit('local.set $fw')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $i')
+    emit('br $scale')
+    emit('))', -1)
+
+    emit('local.get $jz')
+    emit('local.set $i')
+    emit('(block $product_done (loop $product', 1)
+    emit('local.get $i')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('br_if $product_done')
+    emit('f64.const 0')
+    emit('local.set $fw')
+    emit('i32.const 0')
+    emit('local.set $k')
+    emit('(block $terms_done (loop $terms', 1)
+    emit('local.get $k')
+    emit(f'i32.const {jk}')
+    emit('i32.gt_s')
+    emit('local.get $k')
+    emit('local.get $jz')
+    emit('local.get $i')
+    emit('i32.sub')
+    emit('i32.gt_s')
+    emit('i32.or')
+    emit('br_if $terms_done')
+    emit('local.get $fw')
+    emit('local.get $k')
+    _emit_load(emit, 'f64', tables + _PIO2_PARTS_OFFSET)
+    emit('local.get $i')
+    emit('local.get $k')
+    emit('i32.add')
+    _emit_load(emit, 'f64', q_arr)
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $fw')
+    emit('local.get $k')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $k')
+    emit('br $terms')
+    emit('))', -1)
+    emit('local.get $jz')
+    emit('local.get $i')
+    emit('i32.sub')
+    _emit_element_address(emit, 'f64')
+    emit('local.get $fw')
+    emit(f'f64.store offset={fq_arr}')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $i')
+    emit('br $product')
+    emit('))', -1)
+
+    # y0 = sum of fq, y1 = what the sum lost
+    emit('f64.const 0')
+    emit('local.set $fw')
+    emit('local.get $jz')
+    emit('local.set $i')
+    emit('(block $sum_done (loop $sum', 1)
+    emit('local.get $i')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('br_if $sum_done')
+    emit('local.get $fw')
+    emit('local.get $i')
+    _emit_load(emit, 'f64', fq_arr)
+    emit('f64.add')
+    emit('local.set $fw')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $i')
+    emit('br $sum')
+    emit('))', -1)
+    emit('local.get $fw')
+    emit('global.set $math_y0')
+    emit('i32.const 0')
+    _emit_load(emit, 'f64', fq_arr)
+    emit('local.get $fw')
+    emit('f64.sub')
+    emit('local.set $fw')
+    emit('i32.const 1')
+    emit('local.set $i')
+    emit('(block $rest_done (loop $rest', 1)
+    emit('local.get $i')
+    emit('local.get $jz')
+    emit('i32.gt_s')
+    emit('br_if $rest_done')
+    emit('local.get $fw')
+    emit('local.get $i')
+    _emit_load(emit, 'f64', fq_arr)
+    emit('f64.add')
+    emit('local.set $fw')
+    emit('local.get $i')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $i')
+    emit('br $rest')
+    emit('))', -1)
+    emit('local.get $fw')
+    emit('global.set $math_y1')
+    emit('local.get $ih')
+    emit('(if (then', 1)
+    emit('global.get $math_y0')
+    emit('f64.neg')
+    emit('global.set $math_y0')
+    emit('global.get $math_y1')
+    emit('f64.neg')
+    emit('global.set $math_y1')
+    emit('))', -1)
+    emit('local.get $n')
+    emit('i32.const 7')
+    emit('i32.and')
+    emit(')', -1)
+
+
+# --- Trigonometric functions ---
+
+def _emit_reduce(emit) -> None:
+    # Leaves n = $math_rem_pio2(x) in $n for pi/4 < |x|, or returns the
+    # result from the caller for infinite and NaN arguments; $ix holds the
+    # high word of |x|
+    emit('local.get $ix')
+    emit('i32.const 0x7FF00000')
+    emit('i32.ge_u')
+    emit('(if (then local.get $x local.get $x f64.sub return))')
+    emit('local.get $x')
+    emit('call $math_rem_pio2')
+    emit('local.set $n')
+
+
+def _emit_trig(emit) -> None:
+    for name, odd_kernel in (('$sin', True), ('$cos', False)):
+        emit(f'(func {name} (param $x f64) (result f64)', 1)
+        emit('(local $ix i32) (local $n i32) (local $r f64)')
+        _emit_high_word(emit, '$x')
+        emit('i32.const 0x7FFFFFFF')
+        emit('i32.and')
+        emit('local.tee $ix')
+        emit('i32.const 0x3FE921FB') # |x| <= pi/4
+        emit('i32.le_u')
+        emit('(if (then', 1)
+        emit('local.get $x')
+        if odd_kernel:
+            emit('f64.const 0')
+            emit('i32.const 0')
+            emit('call $math_k_sin')
+        else:
+            emit('f64.const 0')
+            emit('call $math_k_cos')
+        emit('return')
+        emit('))', -1)
+        _emit_reduce(emit)
+        # sin: sin, cos, -sin, -cos of y for n mod 4 = 0..3; cos: cos, -sin, -cos, sin
+        emit('local.get $n')
+        if not odd_kernel:
+            emit('i32.const 1')
+            emit('i32.add')
+        emit('local.tee $n')
+        emit('i32.const 1')
+        emit('i32.and')
+        emit('(if (result f64) (then', 1)
+        emit('global.get $math_y0')
+        emit('global.get $math_y1')
+        emit('call $math_k_cos')
+        emit(')(else', 0)
+        emit('global.get $math_y0')
+        emit('global.get $math_y1')
+        emit('i32.const 1')
+        emit('call $math_k_sin')
+        emit('))', -1)
+        emit('local.set $r')
+        emit('local.get $n')
+        emit('i32.const 2')
+        emit('i32.and')
+        emit('(if (then local.get $r f64.neg return))')
+        emit('local.get $r')
+        emit(')', -1)
+
+    emit('(func $tan (param $x f64) (result f64)', 1)
+    emit('(local $ix i32) (local $n i32)')
+    _emit_high_word(emit, '$x')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.tee $ix')
+    emit('i32.const 0x3FE921FB') # |x| <= pi/4
+    emit('i32.le_u')
+    emit('(if (then local.get $x f64.const 0 i32.const 1 call $math_k_tan return))')
+    _emit_reduce(emit)
+    # tan(y) for even n, -1 / tan(y) for odd n
+    emit('global.get $math_y0')
+    emit('global.get $math_y1')
+    emit('i32.const 1')
+    emit('local.get $n')
+    emit('i32.const 1')
+    emit('i32.and')
+    emit('i32.const 1')
+    emit('i32.shl')
+    emit('i32.sub')
+    emit('call $math_k_tan')
+    emit(')', -1)
+
+
+# --- Inverse trigonometric functions ---
+
+def _emit_asin_ratio(emit, var: str) -> None:
+    # p(var) / q(var)
+    emit(f'local.get {var}')
+    _emit_poly(emit, var, _ASIN_P)
+    emit('f64.mul')
+    _emit_poly(emit, var, _ASIN_Q)
+    emit('f64.div')
+
+
+def _emit_domain_check(emit, at_one: list) -> None:
+    # |x| >= 1: ``at_one`` computes the result for |x| = 1, NaN otherwise
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.sub')
+    _emit_low_word(emit, '$x')
+    emit('i32.or')
+    emit('i32.eqz')
+    emit('(if (then', 1)
+    for line in at_one:
+        emit(line)
+    emit('return')
+    emit('))', -1)
+    emit('f64.const nan')
+    emit('return')
+    emit('))', -1)
+
+
+def _emit_inverse_trig(emit) -> None:
+    emit('(func $asin (param $x f64) (result f64)', 1)
+    emit('(local $hx i32) (local $ix i32) (local $t f64) (local $w f64) (local $s f64) (local $c f64)')
+    emit('(local $p f64) (local $q f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.set $ix')
+    _emit_domain_check(emit, [
+        'local.get $x', f'f64.const {_PIO2_HI}', 'f64.mul',
+        'local.get $x', f'f64.const {_PIO2_LO}', 'f64.mul', 'f64.add',
+    ])
+    emit('local.get $ix')
+    emit('i32.const 0x3FE00000') # |x| < 0.5
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3E400000') # |x| < 2^-27
+    emit('i32.lt_u')
+    emit('(if (then local.get $x return))')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.set $t')
+    _emit_asin_ratio(emit, '$t')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('return')
+    emit('))', -1)
+    # asin(x) = pi/2 - 2 * asin(sqrt((1 - |x|) / 2))
+    emit('f64.const 1')
+    emit('local.get $x')
+    emit('f64.abs')
+    emit('f64.sub')
+    emit('f64.const 0.5')
+    emit('f64.mul')
+    emit('local.tee $t')
+    emit('f64.sqrt')
+    emit('local.set $s')
+    emit('local.get $t')
+    _emit_poly(emit, '$t', _ASIN_P)
+    emit('f64.mul')
+    emit('local.set $p')
+    _emit_poly(emit, '$t', _ASIN_Q)
+    emit('local.set $q')
+    emit('local.get $ix')
+    emit('i32.const 0x3FEF3333') # |x| > 0.975
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit(f'f64.const {_PIO2_HI}')
+    emit('f64.const 2')
+    emit('local.get $s')
+    emit('local.get $s')
+    emit('local.get $p')
+    emit('local.get $q')
+    emit('f64.div')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.mul')
+    emit(f'f64.const {_PIO2_LO}')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $t')
+    emit(')(else', 0)
+    # sqrt(t) = w + c with w the high half of s
+    emit('local.get $s')
+    _emit_clear_low_word(emit)
+    emit('local.set $w')
+    emit('local.get $t')
+    emit('local.get $w')
+    emit('local.get $w')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.get $s')
+    emit('local.get $w')
+    emit('f64.add')
+    emit('f64.div')
+    emit('local.set $c')
+    emit(f'f64.const {_PIO4}')
+    emit('f64.const 2')
+    emit('local.get $s')
+    emit('f64.mul')
+    emit('local.get $p')
+    emit('local.get $q')
+    emit('f64.div')
+    emit('f64.mul')
+    emit(f'f64.const {_PIO2_LO}')
+    emit('f64.const 2')
+    emit('local.get $c')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit(f'f64.const {_PIO4}')
+    emit('f64.const 2')
+    emit('local.get $w')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $t')
+    emit('))', -1)
+    emit('local.get $t')
+    emit('local.get $t')
+    emit('f64.neg')
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.gt_s')
+    emit('select')
+    emit(')', -1)
+
+    emit('(func $acos (param $x f64) (result f64)', 1)
+    emit('(local $hx i32) (local $ix i32) (local $z f64) (local $s f64) (local $df f64) (local $c f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.set $ix')
+    _emit_domain_check(emit, [
+        'f64.const 0', f'f64.const {_PI}', 'f64.const 2', f'f64.const {_PIO2_LO}', 'f64.mul', 'f64.add',
+        'local.get $hx', 'i32.const 0', 'i32.gt_s', 'select',
+    ])
+    emit('local.get $ix')
+    emit('i32.const 0x3FE00000') # |x| < 0.5
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3C600000') # |x| <= 2^-57
+    emit('i32.le_u')
+    emit(f'(if (then f64.const {_PIO2_HI} f64.const {_PIO2_LO} f64.add return))')
+    # pi/2 - (x - (pio2_lo - x * r))
+    emit(f'f64.const {_PIO2_HI}')
+    emit('local.get $x')
+    emit(f'f64.const {_PIO2_LO}')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.set $z')
+    _emit_asin_ratio(emit, '$z')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    # x < -0.5: pi - 2 * asin(sqrt((1 + x) / 2))
+    emit('f64.const 1')
+    emit('local.get $x')
+    emit('f64.add')
+    emit('f64.const 0.5')
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('f64.sqrt')
+    emit('local.set $s')
+    emit(f'f64.const {_PI}')
+    emit('f64.const 2')
+    emit('local.get $s')
+    _emit_asin_ratio(emit, '$z')
+    emit('local.get $s')
+    emit('f64.mul')
+    emit(f'f64.const {_PIO2_LO}')
+    emit('f64.sub')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('return')
+    emit('))', -1)
+    # x > 0.5: 2 * asin(sqrt((1 - x) / 2)) with sqrt = df + c
+    emit('f64.const 1')
+    emit('local.get $x')
+    emit('f64.sub')
+    emit('f64.const 0.5')
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('f64.sqrt')
+    emit('local.tee $s')
+    _emit_clear_low_word(emit)
+    emit('local.set $df')
+    emit('local.get $z')
+    emit('local.get $df')
+    emit('local.get $df')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.get $s')
+    emit('local.get $df')
+    emit('f64.add')
+    emit('f64.div')
+    emit('local.set $c')
+    emit('f64.const 2')
+    emit('local.get $df')
+    _emit_asin_ratio(emit, '$z')
+    emit('local.get $s')
+    emit('f64.mul')
+    emit('local.get $c')
+    emit('f64.add')
+    emit('f64.add')
+    emit('f64.mul')
+    emit(')', -1)
+
+    emit('(func $atan (param $x f64) (result f64)', 1)
+    emit('(local $hx i32) (local $ix i32) (local $hi f64) (local $lo f64) (local $z f64) (local $w f64) (local $s f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.set $ix')
+    atan_inf_hi, atan_inf_lo = _ATAN_BREAKPOINTS[3]
+    emit('local.get $ix')
+    emit('i32.const 0x44100000') # |x| >= 2^66
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.ne')
+    emit('(if (then local.get $x local.get $x f64.add return))')
+    emit(f'f64.const {atan_inf_hi}')
+    emit(f'f64.const {atan_inf_lo}')
+    emit('f64.add')
+    emit('local.get $x')
+    emit('f64.copysign')
+    emit('return')
+    emit('))', -1)
+    emit('(block $reduced', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3FDC0000') # |x| < 0.4375
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3E400000') # |x| < 2^-27
+    emit('i32.lt_u')
+    emit('(if (then local.get $x return))')
+    emit('br $reduced')
+    emit('))', -1)
+    # atan(x) = atan(b) + atan((x - b) / (1 + b * x)) for the nearest breakpoint b
+    reductions = (
+        (0x3FE60000, ['f64.const 2', 'local.get $x', 'f64.mul', 'f64.const 1', 'f64.sub',
+                      'f64.const 2', 'local.get $x', 'f64.add', 'f64.div']),
+        (0x3FF30000, ['local.get $x', 'f64.const 1', 'f64.sub',
+                      'local.get $x', 'f64.const 1', 'f64.add', 'f64.div']),
+        (0x40038000, ['local.get $x', 'f64.const 1.5', 'f64.sub',
+                      'f64.const 1', 'f64.const 1.5', 'local.get $x', 'f64.mul', 'f64.add', 'f64.div']),
+        (None, ['f64.const -1', 'local.get $x', 'f64.div']),
+    )
+    emit('local.get $x')
+    emit('f64.abs')
+    emit('local.set $x')
+    emit('(block $breakpoint', 1)
+    for (limit, reduction), (hi, lo) in zip(reductions, _ATAN_BREAKPOINTS):
+        if limit is not None:
+            emit('local.get $ix')
+            emit(f'i32.const 0x{limit:08X}')
+            emit('i32.lt_u')
+            emit('(if (then', 1)
+        emit(f'f64.const {hi}')
+        emit('local.set $hi')
+        emit(f'f64.const {lo}')
+        emit('local.set $lo')
+        for line in reduction:
+            emit(line)
+        emit('local.set $x')
+        if limit is not None:
+            emit('br $breakpoint')
+            emit('))', -1)
+    emit(')', -1)
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('local.set $w')
+    # hi - ((x * (s1 + s2) - lo) - x)
+    emit('local.get $hi')
+    emit('local.get $x')
+    emit('local.get $z')
+    _emit_poly(emit, '$w', _ATAN[0::2])
+    emit('f64.mul')
+    emit('local.get $w')
+    _emit_poly(emit, '$w', _ATAN[1::2])
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('local.get $lo')
+    emit('f64.sub')
+    emit('local.get $x')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.tee $s')
+    emit('f64.neg')
+    emit('local.get $s')
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('select')
+    emit('return')
+    emit(')', -1)
+    # |x| < 0.4375: x - x * (s1 + s2)
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('local.set $w')
+    emit('local.get $z')
+    _emit_poly(emit, '$w', _ATAN[0::2])
+    emit('f64.mul')
+    emit('local.get $w')
+    _emit_poly(emit, '$w', _ATAN[1::2])
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit(')', -1)
+
+
+# --- Logarithms ---
+
+def _emit_log(emit) -> None:
+    emit('(func $ln (param $x f64) (result f64)', 1)
+    emit('(local $hx i32) (local $k i32) (local $i i32)')
+    emit('(local $f f64) (local $s f64) (local $z f64) (local $w f64) (local $r f64) (local $hfsq f64) (local $dk f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x00100000') # x < 2^-1022 (negative, zero or subnormal)
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $x')
+    emit('f64.const 0')
+    emit('f64.eq')
+    emit('(if (then f64.const -inf return))')
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then f64.const nan return))')
+    emit('i32.const -54')
+    emit('local.set $k')
+    emit('local.get $x')
+    emit(f'f64.const {_TWO_54}')
+    emit('f64.mul')
+    emit('local.set $x')
+    _emit_high_word(emit, '$x')
+    emit('local.set $hx')
+    emit('))', -1)
+    emit('local.get $hx')
+    emit('i32.const 0x7FF00000') # inf or NaN
+    emit('i32.ge_s')
+    emit('(if (then local.get $x local.get $x f64.add return))')
+    # x = 2^k * (1 + f) with sqrt(2)/2 < 1 + f < sqrt(2)
+    emit('local.get $k')
+    emit('local.get $hx')
+    emit('i32.const 20')
+    emit('i32.shr_s')
+    emit('i32.const 1023')
+    emit('i32.sub')
+    emit('i32.add')
+    emit('local.set $k')
+    emit('local.get $hx')
+    emit('i32.const 0x000FFFFF')
+    emit('i32.and')
+    emit('local.tee $hx')
+    emit('i32.const 0x95F64')
+    emit('i32.add')
+    emit('i32.const 0x00100000')
+    emit('i32.and')
+    emit('local.set $i')
+    emit('local.get $hx')
+    emit('local.get $i')
+    emit('i32.const 0x3FF00000')
+    emit('i32.xor')
+    emit('i32.or')
+    _emit_with_low_word(emit, '$x')
+    emit('f64.const 1')
+    emit('f64.sub')
+    emit('local.set $f')
+    emit('local.get $k')
+    emit('local.get $i')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('i32.add')
+    emit('f64.convert_i32_s')
+    emit('local.set $dk')
+    emit('i32.const 2')
+    emit('local.get $hx')
+    emit('i32.add')
+    emit('i32.const 0x000FFFFF')
+    emit('i32.and')
+    emit('i32.const 3') # |f| < 2^-20
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $f')
+    emit('f64.const 0')
+    emit('f64.eq')
+    emit('(if (then', 1)
+    emit('local.get $dk')
+    emit(f'f64.const {_LN2_HI}')
+    emit('f64.mul')
+    emit('local.get $dk')
+    emit(f'f64.const {_LN2_LO}')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('return')
+    emit('))', -1)
+    # dk * ln2_hi - ((f^2 * (0.5 - f / 3) - dk * ln2_lo) - f)
+    emit('local.get $dk')
+    emit(f'f64.const {_LN2_HI}')
+    emit('f64.mul')
+    emit('local.get $f')
+    emit('local.get $f')
+    emit('f64.mul')
+    emit('f64.const 0.5')
+    emit('f64.const 0.33333333333333333')
+    emit('local.get $f')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('local.get $dk')
+    emit(f'f64.const {_LN2_LO}')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.get $f')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $f')
+    emit('f64.const 2')
+    emit('local.get $f')
+    emit('f64.add')
+    emit('f64.div')
+    emit('local.tee $s')
+    emit('local.get $s')
+    emit('f64.mul')
+    emit('local.tee $z')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('local.set $w')
+    # R = z * (Lg1 + w * (Lg3 + ...)) + w * (Lg2 + w * (Lg4 + ...))
+    emit('local.get $z')
+    _emit_poly(emit, '$w', _LOG[0::2])
+    emit('f64.mul')
+    emit('local.get $w')
+    _emit_poly(emit, '$w', _LOG[1::2])
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $r')
+    emit('local.get $dk')
+    emit(f'f64.const {_LN2_HI}')
+    emit('f64.mul')
+    # 1 + f outside [1.38, 1.42] (mantissa bits 0x6147A..0x6B851): f^2 / 2 term
+    emit('local.get $hx')
+    emit('i32.const 0x6147A')
+    emit('i32.sub')
+    emit('i32.const 0x6B851')
+    emit('local.get $hx')
+    emit('i32.sub')
+    emit('i32.or')
+    emit('i32.const 0')
+    emit('i32.gt_s')
+    emit('(if (result f64) (then', 1)
+    # (hfsq - (s * (hfsq + R) + dk * ln2_lo)) - f
+    emit('f64.const 0.5')
+    emit('local.get $f')
+    emit('f64.mul')
+    emit('local.get $f')
+    emit('f64.mul')
+    emit('local.tee $hfsq')
+    emit('local.get $s')
+    emit('local.get $hfsq')
+    emit('local.get $r')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('local.get $dk')
+    emit(f'f64.const {_LN2_LO}')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.sub')
+    emit(')(else', 0)
+    # (s * (f - R) - dk * ln2_lo) - f
+    emit('local.get $s')
+    emit('local.get $f')
+    emit('local.get $r')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('local.get $dk')
+    emit(f'f64.const {_LN2_LO}')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('))', -1)
+    emit('local.get $f')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit(')', -1)
+
+    # log10(x) = k * log10(2) + log10(m) for x = 2^k * m, m in [1, 2)
+    emit('(func $log (param $x f64) (result f64)', 1)
+    emit('(local $hx i32) (local $k i32) (local $i i32) (local $y f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x00100000')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $x')
+    emit('f64.const 0')
+    emit('f64.eq')
+    emit('(if (then f64.const -inf return))')
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then f64.const nan return))')
+    emit('i32.const -54')
+    emit('local.set $k')
+    emit('local.get $x')
+    emit(f'f64.const {_TWO_54}')
+    emit('f64.mul')
+    emit('local.set $x')
+    _emit_high_word(emit, '$x')
+    emit('local.set $hx')
+    emit('))', -1)
+    emit('local.get $hx')
+    emit('i32.const 0x7FF00000')
+    emit('i32.ge_s')
+    emit('(if (then local.get $x local.get $x f64.add return))')
+    emit('local.get $x')
+    emit('f64.const 1')
+    emit('f64.eq')
+    emit('(if (then f64.const 0 return))')
+    emit('local.get $k')
+    emit('local.get $hx')
+    emit('i32.const 20')
+    emit('i32.shr_s')
+    emit('i32.const 1023')
+    emit('i32.sub')
+    emit('i32.add')
+    emit('local.tee $k')
+    emit('i32.const 31')
+    emit('i32.shr_u')
+    emit('local.set $i') # 1 for k < 0: m in [0.5, 1) keeps log10(m) small
+    emit('local.get $k')
+    emit('local.get $i')
+    emit('i32.add')
+    emit('f64.convert_i32_s')
+    emit('local.set $y')
+    # y * log10_2lo + ivln10 * ln(m) + y * log10_2hi
+    emit('local.get $y')
+    emit(f'f64.const {_LOG10_2_LO}')
+    emit('f64.mul')
+    emit(f'f64.const {_INV_LN10}')
+    emit('local.get $hx')
+    emit('i32.const 0x000FFFFF')
+    emit('i32.and')
+    emit('i32.const 0x3FF')
+    emit('local.get $i')
+    emit('i32.sub')
+    emit('i32.const 20')
+    emit('i32.shl')
+    emit('i32.or')
+    _emit_with_low_word(emit, '$x')
+    emit('call $ln')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.get $y')
+    emit(f'f64.const {_LOG10_2_HI}')
+    emit('f64.mul')
+    emit('f64.add')
+    emit(')', -1)
+
+
+# --- Power ---
+
+def _emit_inf_or_zero(emit, condition: list, signed: bool) -> None:
+    # Returns (s *) inf when ``condition`` holds and (s *) 0 otherwise
+    emit('f64.const inf')
+    emit('f64.const 0')
+    for line in condition:
+        emit(line)
+    emit('select')
+    if signed:
+        emit('local.get $s')
+        emit('f64.mul')
+    emit('return')
+
+
+def _emit_pow(emit) -> None:
+    # fdlibm's pow with JavaScript's special cases (+-1 ** +-inf is NaN):
+    # x^y = 2^(y * log2(x)) with log2(x) and the product in extra precision
+    emit('(func $pow (param $x f64) (param $y f64) (result f64)', 1)
+    emit('(local $hx i32) (local $lx i32) (local $hy i32) (local $ly i32) (local $ix i32) (local $iy i32)')
+    emit('(local $yisint i32) (local $k i32) (local $j i32) (local $n i32) (local $i i32)')
+    emit('(local $ax f64) (local $s f64) (local $t f64) (local $w f64) (local $u f64) (local $v f64)')
+    emit('(local $t1 f64) (local $t2 f64) (local $ss f64) (local $s_h f64) (local $s_l f64)')
+    emit('(local $t_h f64) (local $t_l f64) (local $s2 f64) (local $r f64) (local $p_h f64) (local $p_l f64)')
+    emit('(local $z f64) (local $z_h f64) (local $z_l f64) (local $bp f64)')
+    _emit_high_word(emit, '$x')
+    emit('local.tee $hx')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.set $ix')
+    _emit_low_word(emit, '$x')
+    emit('local.set $lx')
+    _emit_high_word(emit, '$y')
+    emit('local.tee $hy')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.set $iy')
+    _emit_low_word(emit, '$y')
+    emit('local.set $ly')
+
+    emit('local.get $y')
+    emit('f64.const 0')
+    emit('f64.eq')
+    emit('(if (then f64.const 1 return))')
+    emit('local.get $x')
+    emit('local.get $x')
+    emit('f64.ne')
+    emit('local.get $y')
+    emit('local.get $y')
+    emit('f64.ne')
+    emit('i32.or')
+    emit('(if (then local.get $x local.get $y f64.add return))')
+
+    # yisint = 0: y is not an integer, 1: odd integer, 2: even integer (x < 0 only)
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $iy')
+    emit('i32.const 0x43400000') # |y| >= 2^53
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit('i32.const 2')
+    emit('local.set $yisint')
+    emit(')(else', 0)
+    emit('local.get $iy')
+    emit('i32.const 0x3FF00000')
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit('local.get $iy')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('i32.const 0x3FF')
+    emit('i32.sub')
+    emit('local.tee $k')
+    emit('i32.const 20')
+    emit('i32.gt_s')
+    emit('(if (then', 1)
+    # The units bit is in the low word
+    emit('local.get $ly')
+    emit('i32.const 52')
+    emit('local.get $k')
+    emit('i32.sub')
+    emit('i32.shr_u')
+    emit('local.tee $j')
+    emit('i32.const 52')
+    emit('local.get $k')
+    emit('i32.sub')
+    emit('i32.shl')
+    emit('local.get $ly')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('i32.const 2')
+    emit('local.get $j')
+    emit('i32.const 1')
+    emit('i32.and')
+    emit('i32.sub')
+    emit('local.set $yisint')
+    emit('))', -1)
+    emit(')(else', 0)
+    emit('local.get $ly')
+    emit('i32.eqz')
+    emit('(if (then', 1)
+    emit('local.get $iy')
+    emit('i32.const 20')
+    emit('local.get $k')
+    emit('i32.sub')
+    emit('i32.shr_u')
+    emit('local.tee $j')
+    emit('i32.const 20')
+    emit('local.get $k')
+    emit('i32.sub')
+    emit('i32.shl')
+    emit('local.get $iy')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('i32.const 2')
+    emit('local.get $j')
+    emit('i32.const 1')
+    emit('i32.and')
+    emit('i32.sub')
+    emit('local.set $yisint')
+    emit('))', -1)
+    emit('))', -1)
+    emit('))', -1)
+    emit('))', -1)
+    emit('))', -1)
+    emit('))', -1)
+
+    # y = +-inf, +-1, 2 and 0.5
+    emit('local.get $ly')
+    emit('i32.eqz')
+    emit('(if (then', 1)
+    emit('local.get $iy')
+    emit('i32.const 0x7FF00000')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.sub')
+    emit('local.get $lx')
+    emit('i32.or')
+    emit('i32.eqz')
+    emit('(if (then f64.const nan return))')
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit('local.get $y')
+    emit('f64.const 0')
+    emit('local.get $hy')
+    emit('i32.const 0')
+    emit('i32.ge_s')
+    emit('select')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $y')
+    emit('f64.neg')
+    emit('f64.const 0')
+    emit('local.get $hy')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('select')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $iy')
+    emit('i32.const 0x3FF00000')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $hy')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then f64.const 1 local.get $x f64.div return))')
+    emit('local.get $x')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $hy')
+    emit('i32.const 0x40000000')
+    emit('i32.eq')
+    emit('(if (then local.get $x local.get $x f64.mul return))')
+    emit('local.get $hy')
+    emit('i32.const 0x3FE00000')
+    emit('i32.eq')
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.ge_s')
+    emit('i32.and')
+    emit('(if (then local.get $x f64.sqrt return))')
+    emit('))', -1)
+
+    # x = +-0, +-inf, +-1
+    emit('local.get $x')
+    emit('f64.abs')
+    emit('local.set $ax')
+    emit('local.get $lx')
+    emit('i32.eqz')
+    emit('local.get $ix')
+    emit('i32.const 0x7FF00000')
+    emit('i32.eq')
+    emit('local.get $ix')
+    emit('i32.eqz')
+    emit('i32.or')
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.eq')
+    emit('i32.or')
+    emit('i32.and')
+    emit('(if (then', 1)
+    emit('local.get $ax')
+    emit('local.set $z')
+    emit('local.get $hy')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then f64.const 1 local.get $z f64.div local.set $z))')
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.sub')
+    emit('local.get $yisint')
+    emit('i32.or')
+    emit('i32.eqz')
+    emit('(if (then f64.const nan return))')
+    emit('local.get $yisint')
+    emit('i32.const 1')
+    emit('i32.eq')
+    emit('(if (then local.get $z f64.neg return))')
+    emit('))', -1)
+    emit('local.get $z')
+    emit('return')
+    emit('))', -1)
+
+    # s = sign of the result; a negative x needs an integer y
+    emit('f64.const 1')
+    emit('local.set $s')
+    emit('local.get $hx')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $yisint')
+    emit('i32.eqz')
+    emit('(if (then f64.const nan return))')
+    emit('local.get $yisint')
+    emit('i32.const 1')
+    emit('i32.eq')
+    emit('(if (then f64.const -1 local.set $s))')
+    emit('))', -1)
+
+    # t1 + t2 = log2(ax)
+    emit('local.get $iy')
+    emit('i32.const 0x41E00000') # |y| > 2^31
+    emit('i32.gt_u')
+    emit('(if (then', 1)
+    emit('local.get $iy')
+    emit('i32.const 0x43F00000') # |y| > 2^64: over- or underflows unless x = 1
+    emit('i32.gt_u')
+    emit('(if (then', 1)
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    _emit_inf_or_zero(emit, ['local.get $hy', 'i32.const 0', 'i32.lt_s'], False)
+    emit('))', -1)
+    _emit_inf_or_zero(emit, ['local.get $hy', 'i32.const 0', 'i32.gt_s'], False)
+    emit('))', -1)
+    emit('local.get $ix')
+    emit('i32.const 0x3FEFFFFF')
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    _emit_inf_or_zero(emit, ['local.get $hy', 'i32.const 0', 'i32.lt_s'], True)
+    emit('))', -1)
+    emit('local.get $ix')
+    emit('i32.const 0x3FF00000')
+    emit('i32.gt_u')
+    emit('(if (then', 1)
+    _emit_inf_or_zero(emit, ['local.get $hy', 'i32.const 0', 'i32.gt_s'], True)
+    emit('))', -1)
+    # |1 - x| <= 2^-20: log(x) ~ t - t^2/2 + t^3/3 - t^4/4 with t = x - 1
+    emit('local.get $ax')
+    emit('f64.const 1')
+    emit('f64.sub')
+    emit('local.tee $t')
+    emit('local.get $t')
+    emit('f64.mul')
+    emit('f64.const 0.5')
+    emit('local.get $t')
+    emit('f64.const 0.3333333333333333333333')
+    emit('local.get $t')
+    emit('f64.const 0.25')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('local.set $w')
+    emit(f'f64.const {_IVLN2_H}')
+    emit('local.get $t')
+    emit('f64.mul')
+    emit('local.set $u')
+    emit('local.get $t')
+    emit(f'f64.const {_IVLN2_L}')
+    emit('f64.mul')
+    emit('local.get $w')
+    emit(f'f64.const {_IVLN2}')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.set $v')
+    emit('local.get $u')
+    emit('local.get $v')
+    emit('f64.add')
+    _emit_clear_low_word(emit)
+    emit('local.set $t1')
+    emit('local.get $v')
+    emit('local.get $t1')
+    emit('local.get $u')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $t2')
+    emit(')(else', 0)
+    emit('i32.const 0')
+    emit('local.set $n')
+    emit('local.get $ix')
+    emit('i32.const 0x00100000') # subnormal
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $ax')
+    emit(f'f64.const {_TWO_53}')
+    emit('f64.mul')
+    emit('local.set $ax')
+    emit('i32.const -53')
+    emit('local.set $n')
+    _emit_high_word(emit, '$ax')
+    emit('local.set $ix')
+    emit('))', -1)
+    # ax = 2^n * m with m in [sqrt(3)/2, sqrt(3)), k = 1 for m near 1.5
+    emit('local.get $n')
+    emit('local.get $ix')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('i32.const 0x3FF')
+    emit('i32.sub')
+    emit('i32.add')
+    emit('local.set $n')
+    emit('local.get $ix')
+    emit('i32.const 0x000FFFFF')
+    emit('i32.and')
+    emit('local.tee $j')
+    emit('i32.const 0x3FF00000')
+    emit('i32.or')
+    emit('local.set $ix')
+    emit('i32.const 0')
+    emit('local.set $k')
+    emit('local.get $j')
+    emit('i32.const 0x3988E') # m < sqrt(3/2)
+    emit('i32.gt_u')
+    emit('(if (then', 1)
+    emit('local.get $j')
+    emit('i32.const 0xBB67A') # m < sqrt(3)
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('i32.const 1')
+    emit('local.set $k')
+    emit(')(else', 0)
+    emit('local.get $n')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $n')
+    emit('local.get $ix')
+    emit('i32.const 0x00100000')
+    emit('i32.sub')
+    emit('local.set $ix')
+    emit('))', -1)
+    emit('))', -1)
+    emit('local.get $ix')
+    _emit_with_low_word(emit, '$ax')
+    emit('local.set $ax')
+    emit('f64.const 1.5')
+    emit('f64.const 1')
+    emit('local.get $k')
+    emit('select')
+    emit('local.set $bp')
+    # ss = s_h + s_l = (ax - bp) / (ax + bp)
+    emit('local.get $ax')
+    emit('local.get $bp')
+    emit('f64.sub')
+    emit('local.set $u')
+    emit('f64.const 1')
+    emit('local.get $ax')
+    emit('local.get $bp')
+    emit('f64.add')
+    emit('f64.div')
+    emit('local.set $v')
+    emit('local.get $u')
+    emit('local.get $v')
+    emit('f64.mul')
+    emit('local.tee $ss')
+    _emit_clear_low_word(emit)
+    emit('local.set $s_h')
+    # t_h = ax + bp rounded to its high word
+    emit('local.get $ix')
+    emit('i32.const 1')
+    emit('i32.shr_u')
+    emit('i32.const 0x20000000')
+    emit('i32.or')
+    emit('i32.const 0x00080000')
+    emit('i32.add')
+    emit('local.get $k')
+    emit('i32.const 18')
+    emit('i32.shl')
+    emit('i32.add')
+    _emit_from_high_word(emit)
+    emit('local.set $t_h')
+    emit('local.get $ax')
+    emit('local.get $t_h')
+    emit('local.get $bp')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $t_l')
+    emit('local.get $v')
+    emit('local.get $u')
+    emit('local.get $s_h')
+    emit('local.get $t_h')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.get $s_h')
+    emit('local.get $t_l')
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('f64.mul')
+    emit('local.set $s_l')
+    # log(m) = 2 * ss + 2 * ss^3 * (1/3 + ss^2 * (L1 + ...)) in parts
+    emit('local.get $ss')
+    emit('local.get $ss')
+    emit('f64.mul')
+    emit('local.tee $s2')
+    emit('local.get $s2')
+    emit('f64.mul')
+    _emit_poly(emit, '$s2', _POW_LOG)
+    emit('f64.mul')
+    emit('local.get $s_l')
+    emit('local.get $s_h')
+    emit('local.get $ss')
+    emit('f64.add')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $r')
+    emit('local.get $s_h')
+    emit('local.get $s_h')
+    emit('f64.mul')
+    emit('local.set $s2')
+    emit('f64.const 3')
+    emit('local.get $s2')
+    emit('f64.add')
+    emit('local.get $r')
+    emit('f64.add')
+    _emit_clear_low_word(emit)
+    emit('local.set $t_h')
+    emit('local.get $r')
+    emit('local.get $t_h')
+    emit('f64.const 3')
+    emit('f64.sub')
+    emit('local.get $s2')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $t_l')
+    # p_h + p_l = ss * (3 + ss^2 + r)
+    emit('local.get $s_h')
+    emit('local.get $t_h')
+    emit('f64.mul')
+    emit('local.set $u')
+    emit('local.get $s_l')
+    emit('local.get $t_h')
+    emit('f64.mul')
+    emit('local.get $t_l')
+    emit('local.get $ss')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $v')
+    emit('local.get $u')
+    emit('local.get $v')
+    emit('f64.add')
+    _emit_clear_low_word(emit)
+    emit('local.set $p_h')
+    emit('local.get $v')
+    emit('local.get $p_h')
+    emit('local.get $u')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $p_l')
+    # log2(ax) = n + log2(bp) + 2/(3 ln 2) * (p_h + p_l)
+    emit(f'f64.const {_CP_H}')
+    emit('local.get $p_h')
+    emit('f64.mul')
+    emit('local.set $z_h')
+    emit(f'f64.const {_CP_L}')
+    emit('local.get $p_h')
+    emit('f64.mul')
+    emit('local.get $p_l')
+    emit(f'f64.const {_CP}')
+    emit('f64.mul')
+    emit('f64.add')
+    emit(f'f64.const {_DP_L}')
+    emit('f64.const 0')
+    emit('local.get $k')
+    emit('select')
+    emit('f64.add')
+    emit('local.set $z_l')
+    emit('local.get $n')
+    emit('f64.convert_i32_s')
+    emit('local.set $t')
+    emit(f'f64.const {_DP_H}')
+    emit('f64.const 0')
+    emit('local.get $k')
+    emit('select')
+    emit('local.set $w') # log2(bp), high part
+    emit('local.get $z_h')
+    emit('local.get $z_l')
+    emit('f64.add')
+    emit('local.get $w')
+    emit('f64.add')
+    emit('local.get $t')
+    emit('f64.add')
+    _emit_clear_low_word(emit)
+    emit('local.set $t1')
+    emit('local.get $z_l')
+    emit('local.get $t1')
+    emit('local.get $t')
+    emit('f64.sub')
+    emit('local.get $w')
+    emit('f64.sub')
+    emit('local.get $z_h')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $t2')
+    emit('))', -1)
+
+    # p_h + p_l = y * log2(ax), split with y = y1 + (y - y1)
+    emit('local.get $y')
+    _emit_clear_low_word(emit)
+    emit('local.set $t')
+    emit('local.get $y')
+    emit('local.get $t')
+    emit('f64.sub')
+    emit('local.get $t1')
+    emit('f64.mul')
+    emit('local.get $y')
+    emit('local.get $t2')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $p_l')
+    emit('local.get $t')
+    emit('local.get $t1')
+    emit('f64.mul')
+    emit('local.set $p_h')
+    emit('local.get $p_l')
+    emit('local.get $p_h')
+    emit('f64.add')
+    emit('local.set $z')
+    _emit_high_word(emit, '$z')
+    emit('local.set $j')
+    _emit_low_word(emit, '$z')
+    emit('local.set $i')
+    emit('local.get $j')
+    emit('i32.const 0x40900000') # z >= 1024
+    emit('i32.ge_s')
+    emit('(if (then', 1)
+    emit('local.get $j')
+    emit('i32.const 0x40900000')
+    emit('i32.sub')
+    emit('local.get $i')
+    emit('i32.or')
+    emit('(if (then f64.const inf local.get $s f64.mul return))')
+    emit('local.get $p_l')
+    emit(f'f64.const {_OVT}')
+    emit('f64.add')
+    emit('local.get $z')
+    emit('local.get $p_h')
+    emit('f64.sub')
+    emit('f64.gt')
+    emit('(if (then f64.const inf local.get $s f64.mul return))')
+    emit(')(else', 0)
+    emit('local.get $j')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('i32.const 0x4090CC00') # z <= -1075
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    emit('local.get $j')
+    emit('i32.const 0xC090CC00')
+    emit('i32.sub')
+    emit('local.get $i')
+    emit('i32.or')
+    emit('(if (then f64.const 0 local.get $s f64.mul return))')
+    emit('local.get $p_l')
+    emit('local.get $z')
+    emit('local.get $p_h')
+    emit('f64.sub')
+    emit('f64.le')
+    emit('(if (then f64.const 0 local.get $s f64.mul return))')
+    emit('))', -1)
+    emit('))', -1)
+
+    # 2^(p_h + p_l) = 2^n * exp((p_h + p_l - n) * ln 2) with |p_h + p_l - n| <= 0.5
+    emit('i32.const 0')
+    emit('local.set $n')
+    emit('local.get $j')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('local.tee $i')
+    emit('i32.const 0x3FE00000')
+    emit('i32.gt_u')
+    emit('(if (then', 1)
+    emit('local.get $j')
+    emit('i32.const 0x00100000')
+    emit('local.get $i')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('i32.const 0x3FF')
+    emit('i32.sub')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('i32.shr_s')
+    emit('i32.add')
+    emit('local.tee $n')
+    emit('i32.const 0x7FFFFFFF')
+    emit('i32.and')
+    emit('i32.const 20')
+    emit('i32.shr_u')
+    emit('i32.const 0x3FF')
+    emit('i32.sub')
+    emit('local.set $k')
+    emit('local.get $n')
+    emit('i32.const 0x000FFFFF')
+    emit('local.get $k')
+    emit('i32.shr_s')
+    emit('i32.const -1')
+    emit('i32.xor')
+    emit('i32.and')
+    _emit_from_high_word(emit)
+    emit('local.set $t')
+    emit('local.get $n')
+    emit('i32.const 0x000FFFFF')
+    emit('i32.and')
+    emit('i32.const 0x00100000')
+    emit('i32.or')
+    emit('i32.const 20')
+    emit('local.get $k')
+    emit('i32.sub')
+    emit('i32.shr_s')
+    emit('local.set $n')
+    emit('local.get $j')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then i32.const 0 local.get $n i32.sub local.set $n))')
+    emit('local.get $p_h')
+    emit('local.get $t')
+    emit('f64.sub')
+    emit('local.set $p_h')
+    emit('))', -1)
+    emit('local.get $p_l')
+    emit('local.get $p_h')
+    emit('f64.add')
+    _emit_clear_low_word(emit)
+    emit('local.tee $t')
+    emit(f'f64.const {_LG2_H}')
+    emit('f64.mul')
+    emit('local.set $u')
+    emit('local.get $p_l')
+    emit('local.get $t')
+    emit('local.get $p_h')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit(f'f64.const {_LG2}')
+    emit('f64.mul')
+    emit('local.get $t')
+    emit(f'f64.const {_LG2_L}')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.set $v')
+    emit('local.get $u')
+    emit('local.get $v')
+    emit('f64.add')
+    emit('local.set $z')
+    emit('local.get $v')
+    emit('local.get $z')
+    emit('local.get $u')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $w')
+    emit('local.get $z')
+    emit('local.get $z')
+    emit('f64.mul')
+    emit('local.set $t')
+    emit('local.get $z')
+    emit('local.get $t')
+    _emit_poly(emit, '$t', _POW_EXP)
+    emit('f64.mul')
+    emit('f64.sub')
+    emit('local.set $t1')
+    # exp(z + w) = 1 - ((z * t1 / (t1 - 2) - (w + z * w)) - z)
+    emit('f64.const 1')
+    emit('local.get $z')
+    emit('local.get $t1')
+    emit('f64.mul')
+    emit('local.get $t1')
+    emit('f64.const 2')
+    emit('f64.sub')
+    emit('f64.div')
+    emit('local.get $w')
+    emit('local.get $z')
+    emit('local.get $w')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.sub')
+    emit('local.get $z')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $z')
+    # Scale by 2^n; a subnormal result is rounded once by the last multiply
+    _emit_high_word(emit, '$z')
+    emit('local.get $n')
+    emit('i32.const 20')
+    emit('i32.shl')
+    emit('i32.add')
+    emit('local.tee $j')
+    emit('i32.const 20')
+    emit('i32.shr_s')
+    emit('i32.const 0')
+    emit('i32.le_s')
+    emit('(if (result f64) (then', 1)
+    emit('local.get $z')
+    emit('local.get $n')
+    emit('i32.const 1000')
+    emit('i32.add')
+    _emit_pow2(emit)
+    emit('f64.mul')
+    emit('i32.const -1000')
+    _emit_pow2(emit)
+    emit('f64.mul')
+    emit(')(else', 0)
+    emit('local.get $j')
+    _emit_with_low_word(emit, '$z')
+    emit('))', -1)
+    emit('local.get $s')
+    emit('f64.mul')
+    emit(')', -1)
@@ -0,0 +1,274 @@
+import math
+
+from antlr_generated import GrammarMathPLVisitor, GrammarMathPLParser
+
+from .analyzer import MathPLSemanticAnalyzer
+from . import types
+
+# --- OPTIMIZER ---
+
+class MathPLOptimizer(GrammarMathPLVisitor):
+    """
+    Runs between semantic analysis and WAT generation and annotates the typed
+    parse tree for the generator:
+
+    * ``const_value``  - the node is a compile-time constant (INT, FLOAT, BOOL);
+    * ``replacement``  - the node is an identity (``x * 1``, ``x - 0``, ...) and
+      the given child expression can be emitted instead;
+    * ``pow_exponent`` - ``x ^ n`` with a small integer ``n`` that is emitted as
+      a chain of multiplications instead of a ``Math.pow`` call.
+
+    Folding follows the runtime semantics of the generated code: i32
+    arithmetic wraps, integer division truncates, and anything that would trap
+    or depends on the host (division by zero, invalid ``(int)`` casts, calls
+    to ``sin``, ``ln``, ... and powers, whose last bit depends on the
+    ``Math`` implementation) is left for runtime.  A power is folded only
+    when its exact value is an integer below 2^53, which every ``pow``
+    returns exactly.
+    """
+
+    MAX_POW_CHAIN = 4
+    MAX_EXACT_POW = 2**53
+
+    # Builtins whose runtime code the optimizer can reproduce bit for bit
+    _BUILTIN_MATH = {
+        'deg_to_rad': lambda x: x * 0.017453292519943295,
+    }
+
+    def __init__(self, analyzer: MathPLSemanticAnalyzer) -> None:
+        self.analyzer = analyzer
+        self.folded_count = 0
+        self.reduced_pow_count = 0
+        self.simplified_count = 0
+
+    @staticmethod
+    def _wrap_i32(value: int) -> int:
+        return ((value + 2**31) % 2**32) - 2**31
+
+    @staticmethod
+    def _has_side_effects(ctx) -> bool:
+        if isinstance(ctx, GrammarMathPLParser.FunctionCallContext):
+            return True
+        if isinstance(ctx, GrammarMathPLParser.ExpressionContext) and (ctx.INC() or ctx.DEC()):
+            return True
+        for i in range(ctx.getChildCount()):
+            child = ctx.getChild(i)
+            if hasattr(child, 'getChildCount') and not hasattr(child, 'symbol'):
+                if MathPLOptimizer._has_side_effects(child):
+                    return True
+        return False
+
+    def _set_constant(self, ctx, value):
+        if value is None:
+            return None
+        ctx.const_value = value
+        return value
+
+    def _fold(self, ctx, value):
+        """Marks a node whose value was computed by the optimizer itself."""
+        if value is not None:
+            self.folded_count += 1
+        return self._set_constant(ctx, value)
+
+    def visitLiteral(self, ctx: GrammarMathPLParser.LiteralContext):
+        if ctx.INT_LITERAL():
+            return self._set_constant(ctx, self._wrap_i32(int(ctx.getText())))
+        if ctx.FLOAT_LITERAL():
+            return self._set_constant(ctx, float(ctx.getText()))
+        if ctx.BOOL_LITERAL():
+            return self._set_constant(ctx, 1 if ctx.getText() == 'true' else 0)
+        return None
+
+    def visitAtom(self, ctx: GrammarMathPLParser.AtomContext):
+        if ctx.literal():
+            return self._set_constant(ctx, self.visit(ctx.literal()))
+        if ctx.LPAREN() and ctx.expression():
+            return self._set_constant(ctx, self.visit(ctx.expression(0)))
+        if ctx.typeCast():
+            return self._set_constant(ctx, self.visit(ctx.typeCast()))
+        if ctx.functionCall():
+            return self._set_constant(ctx, self.visit(ctx.functionCall()))
+        self.visitChildren(ctx)
+        return None
+
+    def visitTypeCast(self, ctx: GrammarMathPLParser.TypeCastContext):
+        value = self.visit(ctx.atom())
+        if value is None:
+            return None
+        source_type = ctx.atom().type
+        target_type = ctx.type
+        if target_type == source_type:
+            return value
+        if target_type == types.FLOAT and source_type == types.INT:
+            return self._fold(ctx, float(value))
+        if target_type == types.INT and source_type == types.FLOAT:
+            # i32.trunc_f64_s traps outside the i32 range and on NaN
+            if math.isnan(value) or not (-2**31 - 1 < value < 2**31):
+                return None
+            return self._fold(ctx, int(value))
+        if (source_type, target_type) in ((types.INT, types.BOOL), (types.BOOL, types.INT)):
+            # The generator reinterprets the i32 as is
+            return self._fold(ctx, value)
+        return None
+
+    def visitFunctionCall(self, ctx: GrammarMathPLParser.FunctionCallContext):
+        arg_values = []
+        if ctx.functionArguments():
+            arg_values = [self.visit(expr) for expr in ctx.functionArguments().expression()]
+
+        name = ctx.ID().getText()
+        func = self._BUILTIN_MATH.get(name)
+        if func is None or len(arg_values) != 1 or arg_values[0] is None:
+            return None
+        try:
+            value = float(func(float(arg_values[0])))
+        except (ValueError, OverflowError):
+            return None
+        return self._fold(ctx, value)
+
+    def visitExpression(self, ctx: GrammarMathPLParser.ExpressionContext):
+        if ctx.atom():
+            return self._set_constant(ctx, self.visit(ctx.atom()))
+
+        if ctx.LBRACK() or (ctx.DOT() and ctx.LENGTH()) or ctx.INC() or ctx.DEC():
+            self.visitChildren(ctx)
+            return None
+
+        if ctx.MINUS() and len(ctx.expression()) == 1:
+            value = self.visit(ctx.expression(0))
+            if value is None:
+                return None
+            if ctx.type == types.INT:
+                return self._fold(ctx, self._wrap_i32(-value))
+            return self._fold(ctx, -value)
+
+        if ctx.NOT():
+            value = self.visit(ctx.expression(0))
+            if value is None:
+                return None
+            return self._fold(ctx, 1 if value == 0 else 0)
+
+        if len(ctx.expression()) == 2:
+            left_expr = ctx.expression(0)
+            right_expr = ctx.expression(1)
+            left_value = self.visit(left_expr)
+            right_value = self.visit(right_expr)
+            op = ctx.getChild(1).symbol.type
+
+            if isinstance(ctx.type, types.ArrayType) or \
+               isinstance(left_expr.type, types.ArrayType) or \
+               isinstance(right_expr.type, types.ArrayType):
+                return None
+
+            if left_value is not None and right_value is not None:
+                return self._fold(ctx, self._fold_binary(op, left_expr.type, right_expr.type, left_value, right_value))
+
+            # Short-circuit operators only need the left operand
+            if op == GrammarMathPLParser.AND and left_value == 0:
+                return self._fold(ctx, 0)
+            if op == GrammarMathPLParser.OR and left_value is not None and left_value != 0:
+                return self._fold(ctx, 1)
+
+            self._simplify(ctx, op, left_expr, right_expr, left_value, right_value)
+        return None
+
+    def _fold_binary(self, op, left_type, right_type, left, right):
+        if op == GrammarMathPLParser.POW:
+            left, right = float(left), float(right)
+            if not (left.is_integer() and right.is_integer()) or right < 0:
+                return None
+            if left == 0 and math.copysign(1.0, left) < 0:
+                return None
+            if abs(left) > 1 and right >= self.MAX_EXACT_POW.bit_length():
+                return None
+            value = int(left) ** int(right)
+            if abs(value) >= self.MAX_EXACT_POW:
+                return None
+            return float(value)
+
+        if op == GrammarMathPLParser.AND:
+            return 1 if left != 0 and right != 0 else 0
+        if op == GrammarMathPLParser.OR:
+            return 1 if left != 0 else (1 if right != 0 else 0)
+
+        comparisons = {
+            GrammarMathPLParser.EQ: lambda a, b: a == b,
+            GrammarMathPLParser.NEQ: lambda a, b: a != b,
+            GrammarMathPLParser.GT: lambda a, b: a > b,
+            GrammarMathPLParser.GTE: lambda a, b: a >= b,
+            GrammarMathPLParser.LT: lambda a, b: a < b,
+            GrammarMathPLParser.LTE: lambda a, b: a <= b,
+        }
+        if op in comparisons:
+            if types.STRING in (left_type, right_type):
+                return None
+            return 1 if comparisons[op](left, right) else 0
+
+        is_float = types.FLOAT in (left_type, right_type)
+        if is_float:
+            left, right = float(left), float(right)
+            if op == GrammarMathPLParser.PLUS: return left + right
+            if op == GrammarMathPLParser.MINUS: return left - right
+            if op == GrammarMathPLParser.MUL: return left * right
+            if op == GrammarMathPLParser.DIV and right != 0.0: return left / right
+            return None
+
+        if op == GrammarMathPLParser.PLUS: return self._wrap_i32(left + right)
+        if op == GrammarMathPLParser.MINUS: return self._wrap_i32(left - right)
+        if op == GrammarMathPLParser.MUL: return self._wrap_i32(left * right)
+        if op in (GrammarMathPLParser.DIV, GrammarMathPLParser.MOD):
+            # i32.div_s / i32.rem_s trap on these
+            if right == 0 or (left == -2**31 and right == -1):
+                return None
+            quotient = abs(left) // abs(right)
+            if (left < 0) != (right < 0):
+                quotient = -quotient
+            if op == GrammarMathPLParser.DIV:
+                return self._wrap_i32(quotient)
+            return self._wrap_i32(left - right * quotient)
+        return None
+
+    def _simplify(self, ctx, op, left_expr, right_expr, left_value, right_value):
+        result_type = ctx.type
+
+        def replace_with(expr):
+            if expr.type != result_type:
+                return
+            ctx.replacement = expr
+            self.simplified_count += 1
+
+        if op == GrammarMathPLParser.POW:
+            if right_value is None or float(right_value) != int(right_value):
+                return
+            exponent = int(right_value)
+            if exponent == 0 and not self._has_side_effects(left_expr):
+                self._fold(ctx, 1.0)
+            elif 1 <= exponent <= self.MAX_POW_CHAIN:
+                ctx.pow_exponent = exponent
+                self.reduced_pow_count += 1
+            return
+
+        if op == GrammarMathPLParser.PLUS:
+            # x + 0.0 is not an identity for x = -0.0, so only integers
+            if result_type != types.INT:
+                return
+            if right_value == 0:
+                replace_with(left_expr)
+            elif left_value == 0:
+                replace_with(right_expr)
+        elif op == GrammarMathPLParser.MINUS:
+            if right_value == 0:
+                replace_with(left_expr)
+        elif op == GrammarMathPLParser.MUL:
+            if right_value == 1:
+                replace_with(left_expr)
+            elif left_value == 1:
+                replace_with(right_expr)
+            elif result_type == types.INT:
+                if right_value == 0 and not self._has_side_effects(left_expr):
+                    self._fold(ctx, 0)
+                elif left_value == 0 and not self._has_side_effects(right_expr):
+                    self._fold(ctx, 0)
+        elif op == GrammarMathPLParser.DIV:
+            if right_value == 1:
+                replace_with(left_expr)
@@ -0,0 +1,158 @@
+from antlr4 import ParserRuleContext
+from antlr_generated import GrammarMathPLParser
+
+from . import types
+
+# --- ARRAY OWNERSHIP ---
+
+def owned_arrays(tree, is_temporary) -> set:
+    """
+    Returns the ids of the array variables that own their array, so that the
+    generator can free the old array when the variable is overwritten and,
+    for a local, when its function returns.
+
+    A variable owns its array when:
+
+    * every value stored into it is a fresh allocation (``is_temporary``:
+      ``new``, an array literal, a slice or an element-wise operation) and it
+      is not a parameter;
+    * its pointer never leaves it: every use is indexing, slicing,
+      ``.length``, an operand of an operator, the target of an assignment,
+      ``.append`` or ``.reverse``, the right side of a compound
+      assignment (``c += a`` copies the elements), or an argument of a
+      user function that cannot keep it (see ``_functions_keeping_arguments``);
+    * for a global, it is only stored into by top-level statements, so a
+      function called in the middle of an expression cannot free an array
+      the expression has already loaded.
+    """
+    candidates = set()
+    rejected = set()
+    keeping = _functions_keeping_arguments(tree)
+
+    for node in _walk(tree):
+        if isinstance(node, GrammarMathPLParser.FunctionDefinitionContext) and node.functionInParameters():
+            rejected.update(id(p.symbol_info) for p in node.functionInParameters().ID())
+
+        elif isinstance(node, (GrammarMathPLParser.VariableDeclarationContext,
+                               GrammarMathPLParser.ForInitializerContext)):
+            symbol = getattr(node, 'symbol_info', None)
+            if symbol is not None and isinstance(symbol.type, types.ArrayType):
+                _store(symbol, node, node.expression() is None or is_temporary(node.expression()),
+                       candidates, rejected)
+
+        elif isinstance(node, GrammarMathPLParser.ForUpdateContext):
+            symbol = getattr(node, 'symbol_info', None)
+            if symbol is not None:
+                rejected.add(id(symbol))
+
+        elif isinstance(node, GrammarMathPLParser.AssignmentStatementContext) and node.ASSIGN():
+            symbol = _variable_symbol(node.expression(0))
+            if symbol is not None and isinstance(symbol.type, types.ArrayType):
+                _store(symbol, node, is_temporary(node.expression(1)), candidates, rejected)
+
+        elif isinstance(node, GrammarMathPLParser.ArrayStatementContext) and node.APPEND():
+            symbol = _variable_symbol(node.expression(0))
+            if symbol is not None:
+                _store(symbol, node, True, candidates, rejected)
+
+        elif isinstance(node, GrammarMathPLParser.VariableContext):
+            symbol = getattr(node, 'symbol_info', None)
+            if symbol is not None and isinstance(symbol.type, types.ArrayType) and _escapes(node, keeping):
+                rejected.add(id(symbol))
+
+    return candidates - rejected
+
+
+def _functions_keeping_arguments(tree) -> set:
+    """
+    Returns the names of the user functions whose array arguments may
+    outlive the call. A function can only keep an argument by returning an
+    array, by storing an array into a global variable, or by passing it to
+    a function that keeps it; any other function is done with its arguments
+    when it returns, so passing an owned array to it does not stop the
+    caller from freeing the array later.
+    """
+    definitions = [node for node in _walk(tree)
+                   if isinstance(node, GrammarMathPLParser.FunctionDefinitionContext)]
+    keeping = set()
+    callees = {}
+    for definition in definitions:
+        name = definition.ID().getText()
+        callees[name] = set()
+        if isinstance(definition.symbol_info.return_type, types.ArrayType):
+            keeping.add(name)
+        for node in _walk(definition.block()):
+            if isinstance(node, GrammarMathPLParser.AssignmentStatementContext) and node.ASSIGN():
+                symbol = _variable_symbol(node.expression(0))
+            elif isinstance(node, GrammarMathPLParser.ForUpdateContext) and node.ASSIGN():
+                symbol = getattr(node, 'symbol_info', None)
+            else:
+                if isinstance(node, GrammarMathPLParser.FunctionCallContext) and node.functionArguments():
+                    callees[name].add(node.ID().getText())
+                continue
+            if symbol is not None and symbol.category == types.SymbolCategory.GLOBAL \
+                    and isinstance(symbol.type, types.ArrayType):
+                keeping.add(name)
+
+    changed = True
+    while changed:
+        changed = False
+        for name, called in callees.items():
+            if name not in keeping and called & keeping:
+                keeping.add(name)
+                changed = True
+    return keeping
+
+
+def _walk(node):
+    yield node
+    for i in range(node.getChildCount()):
+        child = node.getChild(i)
+        if isinstance(child, ParserRuleContext):
+            yield from _walk(child)
+
+
+def _variable_symbol(expr):
+    if isinstance(expr, GrammarMathPLParser.ExpressionContext) and expr.atom() \
+            and expr.atom().variable():
+        return getattr(expr.atom().variable(), 'symbol_info', None)
+    return None
+
+
+def _in_function(node) -> bool:
+    while node is not None:
+        if isinstance(node, GrammarMathPLParser.FunctionDefinitionContext):
+            return True
+        node = node.parentCtx
+    return False
+
+
+def _store(symbol, node, fresh: bool, candidates: set, rejected: set):
+    if fresh and not (symbol.category == types.SymbolCategory.GLOBAL and _in_function(node)):
+        candidates.add(id(symbol))
+    else:
+        rejected.add(id(symbol))
+
+
+def _escapes(variable, keeping: set) -> bool:
+    """Can the array pointer read by this use end up somewhere else?"""
+    expr = variable.parentCtx.parentCtx
+    if not isinstance(expr, GrammarMathPLParser.ExpressionContext):
+        return True  # (T[]) c
+    # (c) is still c
+    while isinstance(expr.parentCtx, GrammarMathPLParser.AtomContext) and expr.parentCtx.LPAREN() \
+            and isinstance(expr.parentCtx.parentCtx, GrammarMathPLParser.ExpressionContext):
+        expr = expr.parentCtx.parentCtx
+    parent = expr.parentCtx
+
+    if isinstance(parent, GrammarMathPLParser.ExpressionContext):
+        if parent.LBRACK() or (parent.DOT() and parent.LENGTH()):
+            return parent.expression(0) is not expr
+        return len(parent.expression()) != 2
+    if isinstance(parent, GrammarMathPLParser.AssignmentStatementContext):
+        return parent.ASSIGN() is not None and parent.expression(1) is expr
+    if isinstance(parent, GrammarMathPLParser.ArrayStatementContext):
+        return parent.expression(0) is not expr
+    if isinstance(parent, GrammarMathPLParser.FunctionArgumentsContext):
+        return parent.parentCtx.ID().getText() in keeping
+    return True
@@ -0,0 +1,143 @@
+"""Peephole optimizer over the flat instruction lists of a ``WatModule``.
+
+The generator emits straightforward stack code; the rewrites below clean up
+the most common redundant sequences it produces:
+
+* ``local.set $x; local.get $x``          -> ``local.tee $x``
+* ``local.tee $x; drop``                  -> ``local.set $x``
+* ``local.get $x; drop``                  -> (removed)
+* ``i32.const 2^k; i32.mul``              -> ``i32.const k; i32.shl``
+* ``i32.const N; i32.add; T.load offset=M`` -> ``T.load offset=M+N``
+  (also through a pure index term, ``base + N + i*4``, and for stores
+  whose value is a pure expression)
+
+Structured control flow stays as ``block``/``loop``/``if``/``else``/``end``
+markers in the list, so no pattern ever spans a branch target.
+"""
+
+from .wat_ir import Instruction, WatFunction, WatModule
+
+MAX_OFFSET = 2**32 - 1
+# How far back a pure operand is searched for when folding offsets.
+MAX_PURE_SPAN = 8
+
+# op -> (values popped, values pushed) for side-effect free instructions
+_PURE_OPS = {
+    "local.get": (0, 1),
+    "global.get": (0, 1),
+    "i32.const": (0, 1),
+    "f64.const": (0, 1),
+}
+for _op in ("add", "sub", "mul", "shl", "shr_s", "shr_u", "and", "or", "xor"):
+    _PURE_OPS[f"i32.{_op}"] = (2, 1)
+for _op in ("add", "sub", "mul", "div", "min", "max"):
+    _PURE_OPS[f"f64.{_op}"] = (2, 1)
+for _op in ("neg", "abs", "sqrt", "convert_i32_s"):
+    _PURE_OPS[f"f64.{_op}"] = (1, 1)
+
+
+def _power_of_two(value: int) -> int | None:
+    if value > 1 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+def _const_value(instr: Instruction) -> int | None:
+    if instr.op != "i32.const":
+        return None
+    return int(instr.args[0], 0)
+
+
+def _pure_span_start(body: list, end: int) -> int | None:
+    """Start index of the shortest pure sequence ending at ``end`` that
+    pushes exactly one value without consuming anything below it."""
+    needed = 1
+    index = end
+    while index >= 0 and end - index < MAX_PURE_SPAN:
+        effect = _PURE_OPS.get(body[index].op)
+        if effect is None:
+            return None
+        pops, pushes = effect
+        needed += pops - pushes
+        if needed == 0:
+            return index
+        index -= 1
+    return None
+
+
+def _fold_offset(body: list, pos: int) -> bool:
+    """Moves a constant address addend into the offset of the access at ``pos``."""
+    access = body[pos]
+    address_end = pos - 1
+    if ".store" in access.op:
+        value_start = _pure_span_start(body, pos - 1)
+        if value_start is None:
+            return False
+        address_end = value_start - 1
+
+    if address_end < 1 or body[address_end].op != "i32.add":
+        return False
+
+    # base + N
+    addend = _const_value(body[address_end - 1])
+    if addend is not None:
+        remove = (address_end - 1, address_end)
+    else:
+        # (base + N) + term
+        term_start = _pure_span_start(body, address_end - 1)
+        if term_start is None or term_start < 2 or body[term_start - 1].op != "i32.add":
+            return False
+        addend = _const_value(body[term_start - 2])
+        if addend is None:
+            return False
+        remove = (term_start - 2, term_start - 1)
+
+    offset = access.offset + addend
+    if addend < 0 or offset > MAX_OFFSET:
+        return False
+    body[pos] = access.with_offset(offset)
+    for index in reversed(remove):
+        del body[index]
+    return True
+
+
+def _rewrite_at(body: list, pos: int) -> bool:
+    instr = body[pos]
+    nxt = body[pos + 1] if pos + 1 < len(body) else None
+
+    if nxt is not None:
+        if instr.op == "local.set" and nxt.op == "local.get" and instr.args == nxt.args:
+            body[pos:pos + 2] = [Instruction("local.tee", instr.args)]
+            return True
+        if instr.op == "local.tee" and nxt.op == "drop":
+            body[pos:pos + 2] = [Instruction("local.set", instr.args)]
+            return True
+        if instr.op == "local.get" and nxt.op == "drop":
+            del body[pos:pos + 2]
+            return True
+        if nxt.op == "i32.mul":
+            shift = _power_of_two(_const_value(instr) or 0)
+            if shift is not None:
+                body[pos:pos + 2] = [Instruction("i32.const", [str(shift)]), Instruction("i32.shl")]
+                return True
+
+    return instr.is_memory_access and _fold_offset(body, pos)
+
+
+def optimize_function(func: WatFunction) -> int:
+    """Rewrites ``func.body`` in place and returns the number of instructions removed."""
+    body = func.body
+    before = len(body)
+    pos = 0
+    while pos < len(body):
+        if _rewrite_at(body, pos):
+            # A rewrite can complete a pattern that starts a little earlier.
+            pos = max(0, pos - MAX_PURE_SPAN - 2)
+        else:
+            pos += 1
+    return before - len(body)
+
+
+def optimize_module(module: WatModule) -> dict:
+    """Runs the peephole pass over every function; returns ``{name: removed}``."""
+    return {func.name: optimize_function(func) for func in module.functions}
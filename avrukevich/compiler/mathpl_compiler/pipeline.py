@@ -1,24 +1,64 @@
 import os
-import subprocess
-import shutil
 
 from antlr4 import FileStream, CommonTokenStream
 from antlr_generated import GrammarMathPLLexer, GrammarMathPLParser
 
 from .analyzer import MathPLSemanticAnalyzer
+from .cache import CompilationCache, cache_key, DEFAULT_LIMIT_BYTES
+from .inlining import DEFAULT_THRESHOLD as DEFAULT_INLINE_THRESHOLD
+from .optimizer import MathPLOptimizer
+from .range_analysis import MathPLRangeAnalyzer
 from .utils import MathPLErrorListener
+from .wasm_encoder import encode_module, WasmEncodeError
 from .wat_generator import WatCodeGenerator
 
 
-def compile_source(file_path: str, output_dir: str | None = None, to_wasm: bool = False) -> bool:
+def compile_source(
+    file_path: str,
+    output_dir: str | None = None,
+    to_wasm: bool = False,
+    keep_wat: bool = False,
+    simd_kernels: bool = True,
+    optimize: bool = True,
+    peephole: bool = True,
+    fuse_arrays: bool = True,
+    tree_shake: bool = True,
+    native_math: bool = False,
+    inline_threshold: int = DEFAULT_INLINE_THRESHOLD,
+    use_cache: bool = True,
+    cache_dir: str | None = None,
+    cache_limit: int = DEFAULT_LIMIT_BYTES
+) -> bool:
     try:
         input_stream = FileStream(file_path, encoding="utf-8")
+        with open(file_path, 'rb') as f:
+            source = f.read()
     except FileNotFoundError:
         print(f"Error: File not found at '{file_path}'")
         return False
     except Exception as e:
         print(f"Error: {e} while reading file")
         return False
+
+    compilation_cache = None
+    if use_cache:
+        options = {
+            "to_wasm": to_wasm,
+            "keep_wat": keep_wat,
+            "simd_kernels": simd_kernels,
+            "optimize": optimize,
+            "peephole": peephole,
+            "fuse_arrays": fuse_arrays,
+            "tree_shake": tree_shake,
+            "native_math": native_math,
+            "inline_threshold": inline_threshold,
+        }
+        compilation_cache = CompilationCache(cache_dir, cache_limit)
+        key = cache_key(source, options)
+        artifacts = compilation_cache.lookup(key)
+        if artifacts is not None:
+            print(f"Cache hit for: {file_path}")
+            return _write_artifacts(file_path, output_dir, artifacts)
     
     error_listener = MathPLErrorListener()
     lexer = GrammarMathPLLexer(input_stream)
@@ -49,71 +89,105 @@ def compile_source(file_path: str, output_dir: str | None = None, to_wasm: bool
         return False
     print("Semantic analysis successful.")
 
-    print(f"Starting WAT code generation...")
-    code_generator = WatCodeGenerator(analyzer)
-    wat_code = code_generator.visit(tree)
+    if optimize:
+        print(f"Starting optimization pass...")
+        optimizer = MathPLOptimizer(analyzer)
+        optimizer.visit(tree)
+        print(
+            f"Optimization finished: {optimizer.folded_count} constant(s) folded, "
+            f"{optimizer.reduced_pow_count} power(s) reduced, "
+            f"{optimizer.simplified_count} identity(ies) simplified."
+        )
+        range_analyzer = MathPLRangeAnalyzer(analyzer)
+        range_analyzer.visit(tree)
+        print(f"Range analysis: bounds checks removed from {range_analyzer.eliminated_count} array access(es).")
 
+    print(f"Starting WAT code generation...")
+    code_generator = WatCodeGenerator(
+        analyzer, simd_kernels=simd_kernels, peephole=peephole,
+        fuse_arrays=fuse_arrays, tree_shake=tree_shake, native_math=native_math,
+        inline_threshold=inline_threshold
+    )
     try:
-        base_name = os.path.basename(file_path)
-        file_name_no_ext = os.path.splitext(base_name)[0]
+        wat_code = code_generator.visit(tree)
+    except WasmEncodeError as e:
+        # Tree shaking measures the module through the binary encoder
+        print(f"\n[ERROR] Could not encode the module: {e}")
+        return False
+
+    if fuse_arrays:
+        print(f"Array fusion: {code_generator.fused_count} array expression(s) emitted as a single loop.")
+
+    if inline_threshold > 0:
+        print(f"Inlining: {len(code_generator.inlined_calls)} call site(s) inlined.")
+        for site in code_generator.inlined_calls:
+            print(f"  line {site.line}:{site.column} in {site.caller}: {site.callee} ({site.size} instruction(s))")
+
+    if tree_shake:
+        report = code_generator.shake_report
+        print(
+            f"Tree shaking removed {len(report.imports)} import(s), {len(report.functions)} function(s), "
+            f"{len(report.globals)} global(s) and {len(report.data)} data segment(s): "
+            f"{report.bytes_saved} byte(s) of .wasm saved."
+        )
+
+    if peephole:
+        report = code_generator.peephole_report
+        print(f"Peephole pass removed {sum(report.values())} instruction(s).")
+        for func_name, removed in report.items():
+            if removed:
+                print(f"  {func_name}: -{removed}")
+
+    artifacts = {}
+    if not to_wasm or keep_wat:
+        artifacts[".wat"] = wat_code.encode("utf-8")
+    if to_wasm:
+        print(f"Encoding binary WASM...")
+        try:
+            artifacts[".wasm"] = encode_module(code_generator.module)
+        except WasmEncodeError as e:
+            print(f"\n[ERROR] Could not encode the module: {e}")
+            return False
+
+    if not _write_artifacts(file_path, output_dir, artifacts):
+        return False
+
+    if compilation_cache is not None:
+        try:
+            compilation_cache.store(key, artifacts)
+        except OSError as e:
+            print(f"Warning: could not update the compilation cache: {e}")
 
+    return True
+
+
+def output_stem(file_path: str, output_dir: str | None) -> str:
+    """Path of the artifacts of ``file_path`` without the extension."""
+    file_name_no_ext = os.path.splitext(os.path.basename(file_path))[0]
+    target_dir = output_dir or os.path.dirname(file_path) or "."
+    return os.path.join(target_dir, file_name_no_ext)
+
+
+def _write_artifacts(file_path: str, output_dir: str | None, artifacts: dict) -> bool:
+    try:
+        stem = output_stem(file_path, output_dir)
         if output_dir:
-            target_dir = output_dir
-            os.makedirs(target_dir, exist_ok=True)
-        else:
-            target_dir = os.path.dirname(file_path) or "."
-
-        wat_output_path = os.path.join(target_dir, f"{file_name_no_ext}.wat")
-
-        with open(wat_output_path, 'w', encoding='utf-8') as f:
-            f.write(wat_code)
-        print(f"Generated WAT: '{wat_output_path}'")
-
-        if to_wasm:
-                wasm_output_path = os.path.join(target_dir, f"{file_name_no_ext}.wasm")
-                print(f"Compiling to binary WASM...")
-                
-                executable = shutil.which("wat2wasm")
-
-                if executable is None:
-                    current_dir = os.getcwd()
-                    module_dir = os.path.dirname(os.path.abspath(__file__))
-                    
-                    exe_name = "wat2wasm.exe" if os.name == 'nt' else "wat2wasm"
-                    
-                    potential_paths = [
-                        os.path.join(current_dir, exe_name),
-                        os.path.join(module_dir, exe_name),
-                        os.path.join(current_dir, "bin", exe_name)
-                    ]
-                    
-                    for path in potential_paths:
-                        if os.path.isfile(path):
-                            executable = path
-                            break
-
-                if executable is None:
-                    print("\n[ERROR] Could not find 'wat2wasm'.")
-                    print("Please install WABT (The WebAssembly Binary Toolkit) and add it to your PATH.")
-                    print("Download: https://github.com/WebAssembly/wabt/releases")
-                    return True
-
-                try:
-                    cmd = [executable, wat_output_path, "-o", wasm_output_path]
-                    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    print(f"Successfully compiled: '{wasm_output_path}'")
-                    
-                except subprocess.CalledProcessError as e:
-                    print(f"\n[ERROR] wat2wasm failed with exit code {e.returncode}.")
-                    # Вывод stderr может помочь понять, почему wat2wasm упал (например, синтаксическая ошибка в WAT)
-                    print(e.stderr.decode('utf-8'))
-                    return False
-                except Exception as e:
-                    print(f"[ERROR] Unexpected error running wat2wasm: {e}")
-                    return False
+            os.makedirs(output_dir, exist_ok=True)
+
+        if ".wat" in artifacts:
+            wat_output_path = f"{stem}.wat"
+            with open(wat_output_path, 'wb') as f:
+                f.write(artifacts[".wat"])
+            print(f"Generated WAT: '{wat_output_path}'")
+
+        if ".wasm" in artifacts:
+            wasm_output_path = f"{stem}.wasm"
+            with open(wasm_output_path, 'wb') as f:
+                f.write(artifacts[".wasm"])
+            print(f"Successfully compiled: '{wasm_output_path}'")
 
     except Exception as e:
         print(f"Error writing output file: {e}")
         return False
 
-    return True
\ No newline at end of file
+    return True
@@ -0,0 +1,221 @@
+from antlr4 import ParserRuleContext
+from antlr_generated import GrammarMathPLVisitor, GrammarMathPLParser
+
+from .analyzer import MathPLSemanticAnalyzer
+from . import types
+
+# --- RANGE ANALYSIS ---
+
+class MathPLRangeAnalyzer(GrammarMathPLVisitor):
+    """
+    Finds array reads and writes ``a[i]`` inside counted loops where the index
+    is provably in ``[0, a.length)`` and marks them with ``in_bounds = True``,
+    so the generator skips ``$normalize_index`` and ``$check_bounds``.  For a
+    two-dimensional ``m`` the row views ``m[i]`` are marked the same way.
+
+    A loop qualifies when:
+
+    * its condition is ``i < a.length`` (or ``i <= a.length - 1``) for an int
+      variable ``i`` and an array variable ``a``;
+    * ``i`` starts at a non-negative constant and only grows by a positive
+      constant step: ``for (int i = 0; ...; i++)`` / ``i += c``, or a
+      ``while`` preceded by ``int i = c;`` / ``i = c;`` whose body steps
+      ``i`` in top-level statements only;
+    * neither ``i`` nor ``a`` is assigned elsewhere in the loop (``a.append``
+      only grows the array and is allowed), and when either is a global the
+      loop calls no user functions.
+
+    In a ``while`` body only the accesses that come before the first step of
+    ``i`` are marked.  Array lengths stay far below 2^30 elements, so the
+    steps cannot overflow before the condition fails.
+    """
+
+    MAX_STEP = 2**30
+
+    def __init__(self, analyzer: MathPLSemanticAnalyzer) -> None:
+        self.analyzer = analyzer
+        self.eliminated_count = 0
+
+    # --- tree helpers ---
+
+    @staticmethod
+    def _walk(node):
+        yield node
+        for i in range(node.getChildCount()):
+            child = node.getChild(i)
+            if isinstance(child, ParserRuleContext):
+                yield from MathPLRangeAnalyzer._walk(child)
+
+    @staticmethod
+    def _variable_symbol(expr):
+        if isinstance(expr, GrammarMathPLParser.ExpressionContext) and expr.atom() \
+                and expr.atom().variable():
+            return getattr(expr.atom().variable(), 'symbol_info', None)
+        return None
+
+    @staticmethod
+    def _int_constant(expr):
+        value = getattr(expr, 'const_value', None)
+        if isinstance(value, int) and expr.type == types.INT:
+            return value
+        return None
+
+    def _length_bound(self, cond):
+        """``i < a.length`` / ``i <= a.length - 1`` -> (i, a) symbols."""
+        if cond is None or len(cond.expression()) != 2:
+            return None
+        index_sym = self._variable_symbol(cond.expression(0))
+        bound = cond.expression(1)
+        if cond.LTE():
+            if not (bound.MINUS() and len(bound.expression()) == 2
+                    and self._int_constant(bound.expression(1)) == 1):
+                return None
+            bound = bound.expression(0)
+        elif not cond.LT():
+            return None
+        if not (bound.DOT() and bound.LENGTH()):
+            return None
+        array_sym = self._variable_symbol(bound.expression(0))
+        if index_sym is None or array_sym is None or index_sym.type != types.INT:
+            return None
+        return index_sym, array_sym
+
+    def _modified_symbols(self, node) -> set:
+        modified = set()
+        for sub in self._walk(node):
+            if isinstance(sub, GrammarMathPLParser.AssignmentStatementContext):
+                target = sub.expression(0)
+            elif isinstance(sub, GrammarMathPLParser.IncDecStatementContext):
+                target = sub.expression()
+            elif isinstance(sub, GrammarMathPLParser.ExpressionContext) and (sub.INC() or sub.DEC()):
+                target = sub.expression(0)
+            elif isinstance(sub, GrammarMathPLParser.ForUpdateContext):
+                symbol = getattr(sub, 'symbol_info', None)
+                if symbol is not None:
+                    modified.add(id(symbol))
+                continue
+            else:
+                continue
+            symbol = self._variable_symbol(target)
+            if symbol is not None:
+                modified.add(id(symbol))
+        return modified
+
+    def _calls_user_functions(self, node) -> bool:
+        for sub in self._walk(node):
+            if isinstance(sub, GrammarMathPLParser.FunctionCallContext) and \
+                    sub.ID().getText() not in self.analyzer.built_in_names:
+                return True
+        return False
+
+    def _positive_step(self, node, index_sym) -> bool:
+        """Is ``node`` (a forUpdate or a statement) ``i++`` / ``++i`` / ``i += c``?"""
+        if isinstance(node, GrammarMathPLParser.StatementContext):
+            if node.incDecStatement():
+                stmt = node.incDecStatement()
+                return stmt.INC() is not None and self._variable_symbol(stmt.expression()) is index_sym
+            if node.assignmentStatement():
+                stmt = node.assignmentStatement()
+                step = self._int_constant(stmt.expression(1))
+                return stmt.PLUS_ASSIGN() is not None and \
+                    self._variable_symbol(stmt.expression(0)) is index_sym and \
+                    step is not None and 0 < step <= self.MAX_STEP
+            return False
+        if getattr(node, 'symbol_info', None) is not index_sym:
+            return False
+        if node.INC():
+            return True
+        if node.PLUS_ASSIGN():
+            step = self._int_constant(node.expression())
+            return step is not None and 0 < step <= self.MAX_STEP
+        return False
+
+    def _mark_accesses(self, node, index_sym, array_sym) -> None:
+        for sub in self._walk(node):
+            # m[i, j] is left alone: the loop proves nothing about j
+            if isinstance(sub, GrammarMathPLParser.ExpressionContext) and sub.LBRACK() \
+                    and not sub.COLON() and not sub.COMMA() \
+                    and self._variable_symbol(sub.expression(0)) is array_sym \
+                    and self._variable_symbol(sub.expression(1)) is index_sym:
+                if not getattr(sub, 'in_bounds', False):
+                    sub.in_bounds = True
+                    self.eliminated_count += 1
+
+    def _loop_is_safe(self, body_nodes, index_sym, array_sym, allowed_steps=()) -> bool:
+        modified = set()
+        for node in body_nodes:
+            if node in allowed_steps:
+                continue
+            modified |= self._modified_symbols(node)
+        if id(index_sym) in modified or id(array_sym) in modified:
+            return False
+        uses_globals = types.SymbolCategory.GLOBAL in (index_sym.category, array_sym.category)
+        if uses_globals and any(self._calls_user_functions(node) for node in body_nodes):
+            return False
+        return True
+
+    # --- loops ---
+
+    def visitForStatement(self, ctx: GrammarMathPLParser.ForStatementContext):
+        self.visitChildren(ctx)
+
+        bound = self._length_bound(ctx.expression())
+        if bound is None:
+            return
+        index_sym, array_sym = bound
+        init = ctx.forInitializer()
+        start = self._int_constant(init.expression())
+        if getattr(init, 'symbol_info', None) is not index_sym or start is None or start < 0:
+            return
+        if ctx.forUpdate() is None or not self._positive_step(ctx.forUpdate(), index_sym):
+            return
+        if not self._loop_is_safe([ctx.block()], index_sym, array_sym):
+            return
+        self._mark_accesses(ctx.block(), index_sym, array_sym)
+
+    def visitWhileStatement(self, ctx: GrammarMathPLParser.WhileStatementContext):
+        self.visitChildren(ctx)
+
+        bound = self._length_bound(ctx.expression())
+        if bound is None:
+            return
+        index_sym, array_sym = bound
+        if not self._starts_non_negative(ctx, index_sym):
+            return
+
+        statements = ctx.block().statement()
+        steps = [stmt for stmt in statements if self._positive_step(stmt, index_sym)]
+        if not steps or not self._loop_is_safe(statements, index_sym, array_sym, allowed_steps=steps):
+            return
+        for stmt in statements:
+            if stmt in steps:
+                break
+            self._mark_accesses(stmt, index_sym, array_sym)
+
+    def _starts_non_negative(self, ctx, index_sym) -> bool:
+        """Is the statement right before the loop ``int i = c;`` / ``i = c;`` with c >= 0?"""
+        statement = ctx.parentCtx
+        parent = statement.parentCtx
+        siblings = [child for child in parent.getChildren()
+                    if isinstance(child, (GrammarMathPLParser.StatementContext,
+                                          GrammarMathPLParser.FunctionDefinitionContext))]
+        position = siblings.index(statement)
+        if position == 0:
+            return False
+        previous = siblings[position - 1]
+        if not isinstance(previous, GrammarMathPLParser.StatementContext):
+            return False
+
+        if previous.variableDeclaration():
+            decl = previous.variableDeclaration()
+            if getattr(decl, 'symbol_info', None) is not index_sym or decl.expression() is None:
+                return False
+            start = self._int_constant(decl.expression())
+        elif previous.assignmentStatement():
+            stmt = previous.assignmentStatement()
+            if not stmt.ASSIGN() or self._variable_symbol(stmt.expression(0)) is not index_sym:
+                return False
+            start = self._int_constant(stmt.expression(1))
+        else:
+            return False
+        return start is not None and start >= 0
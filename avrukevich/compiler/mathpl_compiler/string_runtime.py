@@ -0,0 +1,1487 @@
+"""In-module WAT runtime for strings, number formatting and output.
+
+Strings are laid out as ``[len:i32, utf8 bytes...]``: string literals are
+data segments in this layout and every runtime function allocates its
+result with ``$str_alloc``.  Concatenation copies both operands with
+``memory.copy``, numbers are formatted and parsed without calling the host,
+and ``print`` appends to an output buffer in linear memory.  The buffer is
+handed to the host through ``env.write(ptr, len)`` only when it fills up,
+before ``input`` and at the end of ``_start``; a host that catches a trap
+can call the exported ``flush`` to get the output produced so far.
+
+The functions keep the names of the old ``env`` imports (``$concat``,
+``$i32_to_str``, ``$f64_to_str``, ...), so call sites are unchanged.
+
+``$f64_to_str`` follows JavaScript's ``Number.prototype.toString``: the
+shortest digit string that reads back as the same double, in plain notation
+for decimal exponents -7 < e < 21 and ``d.ddde+X`` otherwise.  Integers
+below 2^53 and all other values in [1e-6, 2^53) are converted exactly,
+using an error-free product with the exact powers of ten up to 1e22.
+Other values use the same search with double-double powers of ten.
+``$str_to_float`` follows ``parseFloat(s) || 0`` with the same arithmetic;
+its results may be off by one unit in the last place only near the
+subnormal range.
+"""
+
+import struct
+
+OUTPUT_BUFFER_SIZE = 4096
+
+# Strings returned by the runtime itself; laid out next to the literals.
+STATIC_STRINGS = ("true", "false", "NaN", "Infinity", "-Infinity")
+# Runtime function -> the static strings whose addresses it returns
+STATIC_STRING_USERS = {
+    "$bool_to_str": ("true", "false"),
+    "$f64_to_str": ("NaN", "Infinity", "-Infinity"),
+}
+
+# 2^53: every integer below it is exactly representable in f64
+_EXACT_INT_LIMIT = "9007199254740992"
+# 10^18: the mantissa accumulator keeps at most 19 significant digits
+_MANTISSA_LIMIT = "1000000000000000000"
+# 2^-128 and 2^128: exact range scaling for the double-double search
+_TWO_POW_M128 = "2.938735877055719e-39"
+_TWO_POW_128 = "3.402823669209385e+38"
+# Half the gap between subnormals (2^-1075), scaled by 2^128
+_SUBNORMAL_HALF_GAP = "8.406091369059075e-286"
+# "Infinity" read as a little-endian i64
+_INFINITY_WORD = "0x7974696e69666e49"
+
+
+def string_bytes(text: str) -> bytes:
+    """Returns the in-memory layout of a string constant."""
+    data = text.encode("utf-8")
+    return struct.pack("<i", len(data)) + data
+
+
+def runtime_imports() -> list:
+    """Returns the ``env`` import lines the runtime needs from the host."""
+    return [
+        '(import "env" "write" (func $write (param i32 i32)))',
+        '(import "env" "input" (func $read_input (result i32)))',
+    ]
+
+
+def emit_string_runtime(emit, static_strings: dict, output_buffer: int) -> None:
+    """Emits the runtime through ``emit`` (``WatCodeGenerator._add_line``).
+
+    ``static_strings`` maps every text of ``STATIC_STRINGS`` to its address
+    and ``output_buffer`` is the address of ``OUTPUT_BUFFER_SIZE`` reserved
+    bytes.
+    """
+    emit('(global $out_len (mut i32) (i32.const 0))')
+    # Result of the double-double helpers
+    emit('(global $dd_hi (mut f64) (f64.const 0))')
+    emit('(global $dd_lo (mut f64) (f64.const 0))')
+    _emit_str_alloc(emit)
+    _emit_concat(emit)
+    _emit_output(emit, output_buffer)
+    _emit_digits(emit)
+    _emit_i32_to_str(emit)
+    _emit_bool_to_str(emit, static_strings)
+    _emit_powers(emit)
+    _emit_double_double(emit)
+    _emit_format_decimal(emit)
+    _emit_f64_to_str(emit, static_strings)
+    _emit_skip_space(emit)
+    _emit_str_to_int(emit)
+    _emit_decimal_to_f64(emit)
+    _emit_str_to_float(emit)
+
+
+def _emit_str_alloc(emit) -> None:
+    emit('(func $str_alloc (param $len i32) (result i32)', 1)
+    emit('(local $ptr i32)')
+    emit('local.get $len')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('call $malloc')
+    emit('local.tee $ptr')
+    emit('local.get $len')
+    emit('i32.store')
+    emit('local.get $ptr')
+    emit(')', -1)
+    emit('(export "str_alloc" (func $str_alloc))')
+
+
+def _emit_concat(emit) -> None:
+    emit('(func $concat (param $a i32) (param $b i32) (result i32)', 1)
+    emit('(local $len_a i32) (local $len_b i32) (local $dst i32)')
+    # Strings are immutable, so an empty operand needs no copy
+    emit('local.get $a')
+    emit('i32.load')
+    emit('local.tee $len_a')
+    emit('i32.eqz')
+    emit('(if (then local.get $b return))')
+    emit('local.get $b')
+    emit('i32.load')
+    emit('local.tee $len_b')
+    emit('i32.eqz')
+    emit('(if (then local.get $a return))')
+    emit('local.get $len_a')
+    emit('local.get $len_b')
+    emit('i32.add')
+    emit('call $str_alloc')
+    emit('local.tee $dst')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $a')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $len_a')
+    emit('memory.copy')
+    emit('local.get $dst')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $len_a')
+    emit('i32.add')
+    emit('local.get $b')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $len_b')
+    emit('memory.copy')
+    emit('local.get $dst')
+    emit(')', -1)
+
+
+def _emit_output(emit, output_buffer: int) -> None:
+    emit('(func $flush', 1)
+    emit('global.get $out_len')
+    emit('i32.eqz')
+    emit('(if (then return))')
+    emit(f'i32.const {output_buffer}')
+    emit('global.get $out_len')
+    emit('call $write')
+    emit('i32.const 0')
+    emit('global.set $out_len')
+    emit(')', -1)
+    emit('(export "flush" (func $flush))')
+
+    # Each printed string is followed by a newline
+    emit('(func $print (param $s i32)', 1)
+    emit('(local $len i32)')
+    emit('local.get $s')
+    emit('i32.load')
+    emit('local.tee $len')
+    emit('global.get $out_len')
+    emit('i32.add')
+    emit(f'i32.const {OUTPUT_BUFFER_SIZE}')
+    emit('i32.ge_u')
+    emit('(if (then call $flush))')
+    emit('local.get $len')
+    emit(f'i32.const {OUTPUT_BUFFER_SIZE}')
+    emit('i32.ge_u')
+    emit('(if (then', 1)
+    # Too long for the buffer: hand it over directly
+    emit('local.get $s')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $len')
+    emit('call $write')
+    emit(') (else', 0)
+    emit('global.get $out_len')
+    emit(f'i32.const {output_buffer}')
+    emit('i32.add')
+    emit('local.get $s')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $len')
+    emit('memory.copy')
+    emit('global.get $out_len')
+    emit('local.get $len')
+    emit('i32.add')
+    emit('global.set $out_len')
+    emit('))', -1)
+    emit('global.get $out_len')
+    emit('i32.const 10')
+    emit(f'i32.store8 offset={output_buffer}')
+    emit('global.get $out_len')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('global.set $out_len')
+    emit(')', -1)
+
+    # The host may show a prompt, so everything printed so far goes first
+    emit('(func $input (result i32)', 1)
+    emit('call $flush')
+    emit('call $read_input')
+    emit(')', -1)
+
+
+def _emit_digits(emit) -> None:
+    emit('(func $count_digits (param $n i64) (result i32)', 1)
+    emit('(local $count i32)')
+    emit('i32.const 1')
+    emit('local.set $count')
+    emit('(block $done (loop $next')
+    emit('local.get $n')
+    emit('i64.const 10')
+    emit('i64.lt_u')
+    emit('br_if $done')
+    emit('local.get $n')
+    emit('i64.const 10')
+    emit('i64.div_u')
+    emit('local.set $n')
+    emit('local.get $count')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $count')
+    emit('br $next')
+    emit('))')
+    emit('local.get $count')
+    emit(')', -1)
+
+    # Writes the decimal digits of $n backwards, ending right before $end
+    emit('(func $store_digits (param $end i32) (param $n i64)', 1)
+    emit('(loop $next')
+    emit('local.get $end')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.tee $end')
+    emit('local.get $n')
+    emit('i64.const 10')
+    emit('i64.rem_u')
+    emit('i32.wrap_i64')
+    emit('i32.const 48')
+    emit('i32.add')
+    emit('i32.store8')
+    emit('local.get $n')
+    emit('i64.const 10')
+    emit('i64.div_u')
+    emit('local.tee $n')
+    emit('i64.const 0')
+    emit('i64.ne')
+    emit('br_if $next')
+    emit(')')
+    emit(')', -1)
+
+
+def _emit_i32_to_str(emit) -> None:
+    emit('(func $i32_to_str (param $v i32) (result i32)', 1)
+    emit('(local $n i64) (local $neg i32) (local $len i32) (local $ptr i32)')
+    emit('local.get $v')
+    emit('i64.extend_i32_s')
+    emit('local.set $n')
+    emit('local.get $v')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('local.tee $neg')
+    emit('(if (then i64.const 0 local.get $n i64.sub local.set $n))')
+    emit('local.get $n')
+    emit('call $count_digits')
+    emit('local.get $neg')
+    emit('i32.add')
+    emit('local.tee $len')
+    emit('call $str_alloc')
+    emit('local.tee $ptr')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $len')
+    emit('i32.add')
+    emit('local.get $n')
+    emit('call $store_digits')
+    emit('local.get $neg')
+    emit('(if (then local.get $ptr i32.const 45 i32.store8 offset=4))')
+    emit('local.get $ptr')
+    emit(')', -1)
+
+
+def _emit_bool_to_str(emit, static_strings: dict) -> None:
+    emit('(func $bool_to_str (param $v i32) (result i32)', 1)
+    emit(f'i32.const {static_strings["true"]}')
+    emit(f'i32.const {static_strings["false"]}')
+    emit('local.get $v')
+    emit('select')
+    emit(')', -1)
+
+
+def _emit_powers(emit) -> None:
+    # 10^e for e >= 0 by squaring; exact up to 10^22
+    emit('(func $pow10 (param $e i32) (result f64)', 1)
+    emit('(local $result f64) (local $base f64)')
+    emit('f64.const 1')
+    emit('local.set $result')
+    emit('f64.const 10')
+    emit('local.set $base')
+    emit('(block $done (loop $next')
+    emit('local.get $e')
+    emit('i32.eqz')
+    emit('br_if $done')
+    emit('local.get $e')
+    emit('i32.const 1')
+    emit('i32.and')
+    emit('(if (then local.get $result local.get $base f64.mul local.set $result))')
+    emit('local.get $base')
+    emit('local.get $base')
+    emit('f64.mul')
+    emit('local.set $base')
+    emit('local.get $e')
+    emit('i32.const 1')
+    emit('i32.shr_u')
+    emit('local.set $e')
+    emit('br $next')
+    emit('))')
+    emit('local.get $result')
+    emit(')', -1)
+
+    # $x * 10^$e; correctly rounded for |e| <= 22
+    emit('(func $scale10 (param $x f64) (param $e i32) (result f64)', 1)
+    emit('local.get $e')
+    emit('i32.const 0')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $x')
+    emit('i32.const 0')
+    emit('local.get $e')
+    emit('i32.sub')
+    emit('call $pow10')
+    emit('f64.div')
+    emit('return')
+    emit('))', -1)
+    emit('local.get $x')
+    emit('local.get $e')
+    emit('call $pow10')
+    emit('f64.mul')
+    emit(')', -1)
+
+    # Rounding error of $p = $x * $y (Dekker's product with Veltkamp splitting)
+    emit('(func $mul_error (param $x f64) (param $y f64) (param $p f64) (result f64)', 1)
+    emit('(local $x_hi f64) (local $x_lo f64) (local $y_hi f64) (local $y_lo f64)')
+    for name in ("x", "y"):
+        emit(f'local.get ${name}')
+        emit('f64.const 134217729')
+        emit('f64.mul')
+        emit(f'local.tee ${name}_hi')
+        emit(f'local.get ${name}_hi')
+        emit(f'local.get ${name}')
+        emit('f64.sub')
+        emit('f64.sub')
+        emit(f'local.set ${name}_hi')
+        emit(f'local.get ${name}')
+        emit(f'local.get ${name}_hi')
+        emit('f64.sub')
+        emit(f'local.set ${name}_lo')
+    emit('local.get $x_hi')
+    emit('local.get $y_hi')
+    emit('f64.mul')
+    emit('local.get $p')
+    emit('f64.sub')
+    emit('local.get $x_hi')
+    emit('local.get $y_lo')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.get $x_lo')
+    emit('local.get $y_hi')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.get $x_lo')
+    emit('local.get $y_lo')
+    emit('f64.mul')
+    emit('f64.add')
+    emit(')', -1)
+
+
+def _emit_double_double(emit) -> None:
+    # (x_hi + x_lo) * (y_hi + y_lo) into $dd_hi + $dd_lo
+    emit('(func $mul_dd (param $x_hi f64) (param $x_lo f64) (param $y_hi f64) (param $y_lo f64)', 1)
+    emit('(local $p f64) (local $e f64)')
+    emit('local.get $x_hi')
+    emit('local.get $y_hi')
+    emit('local.get $x_hi')
+    emit('local.get $y_hi')
+    emit('f64.mul')
+    emit('local.tee $p')
+    emit('call $mul_error')
+    emit('local.get $x_hi')
+    emit('local.get $y_lo')
+    emit('f64.mul')
+    emit('local.get $x_lo')
+    emit('local.get $y_hi')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('f64.add')
+    emit('local.set $e')
+    emit('local.get $p')
+    emit('local.get $e')
+    emit('f64.add')
+    emit('global.set $dd_hi')
+    emit('local.get $e')
+    emit('global.get $dd_hi')
+    emit('local.get $p')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('global.set $dd_lo')
+    emit(')', -1)
+
+    # 10^e (e <= 308) into $dd_hi + $dd_lo; exact up to 10^22
+    emit('(func $pow10_dd (param $e i32)', 1)
+    emit('(local $hi f64) (local $lo f64) (local $base_hi f64) (local $base_lo f64)')
+    emit('f64.const 1')
+    emit('local.set $hi')
+    emit('f64.const 10')
+    emit('local.set $base_hi')
+    emit('(block $done (loop $next', 1)
+    emit('local.get $e')
+    emit('i32.const 1')
+    emit('i32.and')
+    emit('(if (then', 1)
+    emit('local.get $hi')
+    emit('local.get $lo')
+    emit('local.get $base_hi')
+    emit('local.get $base_lo')
+    emit('call $mul_dd')
+    emit('global.get $dd_hi')
+    emit('local.set $hi')
+    emit('global.get $dd_lo')
+    emit('local.set $lo')
+    emit('))', -1)
+    emit('local.get $e')
+    emit('i32.const 1')
+    emit('i32.shr_u')
+    emit('local.tee $e')
+    emit('i32.eqz')
+    emit('br_if $done')
+    emit('local.get $base_hi')
+    emit('local.get $base_lo')
+    emit('local.get $base_hi')
+    emit('local.get $base_lo')
+    emit('call $mul_dd')
+    emit('global.get $dd_hi')
+    emit('local.set $base_hi')
+    emit('global.get $dd_lo')
+    emit('local.set $base_lo')
+    emit('br $next')
+    emit('))', -1)
+    emit('local.get $hi')
+    emit('global.set $dd_hi')
+    emit('local.get $lo')
+    emit('global.set $dd_lo')
+    emit(')', -1)
+
+    # $n * ($p_hi + $p_lo) - $target, for an n of up to 19 digits
+    emit('(func $product_error (param $n i64) (param $p_hi f64) (param $p_lo f64) (param $target f64) (result f64)', 1)
+    emit('(local $n_hi f64)')
+    emit('local.get $n')
+    emit('f64.convert_i64_u')
+    emit('local.tee $n_hi')
+    emit('local.get $n')
+    emit('local.get $n_hi')
+    emit('i64.trunc_f64_u')
+    emit('i64.sub')
+    emit('f64.convert_i64_s')
+    emit('local.get $p_hi')
+    emit('local.get $p_lo')
+    emit('call $mul_dd')
+    emit('global.get $dd_hi')
+    emit('local.get $target')
+    emit('f64.sub')
+    emit('global.get $dd_lo')
+    emit('f64.add')
+    emit(')', -1)
+
+
+def _emit_format_decimal(emit) -> None:
+    # Formats [-]$n * 10^-$k. Layouts: 0 - digits and zeros ("1200"),
+    # 1 - digits around a point ("12.5"), 2 - leading zeros ("0.0012"),
+    # 3 - exponent ("1.2e+21", "1e-7").
+    emit('(func $format_decimal (param $neg i32) (param $n i64) (param $k i32) (result i32)', 1)
+    emit('(local $digits i32) (local $point i32) (local $exp i32) (local $layout i32)')
+    emit('(local $len i32) (local $ptr i32) (local $base i32)')
+    emit('(block $done (loop $strip')
+    emit('local.get $n')
+    emit('i64.eqz')
+    emit('br_if $done')
+    emit('local.get $n')
+    emit('i64.const 10')
+    emit('i64.rem_u')
+    emit('i64.const 0')
+    emit('i64.ne')
+    emit('br_if $done')
+    emit('local.get $n')
+    emit('i64.const 10')
+    emit('i64.div_u')
+    emit('local.set $n')
+    emit('local.get $k')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $k')
+    emit('br $strip')
+    emit('))')
+    # $point: position of the decimal point relative to the first digit
+    emit('local.get $n')
+    emit('call $count_digits')
+    emit('local.tee $digits')
+    emit('local.get $k')
+    emit('i32.sub')
+    emit('local.set $point')
+
+    emit('i32.const 3')
+    emit('local.set $layout')
+    emit('local.get $point')
+    emit('i32.const 21')
+    emit('i32.le_s')
+    emit('(if (then', 1)
+    emit('local.get $point')
+    emit('i32.const -6')
+    emit('i32.gt_s')
+    emit('(if (then i32.const 2 local.set $layout))')
+    emit('local.get $point')
+    emit('i32.const 0')
+    emit('i32.gt_s')
+    emit('(if (then i32.const 1 local.set $layout))')
+    emit('local.get $point')
+    emit('local.get $digits')
+    emit('i32.ge_s')
+    emit('(if (then i32.const 0 local.set $layout))')
+    emit('))', -1)
+
+    emit('local.get $layout')
+    emit('i32.const 0')
+    emit('i32.eq')
+    emit('(if (then local.get $point local.set $len))')
+    emit('local.get $layout')
+    emit('i32.const 1')
+    emit('i32.eq')
+    emit('(if (then local.get $digits i32.const 1 i32.add local.set $len))')
+    emit('local.get $layout')
+    emit('i32.const 2')
+    emit('i32.eq')
+    emit('(if (then i32.const 2 local.get $point i32.sub local.get $digits i32.add local.set $len))')
+    emit('local.get $layout')
+    emit('i32.const 3')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $point')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('local.set $exp')
+    emit('local.get $digits')
+    emit('local.get $digits')
+    emit('i32.const 1')
+    emit('i32.gt_s')
+    emit('i32.add')
+    emit('i32.const 2')
+    emit('i32.add')
+    emit('local.get $exp')
+    emit('local.get $exp')
+    emit('i32.const 31')
+    emit('i32.shr_s')
+    emit('local.tee $k')
+    emit('i32.xor')
+    emit('local.get $k')
+    emit('i32.sub')
+    emit('local.tee $exp')
+    emit('i64.extend_i32_u')
+    emit('call $count_digits')
+    emit('i32.add')
+    emit('local.set $len')
+    emit('))', -1)
+
+    emit('local.get $len')
+    emit('local.get $neg')
+    emit('i32.add')
+    emit('call $str_alloc')
+    emit('local.tee $ptr')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.get $neg')
+    emit('i32.add')
+    emit('local.set $base')
+    emit('local.get $neg')
+    emit('(if (then local.get $ptr i32.const 45 i32.store8 offset=4))')
+
+    emit('local.get $layout')
+    emit('i32.const 2')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $base')
+    emit('i32.const 48')
+    emit('i32.store8')
+    emit('local.get $base')
+    emit('i32.const 46')
+    emit('i32.store8 offset=1')
+    emit('local.get $base')
+    emit('i32.const 2')
+    emit('i32.add')
+    emit('i32.const 48')
+    emit('i32.const 0')
+    emit('local.get $point')
+    emit('i32.sub')
+    emit('memory.fill')
+    emit('local.get $base')
+    emit('local.get $len')
+    emit('i32.add')
+    emit('local.get $n')
+    emit('call $store_digits')
+    emit('local.get $ptr')
+    emit('return')
+    emit('))', -1)
+
+    emit('local.get $base')
+    emit('local.get $digits')
+    emit('i32.add')
+    emit('local.get $n')
+    emit('call $store_digits')
+
+    emit('local.get $layout')
+    emit('i32.eqz')
+    emit('(if (then', 1)
+    emit('local.get $base')
+    emit('local.get $digits')
+    emit('i32.add')
+    emit('i32.const 48')
+    emit('local.get $point')
+    emit('local.get $digits')
+    emit('i32.sub')
+    emit('memory.fill')
+    emit('))', -1)
+
+    emit('local.get $layout')
+    emit('i32.const 1')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $base')
+    emit('local.get $point')
+    emit('i32.add')
+    emit('local.tee $k')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.get $k')
+    emit('local.get $digits')
+    emit('local.get $point')
+    emit('i32.sub')
+    emit('memory.copy')
+    emit('local.get $k')
+    emit('i32.const 46')
+    emit('i32.store8')
+    emit('))', -1)
+
+    emit('local.get $layout')
+    emit('i32.const 3')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $digits')
+    emit('i32.const 1')
+    emit('i32.gt_s')
+    emit('(if (then', 1)
+    emit('local.get $base')
+    emit('i32.const 2')
+    emit('i32.add')
+    emit('local.get $base')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.get $digits')
+    emit('i32.const 1')
+    emit('i32.sub')
+    emit('memory.copy')
+    emit('local.get $base')
+    emit('i32.const 46')
+    emit('i32.store8 offset=1')
+    emit('local.get $digits')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $digits')
+    emit('))', -1)
+    emit('local.get $base')
+    emit('local.get $digits')
+    emit('i32.add')
+    emit('local.tee $k')
+    emit('i32.const 101')  # "e"
+    emit('i32.store8')
+    # $point - 1 is the signed exponent, $exp its magnitude
+    emit('local.get $k')
+    emit('i32.const 43')  # "+"
+    emit('i32.const 45')  # "-"
+    emit('local.get $point')
+    emit('i32.const 1')
+    emit('i32.ge_s')
+    emit('select')
+    emit('i32.store8 offset=1')
+    emit('local.get $base')
+    emit('local.get $len')
+    emit('i32.add')
+    emit('local.get $exp')
+    emit('i64.extend_i32_u')
+    emit('call $store_digits')
+    emit('))', -1)
+    emit('local.get $ptr')
+    emit(')', -1)
+
+
+def _emit_f64_to_str(emit, static_strings: dict) -> None:
+    emit('(func $f64_to_str (param $v f64) (result i32)', 1)
+    emit('(local $a f64) (local $neg i32) (local $bits i64) (local $n i64) (local $k i32)')
+    emit('(local $scale f64) (local $hi f64) (local $r f64) (local $frac f64) (local $adj f64) (local $bound f64)')
+    emit('local.get $v')
+    emit('local.get $v')
+    emit('f64.ne')
+    emit(f'(if (then i32.const {static_strings["NaN"]} return))')
+    emit('local.get $v')
+    emit('f64.const 0')
+    emit('f64.lt')
+    emit('local.set $neg')
+    emit('local.get $v')
+    emit('f64.abs')
+    emit('local.tee $a')
+    emit('f64.const inf')
+    emit('f64.eq')
+    emit('(if (then', 1)
+    emit(f'i32.const {static_strings["-Infinity"]}')
+    emit(f'i32.const {static_strings["Infinity"]}')
+    emit('local.get $neg')
+    emit('select')
+    emit('return')
+    emit('))', -1)
+
+    # Integers (and zero) are printed exactly
+    emit('local.get $a')
+    emit(f'f64.const {_EXACT_INT_LIMIT}')
+    emit('f64.lt')
+    emit('local.get $a')
+    emit('f64.floor')
+    emit('local.get $a')
+    emit('f64.eq')
+    emit('i32.and')
+    emit('(if (then', 1)
+    emit('local.get $neg')
+    emit('local.get $a')
+    emit('i64.trunc_f64_u')
+    emit('i32.const 0')
+    emit('call $format_decimal')
+    emit('return')
+    emit('))', -1)
+
+    emit('local.get $a')
+    emit('f64.const 1e-06')
+    emit('f64.lt')
+    emit('local.get $a')
+    emit(f'f64.const {_EXACT_INT_LIMIT}')
+    emit('f64.ge')
+    emit('i32.or')
+    emit('(if (then', 1)
+    emit('local.get $neg')
+    emit('local.get $a')
+    emit('call $f64_to_str_wide')
+    emit('return')
+    emit('))', -1)
+
+    # [1e-6, 2^53): find the smallest k for which round(a * 10^k) / 10^k
+    # reads back as a.  10^k is exact, a * 10^k = hi + error exactly, and
+    # the candidate is accepted when it lies within half the gap to the
+    # neighbouring doubles.
+    emit('local.get $a')
+    emit('i64.reinterpret_f64')
+    emit('local.tee $bits')
+    emit('i64.const 0x7FF0000000000000')
+    emit('i64.and')
+    emit('f64.reinterpret_i64')
+    emit('f64.const 1.1102230246251565e-16')  # 2^-53
+    emit('f64.mul')
+    emit('local.set $bound')
+    emit('f64.const 1')
+    emit('local.set $scale')
+    emit('(block $found (loop $next', 1)
+    emit('local.get $a')
+    emit('local.get $scale')
+    emit('f64.mul')
+    emit('local.tee $hi')
+    emit('f64.nearest')
+    emit('local.set $r')
+    emit('local.get $hi')
+    emit('local.get $r')
+    emit('f64.sub')
+    emit('local.get $a')
+    emit('local.get $scale')
+    emit('local.get $hi')
+    emit('call $mul_error')
+    emit('f64.add')
+    emit('local.tee $frac')
+    emit('f64.nearest')
+    emit('local.set $adj')
+    emit('local.get $r')
+    emit('i64.trunc_f64_u')
+    emit('local.get $adj')
+    emit('i64.trunc_f64_s')
+    emit('i64.add')
+    emit('local.set $n')
+    emit('local.get $adj')
+    emit('local.get $frac')
+    emit('f64.sub')
+    emit('local.get $bound')
+    emit('local.get $scale')
+    emit('f64.mul')
+    emit('local.get $bits')
+    emit('call $within_gap')
+    emit('br_if $found')
+    emit('local.get $k')
+    emit('i32.const 22')
+    emit('i32.ge_s')
+    emit('br_if $found')
+    emit('local.get $k')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $k')
+    emit('local.get $scale')
+    emit('f64.const 10')
+    emit('f64.mul')
+    emit('local.set $scale')
+    emit('br $next')
+    emit('))', -1)
+    emit('local.get $neg')
+    emit('local.get $n')
+    emit('local.get $k')
+    emit('call $format_decimal')
+    emit(')', -1)
+
+    _emit_gap_checks(emit)
+    _emit_f64_to_str_wide(emit)
+
+
+def _emit_gap_checks(emit) -> None:
+    # Whether a candidate $err away from the double with bits $bits reads
+    # back as that double.  A power of two is twice as close to its lower
+    # neighbour (except at the subnormal boundary), and a tie reads back
+    # as the value only when its mantissa is even.
+    emit('(func $within_gap (param $err f64) (param $half f64) (param $bits i64) (result i32)', 1)
+    emit('local.get $err')
+    emit('f64.abs')
+    emit('local.get $half')
+    emit('f64.const 0.5')
+    emit('f64.const 1')
+    emit('local.get $err')
+    emit('f64.const 0')
+    emit('f64.lt')
+    emit('local.get $bits')
+    emit('i64.const 0xFFFFFFFFFFFFF')
+    emit('i64.and')
+    emit('i64.eqz')
+    emit('i32.and')
+    emit('local.get $bits')
+    emit('i64.const 52')
+    emit('i64.shr_u')
+    emit('i64.const 1')
+    emit('i64.gt_u')
+    emit('i32.and')
+    emit('select')
+    emit('f64.mul')
+    emit('local.tee $half')
+    emit('f64.lt')
+    emit('local.get $err')
+    emit('f64.abs')
+    emit('local.get $half')
+    emit('f64.eq')
+    emit('local.get $bits')
+    emit('i64.const 1')
+    emit('i64.and')
+    emit('i64.eqz')
+    emit('i32.and')
+    emit('i32.or')
+    emit(')', -1)
+
+
+def _emit_f64_to_str_wide(emit) -> None:
+    # |a| < 1e-6 or |a| >= 2^53: the same search over 1..17 significant
+    # digits, with 10^s as a double-double.  a is pre-scaled by 2^+-128 so
+    # neither the powers nor the Veltkamp splits overflow or underflow.
+    emit('(func $f64_to_str_wide (param $neg i32) (param $a f64) (result i32)', 1)
+    emit('(local $bits i64) (local $e10 i32) (local $digits i32) (local $s i32) (local $k i32) (local $n i64)')
+    emit('(local $scaled f64) (local $half f64) (local $p_hi f64) (local $p_lo f64)')
+    emit('(local $hi f64) (local $r f64) (local $frac f64) (local $adj f64) (local $err f64)')
+    emit('local.get $a')
+    emit('i64.reinterpret_f64')
+    emit('local.set $bits')
+
+    # Decimal exponent estimate: floor(e2 * log10(2)) is e10 or e10 - 1
+    emit('local.get $bits')
+    emit('i64.const 52')
+    emit('i64.shr_u')
+    emit('i32.wrap_i64')
+    emit('i32.const 1023')
+    emit('i32.sub')
+    emit('local.set $e10')
+    emit('local.get $bits')
+    emit('i64.const 52')
+    emit('i64.shr_u')
+    emit('i64.eqz')
+    emit('(if (then', 1)
+    # Subnormal: normalize first so the exponent bits are meaningful
+    emit('local.get $a')
+    emit('f64.const 18014398509481984')  # 2^54
+    emit('f64.mul')
+    emit('i64.reinterpret_f64')
+    emit('i64.const 52')
+    emit('i64.shr_u')
+    emit('i32.wrap_i64')
+    emit('i32.const 1077')
+    emit('i32.sub')
+    emit('local.set $e10')
+    emit('))', -1)
+    emit('local.get $e10')
+    emit('f64.convert_i32_s')
+    emit('f64.const 0.3010299956639812')  # log10(2)
+    emit('f64.mul')
+    emit('f64.floor')
+    emit('i32.trunc_f64_s')
+    emit('local.set $e10')
+
+    emit('local.get $a')
+    emit(f'f64.const {_TWO_POW_M128}')
+    emit(f'f64.const {_TWO_POW_128}')
+    emit('local.get $a')
+    emit('f64.const 1')
+    emit('f64.ge')
+    emit('select')
+    emit('f64.mul')
+    emit('local.tee $scaled')
+    emit('i64.reinterpret_f64')
+    emit('i64.const 0x7FF0000000000000')
+    emit('i64.and')
+    emit('f64.reinterpret_i64')
+    emit('f64.const 1.1102230246251565e-16')  # 2^-53
+    emit('f64.mul')
+    emit('local.set $half')
+    emit('local.get $bits')
+    emit('i64.const 52')
+    emit('i64.shr_u')
+    emit('i64.eqz')
+    emit(f'(if (then f64.const {_SUBNORMAL_HALF_GAP} local.set $half))')
+
+    emit('i32.const 1')
+    emit('local.set $digits')
+    emit('(block $found (loop $next', 1)
+    # Candidate n * 10^s with $digits significant digits in n
+    emit('local.get $e10')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.get $digits')
+    emit('i32.sub')
+    emit('local.set $s')
+    emit('local.get $a')
+    emit('f64.const 1')
+    emit('f64.ge')
+    emit('(if (then', 1)
+    # Large: n = round(a / 10^s), checked as n * 10^s - a
+    emit('local.get $s')
+    emit('call $pow10_dd')
+    emit('global.get $dd_hi')
+    emit(f'f64.const {_TWO_POW_M128}')
+    emit('f64.mul')
+    emit('local.set $p_hi')
+    emit('global.get $dd_lo')
+    emit(f'f64.const {_TWO_POW_M128}')
+    emit('f64.mul')
+    emit('local.set $p_lo')
+    emit('local.get $scaled')
+    emit('local.get $p_hi')
+    emit('f64.div')
+    emit('f64.nearest')
+    emit('i64.trunc_f64_u')
+    emit('local.set $n')
+    emit('local.get $n')
+    emit('local.get $p_hi')
+    emit('local.get $p_lo')
+    emit('local.get $scaled')
+    emit('call $product_error')
+    emit('local.tee $err')
+    emit('f64.neg')
+    emit('local.get $p_hi')
+    emit('f64.div')
+    emit('f64.nearest')
+    emit('local.tee $adj')
+    emit('f64.const 0')
+    emit('f64.ne')
+    emit('(if (then', 1)
+    emit('local.get $n')
+    emit('local.get $adj')
+    emit('i64.trunc_f64_s')
+    emit('i64.add')
+    emit('local.tee $n')
+    emit('local.get $p_hi')
+    emit('local.get $p_lo')
+    emit('local.get $scaled')
+    emit('call $product_error')
+    emit('local.set $err')
+    emit('))', -1)
+    emit('local.get $err')
+    emit('local.get $half')
+    emit('local.get $bits')
+    emit('call $within_gap')
+    emit('br_if $found')
+    emit(') (else', 0)
+    # Small: n = round(a * 10^-s), split in two products past 10^300
+    emit('local.get $scaled')
+    emit('local.set $p_hi')
+    emit('f64.const 0')
+    emit('local.set $p_lo')
+    emit('i32.const 0')
+    emit('local.get $s')
+    emit('i32.sub')
+    emit('local.tee $k')
+    emit('i32.const 300')
+    emit('i32.gt_s')
+    emit('(if (then', 1)
+    emit('i32.const 300')
+    emit('call $pow10_dd')
+    emit('local.get $p_hi')
+    emit('local.get $p_lo')
+    emit('global.get $dd_hi')
+    emit('global.get $dd_lo')
+    emit('call $mul_dd')
+    emit('global.get $dd_hi')
+    emit('local.set $p_hi')
+    emit('global.get $dd_lo')
+    emit('local.set $p_lo')
+    emit('local.get $k')
+    emit('i32.const 300')
+    emit('i32.sub')
+    emit('local.set $k')
+    emit('))', -1)
+    emit('local.get $k')
+    emit('call $pow10_dd')
+    emit('local.get $p_hi')
+    emit('local.get $p_lo')
+    emit('global.get $dd_hi')
+    emit('global.get $dd_lo')
+    emit('call $mul_dd')
+    emit('global.get $dd_hi')
+    emit(f'f64.const {_TWO_POW_M128}')
+    emit('f64.mul')
+    emit('local.tee $hi')
+    emit('f64.nearest')
+    emit('local.set $r')
+    emit('local.get $hi')
+    emit('local.get $r')
+    emit('f64.sub')
+    emit('global.get $dd_lo')
+    emit(f'f64.const {_TWO_POW_M128}')
+    emit('f64.mul')
+    emit('f64.add')
+    emit('local.tee $frac')
+    emit('f64.nearest')
+    emit('local.set $adj')
+    emit('local.get $r')
+    emit('i64.trunc_f64_u')
+    emit('local.get $adj')
+    emit('i64.trunc_f64_s')
+    emit('i64.add')
+    emit('local.set $n')
+    # The half gap in units of 10^s is |a * 10^-s| * half / scaled
+    emit('local.get $adj')
+    emit('local.get $frac')
+    emit('f64.sub')
+    emit('local.get $hi')
+    emit('local.get $half')
+    emit('local.get $scaled')
+    emit('f64.div')
+    emit('f64.mul')
+    emit('local.get $bits')
+    emit('call $within_gap')
+    emit('br_if $found')
+    emit('))', -1)
+    emit('local.get $digits')
+    emit('i32.const 17')
+    emit('i32.ge_s')
+    emit('br_if $found')
+    emit('local.get $digits')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $digits')
+    emit('br $next')
+    emit('))', -1)
+    emit('local.get $neg')
+    emit('local.get $n')
+    emit('i32.const 0')
+    emit('local.get $s')
+    emit('i32.sub')
+    emit('call $format_decimal')
+    emit(')', -1)
+
+
+def _emit_skip_space(emit) -> None:
+    emit('(func $skip_space (param $pos i32) (param $end i32) (result i32)', 1)
+    emit('(local $char i32)')
+    emit('(block $done (loop $next')
+    emit('local.get $pos')
+    emit('local.get $end')
+    emit('i32.ge_u')
+    emit('br_if $done')
+    emit('local.get $pos')
+    emit('i32.load8_u')
+    emit('local.tee $char')
+    emit('i32.const 32')
+    emit('i32.ne')
+    emit('local.get $char')
+    emit('i32.const 9')
+    emit('i32.sub')
+    emit('i32.const 4')
+    emit('i32.gt_u')
+    emit('i32.and')
+    emit('br_if $done')
+    emit('local.get $pos')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $pos')
+    emit('br $next')
+    emit('))')
+    emit('local.get $pos')
+    emit(')', -1)
+
+
+def _emit_sign(emit) -> None:
+    # Skips an optional sign at $pos; $neg is set for "-"
+    emit('local.get $pos')
+    emit('local.get $end')
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $pos')
+    emit('i32.load8_u')
+    emit('local.tee $char')
+    emit('i32.const 45')
+    emit('i32.eq')
+    emit('local.set $neg')
+    emit('local.get $neg')
+    emit('local.get $char')
+    emit('i32.const 43')
+    emit('i32.eq')
+    emit('i32.or')
+    emit('local.get $pos')
+    emit('i32.add')
+    emit('local.set $pos')
+    emit('))', -1)
+
+
+def _emit_begin_parse(emit) -> None:
+    emit('local.get $s')
+    emit('i32.const 4')
+    emit('i32.add')
+    emit('local.tee $pos')
+    emit('local.get $s')
+    emit('i32.load')
+    emit('i32.add')
+    emit('local.set $end')
+    emit('local.get $pos')
+    emit('local.get $end')
+    emit('call $skip_space')
+    emit('local.set $pos')
+    _emit_sign(emit)
+
+
+def _emit_next_digit(emit, exit_label: str) -> None:
+    # Leaves the digit value in $char, or branches to exit_label
+    emit('local.get $pos')
+    emit('local.get $end')
+    emit('i32.ge_u')
+    emit(f'br_if {exit_label}')
+    emit('local.get $pos')
+    emit('i32.load8_u')
+    emit('i32.const 48')
+    emit('i32.sub')
+    emit('local.tee $char')
+    emit('i32.const 9')
+    emit('i32.gt_u')
+    emit(f'br_if {exit_label}')
+    emit('local.get $pos')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $pos')
+
+
+def _emit_str_to_int(emit) -> None:
+    # parseInt(s, 10) || 0, wrapped to i32
+    emit('(func $str_to_int (param $s i32) (result i32)', 1)
+    emit('(local $pos i32) (local $end i32) (local $neg i32) (local $char i32) (local $value i32)')
+    _emit_begin_parse(emit)
+    emit('(block $done (loop $next')
+    _emit_next_digit(emit, '$done')
+    emit('local.get $value')
+    emit('i32.const 10')
+    emit('i32.mul')
+    emit('local.get $char')
+    emit('i32.add')
+    emit('local.set $value')
+    emit('br $next')
+    emit('))')
+    emit('i32.const 0')
+    emit('local.get $value')
+    emit('i32.sub')
+    emit('local.get $value')
+    emit('local.get $neg')
+    emit('select')
+    emit(')', -1)
+
+
+def _emit_mantissa_digit(emit, fraction: bool) -> None:
+    # Up to 19 significant digits are kept; the rest only move the exponent
+    emit('local.get $mantissa')
+    emit(f'i64.const {_MANTISSA_LIMIT}')
+    emit('i64.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $mantissa')
+    emit('i64.const 10')
+    emit('i64.mul')
+    emit('local.get $char')
+    emit('i64.extend_i32_u')
+    emit('i64.add')
+    emit('local.set $mantissa')
+    if fraction:
+        emit('local.get $exp')
+        emit('i32.const 1')
+        emit('i32.sub')
+        emit('local.set $exp')
+    if not fraction:
+        emit(') (else', 0)
+        emit('local.get $exp')
+        emit('i32.const 1')
+        emit('i32.add')
+        emit('local.set $exp')
+    emit('))', -1)
+    emit('local.get $digits')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $digits')
+
+
+def _emit_str_to_float(emit) -> None:
+    # parseFloat(s) || 0
+    emit('(func $str_to_float (param $s i32) (result f64)', 1)
+    emit('(local $pos i32) (local $end i32) (local $neg i32) (local $char i32)')
+    emit('(local $mantissa i64) (local $digits i32) (local $exp i32) (local $exp_value i32) (local $exp_neg i32)')
+    emit('(local $value f64)')
+    _emit_begin_parse(emit)
+    emit('local.get $end')
+    emit('local.get $pos')
+    emit('i32.sub')
+    emit('i32.const 8')
+    emit('i32.ge_s')
+    emit('(if (then', 1)
+    emit('local.get $pos')
+    emit('i64.load')
+    emit(f'i64.const {_INFINITY_WORD}')
+    emit('i64.eq')
+    emit('(if (then', 1)
+    emit('f64.const -inf')
+    emit('f64.const inf')
+    emit('local.get $neg')
+    emit('select')
+    emit('return')
+    emit('))', -1)
+    emit('))', -1)
+
+    emit('(block $done (loop $next')
+    _emit_next_digit(emit, '$done')
+    _emit_mantissa_digit(emit, fraction=False)
+    emit('br $next')
+    emit('))')
+    emit('local.get $pos')
+    emit('local.get $end')
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $pos')
+    emit('i32.load8_u')
+    emit('i32.const 46')
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $pos')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $pos')
+    emit('(block $done (loop $next')
+    _emit_next_digit(emit, '$done')
+    _emit_mantissa_digit(emit, fraction=True)
+    emit('br $next')
+    emit('))')
+    emit('))', -1)
+    emit('))', -1)
+    emit('local.get $digits')
+    emit('i32.eqz')
+    emit('(if (then f64.const 0 return))')
+
+    # Exponent part; "1e" and "1e+" read as 1
+    emit('local.get $pos')
+    emit('local.get $end')
+    emit('i32.lt_u')
+    emit('(if (then', 1)
+    emit('local.get $pos')
+    emit('i32.load8_u')
+    emit('i32.const 32')
+    emit('i32.or')
+    emit('i32.const 101')  # "e" or "E"
+    emit('i32.eq')
+    emit('(if (then', 1)
+    emit('local.get $neg')
+    emit('local.set $exp_neg')
+    emit('i32.const 0')
+    emit('local.set $neg')
+    emit('local.get $pos')
+    emit('i32.const 1')
+    emit('i32.add')
+    emit('local.set $pos')
+    _emit_sign(emit)
+    # $neg now holds the exponent sign; swap the mantissa sign back
+    emit('local.get $neg')
+    emit('local.get $exp_neg')
+    emit('local.set $neg')
+    emit('local.set $exp_neg')
+    emit('(block $done (loop $next')
+    _emit_next_digit(emit, '$done')
+    emit('local.get $exp_value')
+    emit('i32.const 100000')
+    emit('i32.lt_s')
+    emit('(if (then', 1)
+    emit('local.get $exp_value')
+    emit('i32.const 10')
+    emit('i32.mul')
+    emit('local.get $char')
+    emit('i32.add')
+    emit('local.set $exp_value')
+    emit('))', -1)
+    emit('br $next')
+    emit('))')
+    emit('local.get $exp')
+    emit('i32.const 0')
+    emit('local.get $exp_value')
+    emit('i32.sub')
+    emit('local.get $exp_value')
+    emit('local.get $exp_neg')
+    emit('select')
+    emit('i32.add')
+    emit('local.set $exp')
+    emit('))', -1)
+    emit('))', -1)
+
+    emit('local.get $mantissa')
+    emit('local.get $exp')
+    emit('call $decimal_to_f64')
+    emit('local.tee $value')
+    emit('f64.const 0')
+    emit('f64.eq')
+    emit('(if (then f64.const 0 return))')
+    emit('local.get $value')
+    emit('f64.neg')
+    emit('local.get $value')
+    emit('local.get $neg')
+    emit('select')
+    emit(')', -1)
+
+
+def _emit_decimal_to_f64(emit) -> None:
+    # $n * 10^$e rounded to the nearest double.  The double-double value is
+    # scaled in steps of at most 10^280, so no product or split overflows.
+    emit('(func $decimal_to_f64 (param $n i64) (param $e i32) (result f64)', 1)
+    emit('(local $hi f64) (local $lo f64) (local $p_hi f64) (local $p_lo f64) (local $q f64) (local $step i32)')
+    # n <= 2^53 and |e| <= 22: a single correctly rounded operation
+    emit('local.get $n')
+    emit(f'i64.const {_EXACT_INT_LIMIT}')
+    emit('i64.le_u')
+    emit('local.get $e')
+    emit('i32.const 22')
+    emit('i32.add')
+    emit('i32.const 44')
+    emit('i32.le_u')
+    emit('i32.and')
+    emit('(if (then local.get $n f64.convert_i64_u local.get $e call $scale10 return))')
+    emit('local.get $e')
+    emit('i32.const 400')
+    emit('i32.gt_s')
+    emit('(if (then f64.const inf return))')
+    emit('local.get $e')
+    emit('i32.const -400')
+    emit('i32.lt_s')
+    emit('(if (then f64.const 0 return))')
+    emit('local.get $n')
+    emit('f64.convert_i64_u')
+    emit('local.set $hi')
+    emit('local.get $n')
+    emit('local.get $hi')
+    emit('i64.trunc_f64_u')
+    emit('i64.sub')
+    emit('f64.convert_i64_s')
+    emit('local.set $lo')
+    emit('(block $done (loop $next', 1)
+    emit('local.get $e')
+    emit('i32.eqz')
+    emit('br_if $done')
+    emit('local.get $e')
+    emit('i32.const 0')
+    emit('local.get $e')
+    emit('i32.sub')
+    emit('local.get $e')
+    emit('i32.const 0')
+    emit('i32.gt_s')
+    emit('select')
+    emit('local.tee $step')
+    emit('i32.const 280')
+    emit('local.get $step')
+    emit('i32.const 280')
+    emit('i32.lt_s')
+    emit('select')
+    emit('local.tee $step')
+    emit('call $pow10_dd')
+    emit('global.get $dd_hi')
+    emit('local.set $p_hi')
+    emit('global.get $dd_lo')
+    emit('local.set $p_lo')
+    emit('local.get $e')
+    emit('i32.const 0')
+    emit('i32.gt_s')
+    emit('(if (then', 1)
+    emit('local.get $hi')
+    emit('local.get $p_hi')
+    emit('f64.mul')
+    emit('f64.const inf')
+    emit('f64.eq')
+    emit('(if (then f64.const inf return))')
+    emit('local.get $hi')
+    emit('local.get $lo')
+    emit('local.get $p_hi')
+    emit('local.get $p_lo')
+    emit('call $mul_dd')
+    emit('global.get $dd_hi')
+    emit('local.set $hi')
+    emit('global.get $dd_lo')
+    emit('local.set $lo')
+    emit('local.get $e')
+    emit('local.get $step')
+    emit('i32.sub')
+    emit('local.set $e')
+    emit(') (else', 0)
+    # q = hi / p, corrected by the remainder (hi + lo) - q * p
+    emit('local.get $hi')
+    emit('local.get $p_hi')
+    emit('f64.div')
+    emit('local.tee $q')
+    emit('f64.const 0')
+    emit('local.get $p_hi')
+    emit('local.get $p_lo')
+    emit('call $mul_dd')
+    emit('local.get $hi')
+    emit('global.get $dd_hi')
+    emit('f64.sub')
+    emit('global.get $dd_lo')
+    emit('f64.sub')
+    emit('local.get $lo')
+    emit('f64.add')
+    emit('local.get $p_hi')
+    emit('f64.div')
+    emit('local.set $lo')
+    emit('local.get $q')
+    emit('local.get $lo')
+    emit('f64.add')
+    emit('local.set $hi')
+    emit('local.get $lo')
+    emit('local.get $hi')
+    emit('local.get $q')
+    emit('f64.sub')
+    emit('f64.sub')
+    emit('local.set $lo')
+    emit('local.get $e')
+    emit('local.get $step')
+    emit('i32.add')
+    emit('local.set $e')
+    emit('))', -1)
+    emit('br $next')
+    emit('))', -1)
+    emit('local.get $hi')
+    emit('local.get $lo')
+    emit('f64.add')
+    emit(')', -1)
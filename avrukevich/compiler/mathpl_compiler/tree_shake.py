@@ -0,0 +1,87 @@
+"""Removes the parts of a ``WatModule`` the program never reaches.
+
+The generator emits every import, runtime helper and static string
+up front.  This pass walks the call graph from the exported functions and
+keeps only the functions and imports that are called, the globals that are
+read or written, and the data segments referenced by a function that is
+left.  Addresses are plain ``i32.const`` values in the code, so the
+generator records which function references which segment.  Removed
+segments do not move the other data: the layout of memory stays the same,
+and the bytes are simply never initialized.
+"""
+
+from typing import NamedTuple
+
+from .wasm_encoder import encode_module
+from .wat_ir import WatModule
+
+
+class ShakeReport(NamedTuple):
+    imports: list
+    functions: list
+    globals: list
+    data: list
+    bytes_saved: int
+
+
+def _reachable(module: WatModule) -> tuple:
+    functions = {func.name: func for func in module.functions}
+    global_inits = {glob.name: glob.init for glob in module.globals}
+
+    roots = [func.name for func in module.functions if func.exports]
+    roots += [name for _, kind, name in module.exports if kind == "func"]
+    used_globals = {name for _, kind, name in module.exports if kind == "global"}
+
+    used_functions = set()
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        if name in used_functions:
+            continue
+        used_functions.add(name)
+        if name not in functions:
+            continue  # an import
+        for instr in functions[name].body:
+            if instr.op == "call":
+                pending.append(instr.args[0])
+            elif instr.op in ("global.get", "global.set"):
+                used_globals.add(instr.args[0])
+
+    # Initializers can read other (immutable) globals.
+    pending_globals = list(used_globals)
+    while pending_globals:
+        for instr in global_inits.get(pending_globals.pop(), []):
+            if instr.op == "global.get" and instr.args[0] not in used_globals:
+                used_globals.add(instr.args[0])
+                pending_globals.append(instr.args[0])
+
+    return used_functions, used_globals
+
+
+def shake_module(module: WatModule, data_refs: dict) -> ShakeReport:
+    """Drops unreachable imports, functions, globals and data segments in place.
+
+    ``data_refs`` maps a function name to the offsets of the data segments
+    it references.  ``bytes_saved`` is measured on the binary encoding of
+    the module.
+    """
+    size_before = len(encode_module(module))
+    used_functions, used_globals = _reachable(module)
+    used_data = set()
+    for name in used_functions:
+        used_data.update(data_refs.get(name, ()))
+
+    removed_imports = [imp.name for imp in module.imports if imp.name not in used_functions]
+    removed_functions = [func.name for func in module.functions if func.name not in used_functions]
+    removed_globals = [glob.name for glob in module.globals if glob.name not in used_globals]
+    removed_data = [data.offset for data in module.data if data.offset not in used_data]
+
+    module.imports = [imp for imp in module.imports if imp.name in used_functions]
+    module.functions = [func for func in module.functions if func.name in used_functions]
+    module.globals = [glob for glob in module.globals if glob.name in used_globals]
+    module.data = [data for data in module.data if data.offset in used_data]
+
+    return ShakeReport(
+        removed_imports, removed_functions, removed_globals, removed_data,
+        size_before - len(encode_module(module))
+    )
@@ -28,6 +28,12 @@ class ArrayType(MathPLType):
         self.element_type = element_type
 
 
+class MatrixType(MathPLType):
+    def __init__(self, element_type: MathPLType):
+        super().__init__(f"{element_type.name}[,]")
+        self.element_type = element_type
+
+
 class FunctionType(MathPLType):
     def __init__(
             self,
@@ -0,0 +1,410 @@
+"""Binary encoder for ``WatModule``.
+
+Produces a WebAssembly binary module straight from the structured
+instruction lists, the same ones that are rendered as WAT, so no external
+assembler (``wat2wasm``) is needed.  Only the constructs the MathPL
+generator emits are supported: function imports, one memory, globals,
+active data segments, functions and exports.
+"""
+
+import math
+import struct
+
+from .wat_ir import Instruction, WatFunction, WatModule, V128_SHAPES
+
+MAGIC = b"\x00asm"
+VERSION = b"\x01\x00\x00\x00"
+
+SECTION_CUSTOM = 0
+SECTION_TYPE = 1
+SECTION_IMPORT = 2
+SECTION_FUNCTION = 3
+SECTION_MEMORY = 5
+SECTION_GLOBAL = 6
+SECTION_EXPORT = 7
+SECTION_CODE = 10
+SECTION_DATA = 11
+
+EXPORT_KINDS = {"func": 0x00, "table": 0x01, "memory": 0x02, "global": 0x03}
+
+VALUE_TYPES = {"i32": 0x7F, "i64": 0x7E, "f32": 0x7D, "f64": 0x7C, "v128": 0x7B}
+FUNC_TYPE = 0x60
+EMPTY_BLOCK = 0x40
+
+
+class WasmEncodeError(Exception):
+    pass
+
+
+# --- Opcodes ---
+
+_CONTROL = {
+    "unreachable": 0x00, "nop": 0x01, "block": 0x02, "loop": 0x03, "if": 0x04,
+    "else": 0x05, "end": 0x0B, "br": 0x0C, "br_if": 0x0D, "return": 0x0F,
+    "call": 0x10, "drop": 0x1A, "select": 0x1B,
+    "local.get": 0x20, "local.set": 0x21, "local.tee": 0x22,
+    "global.get": 0x23, "global.set": 0x24,
+    "memory.size": 0x3F, "memory.grow": 0x40,
+    "i32.const": 0x41, "i64.const": 0x42, "f32.const": 0x43, "f64.const": 0x44,
+}
+
+# op -> (opcode, natural alignment as log2)
+_MEMORY = {
+    "i32.load": (0x28, 2), "i64.load": (0x29, 3), "f32.load": (0x2A, 2), "f64.load": (0x2B, 3),
+    "i32.load8_s": (0x2C, 0), "i32.load8_u": (0x2D, 0), "i32.load16_s": (0x2E, 1), "i32.load16_u": (0x2F, 1),
+    "i64.load8_s": (0x30, 0), "i64.load8_u": (0x31, 0), "i64.load16_s": (0x32, 1), "i64.load16_u": (0x33, 1),
+    "i64.load32_s": (0x34, 2), "i64.load32_u": (0x35, 2),
+    "i32.store": (0x36, 2), "i64.store": (0x37, 3), "f32.store": (0x38, 2), "f64.store": (0x39, 3),
+    "i32.store8": (0x3A, 0), "i32.store16": (0x3B, 1),
+    "i64.store8": (0x3C, 0), "i64.store16": (0x3D, 1), "i64.store32": (0x3E, 2),
+}
+
+_NUMERIC = {}
+for _code, _op in enumerate(
+        "i32.eqz i32.eq i32.ne i32.lt_s i32.lt_u i32.gt_s i32.gt_u i32.le_s i32.le_u i32.ge_s i32.ge_u "
+        "i64.eqz i64.eq i64.ne i64.lt_s i64.lt_u i64.gt_s i64.gt_u i64.le_s i64.le_u i64.ge_s i64.ge_u "
+        "f32.eq f32.ne f32.lt f32.gt f32.le f32.ge "
+        "f64.eq f64.ne f64.lt f64.gt f64.le f64.ge "
+        "i32.clz i32.ctz i32.popcnt i32.add i32.sub i32.mul i32.div_s i32.div_u i32.rem_s i32.rem_u "
+        "i32.and i32.or i32.xor i32.shl i32.shr_s i32.shr_u i32.rotl i32.rotr "
+        "i64.clz i64.ctz i64.popcnt i64.add i64.sub i64.mul i64.div_s i64.div_u i64.rem_s i64.rem_u "
+        "i64.and i64.or i64.xor i64.shl i64.shr_s i64.shr_u i64.rotl i64.rotr "
+        "f32.abs f32.neg f32.ceil f32.floor f32.trunc f32.nearest f32.sqrt "
+        "f32.add f32.sub f32.mul f32.div f32.min f32.max f32.copysign "
+        "f64.abs f64.neg f64.ceil f64.floor f64.trunc f64.nearest f64.sqrt "
+        "f64.add f64.sub f64.mul f64.div f64.min f64.max f64.copysign "
+        "i32.wrap_i64 i32.trunc_f32_s i32.trunc_f32_u i32.trunc_f64_s i32.trunc_f64_u "
+        "i64.extend_i32_s i64.extend_i32_u i64.trunc_f32_s i64.trunc_f32_u i64.trunc_f64_s i64.trunc_f64_u "
+        "f32.convert_i32_s f32.convert_i32_u f32.convert_i64_s f32.convert_i64_u f32.demote_f64 "
+        "f64.convert_i32_s f64.convert_i32_u f64.convert_i64_s f64.convert_i64_u f64.promote_f32 "
+        "i32.reinterpret_f32 i64.reinterpret_f64 f32.reinterpret_i32 f64.reinterpret_i64 "
+        "i32.extend8_s i32.extend16_s i64.extend8_s i64.extend16_s i64.extend32_s".split(),
+        start=0x45):
+    _NUMERIC[_op] = _code
+
+# 0xFC prefix: saturating truncation and bulk memory
+_MISC = {
+    "i32.trunc_sat_f32_s": 0, "i32.trunc_sat_f32_u": 1, "i32.trunc_sat_f64_s": 2, "i32.trunc_sat_f64_u": 3,
+    "i64.trunc_sat_f32_s": 4, "i64.trunc_sat_f32_u": 5, "i64.trunc_sat_f64_s": 6, "i64.trunc_sat_f64_u": 7,
+    "memory.copy": 10, "memory.fill": 11,
+}
+
+# 0xFD prefix: the SIMD instructions used by the array kernels and friends
+_SIMD_MEMORY = {"v128.load": (0x00, 4), "v128.store": (0x0B, 4)}
+_SIMD_LANE = {
+    "i32x4.extract_lane": 0x1B, "i32x4.replace_lane": 0x1C,
+    "i64x2.extract_lane": 0x1D, "i64x2.replace_lane": 0x1E,
+    "f32x4.extract_lane": 0x1F, "f32x4.replace_lane": 0x20,
+    "f64x2.extract_lane": 0x21, "f64x2.replace_lane": 0x22,
+}
+_SIMD = {
+    "i8x16.splat": 0x0F, "i16x8.splat": 0x10, "i32x4.splat": 0x11,
+    "i64x2.splat": 0x12, "f32x4.splat": 0x13, "f64x2.splat": 0x14,
+    "i32x4.eq": 0x37, "i32x4.ne": 0x38, "i32x4.lt_s": 0x39, "i32x4.lt_u": 0x3A,
+    "i32x4.gt_s": 0x3B, "i32x4.gt_u": 0x3C, "i32x4.le_s": 0x3D, "i32x4.le_u": 0x3E,
+    "i32x4.ge_s": 0x3F, "i32x4.ge_u": 0x40,
+    "f64x2.eq": 0x47, "f64x2.ne": 0x48, "f64x2.lt": 0x49, "f64x2.gt": 0x4A,
+    "f64x2.le": 0x4B, "f64x2.ge": 0x4C,
+    "v128.not": 0x4D, "v128.and": 0x4E, "v128.andnot": 0x4F, "v128.or": 0x50,
+    "v128.xor": 0x51, "v128.bitselect": 0x52, "v128.any_true": 0x53,
+    "i32x4.abs": 0xA0, "i32x4.neg": 0xA1, "i32x4.all_true": 0xA3,
+    "i32x4.shl": 0xAB, "i32x4.shr_s": 0xAC, "i32x4.shr_u": 0xAD,
+    "i32x4.add": 0xAE, "i32x4.sub": 0xB1, "i32x4.mul": 0xB5,
+    "i32x4.min_s": 0xB6, "i32x4.min_u": 0xB7, "i32x4.max_s": 0xB8, "i32x4.max_u": 0xB9,
+    "i64x2.add": 0xCE, "i64x2.sub": 0xD1, "i64x2.mul": 0xD5,
+    "f32x4.abs": 0xE0, "f32x4.neg": 0xE1, "f32x4.sqrt": 0xE3,
+    "f32x4.add": 0xE4, "f32x4.sub": 0xE5, "f32x4.mul": 0xE6, "f32x4.div": 0xE7,
+    "f32x4.min": 0xE8, "f32x4.max": 0xE9,
+    "f64x2.abs": 0xEC, "f64x2.neg": 0xED, "f64x2.sqrt": 0xEF,
+    "f64x2.add": 0xF0, "f64x2.sub": 0xF1, "f64x2.mul": 0xF2, "f64x2.div": 0xF3,
+    "f64x2.min": 0xF4, "f64x2.max": 0xF5,
+}
+
+
+# --- Primitive encodings ---
+
+def uleb128(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def sleb128(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if (value == 0 and not byte & 0x40) or (value == -1 and byte & 0x40):
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _name(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return uleb128(len(data)) + data
+
+
+def _vector(items: list) -> bytes:
+    return uleb128(len(items)) + b"".join(items)
+
+
+def _section(section_id: int, payload: bytes) -> bytes:
+    return bytes([section_id]) + uleb128(len(payload)) + payload
+
+
+def _parse_int(text: str, bits: int) -> int:
+    value = int(text.replace("_", ""), 0)
+    if not -(1 << (bits - 1)) <= value < (1 << bits):
+        raise WasmEncodeError(f"Integer constant {text} does not fit in i{bits}")
+    # Unsigned spellings of negative values (e.g. 0xFFFFFFFF) wrap around
+    if value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+def _parse_float(text: str) -> float:
+    text = text.replace("_", "")
+    sign = -1.0 if text.startswith("-") else 1.0
+    body = text.lstrip("+-")
+    if body == "inf":
+        return sign * math.inf
+    if body.startswith("nan"):
+        return math.copysign(math.nan, sign)
+    if body.startswith(("0x", "0X")):
+        return sign * float.fromhex(body)
+    return sign * float(body)
+
+
+def _float_bytes(text: str, fmt: str) -> bytes:
+    body = text.replace("_", "").lstrip("+-")
+    if body.startswith("nan:"):
+        # Explicit NaN payload
+        payload = int(body[4:], 16)
+        negative = text.startswith("-")
+        if fmt == "<d":
+            bits = (negative << 63) | (0x7FF << 52) | payload
+            return struct.pack("<Q", bits)
+        bits = (negative << 31) | (0xFF << 23) | payload
+        return struct.pack("<I", bits)
+    return struct.pack(fmt, _parse_float(text))
+
+
+# --- Module encoding ---
+
+class _ModuleIndex:
+    """Name -> index maps for functions, globals and function types."""
+
+    def __init__(self, module: WatModule):
+        self.functions = {}
+        for index, imp in enumerate(module.imports):
+            self.functions[imp.name] = index
+        for index, func in enumerate(module.functions, start=len(module.imports)):
+            if func.name:
+                self.functions[func.name] = index
+        self.globals = {glob.name: index for index, glob in enumerate(module.globals)}
+        self.types = []
+        self._type_index = {}
+
+    def type_index(self, params: list, results: list) -> int:
+        key = (tuple(params), tuple(results))
+        if key not in self._type_index:
+            self._type_index[key] = len(self.types)
+            self.types.append(key)
+        return self._type_index[key]
+
+    @staticmethod
+    def resolve(names: dict, ref: str, kind: str) -> int:
+        if ref in names:
+            return names[ref]
+        if ref.lstrip("-").isdigit():
+            return int(ref)
+        raise WasmEncodeError(f"Unknown {kind} '{ref}'")
+
+
+def _value_type(name: str) -> int:
+    if name not in VALUE_TYPES:
+        raise WasmEncodeError(f"Unknown value type '{name}'")
+    return VALUE_TYPES[name]
+
+
+def _memarg(instr: Instruction, natural_align: int) -> bytes:
+    align = natural_align
+    for arg in instr.args:
+        if arg.startswith("align="):
+            align = int(arg[len("align="):], 0).bit_length() - 1
+    return uleb128(align) + uleb128(instr.offset)
+
+
+def _encode_instruction(instr: Instruction, index: _ModuleIndex, local_names: dict, labels: list) -> bytes:
+    op = instr.op
+
+    if op in ("block", "loop", "if"):
+        labels.append(instr.label)
+        block_type = EMPTY_BLOCK if instr.block_type is None else _value_type(instr.block_type)
+        return bytes([_CONTROL[op], block_type])
+    if op == "end":
+        if labels:
+            labels.pop()
+        return bytes([_CONTROL[op]])
+    if op in ("br", "br_if"):
+        target = instr.args[0]
+        if target in labels:
+            depth = labels[::-1].index(target)
+        elif target.isdigit():
+            depth = int(target)
+        else:
+            raise WasmEncodeError(f"Unknown label '{target}'")
+        return bytes([_CONTROL[op]]) + uleb128(depth)
+    if op == "call":
+        return bytes([_CONTROL[op]]) + uleb128(index.resolve(index.functions, instr.args[0], "function"))
+    if op in ("local.get", "local.set", "local.tee"):
+        return bytes([_CONTROL[op]]) + uleb128(index.resolve(local_names, instr.args[0], "local"))
+    if op in ("global.get", "global.set"):
+        return bytes([_CONTROL[op]]) + uleb128(index.resolve(index.globals, instr.args[0], "global"))
+    if op in ("memory.size", "memory.grow"):
+        return bytes([_CONTROL[op], 0x00])
+    if op == "i32.const":
+        return bytes([_CONTROL[op]]) + sleb128(_parse_int(instr.args[0], 32))
+    if op == "i64.const":
+        return bytes([_CONTROL[op]]) + sleb128(_parse_int(instr.args[0], 64))
+    if op == "f32.const":
+        return bytes([_CONTROL[op]]) + _float_bytes(instr.args[0], "<f")
+    if op == "f64.const":
+        return bytes([_CONTROL[op]]) + _float_bytes(instr.args[0], "<d")
+    if op in _CONTROL:
+        return bytes([_CONTROL[op]])
+
+    if op in _MEMORY:
+        opcode, natural_align = _MEMORY[op]
+        return bytes([opcode]) + _memarg(instr, natural_align)
+    if op in _NUMERIC:
+        return bytes([_NUMERIC[op]])
+
+    if op in _MISC:
+        suffix = {"memory.copy": b"\x00\x00", "memory.fill": b"\x00"}.get(op, b"")
+        return b"\xFC" + uleb128(_MISC[op]) + suffix
+
+    if op in _SIMD_MEMORY:
+        opcode, natural_align = _SIMD_MEMORY[op]
+        return b"\xFD" + uleb128(opcode) + _memarg(instr, natural_align)
+    if op in _SIMD_LANE:
+        return b"\xFD" + uleb128(_SIMD_LANE[op]) + bytes([int(instr.args[0])])
+    if op in _SIMD:
+        return b"\xFD" + uleb128(_SIMD[op])
+    if op == "v128.const":
+        shape, lanes = instr.args[0], instr.args[1:]
+        count = V128_SHAPES[shape]
+        lane_bits = 128 // count
+        if shape[0] == "f":
+            fmt = "<d" if lane_bits == 64 else "<f"
+            data = b"".join(_float_bytes(lane, fmt) for lane in lanes)
+        else:
+            data = b"".join(
+                (_parse_int(lane, lane_bits) & ((1 << lane_bits) - 1)).to_bytes(lane_bits // 8, "little")
+                for lane in lanes
+            )
+        return b"\xFD" + uleb128(0x0C) + data
+
+    raise WasmEncodeError(f"Unsupported instruction '{op}'")
+
+
+def _encode_expression(instructions: list, index: _ModuleIndex, local_names: dict) -> bytes:
+    labels = []
+    body = b"".join(_encode_instruction(instr, index, local_names, labels) for instr in instructions)
+    return body + bytes([_CONTROL["end"]])
+
+
+def _encode_locals(func: WatFunction) -> bytes:
+    # Consecutive locals of the same type are stored as one (count, type) entry
+    runs = []
+    for _, value_type in func.locals:
+        if runs and runs[-1][1] == value_type:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, value_type])
+    return _vector([uleb128(count) + bytes([_value_type(value_type)]) for count, value_type in runs])
+
+
+def _encode_function_body(func: WatFunction, index: _ModuleIndex) -> bytes:
+    local_names = {}
+    for position, (name, _) in enumerate(func.params + func.locals):
+        if name:
+            local_names[name] = position
+    code = _encode_locals(func) + _encode_expression(func.body, index, local_names)
+    return uleb128(len(code)) + code
+
+
+def _encode_names(module: WatModule) -> bytes:
+    """``name`` custom section with function names, for readable stack traces."""
+    entries = []
+    all_functions = [imp.name for imp in module.imports] + [func.name for func in module.functions]
+    for func_index, name in enumerate(all_functions):
+        if name:
+            entries.append(uleb128(func_index) + _name(name.lstrip("$")))
+    function_names = _vector(entries)
+    payload = _name("name") + bytes([1]) + uleb128(len(function_names)) + function_names
+    return _section(SECTION_CUSTOM, payload)
+
+
+def encode_module(module: WatModule) -> bytes:
+    """Encodes ``module`` in the WebAssembly binary format."""
+    index = _ModuleIndex(module)
+
+    imports = []
+    for imp in module.imports:
+        type_index = index.type_index(imp.params, imp.results)
+        imports.append(_name(imp.module) + _name(imp.field) + bytes([EXPORT_KINDS["func"]]) + uleb128(type_index))
+
+    function_types = [
+        uleb128(index.type_index([value_type for _, value_type in func.params], func.results))
+        for func in module.functions
+    ]
+
+    globals_ = []
+    for glob in module.globals:
+        init = _encode_expression(glob.init, index, {})
+        globals_.append(bytes([_value_type(glob.type), 1 if glob.mutable else 0]) + init)
+
+    exports = [_name(name) + bytes([EXPORT_KINDS["memory"]]) + uleb128(0) for name in module.memory_exports]
+    for func in module.functions:
+        for name in func.exports:
+            exports.append(_name(name) + bytes([EXPORT_KINDS["func"]]) + uleb128(index.functions[func.name]))
+    for name, kind, target in module.exports:
+        names = index.functions if kind == "func" else index.globals
+        exports.append(_name(name) + bytes([EXPORT_KINDS[kind]]) + uleb128(index.resolve(names, target, kind)))
+
+    code = [_encode_function_body(func, index) for func in module.functions]
+
+    data = []
+    for segment in module.data:
+        offset = _encode_expression([Instruction("i32.const", [str(segment.offset)])], index, {})
+        data.append(b"\x00" + offset + uleb128(len(segment.data)) + segment.data)
+
+    types = []
+    for params, results in index.types:
+        types.append(bytes([FUNC_TYPE])
+                     + _vector([bytes([_value_type(t)]) for t in params])
+                     + _vector([bytes([_value_type(t)]) for t in results]))
+
+    binary = bytearray(MAGIC + VERSION)
+    binary += _section(SECTION_TYPE, _vector(types))
+    if imports:
+        binary += _section(SECTION_IMPORT, _vector(imports))
+    binary += _section(SECTION_FUNCTION, _vector(function_types))
+    # Memory limits without a maximum: flag 0x00, then the initial page count
+    binary += _section(SECTION_MEMORY, _vector([b"\x00" + uleb128(module.memory_pages)]))
+    if globals_:
+        binary += _section(SECTION_GLOBAL, _vector(globals_))
+    binary += _section(SECTION_EXPORT, _vector(exports))
+    binary += _section(SECTION_CODE, _vector(code))
+    if data:
+        binary += _section(SECTION_DATA, _vector(data))
+    binary += _encode_names(module)
+    return bytes(binary)
@@ -3,15 +3,74 @@ import collections
 from antlr_generated import GrammarMathPLVisitor, GrammarMathPLParser
 
 from .analyzer import MathPLSemanticAnalyzer
+from . import array_fusion
+from . import array_kernels
+from . import inlining
+from . import native_math
+from . import ownership
+from . import peephole as peephole_pass
+from . import string_runtime
+from . import tree_shake
 from . import types
+from . import wat_ir
 
 
 class WatCodeGenerator(GrammarMathPLVisitor):
 
-    def __init__(self, analyzer: MathPLSemanticAnalyzer):
+    PAGE_SIZE = 65536
+    # Blocks are powers of two from 16 bytes (class 0) up to 2 GiB (class 27)
+    SIZE_CLASS_COUNT = 28
+
+    # Element-wise array operators that can be fused into one loop
+    FUSION_OPS = {
+        GrammarMathPLParser.PLUS: "add",
+        GrammarMathPLParser.MINUS: "sub",
+        GrammarMathPLParser.MUL: "mul",
+        GrammarMathPLParser.DIV: "div",
+    }
+
+    def __init__(self, analyzer: MathPLSemanticAnalyzer, simd_kernels: bool = True, peephole: bool = True,
+                 fuse_arrays: bool = True, tree_shake: bool = True, native_math: bool = False,
+                 inline_threshold: int = inlining.DEFAULT_THRESHOLD):
         self.analyzer = analyzer
+        self.simd_kernels = simd_kernels
+        self.peephole = peephole
+        self.fuse_arrays = fuse_arrays
+        self.tree_shake = tree_shake
+        self.native_math = native_math
+        # Functions of at most this many instructions are inlined (0 disables)
+        self.inline_threshold = inline_threshold
+        # Number of array expressions emitted as a single fused loop
+        self.fused_count = 0
+        # Call sites emitted as the body of the callee (inlining.InlinedCall)
+        self.inlined_calls = []
+        # Structured form of the emitted module, {function: instructions removed}
+        # and what tree shaking dropped from the module
+        self.module = None
+        self.peephole_report = {}
+        self.shake_report = None
+        # {function: offsets of the data segments it references}, for tree shaking
+        self.data_refs = collections.defaultdict(set)
+        self._function_name = None
         self.wat_lines = []
         self.indent_level = 0
+        self._temp_depth = 0
+        self._temp_max = 0
+        # ids of the array variables that own their array (ownership.owned_arrays)
+        self._owned = set()
+        # Owned array locals of the function being emitted, freed on return
+        self._owned_locals = []
+        self._fuse_depth = collections.Counter()
+        self._fuse_max = collections.Counter()
+        # {function name: inlining.InlineCandidate}
+        self._inline_candidates = {}
+        # (function name, block label) of the inlined bodies being emitted, innermost last
+        self._inline_stack = []
+        # Added to the index of local symbols while an inlined body is emitted
+        self._local_base = 0
+        self._next_local = 0
+        self._inline_locals = []
+        self._inline_scratch = set()
         self.type_map = {
             types.INT: "i32",
             types.FLOAT: "f64",
@@ -28,7 +87,7 @@ class WatCodeGenerator(GrammarMathPLVisitor):
             self.indent_level += indent_change
 
     def _wat_type(self, mptype) -> str:
-        if isinstance(mptype, types.ArrayType):
+        if isinstance(mptype, (types.ArrayType, types.MatrixType)):
             return "i32" # Pointer
         return self.type_map.get(mptype, "i32")
 
@@ -42,7 +101,380 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         if symbol.category == types.SymbolCategory.GLOBAL:
             return f"${symbol.name}"
         else:
-            return f"$var_{symbol.index}"
+            return f"$var_{symbol.index + self._local_base}"
+
+    def _is_temporary_array(self, ctx: GrammarMathPLParser.ExpressionContext) -> bool:
+        """Array expressions that always produce a fresh, unaliased allocation."""
+        if not isinstance(getattr(ctx, 'type', None), types.ArrayType):
+            return False
+        if ctx.atom():
+            atom = ctx.atom()
+            if atom.LPAREN() and atom.expression():
+                return self._is_temporary_array(atom.expression(0))
+            return bool(atom.NEW() or atom.LBRACK())
+        if ctx.LBRACK():
+            return bool(ctx.COLON())
+        return len(ctx.expression()) == 2
+
+    def _emit_variable_get(self, symbol: types.Symbol):
+        op = "global.get" if symbol.category == types.SymbolCategory.GLOBAL else "local.get"
+        self._add_line(f"{op} {self._get_var_name(symbol)}")
+
+    def _emit_variable_set(self, symbol: types.Symbol):
+        op = "global.set" if symbol.category == types.SymbolCategory.GLOBAL else "local.set"
+        self._add_line(f"{op} {self._get_var_name(symbol)}")
+
+    def _emit_owned_store(self, symbol: types.Symbol):
+        """Stores the value on top of the stack, freeing the array the variable owned."""
+        if id(symbol) in self._owned:
+            self._emit_variable_get(symbol)
+            self._add_line("call $free")
+        self._emit_variable_set(symbol)
+
+    def _owned_locals_of(self, block: GrammarMathPLParser.BlockContext) -> list:
+        local_vars = self._collect_locals(block)
+        return [local_vars[index] for index in sorted(local_vars) if id(local_vars[index]) in self._owned]
+
+    def _free_owned_locals(self):
+        for symbol in self._owned_locals:
+            self._emit_variable_get(symbol)
+            self._add_line("call $free")
+
+    def _hold_temporary(self) -> str:
+        """Keeps the array on top of the stack in a temp local so it can be freed later."""
+        name = f"$arr_tmp_{self._temp_depth}"
+        self._temp_depth += 1
+        self._temp_max = max(self._temp_max, self._temp_depth)
+        self._add_line(f"local.tee {name}")
+        return name
+
+    def _release_temporaries(self, names: list):
+        for name in reversed(names):
+            self._add_line(f"local.get {name}")
+            self._add_line("call $free")
+            self._temp_depth -= 1
+
+    def _emit_index_checks(self, access_ctx):
+        # Normalizes $idx_tmp against the array in $ptr_tmp and traps when it is out of
+        # range, unless the range analysis proved the access in bounds.
+        if getattr(access_ctx, 'in_bounds', False):
+            return
+        self._add_line("local.get $ptr_tmp")
+        self._add_line("local.get $idx_tmp")
+        self._add_line("call $normalize_index")
+        self._add_line("local.set $idx_tmp")
+        self._add_line("local.get $ptr_tmp")
+        self._add_line("local.get $idx_tmp")
+        self._add_line("call $check_bounds")
+
+    def _emit_element_address(self, access_ctx) -> types.MathPLType:
+        """Pushes the address of ``a[i]`` or ``m[i, j]`` and returns the element type."""
+        arr_expr = access_ctx.expression(0)
+        elem_type = arr_expr.type.element_type
+        elem_size = self._get_element_size(elem_type)
+
+        if access_ctx.COMMA():
+            for expr in access_ctx.expression():
+                self.visit(expr)
+            self._add_line(f"i32.const {elem_size}")
+            self._add_line("call $matrix_element")
+            return elem_type
+
+        self.visit(arr_expr)
+        self._add_line("local.set $ptr_tmp")
+        self.visit(access_ctx.expression(1))
+        self._add_line("local.set $idx_tmp")
+        self._emit_index_checks(access_ctx)
+
+        self._add_line("local.get $ptr_tmp")
+        self._add_line("i32.const 8")
+        self._add_line("i32.add")
+        self._add_line("local.get $idx_tmp")
+        self._add_line(f"i32.const {elem_size}")
+        self._add_line("i32.mul")
+        self._add_line("i32.add")
+        return elem_type
+
+    def _emit_matrix_row(self, access_ctx):
+        # m[i] is row i itself: a float[]/int[] header inside the matrix block
+        elem_size = self._get_element_size(access_ctx.expression(0).type.element_type)
+        self.visit(access_ctx.expression(0))
+        if not getattr(access_ctx, 'in_bounds', False):
+            self.visit(access_ctx.expression(1))
+            self._add_line(f"i32.const {elem_size}")
+            self._add_line("call $matrix_row")
+            return
+        self._add_line("local.tee $ptr_tmp")
+        self._add_line("i32.const 8")
+        self._add_line("i32.add")
+        self.visit(access_ctx.expression(1))
+        self._add_line("local.get $ptr_tmp")
+        self._add_line("i32.load")
+        self._add_line(f"i32.const {elem_size}")
+        self._add_line("i32.mul")
+        self._add_line("i32.const 8")
+        self._add_line("i32.add")
+        self._add_line("i32.mul")
+        self._add_line("i32.add")
+
+    def _begin_function_temps(self, first_free_local: int) -> int:
+        self._temp_depth = 0
+        self._temp_max = 0
+        self._fuse_depth.clear()
+        self._fuse_max.clear()
+        self._next_local = first_free_local
+        self._inline_locals = []
+        self._inline_scratch = set()
+        return len(self.wat_lines)
+
+    def _end_function_temps(self, insert_at: int):
+        indent = "  " * self.indent_level
+        declarations = [f"{indent}(local $arr_tmp_{i} i32)" for i in range(self._temp_max)]
+        for wat_type, count in sorted(self._fuse_max.items()):
+            declarations.extend(f"{indent}(local $fuse_{wat_type}_{i} {wat_type})" for i in range(count))
+        declarations.extend(f"{indent}(local {name} {wat_type})" for name, wat_type in self._inline_locals)
+        for name in sorted(self._inline_scratch):
+            wat_type = inlining.SCRATCH_LOCALS[name.rsplit("_", 1)[0]]
+            declarations.append(f"{indent}(local {name} {wat_type})")
+        self.wat_lines[insert_at:insert_at] = declarations
+
+    def _fusion_local(self, wat_type: str) -> str:
+        index = self._fuse_depth[wat_type]
+        self._fuse_depth[wat_type] += 1
+        self._fuse_max[wat_type] = max(self._fuse_max[wat_type], index + 1)
+        return f"$fuse_{wat_type}_{index}"
+
+    def _fusion_op(self, ctx: GrammarMathPLParser.ExpressionContext) -> str | None:
+        """Kernel op name of an element-wise array operator node, or None."""
+        if not isinstance(getattr(ctx, 'type', None), types.ArrayType) or len(ctx.expression()) != 2:
+            return None
+        return self.FUSION_OPS.get(ctx.getChild(1).symbol.type)
+
+    @staticmethod
+    def _strip_parens(ctx: GrammarMathPLParser.ExpressionContext) -> GrammarMathPLParser.ExpressionContext:
+        while ctx.atom() and ctx.atom().LPAREN() and ctx.atom().expression():
+            ctx = ctx.atom().expression(0)
+        return ctx
+
+    def _fusable_op_count(self, ctx: GrammarMathPLParser.ExpressionContext) -> int:
+        ctx = self._strip_parens(ctx)
+        if not self.fuse_arrays or self._fusion_op(ctx) is None:
+            return 0
+        return 1 + self._fusable_op_count(ctx.expression(0)) + self._fusable_op_count(ctx.expression(1))
+
+    def _emit_length_check(self, left: str, right: str):
+        # The same trap the kernel would raise at this point of the evaluation
+        self._add_line(f"local.get {left}")
+        self._add_line("i32.load offset=4")
+        self._add_line(f"local.get {right}")
+        self._add_line("i32.load offset=4")
+        self._add_line("i32.ne")
+        self._add_line("(if (then unreachable))")
+
+    def _collect_fusion_leaves(self, ctx: GrammarMathPLParser.ExpressionContext, wat_type: str, held: list):
+        """Evaluates the leaves of a fusable tree left to right into fusion locals.
+
+        Returns the ``array_fusion`` tree and the local of an array leaf whose
+        length is the length of the whole tree.
+        """
+        ctx = self._strip_parens(ctx)
+        op = self._fusion_op(ctx)
+        if op is None:
+            self.visit(ctx)
+            if self._is_temporary_array(ctx): held.append(self._hold_temporary())
+            local = self._fusion_local("i32")
+            self._add_line(f"local.set {local}")
+            return ("array", local), local
+
+        left, length = self._collect_fusion_leaves(ctx.expression(0), wat_type, held)
+        right_expr = ctx.expression(1)
+        if isinstance(right_expr.type, types.ArrayType):
+            right, right_length = self._collect_fusion_leaves(right_expr, wat_type, held)
+            self._emit_length_check(length, right_length)
+        else:
+            self.visit(right_expr)
+            local = self._fusion_local(wat_type)
+            self._add_line(f"local.set {local}")
+            right = ("scalar", local)
+        return (op, left, right), length
+
+    def _emit_fused_array(self, ctx: GrammarMathPLParser.ExpressionContext, in_place_op: str | None = None):
+        """Emits a whole-array expression as one loop.
+
+        Without ``in_place_op`` the result goes to a single fresh array left on
+        the stack.  Otherwise the array on top of the stack is popped and
+        updated in place as ``target = target <in_place_op> ctx``.
+        """
+        elem_type = ctx.type.element_type
+        suffix = "f64" if elem_type == types.FLOAT else "i32"
+        saved_depth = collections.Counter(self._fuse_depth)
+        held = []
+
+        if in_place_op is None:
+            tree, length_of = self._collect_fusion_leaves(ctx, suffix, held)
+        else:
+            dst = self._fusion_local("i32")
+            self._add_line(f"local.set {dst}")
+            right, right_length = self._collect_fusion_leaves(ctx, suffix, held)
+            self._emit_length_check(dst, right_length)
+            tree, length_of = (in_place_op, ("array", dst), right), dst
+
+        length = self._fusion_local("i32")
+        self._add_line(f"local.get {length_of}")
+        self._add_line("i32.load offset=4")
+        self._add_line(f"local.set {length}")
+
+        if in_place_op is None:
+            dst = self._fusion_local("i32")
+            self._add_line(f"local.get {length}")
+            self._add_line(f"i32.const {self._get_element_size(elem_type)}")
+            self._add_line("i32.mul")
+            self._add_line("i32.const 8")
+            self._add_line("i32.add")
+            self._add_line("call $malloc")
+            self._add_line(f"local.tee {dst}")
+            self._add_line(f"local.get {length}")
+            self._add_line("i32.store")
+            self._add_line(f"local.get {dst}")
+            self._add_line(f"local.get {length}")
+            self._add_line("i32.store offset=4")
+
+        array_fusion.emit_fused_loop(
+            self._add_line, tree, suffix, dst, length, f"$fuse_{self.fused_count}",
+            self._fusion_local, simd=self.simd_kernels
+        )
+        self.fused_count += 1
+
+        if in_place_op is None:
+            self._add_line(f"local.get {dst}")
+        self._release_temporaries(held)
+        self._fuse_depth = saved_depth
+
+    def _emit_allocator(self):
+        # Every block starts with an 8-byte header: [size class, next free block].
+        self._add_line('(func $malloc (param $size i32) (result i32)', 1)
+        self._add_line('(local $class i32) (local $slot i32) (local $block i32) (local $end i32) (local $pages i32)')
+        # class = max(0, ceil(log2(size + 8)) - 4)
+        self._add_line('i32.const 28')
+        self._add_line('local.get $size')
+        self._add_line('i32.const 7')
+        self._add_line('i32.add')
+        self._add_line('i32.clz')
+        self._add_line('i32.sub')
+        self._add_line('local.tee $class')
+        self._add_line('i32.const 0')
+        self._add_line('i32.lt_s')
+        self._add_line('(if (then i32.const 0 local.set $class))')
+        self._add_line('local.get $class')
+        self._add_line('i32.const 2')
+        self._add_line('i32.shl')
+        self._add_line('global.get $free_lists')
+        self._add_line('i32.add')
+        self._add_line('local.tee $slot')
+        self._add_line('i32.load')
+        self._add_line('local.tee $block')
+        self._add_line('(if (then', 1)
+        # Reuse a freed block; callers expect zeroed memory like a fresh page.
+        self._add_line('local.get $slot')
+        self._add_line('local.get $block')
+        self._add_line('i32.load offset=4')
+        self._add_line('i32.store')
+        self._add_line('local.get $block')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('i32.const 0')
+        self._add_line('i32.const 16')
+        self._add_line('local.get $class')
+        self._add_line('i32.shl')
+        self._add_line('i32.const 8')
+        self._add_line('i32.sub')
+        self._add_line('memory.fill')
+        self._add_line('local.get $block')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('return')
+        self._add_line('))', -1)
+        self._add_line('global.get $heap_pointer')
+        self._add_line('local.tee $block')
+        self._add_line('i32.const 16')
+        self._add_line('local.get $class')
+        self._add_line('i32.shl')
+        self._add_line('i32.add')
+        self._add_line('local.tee $end')
+        self._add_line('memory.size')
+        self._add_line('i32.const 16')
+        self._add_line('i32.shl')
+        self._add_line('i32.gt_u')
+        self._add_line('(if (then', 1)
+        self._add_line('local.get $end')
+        self._add_line('memory.size')
+        self._add_line('i32.const 16')
+        self._add_line('i32.shl')
+        self._add_line('i32.sub')
+        self._add_line(f'i32.const {self.PAGE_SIZE - 1}')
+        self._add_line('i32.add')
+        self._add_line('i32.const 16')
+        self._add_line('i32.shr_u')
+        # Grow by at least the current size so that a growing heap takes
+        # O(log n) memory.grow calls; fall back to the pages actually needed
+        self._add_line('local.tee $pages')
+        self._add_line('memory.size')
+        self._add_line('local.get $pages')
+        self._add_line('memory.size')
+        self._add_line('i32.gt_u')
+        self._add_line('select')
+        self._add_line('memory.grow')
+        self._add_line('i32.const -1')
+        self._add_line('i32.eq')
+        self._add_line('(if (then', 1)
+        self._add_line('local.get $pages')
+        self._add_line('memory.grow')
+        self._add_line('i32.const -1')
+        self._add_line('i32.eq')
+        self._add_line('(if (then unreachable))')
+        self._add_line('))', -1)
+        self._add_line('))', -1)
+        self._add_line('local.get $end')
+        self._add_line('global.set $heap_pointer')
+        self._add_line('local.get $block')
+        self._add_line('local.get $class')
+        self._add_line('i32.store')
+        self._add_line('local.get $block')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line(')', -1)
+        self._add_line('(export "malloc" (func $malloc))')
+
+        self._add_line('(func $free (param $ptr i32)', 1)
+        self._add_line('(local $block i32) (local $slot i32)')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.eqz')
+        self._add_line('(if (then return))')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.const 8')
+        self._add_line('i32.sub')
+        self._add_line('local.tee $block')
+        self._add_line('i32.load')
+        self._add_line('i32.const 2')
+        self._add_line('i32.shl')
+        self._add_line('global.get $free_lists')
+        self._add_line('i32.add')
+        self._add_line('local.set $slot')
+        self._add_line('local.get $block')
+        self._add_line('local.get $slot')
+        self._add_line('i32.load')
+        self._add_line('i32.store offset=4')
+        self._add_line('local.get $slot')
+        self._add_line('local.get $block')
+        self._add_line('i32.store')
+        self._add_line(')', -1)
+        self._add_line('(export "free" (func $free))')
+
+    def _emit_constant(self, mptype, value):
+        if mptype == types.FLOAT:
+            self._add_line(f"(f64.const {float(value)!r})")
+        else:
+            self._add_line(f"(i32.const {int(value)})")
 
     def _collect_locals(self, ctx: GrammarMathPLParser.BlockContext) -> dict:
         locals_map = {} 
@@ -72,117 +504,65 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         
         # --- Imports ---
         self._add_line(';; --- Imports ---')
-        self._add_line('(import "env" "print_str" (func $print (param i32)))')
+        for line in string_runtime.runtime_imports():
+            self._add_line(line)
         self._add_line('(import "env" "print_i32" (func $print_i32 (param i32)))')
         self._add_line('(import "env" "print_f64" (func $print_f64 (param f64)))')
-        self._add_line('(import "env" "input" (func $input (result i32)))')
-        self._add_line('(import "env" "i32_to_str" (func $i32_to_str (param i32) (result i32)))')
-        self._add_line('(import "env" "bool_to_str" (func $bool_to_str (param i32) (result i32)))')
-        self._add_line('(import "env" "f64_to_str" (func $f64_to_str (param f64) (result i32)))')
-        self._add_line('(import "env" "str_to_int" (func $str_to_int (param i32) (result i32)))')
-        self._add_line('(import "env" "str_to_float" (func $str_to_float (param i32) (result f64)))')
-        self._add_line('(import "env" "concat" (func $concat (param i32 i32) (result i32)))')
         
-        self._add_line('(import "js" "Math.pow" (func $pow (param f64 f64) (result f64)))')
-        self._add_line('(import "js" "Math.sin" (func $sin (param f64) (result f64)))')
-        self._add_line('(import "js" "Math.cos" (func $cos (param f64) (result f64)))')
-        self._add_line('(import "js" "Math.tan" (func $tan (param f64) (result f64)))')
-        self._add_line('(import "js" "Math.asin" (func $asin (param f64) (result f64)))')
-        self._add_line('(import "js" "Math.acos" (func $acos (param f64) (result f64)))')
-        self._add_line('(import "js" "Math.atan" (func $atan (param f64) (result f64)))')
-        self._add_line('(import "js" "Math.log" (func $ln (param f64) (result f64)))')
-        self._add_line('(import "js" "Math.log10" (func $log (param f64) (result f64)))')
-
-        self._add_line(';; --- Array Operation Imports ---', 0)
-        self._add_line('(import "env" "arr_gt" (func $arr_gt (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_gte" (func $arr_gte (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_lt" (func $arr_lt (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_lte" (func $arr_lte (param i32 i32) (result i32)))')
-        
-        self._add_line('(import "env" "arr_add_i32" (func $arr_add_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_sub_i32" (func $arr_sub_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_mul_i32" (func $arr_mul_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_div_i32" (func $arr_div_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_add_f64" (func $arr_add_f64 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_sub_f64" (func $arr_sub_f64 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_mul_f64" (func $arr_mul_f64 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_div_f64" (func $arr_div_f64 (param i32 i32) (result i32)))')
-
-        self._add_line('(import "env" "arr_add_scalar_i32" (func $arr_add_scalar_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_sub_scalar_i32" (func $arr_sub_scalar_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_mul_scalar_i32" (func $arr_mul_scalar_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_div_scalar_i32" (func $arr_div_scalar_i32 (param i32 i32) (result i32)))')
-        self._add_line('(import "env" "arr_add_scalar_f64" (func $arr_add_scalar_f64 (param i32 f64) (result i32)))')
-        self._add_line('(import "env" "arr_sub_scalar_f64" (func $arr_sub_scalar_f64 (param i32 f64) (result i32)))')
-        self._add_line('(import "env" "arr_mul_scalar_f64" (func $arr_mul_scalar_f64 (param i32 f64) (result i32)))')
-        self._add_line('(import "env" "arr_div_scalar_f64" (func $arr_div_scalar_f64 (param i32 f64) (result i32)))')
-
-        self._add_line('(import "env" "arr_add_assign_i32" (func $arr_add_assign_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_sub_assign_i32" (func $arr_sub_assign_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_mul_assign_i32" (func $arr_mul_assign_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_div_assign_i32" (func $arr_div_assign_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_add_assign_f64" (func $arr_add_assign_f64 (param i32 i32)))')
-        self._add_line('(import "env" "arr_sub_assign_f64" (func $arr_sub_assign_f64 (param i32 i32)))')
-        self._add_line('(import "env" "arr_mul_assign_f64" (func $arr_mul_assign_f64 (param i32 i32)))')
-        self._add_line('(import "env" "arr_div_assign_f64" (func $arr_div_assign_f64 (param i32 i32)))')
-
-        self._add_line('(import "env" "arr_add_assign_scalar_i32" (func $arr_add_assign_scalar_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_sub_assign_scalar_i32" (func $arr_sub_assign_scalar_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_mul_assign_scalar_i32" (func $arr_mul_assign_scalar_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_div_assign_scalar_i32" (func $arr_div_assign_scalar_i32 (param i32 i32)))')
-        self._add_line('(import "env" "arr_add_assign_scalar_f64" (func $arr_add_assign_scalar_f64 (param i32 f64)))')
-        self._add_line('(import "env" "arr_sub_assign_scalar_f64" (func $arr_sub_assign_scalar_f64 (param i32 f64)))')
-        self._add_line('(import "env" "arr_mul_assign_scalar_f64" (func $arr_mul_assign_scalar_f64 (param i32 f64)))')
-        self._add_line('(import "env" "arr_div_assign_scalar_f64" (func $arr_div_assign_scalar_f64 (param i32 f64)))')
+        if not self.native_math:
+            for line in native_math.math_imports():
+                self._add_line(line)
+
+        if not self.simd_kernels:
+            self._add_line(';; --- Array Operation Imports ---', 0)
+            for line in array_kernels.kernel_imports():
+                self._add_line(line)
+
+        # Static data: string literals, the runtime's own strings and the
+        # output buffer, followed by the free-list heads and the heap
+        static_strings = {}
+        data_end = self.analyzer.memory_offset_counter
+        for text in string_runtime.STATIC_STRINGS:
+            if text in self.analyzer.string_literals:
+                static_strings[text] = self.analyzer.string_literals[text]['address']
+            else:
+                static_strings[text] = (data_end + 3) & ~3
+                data_end = static_strings[text] + len(string_runtime.string_bytes(text))
+        for func_name, texts in string_runtime.STATIC_STRING_USERS.items():
+            self.data_refs[func_name].update(static_strings[text] for text in texts)
+        if self.native_math:
+            math_tables = (data_end + 7) & ~7
+            math_scratch = math_tables + native_math.TABLE_SIZE
+            data_end = math_scratch + native_math.SCRATCH_SIZE
+            for func_name in ("$math_rem_pio2", "$math_rem_pio2_large"):
+                self.data_refs[func_name].add(math_tables)
+        output_buffer = (data_end + 7) & ~7 # Align to 8 bytes
+        free_lists = output_buffer + string_runtime.OUTPUT_BUFFER_SIZE
+        heap_start = free_lists + self.SIZE_CLASS_COUNT * 4
+        initial_pages = heap_start // self.PAGE_SIZE + 1
 
         self._add_line("", 0)
-        self._add_line("(memory 100)")
+        self._add_line(f"(memory {initial_pages})")
         self._add_line('(export "memory" (memory 0))')
 
         # Static Strings
-        if self.analyzer.string_literals:
-            for str_val, info in self.analyzer.string_literals.items():
-                escaped_str = ""
-                for char in str_val:
-                    if ' ' <= char <= '~' and char not in ('\\', '"'):
-                        escaped_str += char
-                    else:
-                        escaped_str += f"\\{ord(char):02x}"
-                self._add_line(f'(data (i32.const {info["address"]}) "{escaped_str}\\00")')
-
-        # Heap setup
-        heap_start = 8
-        if self.analyzer.string_literals:
-            max_addr = 0
-            for info in self.analyzer.string_literals.values():
-                end = info['address'] + info['length']
-                if end > max_addr:
-                    max_addr = end
-            heap_start = (max_addr + 7) & ~7 # Align to 8 bytes
-        
+        for str_val, info in self.analyzer.string_literals.items():
+            self._add_line(wat_ir.WatData(info['address'], string_runtime.string_bytes(str_val)).to_wat())
+        for str_val, address in static_strings.items():
+            if str_val not in self.analyzer.string_literals:
+                self._add_line(wat_ir.WatData(address, string_runtime.string_bytes(str_val)).to_wat())
+        if self.native_math:
+            self._add_line(wat_ir.WatData(math_tables, native_math.table_bytes()).to_wat())
+
         self._add_line(f';; Heap Pointer (starts at {heap_start})')
         self._add_line(f'(global $heap_pointer (mut i32) (i32.const {heap_start}))')
+        self._add_line(f'(global $free_lists i32 (i32.const {free_lists}))')
         
         # --- Internal Helpers ---
-        self._add_line('(func $malloc (param $size i32) (result i32)', 1)
-        self._add_line('(local $ptr i32)')
-        self._add_line('(local $aligned_size i32)')
-        self._add_line('global.get $heap_pointer')
-        self._add_line('local.set $ptr')
-        self._add_line('local.get $size')
-        self._add_line('i32.const 7')
-        self._add_line('i32.add')
-        self._add_line('i32.const -8') 
-        self._add_line('i32.and')
-        self._add_line('local.set $aligned_size')
-        self._add_line('global.get $heap_pointer')
-        self._add_line('local.get $aligned_size')
-        self._add_line('i32.add')
-        self._add_line('global.set $heap_pointer')
-        self._add_line('local.get $ptr')
-        self._add_line(')', -1)
-        
-        self._add_line('(export "malloc" (func $malloc))')
+        self._emit_allocator()
+        string_runtime.emit_string_runtime(self._add_line, static_strings, output_buffer)
+        if self.native_math:
+            native_math.emit_native_math(self._add_line, math_tables, math_scratch)
 
         self._add_line('(func $clamp_index (param $idx i32) (param $len i32) (result i32)', 1)
         self._add_line('local.get $idx')
@@ -459,6 +839,132 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         self._add_line('(if (then unreachable))')
         self._add_line(')', -1)
 
+        # Two-dimensional arrays: [cols:i32][rows:i32] followed by the rows back to
+        # back, each laid out as a one-dimensional array [cap=cols][len=cols][data].
+        # Row i starts at ptr + 8 + i * stride with stride = 8 + cols * size.
+        self._add_line('(func $matrix_new (param $rows i32) (param $cols i32) (param $size i32) (result i32)', 1)
+        self._add_line('(local $ptr i32) (local $stride i32) (local $row i32) (local $end i32)')
+        self._add_line('local.get $rows')
+        self._add_line('local.get $cols')
+        self._add_line('i32.or')
+        self._add_line('i32.const 0')
+        self._add_line('i32.lt_s')
+        self._add_line('(if (then unreachable))')
+        self._add_line('local.get $cols')
+        self._add_line('local.get $size')
+        self._add_line('i32.mul')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('local.tee $stride')
+        self._add_line('local.get $rows')
+        self._add_line('i32.mul')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('call $malloc')
+        self._add_line('local.tee $ptr')
+        self._add_line('local.get $cols')
+        self._add_line('i32.store')
+        self._add_line('local.get $ptr')
+        self._add_line('local.get $rows')
+        self._add_line('i32.store offset=4')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('local.tee $row')
+        self._add_line('local.get $stride')
+        self._add_line('local.get $rows')
+        self._add_line('i32.mul')
+        self._add_line('i32.add')
+        self._add_line('local.set $end')
+        self._add_line('(block $break (loop $top')
+        self._add_line('local.get $row')
+        self._add_line('local.get $end')
+        self._add_line('i32.ge_u')
+        self._add_line('br_if $break')
+        self._add_line('local.get $row')
+        self._add_line('local.get $cols')
+        self._add_line('i32.store')
+        self._add_line('local.get $row')
+        self._add_line('local.get $cols')
+        self._add_line('i32.store offset=4')
+        self._add_line('local.get $row')
+        self._add_line('local.get $stride')
+        self._add_line('i32.add')
+        self._add_line('local.set $row')
+        self._add_line('br $top')
+        self._add_line('))')
+        self._add_line('local.get $ptr')
+        self._add_line(')', -1)
+
+        self._add_line('(func $matrix_row (param $ptr i32) (param $i i32) (param $size i32) (result i32)', 1)
+        self._add_line('(local $rows i32)')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.load offset=4')
+        self._add_line('local.set $rows')
+        self._add_line('local.get $i')
+        self._add_line('i32.const 0')
+        self._add_line('i32.lt_s')
+        self._add_line('(if (then local.get $i local.get $rows i32.add local.set $i))')
+        self._add_line('local.get $i')
+        self._add_line('local.get $rows')
+        self._add_line('i32.ge_u')
+        self._add_line('(if (then unreachable))')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('local.get $i')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.load')
+        self._add_line('local.get $size')
+        self._add_line('i32.mul')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('i32.mul')
+        self._add_line('i32.add')
+        self._add_line(')', -1)
+
+        self._add_line('(func $matrix_element (param $ptr i32) (param $i i32) (param $j i32) (param $size i32) (result i32)', 1)
+        self._add_line('(local $rows i32) (local $cols i32)')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.load')
+        self._add_line('local.set $cols')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.load offset=4')
+        self._add_line('local.set $rows')
+        self._add_line('local.get $i')
+        self._add_line('i32.const 0')
+        self._add_line('i32.lt_s')
+        self._add_line('(if (then local.get $i local.get $rows i32.add local.set $i))')
+        self._add_line('local.get $j')
+        self._add_line('i32.const 0')
+        self._add_line('i32.lt_s')
+        self._add_line('(if (then local.get $j local.get $cols i32.add local.set $j))')
+        # Unsigned comparisons also reject indices that are still negative
+        self._add_line('local.get $i')
+        self._add_line('local.get $rows')
+        self._add_line('i32.ge_u')
+        self._add_line('local.get $j')
+        self._add_line('local.get $cols')
+        self._add_line('i32.ge_u')
+        self._add_line('i32.or')
+        self._add_line('(if (then unreachable))')
+        self._add_line('local.get $ptr')
+        self._add_line('i32.const 16')
+        self._add_line('i32.add')
+        self._add_line('local.get $i')
+        self._add_line('local.get $cols')
+        self._add_line('local.get $size')
+        self._add_line('i32.mul')
+        self._add_line('i32.const 8')
+        self._add_line('i32.add')
+        self._add_line('i32.mul')
+        self._add_line('i32.add')
+        self._add_line('local.get $j')
+        self._add_line('local.get $size')
+        self._add_line('i32.mul')
+        self._add_line('i32.add')
+        self._add_line(')', -1)
+
         self._add_line('(func $append_i32 (param $ptr i32) (param $val i32) (result i32)', 1)
         self._add_line('(local $len i32) (local $cap i32) (local $new_ptr i32) (local $new_cap i32)')
         self._add_line('local.get $ptr')
@@ -586,12 +1092,18 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         self._add_line('f64.mul')
         self._add_line(')', -1)
 
+        if self.simd_kernels:
+            self._add_line(';; --- Array Kernels (SIMD) ---')
+            array_kernels.emit_array_kernels(self._add_line)
+
         global_scope = self.analyzer.symbol_table[0]
         for name, symbol in global_scope.items():
             if symbol.category == types.SymbolCategory.GLOBAL:
                 wat_type = self._wat_type(symbol.type)
                 self._add_line(f"(global ${name} (mut {wat_type}) ({wat_type}.const 0))")
 
+        self._owned = ownership.owned_arrays(ctx, self._is_temporary_array)
+
         func_defs = [item for item in ctx.children if isinstance(item, GrammarMathPLParser.FunctionDefinitionContext)]
         for func_def in func_defs:
             self.visit(func_def)
@@ -599,6 +1111,7 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         global_stmts = [item for item in ctx.children if isinstance(item, GrammarMathPLParser.StatementContext)]
         if global_stmts:
             self._add_line('(func $_start (export "_start")', 1)
+            self._function_name = "$_start"
             self._add_line("(local $ptr_tmp i32)")
             self._add_line("(local $idx_tmp i32)")
             self._add_line("(local $size_tmp i32)")
@@ -627,12 +1140,21 @@ class WatCodeGenerator(GrammarMathPLVisitor):
                 symbol = global_locals[index]
                 self._add_line(f"(local {self._get_var_name(symbol)} {self._wat_type(symbol.type)})")
 
+            temps_at = self._begin_function_temps(max(global_locals, default=-1) + 1)
             for stmt in global_stmts:
                 self.visit(stmt)
+            self._end_function_temps(temps_at)
+            self._add_line("call $flush")
             self._add_line(")", -1)
         
         self._add_line(")", -1)
-        return "\n".join(self.wat_lines)
+
+        self.module = wat_ir.parse_wat("\n".join(self.wat_lines))
+        if self.tree_shake:
+            self.shake_report = tree_shake.shake_module(self.module, self.data_refs)
+        if self.peephole:
+            self.peephole_report = peephole_pass.optimize_module(self.module)
+        return self.module.to_wat()
 
     def visitForStatement(self, ctx: GrammarMathPLParser.ForStatementContext):
         loop_id = f"$loop_for_{ctx.start.line}_{ctx.start.column}"
@@ -654,11 +1176,7 @@ class WatCodeGenerator(GrammarMathPLVisitor):
 
     def visitForInitializer(self, ctx: GrammarMathPLParser.ForInitializerContext):
         self.visit(ctx.expression())
-        symbol = ctx.symbol_info
-        if symbol.category == types.SymbolCategory.GLOBAL:
-            self._add_line(f"global.set {self._get_var_name(symbol)}")
-        else:
-            self._add_line(f"local.set {self._get_var_name(symbol)}")
+        self._emit_owned_store(ctx.symbol_info)
 
     def visitForUpdate(self, ctx: GrammarMathPLParser.ForUpdateContext):
         var_node = ctx.ID()
@@ -691,6 +1209,7 @@ class WatCodeGenerator(GrammarMathPLVisitor):
     def visitFunctionDefinition(self, ctx:GrammarMathPLParser.FunctionDefinitionContext):
         func_symbol = ctx.symbol_info
         params_list = []
+        param_symbols = []
         if ctx.functionInParameters():
             param_symbols = [p_id.symbol_info for p_id in ctx.functionInParameters().ID()]
             for symbol in param_symbols:
@@ -699,6 +1218,7 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         params_str = " ".join(params_list)
         result_str = f" (result {self._wat_type(func_symbol.return_type)})" if func_symbol.return_type != types.VOID else ""
         self._add_line(f"(func ${func_symbol.name} {params_str}{result_str}", 1)
+        self._function_name = f"${func_symbol.name}"
         local_vars = self._collect_locals(ctx.block())
         for index in sorted(local_vars.keys()):
             symbol = local_vars[index]
@@ -712,13 +1232,84 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         self._add_line("(local $temp_addr i32)")
         self._add_line("(local $tmp_val_i32 i32)")
         self._add_line("(local $tmp_val_f64 f64)")
+        local_types = {symbol.index: self._wat_type(symbol.type) for symbol in param_symbols}
+        local_types.update({index: self._wat_type(symbol.type) for index, symbol in local_vars.items()})
+        temps_at = self._begin_function_temps(max(local_types, default=-1) + 1)
+        self._owned_locals = self._owned_locals_of(ctx.block())
         
         self.visit(ctx.block())
+        self._free_owned_locals()
+        self._owned_locals = []
         if func_symbol.return_type != types.VOID:
             if func_symbol.return_type == types.FLOAT: self._add_line("f64.const 0.0")
             else: self._add_line("i32.const 0")
+        size = inlining.count_instructions(self.wat_lines[temps_at:])
+        self._end_function_temps(temps_at)
         self._add_line(")", -1)
 
+        if self.inline_threshold > 0 and size <= self.inline_threshold:
+            self._inline_candidates[func_symbol.name] = inlining.InlineCandidate(
+                ctx, size, [symbol.index for symbol in param_symbols], local_types
+            )
+
+    def _emit_inlined_call(self, ctx: GrammarMathPLParser.FunctionCallContext, candidate: inlining.InlineCandidate):
+        """Emits the body of the callee in place of ``call``.
+
+        The arguments are stored into fresh locals of the caller that stand in
+        for the parameters, the other locals of the callee start at zero as
+        they would in a real call, and ``return`` branches out of a block
+        that carries the result.
+        """
+        definition = candidate.definition
+        func_symbol = definition.symbol_info
+        base = self._next_local
+        self._next_local += max(candidate.local_types) + 1 if candidate.local_types else 0
+        for index, wat_type in sorted(candidate.local_types.items()):
+            self._inline_locals.append((f"$var_{base + index}", wat_type))
+
+        for index in reversed(candidate.param_indices):
+            self._add_line(f"local.set $var_{base + index}")
+        for index, wat_type in sorted(candidate.local_types.items()):
+            if index not in candidate.param_indices:
+                self._add_line(f"{wat_type}.const 0")
+                self._add_line(f"local.set $var_{base + index}")
+
+        label = f"$inline_{func_symbol.name}_{ctx.start.line}_{ctx.start.column}"
+        result_str = f" (result {self._wat_type(func_symbol.return_type)})" if func_symbol.return_type != types.VOID else ""
+        self._add_line(f"(block {label}{result_str}", 1)
+        saved_base = self._local_base
+        saved_owned = self._owned_locals
+        self._local_base = base
+        self._owned_locals = self._owned_locals_of(definition.block())
+        self._inline_stack.append((func_symbol.name, label))
+        body_at = len(self.wat_lines)
+
+        statements = definition.block().statement()
+        tail = statements[-1].returnStatement() if statements else None
+        if tail is not None and tail.expression():
+            # The result of a trailing return falls through to the end of the block
+            for stmt in statements[:-1]:
+                self.visit(stmt)
+            self.visit(tail.expression())
+            self._free_owned_locals()
+        else:
+            self.visit(definition.block())
+            self._free_owned_locals()
+            if func_symbol.return_type != types.VOID:
+                if func_symbol.return_type == types.FLOAT: self._add_line("f64.const 0.0")
+                else: self._add_line("i32.const 0")
+
+        self.wat_lines[body_at:] = inlining.rename_scratch(
+            self.wat_lines[body_at:], len(self._inline_stack), self._inline_scratch
+        )
+        self._inline_stack.pop()
+        self._local_base = saved_base
+        self._owned_locals = saved_owned
+        self._add_line(")", -1)
+        self.inlined_calls.append(inlining.InlinedCall(
+            self._function_name, f"${func_symbol.name}", ctx.start.line, ctx.start.column, candidate.size
+        ))
+
     def visitBlock(self, ctx:GrammarMathPLParser.BlockContext):
         for stmt in ctx.statement():
             self.visit(stmt)
@@ -726,11 +1317,26 @@ class WatCodeGenerator(GrammarMathPLVisitor):
     def visitVariableDeclaration(self, ctx:GrammarMathPLParser.VariableDeclarationContext):
         if ctx.expression():
             self.visit(ctx.expression())
-            symbol = ctx.symbol_info
-            name = self._get_var_name(symbol)
-            if symbol.category == types.SymbolCategory.GLOBAL: self._add_line(f"global.set {name}")
-            else: self._add_line(f"local.set {name}")
+            self._emit_owned_store(ctx.symbol_info)
     
+    def _emit_array_compound_assignment(self, target_type: types.ArrayType, right_expr, op_text: str):
+        """Pops the array on top of the stack and updates it in place: ``target op= right``."""
+        if isinstance(right_expr.type, types.ArrayType) and self._fusable_op_count(right_expr) >= 1:
+            # c += a * 2.0 updates c in place instead of materializing a * 2.0
+            op_map = {'+=': 'add', '-=': 'sub', '*=': 'mul', '/=': 'div'}
+            self._emit_fused_array(right_expr, in_place_op=op_map[op_text])
+            return
+
+        held = []
+        self.visit(right_expr)
+        if self._is_temporary_array(right_expr): held.append(self._hold_temporary())
+
+        type_suffix = "f64" if target_type.element_type == types.FLOAT else "i32"
+        scalar = "" if isinstance(right_expr.type, types.ArrayType) else "scalar_"
+        op_map = {'+=': 'add', '-=': 'sub', '*=': 'mul', '/=': 'div'}
+        self._add_line(f"call $arr_{op_map[op_text]}_assign_{scalar}{type_suffix}")
+        self._release_temporaries(held)
+
     def visitAssignmentStatement(self, ctx: GrammarMathPLParser.AssignmentStatementContext):
         left_expr = ctx.expression(0)
         right_expr = ctx.expression(1)
@@ -740,90 +1346,38 @@ class WatCodeGenerator(GrammarMathPLVisitor):
             symbol = left_expr.atom().variable().symbol_info
             name = self._get_var_name(symbol)
             if op_text != '=':
-                is_target_arr = isinstance(symbol.type, types.ArrayType)
-                is_right_arr = isinstance(right_expr.type, types.ArrayType)
-
                 if symbol.category == types.SymbolCategory.GLOBAL:
                     self._add_line(f"global.get {name}")
                 else:
                     self._add_line(f"local.get {name}")
-                
-                self.visit(right_expr)
-
-                func_name = ""
 
-                if is_target_arr and is_right_arr:
-                    elem_type = symbol.type.element_type
-                    type_suffix = "f64" if elem_type == types.FLOAT else "i32"
-                    op_map = {
-                        '+=': f"$arr_add_assign_{type_suffix}",
-                        '-=': f"$arr_sub_assign_{type_suffix}",
-                        '*=': f"$arr_mul_assign_{type_suffix}",
-                        '/=': f"$arr_div_assign_{type_suffix}",
-                    }
-                    func_name = op_map.get(op_text)
-                
-                elif is_target_arr and not is_right_arr:
-                    elem_type = symbol.type.element_type
-                    type_suffix = "f64" if elem_type == types.FLOAT else "i32"
-                    op_map = {
-                        '+=': f"$arr_add_assign_scalar_{type_suffix}",
-                        '-=': f"$arr_sub_assign_scalar_{type_suffix}",
-                        '*=': f"$arr_mul_assign_scalar_{type_suffix}",
-                        '/=': f"$arr_div_assign_scalar_{type_suffix}",
-                    }
-                    func_name = op_map.get(op_text)
-
-                else:
-                    wat_type = self._wat_type(symbol.type)
-                    suffix = "_s" if wat_type == "i32" and op_text in ('/=', '%=') else ""
-                    if op_text == '/=' and wat_type == 'f64': suffix = ""
-                    op_map = {'+=': 'add', '-=': 'sub', '*=': 'mul', '/=': 'div'}
-                    self._add_line(f"{wat_type}.{op_map[op_text]}{suffix}")
-                    if symbol.category == types.SymbolCategory.GLOBAL: self._add_line(f"global.set {name}")
-                    else: self._add_line(f"local.set {name}")
+                if isinstance(symbol.type, types.ArrayType):
+                    self._emit_array_compound_assignment(symbol.type, right_expr, op_text)
                     return
 
-                if func_name:
-                    self._add_line(f"call {func_name}")
-            
-            else:
                 self.visit(right_expr)
+                wat_type = self._wat_type(symbol.type)
+                suffix = "_s" if wat_type == "i32" and op_text in ('/=', '%=') else ""
+                if op_text == '/=' and wat_type == 'f64': suffix = ""
+                op_map = {'+=': 'add', '-=': 'sub', '*=': 'mul', '/=': 'div'}
+                self._add_line(f"{wat_type}.{op_map[op_text]}{suffix}")
                 if symbol.category == types.SymbolCategory.GLOBAL: self._add_line(f"global.set {name}")
                 else: self._add_line(f"local.set {name}")
+            
+            else:
+                self.visit(right_expr)
+                self._emit_owned_store(symbol)
+
+        elif left_expr.LBRACK() and not left_expr.COMMA() \
+                and isinstance(left_expr.expression(0).type, types.MatrixType):
+            # m[i] += ... updates row i of the matrix in place
+            self._emit_matrix_row(left_expr)
+            self._emit_array_compound_assignment(left_expr.type, right_expr, op_text)
 
         elif left_expr.LBRACK():
-            arr_expr = left_expr.expression(0)
-            idx_expr = left_expr.expression(1)
-            
-            # 1. Ptr & Idx
-            self.visit(arr_expr)
-            self._add_line("local.set $ptr_tmp") # Store cleanly
-            self.visit(idx_expr)
-            self._add_line("local.set $idx_tmp") # Store cleanly
-            
-            # 2. Normalize & Check
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("local.get $idx_tmp")
-            self._add_line("call $normalize_index")
-            self._add_line("local.set $idx_tmp")
-            
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("local.get $idx_tmp")
-            self._add_line("call $check_bounds")
-            
-            # 3. Calc Address
-            elem_type = arr_expr.type.element_type
+            elem_type = self._emit_element_address(left_expr) # Stack: [Addr]
             elem_size = self._get_element_size(elem_type)
             
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("i32.const 8")
-            self._add_line("i32.add")
-            self._add_line("local.get $idx_tmp")
-            self._add_line(f"i32.const {elem_size}")
-            self._add_line("i32.mul")
-            self._add_line("i32.add") # Stack: [Addr]
-            
             if op_text == '=':
                 self.visit(right_expr) # Stack: [Addr, Val]
                 if elem_size == 8: self._add_line("f64.store")
@@ -851,7 +1405,11 @@ class WatCodeGenerator(GrammarMathPLVisitor):
 
     def visitReturnStatement(self, ctx:GrammarMathPLParser.ReturnStatementContext):
         if ctx.expression(): self.visit(ctx.expression())
-        self._add_line("return")
+        self._free_owned_locals()
+        if self._inline_stack:
+            self._add_line(f"br {self._inline_stack[-1][1]}")
+        else:
+            self._add_line("return")
 
     def visitIfStatement(self, ctx: GrammarMathPLParser.IfStatementContext):
         self.visit(ctx.expression())
@@ -895,35 +1453,10 @@ class WatCodeGenerator(GrammarMathPLVisitor):
             else: self._add_line(f"local.set {name}")
         
         elif target_expr.LBRACK():
-            arr_expr = target_expr.expression(0)
-            idx_expr = target_expr.expression(1)
-            
-            self.visit(arr_expr)
-            self._add_line("local.set $ptr_tmp")
-            self.visit(idx_expr)
-            self._add_line("local.set $idx_tmp")
-            
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("local.get $idx_tmp")
-            self._add_line("call $normalize_index")
-            self._add_line("local.set $idx_tmp")
-
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("local.get $idx_tmp")
-            self._add_line("call $check_bounds")
-            
-            elem_type = arr_expr.type.element_type
+            elem_type = self._emit_element_address(target_expr)
             elem_size = self._get_element_size(elem_type)
             wat_type = "f64" if elem_size == 8 else "i32"
 
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("i32.const 8")
-            self._add_line("i32.add")
-            self._add_line("local.get $idx_tmp")
-            self._add_line(f"i32.const {elem_size}")
-            self._add_line("i32.mul")
-            self._add_line("i32.add")
-            
             self._add_line("local.tee $temp_addr") # Stack: [Addr]
             self._add_line("local.get $temp_addr") # Stack: [Addr, Addr] (Prep for load)
             
@@ -943,15 +1476,39 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         if ctx.functionArguments():
             for arg_expr in ctx.functionArguments().expression():
                 self.visit(arg_expr)
-        self._add_line(f"call ${ctx.ID().getText()}")
+        name = ctx.ID().getText()
+        candidate = self._inline_candidates.get(name)
+        # A recursive call inside its own inlined body stays a call
+        if candidate is not None and all(name != inlined for inlined, _ in self._inline_stack):
+            self._emit_inlined_call(ctx, candidate)
+        else:
+            self._add_line(f"call ${ctx.ID().getText()}")
         if is_statement and ctx.symbol_info.return_type != types.VOID:
             self._add_line("drop")
 
     def visitExpression(self, ctx:GrammarMathPLParser.ExpressionContext):
+        # Annotations left by MathPLOptimizer
+        if getattr(ctx, 'const_value', None) is not None:
+            self._emit_constant(ctx.type, ctx.const_value)
+            return
+        if getattr(ctx, 'replacement', None) is not None:
+            self.visit(ctx.replacement)
+            return
+
         if ctx.atom():
             self.visit(ctx.atom())
             return
 
+        if ctx.LBRACK() and ctx.COMMA():
+            elem_type = self._emit_element_address(ctx)
+            if elem_type == types.FLOAT: self._add_line("f64.load")
+            else: self._add_line("i32.load")
+            return
+
+        if ctx.LBRACK() and isinstance(ctx.expression(0).type, types.MatrixType):
+            self._emit_matrix_row(ctx)
+            return
+
         if ctx.LBRACK():
             arr_expr = ctx.expression(0)
             
@@ -959,7 +1516,9 @@ class WatCodeGenerator(GrammarMathPLVisitor):
                 start_expr = ctx.expression(1)
                 end_expr = ctx.expression(2)
                 
+                held = []
                 self.visit(arr_expr)
+                if self._is_temporary_array(arr_expr): held.append(self._hold_temporary())
                 self._add_line("local.set $ptr_tmp")
                 
                 self.visit(start_expr)
@@ -985,20 +1544,17 @@ class WatCodeGenerator(GrammarMathPLVisitor):
                     self._add_line("call $slice_f64")
                 else:
                     self._add_line("call $slice_i32")
+                self._release_temporaries(held)
                 return
 
             idx_expr = ctx.expression(1)
+            held = []
             self.visit(arr_expr)
+            if self._is_temporary_array(arr_expr): held.append(self._hold_temporary())
             self._add_line("local.set $ptr_tmp")
             self.visit(idx_expr)
             self._add_line("local.set $idx_tmp")
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("local.get $idx_tmp")
-            self._add_line("call $normalize_index") 
-            self._add_line("local.set $idx_tmp")
-            self._add_line("local.get $ptr_tmp")
-            self._add_line("local.get $idx_tmp")
-            self._add_line("call $check_bounds")
+            self._emit_index_checks(ctx)
             
             elem_type = arr_expr.type.element_type
             elem_size = self._get_element_size(elem_type)
@@ -1013,13 +1569,17 @@ class WatCodeGenerator(GrammarMathPLVisitor):
             
             if elem_size == 8: self._add_line("f64.load")
             else: self._add_line("i32.load")
+            self._release_temporaries(held)
             return
 
         if ctx.DOT() and ctx.LENGTH():
+            held = []
             self.visit(ctx.expression(0))
+            if self._is_temporary_array(ctx.expression(0)): held.append(self._hold_temporary())
             self._add_line("i32.const 4")
             self._add_line("i32.add")
             self._add_line("i32.load") 
+            self._release_temporaries(held)
             return
 
         if ctx.INC() or ctx.DEC():
@@ -1109,6 +1669,10 @@ class WatCodeGenerator(GrammarMathPLVisitor):
             is_right_arr = isinstance(right_type, types.ArrayType)
 
             if is_left_arr or is_right_arr:
+                if self._fusable_op_count(ctx) >= 2:
+                    self._emit_fused_array(ctx)
+                    return
+
                 func_name = ""
                 # Arr op Arr
                 if is_left_arr and is_right_arr:
@@ -1137,13 +1701,27 @@ class WatCodeGenerator(GrammarMathPLVisitor):
 
                 # Если нашли специальную JS-функцию для массива, вызываем ее
                 if func_name:
+                    held = []
                     self.visit(left_expr)
+                    if self._is_temporary_array(left_expr): held.append(self._hold_temporary())
                     self.visit(right_expr)
+                    if self._is_temporary_array(right_expr): held.append(self._hold_temporary())
                     self._add_line(f"call {func_name}")
+                    self._release_temporaries(held)
                     return
                 # Если не нашли (случай == и !=), то проваливаемся в стандартную скалярную/указательную логику ниже
             
             # --- Логика для скаляров (и сравнения указателей массивов) ---
+            if op == GrammarMathPLParser.POW and getattr(ctx, 'pow_exponent', None):
+                self.visit(left_expr)
+                if left_type == types.INT: self._add_line("f64.convert_i32_s")
+                if ctx.pow_exponent > 1:
+                    self._add_line("local.tee $tmp_val_f64")
+                    for _ in range(ctx.pow_exponent - 1):
+                        self._add_line("local.get $tmp_val_f64")
+                        self._add_line("f64.mul")
+                return
+
             if op == GrammarMathPLParser.POW:
                 self.visit(left_expr)
                 if left_type == types.INT: self._add_line("f64.convert_i32_s")
@@ -1152,9 +1730,12 @@ class WatCodeGenerator(GrammarMathPLVisitor):
                 self._add_line("call $pow")
                 return
 
+            held = []
             self.visit(left_expr)
+            if self._is_temporary_array(left_expr): held.append(self._hold_temporary())
             if left_type == types.INT and right_type == types.FLOAT: self._add_line("f64.convert_i32_s")
             self.visit(right_expr)
+            if self._is_temporary_array(right_expr): held.append(self._hold_temporary())
             if right_type == types.INT and left_type == types.FLOAT: self._add_line("f64.convert_i32_s")
 
             if left_type == types.STRING and op == GrammarMathPLParser.PLUS:
@@ -1188,20 +1769,32 @@ class WatCodeGenerator(GrammarMathPLVisitor):
             }
             wat_op = op_map.get((is_float, op), ";; unimpl")
             self._add_line(f"{wat_op}")
+            self._release_temporaries(held)
             return
 
     def visitAtom(self, ctx:GrammarMathPLParser.AtomContext):
+        if getattr(ctx, 'const_value', None) is not None:
+            self._emit_constant(ctx.type, ctx.const_value)
+            return
+
         if ctx.literal(): self.visit(ctx.literal())
         elif ctx.variable(): self.visit(ctx.variable())
         elif ctx.functionCall(): self.visit(ctx.functionCall())
         elif ctx.LPAREN(): self.visit(ctx.expression(0))
         elif ctx.typeCast(): self.visit(ctx.typeCast())
         
+        elif ctx.NEW() and ctx.COMMA():
+            target_type = self.analyzer._type_from_node(ctx.type_())
+            self.visit(ctx.atom(0))
+            self.visit(ctx.atom(1))
+            self._add_line(f"i32.const {self._get_element_size(target_type)}")
+            self._add_line("call $matrix_new")
+
         elif ctx.NEW():
             target_type = self.analyzer._type_from_node(ctx.type_())
             elem_size = self._get_element_size(target_type)
             
-            size_atom = ctx.atom()
+            size_atom = ctx.atom(0)
             self.visit(size_atom)
             self._add_line("local.tee $size_tmp")
             
@@ -1268,7 +1861,9 @@ class WatCodeGenerator(GrammarMathPLVisitor):
         if ctx.type == types.INT: self._add_line(f"(i32.const {ctx.getText()})")
         elif ctx.type == types.FLOAT: self._add_line(f"(f64.const {ctx.getText()})")
         elif ctx.type == types.BOOL: self._add_line(f"(i32.const {'1' if ctx.getText() == 'true' else '0'})")
-        elif ctx.type == types.STRING: self._add_line(f"(i32.const {ctx.address})")
+        elif ctx.type == types.STRING:
+            self._add_line(f"(i32.const {ctx.address})")
+            self.data_refs[self._function_name].add(ctx.address)
 
     def visitVariable(self, ctx: GrammarMathPLParser.VariableContext):
         symbol = ctx.symbol_info
@@ -1293,11 +1888,17 @@ class WatCodeGenerator(GrammarMathPLVisitor):
                 else: self._add_line("call $append_i32")
                 
                 symbol = target_expr.atom().variable().symbol_info
-                name = self._get_var_name(symbol)
-                if symbol.category == types.SymbolCategory.GLOBAL: 
-                    self._add_line(f"global.set {name}")
-                else: 
-                    self._add_line(f"local.set {name}")
+                if id(symbol) in self._owned:
+                    # A full array is copied into a bigger block; the old one is dropped
+                    self._add_line("local.tee $ptr_tmp")
+                    self._emit_variable_get(symbol)
+                    self._add_line("i32.ne")
+                    self._add_line("(if (then", 1)
+                    self._emit_variable_get(symbol)
+                    self._add_line("call $free")
+                    self._add_line("))", -1)
+                    self._add_line("local.get $ptr_tmp")
+                self._emit_variable_set(symbol)
 
             elif target_expr.LBRACK():
                 arr_expr = target_expr.expression(0)
@@ -1309,14 +1910,7 @@ class WatCodeGenerator(GrammarMathPLVisitor):
                 self.visit(idx_expr)
                 self._add_line("local.set $idx_tmp")
                 
-                self._add_line("local.get $ptr_tmp")
-                self._add_line("local.get $idx_tmp")
-                self._add_line("call $normalize_index")
-                self._add_line("local.set $idx_tmp")
-                
-                self._add_line("local.get $ptr_tmp")
-                self._add_line("local.get $idx_tmp")
-                self._add_line("call $check_bounds")
+                self._emit_index_checks(target_expr)
                 
                 
                 elem_type = arr_expr.type.element_type
@@ -0,0 +1,430 @@
+"""Structured form of the WAT module produced by ``WatCodeGenerator``.
+
+The generator writes WAT text line by line; ``parse_wat`` turns that text into
+a ``WatModule`` whose function bodies are flat lists of ``Instruction``s
+(folded S-expressions are unfolded, structured control flow becomes
+``block``/``loop``/``if`` ... ``else``/``end`` markers).  Optimization passes
+work on this form, and ``WatModule.to_wat`` renders it back to text.
+"""
+
+VALUE_TYPES = ("i32", "i64", "f32", "f64", "v128")
+BLOCK_OPS = ("block", "loop", "if")
+
+# Instructions that take exactly one plain immediate
+_ONE_IMMEDIATE = {
+    "local.get", "local.set", "local.tee", "global.get", "global.set",
+    "call", "return_call", "br", "br_if",
+    "i32.const", "i64.const", "f32.const", "f64.const",
+}
+# v128.const <shape> followed by one value per lane
+V128_SHAPES = {"i8x16": 16, "i16x8": 8, "i32x4": 4, "i64x2": 2, "f32x4": 4, "f64x2": 2}
+
+
+class WatParseError(Exception):
+    pass
+
+
+class Instruction:
+    __slots__ = ("op", "args", "label", "block_type")
+
+    def __init__(self, op: str, args=None, label: str | None = None, block_type: str | None = None):
+        self.op = op
+        self.args = list(args) if args else []
+        self.label = label
+        self.block_type = block_type
+
+    @property
+    def is_memory_access(self) -> bool:
+        return ".load" in self.op or ".store" in self.op
+
+    @property
+    def offset(self) -> int:
+        for arg in self.args:
+            if arg.startswith("offset="):
+                return int(arg[len("offset="):], 0)
+        return 0
+
+    def with_offset(self, offset: int) -> "Instruction":
+        args = [arg for arg in self.args if not arg.startswith("offset=")]
+        if offset:
+            args.insert(0, f"offset={offset}")
+        return Instruction(self.op, args)
+
+    def __eq__(self, other):
+        return isinstance(other, Instruction) and \
+            (self.op, self.args, self.label, self.block_type) == \
+            (other.op, other.args, other.label, other.block_type)
+
+    def __repr__(self) -> str:
+        return f"<Instruction {self.to_wat()}>"
+
+    def to_wat(self) -> str:
+        parts = [self.op]
+        if self.label:
+            parts.append(self.label)
+        if self.block_type:
+            parts.append(f"(result {self.block_type})")
+        parts.extend(self.args)
+        return " ".join(parts)
+
+
+class WatImport:
+    def __init__(self, module: str, field: str, name: str, params: list, results: list):
+        self.module = module
+        self.field = field
+        self.name = name
+        self.params = params
+        self.results = results
+
+    def to_wat(self) -> str:
+        signature = _signature_wat([(None, t) for t in self.params], self.results)
+        return f'(import "{self.module}" "{self.field}" (func {self.name}{signature}))'
+
+
+class WatGlobal:
+    def __init__(self, name: str, value_type: str, mutable: bool, init: list):
+        self.name = name
+        self.type = value_type
+        self.mutable = mutable
+        self.init = init
+
+    def to_wat(self) -> str:
+        value_type = f"(mut {self.type})" if self.mutable else self.type
+        init = " ".join(f"({instr.to_wat()})" for instr in self.init)
+        return f"(global {self.name} {value_type} {init})"
+
+
+class WatData:
+    def __init__(self, offset: int, data: bytes):
+        self.offset = offset
+        self.data = data
+
+    def to_wat(self) -> str:
+        escaped = ""
+        for byte in self.data:
+            char = chr(byte)
+            if " " <= char <= "~" and char not in ("\\", '"'):
+                escaped += char
+            else:
+                escaped += f"\\{byte:02x}"
+        return f'(data (i32.const {self.offset}) "{escaped}")'
+
+
+class WatFunction:
+    def __init__(self, name: str):
+        self.name = name
+        self.params = []    # [(name | None, type)]
+        self.results = []
+        self.locals = []    # [(name | None, type)]
+        self.body = []
+        self.exports = []
+
+    def local_types(self) -> dict:
+        return {name: value_type for name, value_type in self.params + self.locals if name}
+
+    def to_wat(self, indent: str = "  ") -> list:
+        header = f"(func {self.name}"
+        for export in self.exports:
+            header += f' (export "{export}")'
+        header += _signature_wat(self.params, self.results)
+        lines = [indent + header]
+        for name, value_type in self.locals:
+            lines.append(indent * 2 + (f"(local {name} {value_type})" if name else f"(local {value_type})"))
+        depth = 2
+        for instr in self.body:
+            if instr.op in ("end", "else"):
+                depth -= 1
+            lines.append(indent * depth + instr.to_wat())
+            if instr.op in BLOCK_OPS or instr.op == "else":
+                depth += 1
+        lines.append(indent + ")")
+        return lines
+
+
+class WatModule:
+    def __init__(self):
+        self.imports = []
+        self.memory_pages = 1
+        self.memory_exports = []
+        self.globals = []
+        self.data = []
+        self.functions = []
+        self.exports = []   # [(field, kind, name)] for top-level exports
+
+    def function(self, name: str) -> WatFunction | None:
+        for func in self.functions:
+            if func.name == name:
+                return func
+        return None
+
+    def to_wat(self) -> str:
+        lines = ["(module"]
+        for imp in self.imports:
+            lines.append("  " + imp.to_wat())
+        lines.append(f"  (memory {self.memory_pages})")
+        for export in self.memory_exports:
+            lines.append(f'  (export "{export}" (memory 0))')
+        for data in self.data:
+            lines.append("  " + data.to_wat())
+        for glob in self.globals:
+            lines.append("  " + glob.to_wat())
+        for func in self.functions:
+            lines.extend(func.to_wat())
+        for field, kind, name in self.exports:
+            lines.append(f'  (export "{field}" ({kind} {name}))')
+        lines.append(")")
+        return "\n".join(lines)
+
+
+def _signature_wat(params: list, results: list) -> str:
+    text = ""
+    for name, value_type in params:
+        text += f" (param {name} {value_type})" if name else f" (param {value_type})"
+    if results:
+        text += f" (result {' '.join(results)})"
+    return text
+
+
+# --- Parsing ---
+
+class _String(bytes):
+    """A quoted WAT string, kept apart from plain atoms."""
+
+
+def _decode_string(raw: str) -> _String:
+    result = bytearray()
+    i = 0
+    while i < len(raw):
+        char = raw[i]
+        if char != "\\":
+            result.extend(char.encode("utf-8"))
+            i += 1
+            continue
+        nxt = raw[i + 1]
+        simple = {"n": 10, "t": 9, "r": 13, '"': 34, "'": 39, "\\": 92}
+        if nxt in simple:
+            result.append(simple[nxt])
+            i += 2
+        elif nxt == "u":
+            end = raw.index("}", i)
+            result.extend(chr(int(raw[i + 3:end], 16)).encode("utf-8"))
+            i = end + 1
+        else:
+            result.append(int(raw[i + 1:i + 3], 16))
+            i += 3
+    return _String(result)
+
+
+def _tokenize(text: str) -> list:
+    tokens = []
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char.isspace():
+            i += 1
+        elif text.startswith(";;", i):
+            end = text.find("\n", i)
+            i = length if end == -1 else end
+        elif text.startswith("(;", i):
+            i = text.index(";)", i) + 2
+        elif char in "()":
+            tokens.append(char)
+            i += 1
+        elif char == '"':
+            j = i + 1
+            while text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            tokens.append(_decode_string(text[i + 1:j]))
+            i = j + 1
+        else:
+            j = i
+            while j < length and not text[j].isspace() and text[j] not in '()";':
+                j += 1
+            tokens.append(text[i:j])
+            i = j
+    return tokens
+
+
+def _read_sexprs(tokens: list) -> list:
+    stack = [[]]
+    for token in tokens:
+        if token == "(" and not isinstance(token, _String):
+            stack.append([])
+        elif token == ")" and not isinstance(token, _String):
+            if len(stack) == 1:
+                raise WatParseError("Unbalanced ')'")
+            done = stack.pop()
+            stack[-1].append(done)
+        else:
+            stack[-1].append(token)
+    if len(stack) != 1:
+        raise WatParseError("Unbalanced '('")
+    return stack[0]
+
+
+def _is_atom(item) -> bool:
+    return isinstance(item, str)
+
+
+def _is_list(item, head: str | None = None) -> bool:
+    return isinstance(item, list) and (head is None or (item and item[0] == head))
+
+
+def _parse_block_header(items: list, i: int):
+    label = None
+    block_type = None
+    if i < len(items) and _is_atom(items[i]) and items[i].startswith("$"):
+        label = items[i]
+        i += 1
+    if i < len(items) and _is_list(items[i], "result"):
+        block_type = items[i][1]
+        i += 1
+    return label, block_type, i
+
+
+def _parse_immediates(op: str, items: list, i: int):
+    args = []
+    if ".load" in op or ".store" in op:
+        while i < len(items) and _is_atom(items[i]) and items[i].startswith(("offset=", "align=")):
+            args.append(items[i])
+            i += 1
+    elif op == "v128.const":
+        count = 1 + V128_SHAPES[items[i]]
+        args = list(items[i:i + count])
+        i += count
+    elif op in _ONE_IMMEDIATE or op.endswith(("extract_lane", "extract_lane_s", "extract_lane_u", "replace_lane")):
+        if i >= len(items) or not _is_atom(items[i]):
+            raise WatParseError(f"'{op}' expects an immediate")
+        args.append(items[i])
+        i += 1
+    return args, i
+
+
+def _parse_instructions(items: list, out: list):
+    i = 0
+    while i < len(items):
+        item = items[i]
+        if isinstance(item, list):
+            _parse_folded(item, out)
+            i += 1
+            continue
+        if isinstance(item, _String):
+            raise WatParseError("Unexpected string in function body")
+        op = item
+        i += 1
+        if op in BLOCK_OPS:
+            label, block_type, i = _parse_block_header(items, i)
+            out.append(Instruction(op, label=label, block_type=block_type))
+        elif op in ("else", "end"):
+            if i < len(items) and _is_atom(items[i]) and items[i].startswith("$"):
+                i += 1
+            out.append(Instruction(op))
+        else:
+            args, i = _parse_immediates(op, items, i)
+            out.append(Instruction(op, args))
+
+
+def _parse_folded(sexpr: list, out: list):
+    head = sexpr[0]
+    if head in ("block", "loop"):
+        label, block_type, i = _parse_block_header(sexpr, 1)
+        out.append(Instruction(head, label=label, block_type=block_type))
+        _parse_instructions(sexpr[i:], out)
+        out.append(Instruction("end"))
+    elif head == "if":
+        label, block_type, i = _parse_block_header(sexpr, 1)
+        condition, then_branch, else_branch = [], None, None
+        for item in sexpr[i:]:
+            if _is_list(item, "then"):
+                then_branch = item[1:]
+            elif _is_list(item, "else"):
+                else_branch = item[1:]
+            else:
+                condition.append(item)
+        _parse_instructions(condition, out)
+        out.append(Instruction("if", label=label, block_type=block_type))
+        _parse_instructions(then_branch or [], out)
+        if else_branch is not None:
+            out.append(Instruction("else"))
+            _parse_instructions(else_branch, out)
+        out.append(Instruction("end"))
+    else:
+        args, i = _parse_immediates(head, sexpr, 1)
+        _parse_instructions(sexpr[i:], out)
+        out.append(Instruction(head, args))
+
+
+def _parse_typed_names(items: list) -> list:
+    """``(param $a i32)`` / ``(param i32 f64)`` -> [(name | None, type)]"""
+    if len(items) == 2 and items[0].startswith("$"):
+        return [(items[0], items[1])]
+    return [(None, value_type) for value_type in items]
+
+
+def _parse_func(sexpr: list) -> WatFunction:
+    i = 1
+    name = None
+    if i < len(sexpr) and _is_atom(sexpr[i]) and sexpr[i].startswith("$"):
+        name = sexpr[i]
+        i += 1
+    func = WatFunction(name)
+    while i < len(sexpr) and isinstance(sexpr[i], list) and sexpr[i] and \
+            sexpr[i][0] in ("export", "param", "result", "local"):
+        item = sexpr[i]
+        if item[0] == "export":
+            func.exports.append(item[1].decode("utf-8"))
+        elif item[0] == "param":
+            func.params.extend(_parse_typed_names(item[1:]))
+        elif item[0] == "result":
+            func.results.extend(item[1:])
+        else:
+            func.locals.extend(_parse_typed_names(item[1:]))
+        i += 1
+    _parse_instructions(sexpr[i:], func.body)
+    return func
+
+
+def parse_wat(text: str) -> WatModule:
+    top = _read_sexprs(_tokenize(text))
+    if len(top) != 1 or not _is_list(top[0], "module"):
+        raise WatParseError("Expected a single (module ...)")
+
+    module = WatModule()
+    for field in top[0][1:]:
+        head = field[0]
+        if head == "import":
+            desc = field[3]
+            if desc[0] != "func":
+                raise WatParseError(f"Unsupported import kind '{desc[0]}'")
+            func = _parse_func(desc)
+            module.imports.append(WatImport(
+                field[1].decode("utf-8"), field[2].decode("utf-8"), func.name,
+                [value_type for _, value_type in func.params], func.results
+            ))
+        elif head == "memory":
+            module.memory_pages = int(field[1])
+        elif head == "export":
+            export_name = field[1].decode("utf-8")
+            kind, target = field[2][0], field[2][1]
+            if kind == "memory":
+                module.memory_exports.append(export_name)
+            else:
+                module.exports.append((export_name, kind, target))
+        elif head == "data":
+            offset = []
+            _parse_instructions([field[1]], offset)
+            module.data.append(WatData(int(offset[0].args[0], 0), b"".join(field[2:])))
+        elif head == "global":
+            if _is_list(field[2], "mut"):
+                value_type, mutable = field[2][1], True
+            else:
+                value_type, mutable = field[2], False
+            init = []
+            _parse_instructions(field[3:], init)
+            module.globals.append(WatGlobal(field[1], value_type, mutable, init))
+        elif head == "func":
+            module.functions.append(_parse_func(field))
+        else:
+            raise WatParseError(f"Unsupported module field '{head}'")
+    return module
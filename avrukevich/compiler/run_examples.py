@@ -1,7 +1,10 @@
 import os
 import sys
+import shutil
 import subprocess
 
+from benchmark import check_peak_memory, check_runtime_errors
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 VENV_DIR = os.path.join(BASE_DIR, ".venv")
@@ -57,32 +60,29 @@ def run_tests():
 
     log(f"Found example files: {len(files)}. Running compiler...")
     
-    success_count = 0
-    for file in files:
-        source_path = os.path.join(EXAMPLES_DIR, file)
-        
-        cmd = [
-            sys.executable, 
-            "-m", MODULE_NAME, 
-            source_path, 
-            "-o", OUTPUT_DIR, 
-            "--wasm"
-        ]
-        
-        try:
-            subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=BASE_DIR)
-            print(f" [OK] {file}")
-            success_count += 1
-        except subprocess.CalledProcessError as e:
-            print(f" [FAIL] {file}")
-            print("      " + e.stdout.replace("\n", "\n      "))
-            if e.stderr:
-                print("      Stderr: " + e.stderr.replace("\n", "\n      "))
-    
+    # One compiler process for all files: the workers import the parser once.
+    cmd = [
+        sys.executable, 
+        "-m", MODULE_NAME, 
+        EXAMPLES_DIR, 
+        "-o", OUTPUT_DIR, 
+        "--wasm",
+        "-j", str(os.cpu_count() or 1)
+    ]
+    result = subprocess.run(cmd, cwd=BASE_DIR)
+
     log(
-        f"Result: Successful {success_count} out of {len(files)}. "
+        f"Compiler exited with code {result.returncode}. "
         f"Output folder: {OUTPUT_DIR}"
     )
+    if result.returncode != 0:
+        sys.exit(result.returncode)
+
+    if shutil.which("node") is None:
+        log("node was not found on PATH: runtime and memory checks skipped.")
+        return
+    if check_runtime_errors() + check_peak_memory():
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,196 @@
+// Command-line runner for compiled MathPL modules (node 16+):
+//
+//   node wasm_runner/headless.js out/example_1.wasm [--runs N] [--input TEXT]... [--json]
+//
+// Every run instantiates the module again (a program starts with a fresh
+// heap) and calls `_start`. Answers to input() are taken from --input in
+// order, or from the lines of stdin when no --input is given (stdin is read
+// on the first call of input(), so a program that asks for nothing never
+// touches it). The output of the first run is printed, followed by a report:
+// the time of instantiation and of `_start`, and the peak size of linear
+// memory. With --json the report, including the output, is printed as one
+// JSON object instead.
+//
+// The exit code is 1 if a run traps or an import throws (the output so far
+// and the report are still printed) and 2 on bad arguments or an unreadable
+// module.
+
+const fs = require('fs');
+const path = require('path');
+const { createImportObject } = require('./imports.js');
+
+const USAGE = 'usage: node headless.js <file.wasm> [--runs N] [--input TEXT]... [--json]';
+
+function parseArgs(argv) {
+    const options = { file: null, runs: 1, inputs: null, json: false };
+    for (let i = 0; i < argv.length; i++) {
+        const arg = argv[i];
+        if (arg === '--runs') {
+            options.runs = Number(argv[++i]);
+            if (!Number.isInteger(options.runs) || options.runs < 1) throw new Error('--runs expects a positive integer');
+        } else if (arg === '--input') {
+            if (i + 1 >= argv.length) throw new Error('--input expects a value');
+            (options.inputs = options.inputs || []).push(argv[++i]);
+        } else if (arg === '--json') {
+            options.json = true;
+        } else if (arg.startsWith('--') || options.file !== null) {
+            throw new Error(`unexpected argument '${arg}'`);
+        } else {
+            options.file = arg;
+        }
+    }
+    if (options.file === null) throw new Error('no module given');
+    return options;
+}
+
+function readStdinLines() {
+    if (process.stdin.isTTY) return [];
+    // readFileSync(0) fails with EAGAIN on a non-blocking pipe that has no
+    // data yet, so read in chunks and wait for the writer instead
+    const chunks = [];
+    const chunk = Buffer.alloc(65536);
+    const pause = new Int32Array(new SharedArrayBuffer(4));
+    for (;;) {
+        let count;
+        try {
+            count = fs.readSync(0, chunk, 0, chunk.length, null);
+        } catch (e) {
+            if (e.code !== 'EAGAIN') throw e;
+            Atomics.wait(pause, 0, 0, 10);
+            continue;
+        }
+        if (count === 0) break;
+        chunks.push(Buffer.from(chunk.subarray(0, count)));
+    }
+    const text = Buffer.concat(chunks).toString('utf8');
+    const lines = text.split(/\r?\n/);
+    if (lines[lines.length - 1] === '') lines.pop();
+    return lines;
+}
+
+// Returns a function that yields the answers to input(), reading stdin once,
+// on the first call
+function inputSource(options) {
+    let lines = options.inputs;
+    return () => {
+        if (lines === null) lines = readStdinLines();
+        return lines;
+    };
+}
+
+function runOnce(wasmModule, inputs) {
+    let pending = null;
+    let readNs = 0n;
+    const decoder = new TextDecoder('utf-8');
+    let instance = null;
+    let output = '';
+
+    const importObject = createImportObject({
+        instance: () => instance,
+        write: (ptr, len) => {
+            output += decoder.decode(new Uint8Array(instance.exports.memory.buffer, ptr, len), { stream: true });
+        },
+        print: (text) => { output += text + '\n'; },
+        input: () => {
+            if (pending === null) {
+                // Waiting for stdin is not part of the program's run time
+                const readStart = process.hrtime.bigint();
+                pending = [...inputs()];
+                readNs = process.hrtime.bigint() - readStart;
+            }
+            return pending.length ? pending.shift() : '';
+        },
+    });
+
+    const instantiateStart = process.hrtime.bigint();
+    instance = new WebAssembly.Instance(wasmModule, importObject);
+    const runStart = process.hrtime.bigint();
+    let trap = null;
+    try {
+        instance.exports._start();
+    } catch (e) {
+        // A wasm trap, a stack overflow or an error thrown by an import
+        // (the array kernels of --no-simd builds) all stop the program
+        trap = e instanceof Error ? e.message : String(e);
+    }
+    const runEnd = process.hrtime.bigint();
+    if (trap !== null && instance.exports.flush) instance.exports.flush();
+    output += decoder.decode();
+
+    return {
+        instantiateMs: Number(runStart - instantiateStart) / 1e6,
+        runMs: Number(runEnd - runStart - readNs) / 1e6,
+        memoryBytes: instance.exports.memory.buffer.byteLength,
+        output,
+        trap,
+    };
+}
+
+function summarize(values) {
+    const sorted = [...values].sort((a, b) => a - b);
+    const sum = sorted.reduce((a, b) => a + b, 0);
+    return {
+        min: sorted[0],
+        median: sorted[Math.floor(sorted.length / 2)],
+        mean: sum / sorted.length,
+        max: sorted[sorted.length - 1],
+    };
+}
+
+function main() {
+    let options;
+    try {
+        options = parseArgs(process.argv.slice(2));
+    } catch (e) {
+        console.error(`error: ${e.message}\n${USAGE}`);
+        return 2;
+    }
+
+    let wasmModule;
+    const compileStart = process.hrtime.bigint();
+    try {
+        wasmModule = new WebAssembly.Module(fs.readFileSync(options.file));
+    } catch (e) {
+        console.error(`error: could not load '${options.file}': ${e.message}`);
+        return 2;
+    }
+    const compileMs = Number(process.hrtime.bigint() - compileStart) / 1e6;
+
+    const inputs = inputSource(options);
+    const runs = [];
+    for (let i = 0; i < options.runs; i++) runs.push(runOnce(wasmModule, inputs));
+
+    const first = runs[0];
+    const trap = runs.map((run) => run.trap).find((t) => t !== null) || null;
+    const report = {
+        file: path.resolve(options.file),
+        runs: runs.length,
+        compile_ms: compileMs,
+        instantiate_ms: summarize(runs.map((run) => run.instantiateMs)),
+        run_ms: summarize(runs.map((run) => run.runMs)),
+        times_ms: runs.map((run) => run.runMs),
+        peak_memory_bytes: Math.max(...runs.map((run) => run.memoryBytes)),
+        output: first.output,
+        trap,
+    };
+
+    if (options.json) {
+        console.log(JSON.stringify(report));
+    } else {
+        process.stdout.write(first.output);
+        if (first.output && !first.output.endsWith('\n')) process.stdout.write('\n');
+        const ms = (value) => value.toFixed(3);
+        console.error(`--- ${options.file}: ${report.runs} run(s) ---`);
+        if (trap !== null) console.error(`trap:           ${trap}`);
+        console.error(`compile:        ${ms(compileMs)} ms`);
+        console.error(`instantiate:    ${ms(report.instantiate_ms.median)} ms (median)`);
+        console.error(
+            `_start:         ${ms(report.run_ms.median)} ms median, ` +
+            `${ms(report.run_ms.min)} min, ${ms(report.run_ms.max)} max, ${ms(report.run_ms.mean)} mean`
+        );
+        console.error(`peak memory:    ${report.peak_memory_bytes} bytes (${report.peak_memory_bytes / 65536} pages)`);
+    }
+    return trap === null ? 0 : 1;
+}
+
+process.exitCode = main();
@@ -0,0 +1,297 @@
+// Import object of MathPL modules, shared by the browser page (script.js)
+// and the command-line runner (headless.js). The host connects it to the
+// page or to the terminal:
+//   instance()       the running WebAssembly.Instance
+//   write(ptr, len)  a chunk of UTF-8 output in linear memory
+//   print(text)      a number printed with print_i32/print_f64
+//   input()          the answer to input(), as a string
+
+function createImportObject(host) {
+    const memory = () => host.instance().exports.memory;
+
+    const getArrayMetadata = (ptr) => {
+        const view = new DataView(memory().buffer);
+        const cap = view.getInt32(ptr, true);
+        const len = view.getInt32(ptr + 4, true);
+        return { cap, len, dataPtr: ptr + 8 };
+    };
+
+    const createWasmArray = (len, elementSize) => {
+        const bytes = 8 + len * elementSize;
+        const ptr = host.instance().exports.malloc(bytes);
+        const view = new DataView(memory().buffer);
+        view.setInt32(ptr, len, true);
+        view.setInt32(ptr + 4, len, true);
+        return ptr;
+    };
+
+    const checkLengthMatch = (ptr1, ptr2) => {
+        const meta1 = getArrayMetadata(ptr1);
+        const meta2 = getArrayMetadata(ptr2);
+        if (meta1.len !== meta2.len) {
+            throw new Error(`Runtime Error: Array length mismatch for operation (${meta1.len} vs ${meta2.len}).`);
+        }
+        return meta1.len;
+    };
+
+    return {
+        js: {
+            'Math.pow': Math.pow,
+            'Math.sin': Math.sin,
+            'Math.cos': Math.cos,
+            'Math.tan': Math.tan,
+            'Math.asin': Math.asin,
+            'Math.acos': Math.acos,
+            'Math.atan': Math.atan,
+            'Math.log': Math.log,
+            'Math.log10': Math.log10
+        },
+        env: {
+            write: (ptr, len) => host.write(ptr, len),
+            print_i32: (val) => host.print(val.toString()),
+            print_f64: (val) => host.print(val.toString()),
+
+            input: () => {
+                const bytes = new TextEncoder().encode(host.input());
+                const ptr = host.instance().exports.str_alloc(bytes.length);
+                new Uint8Array(memory().buffer).set(bytes, ptr + 4);
+                return ptr;
+            },
+
+            arr_gt: (ptr1, ptr2) => getArrayMetadata(ptr1).len > getArrayMetadata(ptr2).len ? 1 : 0,
+            arr_gte: (ptr1, ptr2) => getArrayMetadata(ptr1).len >= getArrayMetadata(ptr2).len ? 1 : 0,
+            arr_lt: (ptr1, ptr2) => getArrayMetadata(ptr1).len < getArrayMetadata(ptr2).len ? 1 : 0,
+            arr_lte: (ptr1, ptr2) => getArrayMetadata(ptr1).len <= getArrayMetadata(ptr2).len ? 1 : 0,
+        
+            arr_add_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 4);
+                const src1 = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src1[i] + src2[i];
+                return newPtr;
+            },
+            arr_sub_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 4);
+                const src1 = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src1[i] - src2[i];
+                return newPtr;
+            },
+            arr_mul_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 4);
+                const src1 = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src1[i] * src2[i];
+                return newPtr;
+            },
+            arr_div_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 4);
+                const src1 = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = Math.trunc(src1[i] / src2[i]);
+                return newPtr;
+            },
+            arr_add_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 8);
+                const src1 = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src1[i] + src2[i];
+                return newPtr;
+            },
+            arr_sub_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 8);
+                const src1 = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src1[i] - src2[i];
+                return newPtr;
+            },
+            arr_mul_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 8);
+                const src1 = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src1[i] * src2[i];
+                return newPtr;
+            },
+            arr_div_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const newPtr = createWasmArray(len, 8);
+                const src1 = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src2 = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src1[i] / src2[i];
+                return newPtr;
+            },
+
+            arr_add_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 4);
+                const src = new Int32Array(memory().buffer, dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src[i] + val;
+                return newPtr;
+            },
+            arr_sub_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 4);
+                const src = new Int32Array(memory().buffer, dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src[i] - val;
+                return newPtr;
+            },
+            arr_mul_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 4);
+                const src = new Int32Array(memory().buffer, dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src[i] * val;
+                return newPtr;
+            },
+            arr_div_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 4);
+                const src = new Int32Array(memory().buffer, dataPtr, len);
+                const dest = new Int32Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = Math.trunc(src[i] / val);
+                return newPtr;
+            },
+            arr_add_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 8);
+                const src = new Float64Array(memory().buffer, dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src[i] + val;
+                return newPtr;
+            },
+            arr_sub_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 8);
+                const src = new Float64Array(memory().buffer, dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src[i] - val;
+                return newPtr;
+            },
+            arr_mul_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 8);
+                const src = new Float64Array(memory().buffer, dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src[i] * val;
+                return newPtr;
+            },
+            arr_div_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const newPtr = createWasmArray(len, 8);
+                const src = new Float64Array(memory().buffer, dataPtr, len);
+                const dest = new Float64Array(memory().buffer, getArrayMetadata(newPtr).dataPtr, len);
+                for (let i = 0; i < len; i++) dest[i] = src[i] / val;
+                return newPtr;
+            },
+
+            arr_add_assign_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] += src[i];
+            },
+            arr_sub_assign_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] -= src[i];
+            },
+            arr_mul_assign_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] *= src[i];
+            },
+            arr_div_assign_i32: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Int32Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Int32Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] = Math.trunc(target[i] / src[i]);
+            },
+            arr_add_assign_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] += src[i];
+            },
+            arr_sub_assign_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] -= src[i];
+            },
+            arr_mul_assign_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] *= src[i];
+            },
+            arr_div_assign_f64: (ptr1, ptr2) => {
+                const len = checkLengthMatch(ptr1, ptr2);
+                const target = new Float64Array(memory().buffer, getArrayMetadata(ptr1).dataPtr, len);
+                const src = new Float64Array(memory().buffer, getArrayMetadata(ptr2).dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] /= src[i];
+            },
+        
+            arr_add_assign_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Int32Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] += val;
+            },
+            arr_sub_assign_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Int32Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] -= val;
+            },
+            arr_mul_assign_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Int32Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] *= val;
+            },
+            arr_div_assign_scalar_i32: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Int32Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] = Math.trunc(target[i] / val);
+            },
+            arr_add_assign_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Float64Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] += val;
+            },
+            arr_sub_assign_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Float64Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] -= val;
+            },
+            arr_mul_assign_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Float64Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] *= val;
+            },
+            arr_div_assign_scalar_f64: (ptr, val) => {
+                const { len, dataPtr } = getArrayMetadata(ptr);
+                const target = new Float64Array(memory().buffer, dataPtr, len);
+                for (let i = 0; i < len; i++) target[i] /= val;
+            },
+        }
+    };
+}
+
+if (typeof module !== 'undefined') module.exports = { createImportObject };
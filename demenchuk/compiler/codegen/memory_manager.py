@@ -2,18 +2,584 @@
 Управление линейной памятью WASM
 
 Функциональность:
-- Аллокация памяти для списковых структур
-- Управление указателями
-- Реализация list в памяти (массив)
-- Реализация tree в памяти (узлы с указателями)
-- Реализация queue в памяти (связный список)
+- Аллокация памяти (bump-аллокатор с выравниванием и memory.grow)
+- Реализация list в памяти (растущий массив с удвоением ёмкости)
+- Реализация tree в памяти (узлы из пула, выделяемого блоками)
+- Реализация queue в памяти (кольцевой буфер)
 - Реализация element в памяти (контейнер значения)
 
 Структура памяти:
-- element: [type: i32, value: i32/f32]
-- list: [length: i32, capacity: i32, data: pointer]
+- element: [type: i32, value: i32]
+- list: [length: i32, capacity: i32, data: pointer, start: i32, kind: i32]
+- list data: [first: i32, used: i32, items: i32 * capacity]
+- tree: [size: i32, root: pointer, -, -, kind: i32]
 - tree_node: [value: i32, left: pointer, right: pointer]
-- queue_node: [value: i32, next: pointer]
+- queue: [length: i32, capacity: i32, start: i32, data: pointer, kind: i32]
+- queue data: [lo: i32, hi: i32, shared: i32, items: i32 * capacity]
+
+Длина всех коллекций лежит по смещению 0, поэтому length() одинаков
+для list, tree и queue. По смещению 16 лежит вид коллекции (KIND_*).
+
+Элементы списка занимают ячейки [start, start + length) блока данных.
+Списки неизменяемы: `lst >> x` и `x << lst` возвращают новый заголовок, а
+старый продолжает видеть прежние элементы. Блок данных при этом общий:
+ячейки [first, used) заняты каким-либо списком. Если список кончается на
+`used` (начинается с `first`) и за ним (перед ним) есть свободная ячейка,
+элемент записывается в тот же блок без копирования, иначе данные
+копируются в новый блок с запасом. Поэтому цепочки `lst = lst >> x` и
+`lst = x << lst` работают за амортизированное O(1).
+
+list_push и list_push_front изменяют сам заголовок; генератор использует их
+для построения новых списков и для `lst = lst >> x`, когда на список
+`lst` больше никто не ссылается (см. semantic/ownership.py). Так же
+`q = enqueue(q, x)` и `x, q = dequeue(q)` выполняются через queue_push и
+queue_pop.
 """
 
-# TODO: Реализовать MemoryManager
+from textwrap import dedent
+
+from .emitter import WATEmitter
+
+
+# Начало кучи (первые 4 KB зарезервированы)
+HEAP_START = 4096
+# Минимальная ёмкость нового списка/очереди (степень двойки для очереди)
+MIN_CAPACITY = 4
+QUEUE_CAPACITY = 8
+# Сколько узлов дерева выделяется одним блоком пула
+TREE_POOL_NODES = 256
+
+LIST_HEADER_SIZE = 20
+QUEUE_HEADER_SIZE = 20
+QUEUE_BLOCK_HEADER = 12
+TREE_HEADER_SIZE = 20
+TREE_NODE_SIZE = 12
+
+# Метка вида коллекции по смещению KIND_OFFSET в заголовке списка, очереди
+# и дерева: по ней for-in обходит значения, тип которых неизвестен при
+# компиляции (например, параметры функций)
+KIND_OFFSET = 16
+KIND_LIST = 1
+KIND_QUEUE = 2
+KIND_TREE = 3
+
+
+class MemoryManager:
+    """Генерирует глобальные переменные и runtime-функции для работы с памятью"""
+
+    def __init__(self, emitter: WATEmitter):
+        self.emitter = emitter
+
+    def emit_memory(self):
+        """Генерирует объявление памяти и глобальные указатели"""
+        self.emitter.emit(';; Memory (grows on demand)')
+        self.emitter.emit('(memory (export "memory") 1)')
+        self.emitter.emit("")
+        self.emitter.emit(';; Heap pointer')
+        self.emitter.emit(f'(global $heap_ptr (mut i32) (i32.const {HEAP_START}))')
+        self.emitter.emit(';; Tree node pool')
+        self.emitter.emit('(global $tree_pool_ptr (mut i32) (i32.const 0))')
+        self.emitter.emit('(global $tree_pool_end (mut i32) (i32.const 0))')
+        self.emitter.emit(';; Scratch buffer of builtins')
+        self.emitter.emit('(global $scratch_ptr (mut i32) (i32.const 0))')
+        self.emitter.emit('(global $scratch_size (mut i32) (i32.const 0))')
+        self.emitter.emit("")
+
+    def emit_runtime(self):
+        """Генерирует все runtime-функции"""
+        self.emitter.emit(";; Memory runtime")
+        self._emit_alloc()
+        self._emit_scratch()
+        self._emit_list_runtime()
+        self._emit_queue_runtime()
+        self._emit_tree_runtime()
+        self._emit_element_runtime()
+
+    def _emit_function(self, code: str):
+        """Выводит функцию, записанную многострочным WAT"""
+        for line in dedent(code).strip("\n").splitlines():
+            self.emitter.emit(line)
+        self.emitter.emit("")
+
+    # =========================================================================
+    # Аллокатор
+    # =========================================================================
+
+    def _emit_alloc(self):
+        """alloc: bump-аллокатор с выравниванием на 8 байт.
+
+        Если блок не помещается в память, она растёт как минимум вдвое,
+        чтобы число вызовов memory.grow было логарифмическим.
+        """
+        self._emit_function("""
+            (func $alloc (param $size i32) (result i32)
+              (local $ptr i32)
+              (local $end i32)
+              (local $need i32)
+              (local $pages i32)
+              (local.set $ptr (i32.and (i32.add (global.get $heap_ptr) (i32.const 7)) (i32.const -8)))
+              (local.set $end (i32.add (local.get $ptr) (local.get $size)))
+              (if (i32.gt_u (local.get $end) (i32.shl (memory.size) (i32.const 16)))
+                (then
+                  (local.set $need
+                    (i32.shr_u
+                      (i32.add (i32.sub (local.get $end) (i32.shl (memory.size) (i32.const 16))) (i32.const 65535))
+                      (i32.const 16)))
+                  (local.set $pages (memory.size))
+                  (if (i32.lt_u (local.get $pages) (local.get $need))
+                    (then (local.set $pages (local.get $need))))
+                  (if (i32.eq (memory.grow (local.get $pages)) (i32.const -1))
+                    (then
+                      (if (i32.eq (memory.grow (local.get $need)) (i32.const -1))
+                        (then (unreachable)))))))
+              (global.set $heap_ptr (local.get $end))
+              (local.get $ptr)
+            )""")
+
+    def _emit_scratch(self):
+        """scratch: общий временный буфер не меньше `size` байт.
+
+        Буфер переиспользуется всеми вызовами и заменяется вдвое большим,
+        только если запрошено больше, поэтому повторные вызовы не расходуют
+        кучу. Содержимое действительно до следующего вызова scratch.
+        """
+        self._emit_function("""
+            (func $scratch (param $size i32) (result i32)
+              (if (i32.gt_u (local.get $size) (global.get $scratch_size))
+                (then
+                  (global.set $scratch_size (i32.shl (global.get $scratch_size) (i32.const 1)))
+                  (if (i32.gt_u (local.get $size) (global.get $scratch_size))
+                    (then (global.set $scratch_size (local.get $size))))
+                  (global.set $scratch_ptr (call $alloc (global.get $scratch_size)))))
+              (global.get $scratch_ptr)
+            )""")
+
+    # =========================================================================
+    # list
+    # =========================================================================
+
+    def _emit_list_runtime(self):
+        """Функции для списков"""
+        self._emit_list_new()
+        self._emit_list_grow()
+        self._emit_list_push()
+        self._emit_list_push_front()
+        self._emit_list_append()
+        self._emit_list_prepend()
+        self._emit_list_concat()
+        self._emit_list_get()
+        self._emit_list_contains()
+        self._emit_list_items()
+
+    def _emit_list_new(self):
+        """list_new: пустой список с заданной ёмкостью"""
+        self._emit_function(f"""
+            (func $list_new (param $capacity i32) (result i32)
+              (local $list i32)
+              (local $data i32)
+              (if (i32.lt_s (local.get $capacity) (i32.const {MIN_CAPACITY}))
+                (then (local.set $capacity (i32.const {MIN_CAPACITY}))))
+              (local.set $data (call $alloc (i32.add (i32.const 8) (i32.shl (local.get $capacity) (i32.const 2)))))
+              (i32.store (local.get $data) (i32.const 0))
+              (i32.store offset=4 (local.get $data) (i32.const 0))
+              (local.set $list (call $alloc (i32.const {LIST_HEADER_SIZE})))
+              (i32.store (local.get $list) (i32.const 0))
+              (i32.store offset=4 (local.get $list) (local.get $capacity))
+              (i32.store offset=8 (local.get $list) (local.get $data))
+              (i32.store offset=12 (local.get $list) (i32.const 0))
+              (i32.store offset={KIND_OFFSET} (local.get $list) (i32.const {KIND_LIST}))
+              (local.get $list)
+            )""")
+
+    def _emit_list_grow(self):
+        """list_grow: копирует элементы списка в новый блок данных,
+        которым список владеет единолично, оставляя `front` свободных
+        ячеек перед первым элементом и не меньше `length` - после последнего
+        """
+        self._emit_function(f"""
+            (func $list_grow (param $list i32) (param $front i32)
+              (local $length i32)
+              (local $capacity i32)
+              (local $data i32)
+              (local.set $length (i32.load (local.get $list)))
+              (local.set $capacity (i32.shl (local.get $length) (i32.const 1)))
+              (if (i32.lt_s (local.get $capacity) (i32.const {MIN_CAPACITY}))
+                (then (local.set $capacity (i32.const {MIN_CAPACITY}))))
+              (local.set $capacity (i32.add (local.get $capacity) (local.get $front)))
+              (local.set $data (call $alloc (i32.add (i32.const 8) (i32.shl (local.get $capacity) (i32.const 2)))))
+              (memory.copy
+                (i32.add (i32.add (local.get $data) (i32.const 8)) (i32.shl (local.get $front) (i32.const 2)))
+                (i32.add
+                  (i32.add (i32.load offset=8 (local.get $list)) (i32.const 8))
+                  (i32.shl (i32.load offset=12 (local.get $list)) (i32.const 2)))
+                (i32.shl (local.get $length) (i32.const 2)))
+              (i32.store (local.get $data) (local.get $front))
+              (i32.store offset=4 (local.get $data) (i32.add (local.get $front) (local.get $length)))
+              (i32.store offset=4 (local.get $list) (local.get $capacity))
+              (i32.store offset=8 (local.get $list) (local.get $data))
+              (i32.store offset=12 (local.get $list) (local.get $front))
+            )""")
+
+    def _emit_list_push(self):
+        """list_push: добавляет элемент в конец списка на месте и
+        возвращает тот же список
+        """
+        self._emit_function("""
+            (func $list_push (param $list i32) (param $value i32) (result i32)
+              (local $end i32)
+              (local $data i32)
+              (local.set $end (i32.add (i32.load offset=12 (local.get $list)) (i32.load (local.get $list))))
+              (local.set $data (i32.load offset=8 (local.get $list)))
+              ;; Ячейка за концом списка занята другим списком или блок заполнен
+              (if (i32.or
+                    (i32.ne (i32.load offset=4 (local.get $data)) (local.get $end))
+                    (i32.ge_u (local.get $end) (i32.load offset=4 (local.get $list))))
+                (then
+                  (call $list_grow (local.get $list) (i32.const 0))
+                  (local.set $end (i32.load (local.get $list)))
+                  (local.set $data (i32.load offset=8 (local.get $list)))))
+              (i32.store offset=8
+                (i32.add (local.get $data) (i32.shl (local.get $end) (i32.const 2)))
+                (local.get $value))
+              (i32.store offset=4 (local.get $data) (i32.add (local.get $end) (i32.const 1)))
+              (i32.store (local.get $list) (i32.add (i32.load (local.get $list)) (i32.const 1)))
+              (local.get $list)
+            )""")
+
+    def _emit_list_push_front(self):
+        """list_push_front: добавляет элемент в начало списка на месте и
+        возвращает тот же список
+        """
+        self._emit_function(f"""
+            (func $list_push_front (param $list i32) (param $value i32) (result i32)
+              (local $start i32)
+              (local $data i32)
+              (local.set $start (i32.load offset=12 (local.get $list)))
+              (local.set $data (i32.load offset=8 (local.get $list)))
+              ;; Ячейка перед началом списка занята другим списком или её нет
+              (if (i32.or
+                    (i32.ne (i32.load (local.get $data)) (local.get $start))
+                    (i32.eqz (local.get $start)))
+                (then
+                  (local.set $start (i32.load (local.get $list)))
+                  (if (i32.lt_s (local.get $start) (i32.const {MIN_CAPACITY}))
+                    (then (local.set $start (i32.const {MIN_CAPACITY}))))
+                  (call $list_grow (local.get $list) (local.get $start))
+                  (local.set $data (i32.load offset=8 (local.get $list)))))
+              (local.set $start (i32.sub (local.get $start) (i32.const 1)))
+              (i32.store offset=8
+                (i32.add (local.get $data) (i32.shl (local.get $start) (i32.const 2)))
+                (local.get $value))
+              (i32.store (local.get $data) (local.get $start))
+              (i32.store offset=12 (local.get $list) (local.get $start))
+              (i32.store (local.get $list) (i32.add (i32.load (local.get $list)) (i32.const 1)))
+              (local.get $list)
+            )""")
+
+    def _emit_list_append(self):
+        """list_append: `list >> value`, возвращает новый список"""
+        self._emit_function(f"""
+            (func $list_append (param $list i32) (param $value i32) (result i32)
+              (local $result i32)
+              (local.set $result (call $alloc (i32.const {LIST_HEADER_SIZE})))
+              (memory.copy (local.get $result) (local.get $list) (i32.const {LIST_HEADER_SIZE}))
+              (call $list_push (local.get $result) (local.get $value))
+            )""")
+
+    def _emit_list_prepend(self):
+        """list_prepend: `value << list`, возвращает новый список"""
+        self._emit_function(f"""
+            (func $list_prepend (param $value i32) (param $list i32) (result i32)
+              (local $result i32)
+              (local.set $result (call $alloc (i32.const {LIST_HEADER_SIZE})))
+              (memory.copy (local.get $result) (local.get $list) (i32.const {LIST_HEADER_SIZE}))
+              (call $list_push_front (local.get $result) (local.get $value))
+            )""")
+
+    def _emit_list_concat(self):
+        """list_concat: `list + list`, возвращает новый список"""
+        self._emit_function("""
+            (func $list_concat (param $first i32) (param $second i32) (result i32)
+              (local $result i32)
+              (local $length i32)
+              (local.set $length (i32.load (local.get $first)))
+              (local.set $result (call $list_new (i32.add (local.get $length) (i32.load (local.get $second)))))
+              (memory.copy
+                (call $list_items (local.get $result))
+                (call $list_items (local.get $first))
+                (i32.shl (local.get $length) (i32.const 2)))
+              (memory.copy
+                (i32.add (call $list_items (local.get $result)) (i32.shl (local.get $length) (i32.const 2)))
+                (call $list_items (local.get $second))
+                (i32.shl (i32.load (local.get $second)) (i32.const 2)))
+              (call $list_set_length
+                (local.get $result)
+                (i32.add (local.get $length) (i32.load (local.get $second))))
+              (local.get $result)
+            )""")
+
+    def _emit_list_get(self):
+        """list_get: элемент по индексу (отрицательный индекс - с конца)"""
+        self._emit_function("""
+            (func $list_get (param $list i32) (param $index i32) (result i32)
+              (local $length i32)
+              (local.set $length (i32.load (local.get $list)))
+              (if (i32.lt_s (local.get $index) (i32.const 0))
+                (then (local.set $index (i32.add (local.get $index) (local.get $length)))))
+              (if (i32.ge_u (local.get $index) (local.get $length))
+                (then (unreachable)))
+              (i32.load offset=8
+                (i32.add
+                  (i32.load offset=8 (local.get $list))
+                  (i32.shl
+                    (i32.add (i32.load offset=12 (local.get $list)) (local.get $index))
+                    (i32.const 2))))
+            )""")
+
+    def _emit_list_contains(self):
+        """list_contains: `value @ list`"""
+        self._emit_function("""
+            (func $list_contains (param $value i32) (param $list i32) (result i32)
+              (local $ptr i32)
+              (local $end i32)
+              (local.set $ptr
+                (i32.add
+                  (i32.add (i32.load offset=8 (local.get $list)) (i32.const 8))
+                  (i32.shl (i32.load offset=12 (local.get $list)) (i32.const 2))))
+              (local.set $end (i32.add (local.get $ptr) (i32.shl (i32.load (local.get $list)) (i32.const 2))))
+              (block $done
+                (loop $scan
+                  (br_if $done (i32.ge_u (local.get $ptr) (local.get $end)))
+                  (if (i32.eq (i32.load (local.get $ptr)) (local.get $value))
+                    (then (return (i32.const 1))))
+                  (local.set $ptr (i32.add (local.get $ptr) (i32.const 4)))
+                  (br $scan)))
+              (i32.const 0)
+            )""")
+
+    def _emit_list_items(self):
+        """list_items: адрес первого элемента; list_set_length: длина списка,
+        заполненного напрямую (список должен владеть блоком данных)
+        """
+        self._emit_function("""
+            (func $list_items (param $list i32) (result i32)
+              (i32.add
+                (i32.add (i32.load offset=8 (local.get $list)) (i32.const 8))
+                (i32.shl (i32.load offset=12 (local.get $list)) (i32.const 2)))
+            )""")
+        self._emit_function("""
+            (func $list_set_length (param $list i32) (param $length i32)
+              (i32.store (local.get $list) (local.get $length))
+              (i32.store offset=4
+                (i32.load offset=8 (local.get $list))
+                (i32.add (i32.load offset=12 (local.get $list)) (local.get $length)))
+            )""")
+
+    # =========================================================================
+    # queue
+    # =========================================================================
+
+    def _emit_queue_runtime(self):
+        """Функции для очередей (кольцевой буфер, ёмкость - степень двойки).
+
+        Позиции элементов логические и только растут, ячейка позиции i -
+        i & (capacity - 1). Очередь видит позиции [start, start + length),
+        блок помнит [lo, hi) - позиции, которые может видеть хоть одна
+        очередь. Как и в списках, очередь, которая кончается на hi,
+        дописывает элемент в тот же блок (`enqueue` не меняет старую очередь),
+        пока в блоке есть место. Ячейки перед lo свободны: queue_pop сдвигает
+        lo, только если над блоком не создавали других заголовков (shared = 0),
+        поэтому очередь, которая изменяется на месте, переиспользует ячейки
+        кольца. Иначе при заполнении блок копируется в новый, которым очередь
+        владеет единолично.
+        """
+        self._emit_function(f"""
+            (func $queue_block_new (param $capacity i32) (result i32)
+              (local $block i32)
+              (local.set $block
+                (call $alloc (i32.add (i32.const {QUEUE_BLOCK_HEADER}) (i32.shl (local.get $capacity) (i32.const 2)))))
+              (i32.store (local.get $block) (i32.const 0))
+              (i32.store offset=4 (local.get $block) (i32.const 0))
+              (i32.store offset=8 (local.get $block) (i32.const 0))
+              (local.get $block)
+            )""")
+        self._emit_function(f"""
+            (func $queue_new (result i32)
+              (local $queue i32)
+              (local.set $queue (call $alloc (i32.const {QUEUE_HEADER_SIZE})))
+              (i32.store (local.get $queue) (i32.const 0))
+              (i32.store offset=4 (local.get $queue) (i32.const {QUEUE_CAPACITY}))
+              (i32.store offset=8 (local.get $queue) (i32.const 0))
+              (i32.store offset=12 (local.get $queue) (call $queue_block_new (i32.const {QUEUE_CAPACITY})))
+              (i32.store offset={KIND_OFFSET} (local.get $queue) (i32.const {KIND_QUEUE}))
+              (local.get $queue)
+            )""")
+
+        # Копирует элементы по порядку в начало нового блока: ячейки
+        # [start & mask, capacity) и [0, остаток)
+        self._emit_function(f"""
+            (func $queue_grow (param $queue i32)
+              (local $length i32)
+              (local $capacity i32)
+              (local $first i32)
+              (local $head_count i32)
+              (local $items i32)
+              (local $block i32)
+              (local.set $length (i32.load (local.get $queue)))
+              (local.set $capacity (i32.load offset=4 (local.get $queue)))
+              (local.set $items (i32.add (i32.load offset=12 (local.get $queue)) (i32.const {QUEUE_BLOCK_HEADER})))
+              (local.set $first
+                (i32.and (i32.load offset=8 (local.get $queue)) (i32.sub (local.get $capacity) (i32.const 1))))
+              (local.set $head_count (i32.sub (local.get $capacity) (local.get $first)))
+              (if (i32.gt_u (local.get $head_count) (local.get $length))
+                (then (local.set $head_count (local.get $length))))
+              (if (i32.ge_u (i32.shl (local.get $length) (i32.const 1)) (local.get $capacity))
+                (then (local.set $capacity (i32.shl (local.get $capacity) (i32.const 1)))))
+              (local.set $block (call $queue_block_new (local.get $capacity)))
+              (memory.copy
+                (i32.add (local.get $block) (i32.const {QUEUE_BLOCK_HEADER}))
+                (i32.add (local.get $items) (i32.shl (local.get $first) (i32.const 2)))
+                (i32.shl (local.get $head_count) (i32.const 2)))
+              (memory.copy
+                (i32.add (i32.add (local.get $block) (i32.const {QUEUE_BLOCK_HEADER})) (i32.shl (local.get $head_count) (i32.const 2)))
+                (local.get $items)
+                (i32.shl (i32.sub (local.get $length) (local.get $head_count)) (i32.const 2)))
+              (i32.store offset=4 (local.get $block) (local.get $length))
+              (i32.store offset=4 (local.get $queue) (local.get $capacity))
+              (i32.store offset=8 (local.get $queue) (i32.const 0))
+              (i32.store offset=12 (local.get $queue) (local.get $block))
+            )""")
+
+        # Добавляет элемент в конец очереди на месте и возвращает её
+        self._emit_function(f"""
+            (func $queue_push (param $queue i32) (param $value i32) (result i32)
+              (local $block i32)
+              (local $end i32)
+              (local.set $block (i32.load offset=12 (local.get $queue)))
+              (local.set $end (i32.add (i32.load offset=8 (local.get $queue)) (i32.load (local.get $queue))))
+              ;; Позиция за концом очереди занята другой очередью или кольцо заполнено
+              (if (i32.or
+                    (i32.ne (i32.load offset=4 (local.get $block)) (local.get $end))
+                    (i32.ge_u
+                      (i32.sub (local.get $end) (i32.load (local.get $block)))
+                      (i32.load offset=4 (local.get $queue))))
+                (then
+                  (call $queue_grow (local.get $queue))
+                  (local.set $block (i32.load offset=12 (local.get $queue)))
+                  (local.set $end (i32.load (local.get $queue)))))
+              (i32.store offset={QUEUE_BLOCK_HEADER}
+                (i32.add
+                  (local.get $block)
+                  (i32.shl
+                    (i32.and (local.get $end) (i32.sub (i32.load offset=4 (local.get $queue)) (i32.const 1)))
+                    (i32.const 2)))
+                (local.get $value))
+              (i32.store offset=4 (local.get $block) (i32.add (local.get $end) (i32.const 1)))
+              (i32.store (local.get $queue) (i32.add (i32.load (local.get $queue)) (i32.const 1)))
+              (local.get $queue)
+            )""")
+
+        # Извлекает первый элемент, изменяя заголовок на месте
+        self._emit_function(f"""
+            (func $queue_pop (param $queue i32) (result i32)
+              (local $block i32)
+              (local $start i32)
+              (local $value i32)
+              (if (i32.eqz (i32.load (local.get $queue)))
+                (then (unreachable)))
+              (local.set $block (i32.load offset=12 (local.get $queue)))
+              (local.set $start (i32.load offset=8 (local.get $queue)))
+              (local.set $value
+                (i32.load offset={QUEUE_BLOCK_HEADER}
+                  (i32.add
+                    (local.get $block)
+                    (i32.shl
+                      (i32.and (local.get $start) (i32.sub (i32.load offset=4 (local.get $queue)) (i32.const 1)))
+                      (i32.const 2)))))
+              (local.set $start (i32.add (local.get $start) (i32.const 1)))
+              (i32.store offset=8 (local.get $queue) (local.get $start))
+              (i32.store (local.get $queue) (i32.sub (i32.load (local.get $queue)) (i32.const 1)))
+              ;; Ячейку больше никто не видит
+              (if (i32.eqz (i32.load offset=8 (local.get $block)))
+                (then (i32.store (local.get $block) (local.get $start))))
+              (local.get $value)
+            )""")
+
+        # Копия заголовка над тем же блоком: блок становится общим
+        self._emit_function(f"""
+            (func $queue_share (param $queue i32) (result i32)
+              (local $result i32)
+              (local.set $result (call $alloc (i32.const {QUEUE_HEADER_SIZE})))
+              (memory.copy (local.get $result) (local.get $queue) (i32.const {QUEUE_HEADER_SIZE}))
+              (i32.store offset=8 (i32.load offset=12 (local.get $queue)) (i32.const 1))
+              (local.get $result)
+            )""")
+
+        # `enqueue(q, x)`: новая очередь, q не меняется
+        self._emit_function("""
+            (func $queue_enqueue (param $queue i32) (param $value i32) (result i32)
+              (call $queue_push (call $queue_share (local.get $queue)) (local.get $value))
+            )""")
+
+        # `dequeue(q)`: список [элемент, очередь без него], q не меняется
+        self._emit_function("""
+            (func $queue_dequeue (param $queue i32) (result i32)
+              (local $result i32)
+              (local $value i32)
+              (local.set $result (call $queue_share (local.get $queue)))
+              (local.set $value (call $queue_pop (local.get $result)))
+              (call $list_push
+                (call $list_push (call $list_new (i32.const 2)) (local.get $value))
+                (local.get $result))
+            )""")
+
+    # =========================================================================
+    # tree
+    # =========================================================================
+
+    def _emit_tree_runtime(self):
+        """Функции для деревьев (двоичное дерево поиска, равные значения - справа)"""
+        # Узлы берутся из пула, который пополняется блоками по
+        # TREE_POOL_NODES узлов, вместо отдельного alloc на каждый узел
+        self._emit_function(f"""
+            (func $tree_node_new (param $value i32) (result i32)
+              (local $node i32)
+              (if (i32.gt_u
+                    (i32.add (global.get $tree_pool_ptr) (i32.const {TREE_NODE_SIZE}))
+                    (global.get $tree_pool_end))
+                (then
+                  (global.set $tree_pool_ptr (call $alloc (i32.const {TREE_NODE_SIZE * TREE_POOL_NODES})))
+                  (global.set $tree_pool_end
+                    (i32.add (global.get $tree_pool_ptr) (i32.const {TREE_NODE_SIZE * TREE_POOL_NODES})))))
+              (local.set $node (global.get $tree_pool_ptr))
+              (global.set $tree_pool_ptr (i32.add (local.get $node) (i32.const {TREE_NODE_SIZE})))
+              (i32.store (local.get $node) (local.get $value))
+              (i32.store offset=4 (local.get $node) (i32.const 0))
+              (i32.store offset=8 (local.get $node) (i32.const 0))
+              (local.get $node)
+            )""")
+
+        self._emit_function(f"""
+            (func $tree_new (result i32)
+              (local $tree i32)
+              (local.set $tree (call $alloc (i32.const {TREE_HEADER_SIZE})))
+              (i32.store (local.get $tree) (i32.const 0))
+              (i32.store offset=4 (local.get $tree) (i32.const 0))
+              (i32.store offset={KIND_OFFSET} (local.get $tree) (i32.const {KIND_TREE}))
+              (local.get $tree)
+            )""")
+
+    # =========================================================================
+    # element
+    # =========================================================================
+
+    def _emit_element_runtime(self):
+        """Функции для контейнера element"""
+        self._emit_function("""
+            (func $element_new (param $type i32) (param $value i32) (result i32)
+              (local $element i32)
+              (local.set $element (call $alloc (i32.const 8)))
+              (i32.store (local.get $element) (local.get $type))
+              (i32.store offset=4 (local.get $element) (local.get $value))
+              (local.get $element)
+            )""")
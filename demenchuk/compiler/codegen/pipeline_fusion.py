@@ -0,0 +1,227 @@
+"""
+Слияние поэлементных стадий pipeline
+
+Пользовательская функция считается поэлементной (map/filter), если она
+имеет вид:
+
+    def f(lst):
+        result = []
+        for item in lst:
+            tmp = ...              # ноль или больше присваиваний
+            if condition:          # необязательный фильтр, без else
+                result = result >> value
+        return result
+
+а выражения в теле цикла используют только `item`, временные переменные,
+литералы и вызовы функций, которые ничего не выводят. Соседние
+поэлементные стадии `data |> f |> g` генератор выполняет одним циклом по
+`data` и строит только итоговый список; остальные стадии (sort, unique,
+write, другие функции) получают готовый список как обычный аргумент.
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'generated'))
+
+from antlr4 import ParserRuleContext
+from RivScriptParser import RivScriptParser
+
+
+# Встроенные функции, которые выполняют ввод/вывод
+IO_BUILTINS = {"write", "read"}
+
+
+class ElementwiseStage(NamedTuple):
+    """Поэлементная стадия: присваивания, фильтр и новое значение элемента"""
+    item: str
+    temps: List[Tuple[str, ParserRuleContext]]
+    condition: Optional[ParserRuleContext]
+    value: ParserRuleContext
+
+
+def find_elementwise_functions(tree: RivScriptParser.ProgramContext) -> Dict[str, ElementwiseStage]:
+    """Возвращает поэлементные функции с одним параметром по именам"""
+    functions = {}
+    for item in tree.program_item():
+        function = item.function_def()
+        if function:
+            functions.setdefault(function.ID().getText(), []).append(function)
+
+    quiet = _QuietFunctions(functions)
+    stages = {}
+    for name, overloads in functions.items():
+        unary = [f for f in overloads if f.param_list() and len(f.param_list().param()) == 1]
+        if len(unary) == 1:
+            stage = _as_elementwise(unary[0], quiet)
+            if stage:
+                stages[name] = stage
+    return stages
+
+
+def _statements(block: RivScriptParser.Statement_blockContext) -> List[ParserRuleContext]:
+    """Инструкции блока без обёртки statement"""
+    result = []
+    for statement in block.statement():
+        result.append(next(c for c in statement.getChildren() if isinstance(c, ParserRuleContext)))
+    return result
+
+
+def _strip(ctx: ParserRuleContext) -> ParserRuleContext:
+    """Спускается по цепочке узлов с единственным подвыражением"""
+    while True:
+        if isinstance(ctx, RivScriptParser.ParenExprContext):
+            ctx = ctx.expr()
+        elif ctx.getChildCount() == 1 and isinstance(ctx.getChild(0), ParserRuleContext):
+            ctx = ctx.getChild(0)
+        else:
+            return ctx
+
+
+def _single_assignment(ctx) -> Optional[Tuple[str, ParserRuleContext]]:
+    if not isinstance(ctx, RivScriptParser.Assignment_stmtContext):
+        return None
+    ids = ctx.id_list().ID()
+    exprs = ctx.expr_list().expr()
+    if len(ids) != 1 or len(exprs) != 1:
+        return None
+    return ids[0].getText(), exprs[0]
+
+
+def _appended_value(ctx, result: str) -> Optional[ParserRuleContext]:
+    """Значение из `result = result >> value`"""
+    assignment = _single_assignment(ctx)
+    if not assignment or assignment[0] != result:
+        return None
+    additive = _strip(assignment[1])
+    if not isinstance(additive, RivScriptParser.Additive_exprContext) or additive.getChildCount() != 3:
+        return None
+    left, op, value = additive.getChildren()
+    left = _strip(left)
+    if op.getText() != '>>' or not isinstance(left, RivScriptParser.IdExprContext) or left.ID().getText() != result:
+        return None
+    return value
+
+
+def _as_elementwise(function: RivScriptParser.Function_defContext, quiet: '_QuietFunctions') -> Optional[ElementwiseStage]:
+    param = function.param_list().param(0)
+    if param.REF() or not function.statement_block():
+        return None
+    param_name = param.ID().getText()
+
+    body = _statements(function.statement_block())
+    if len(body) != 3:
+        return None
+    init, loop, ret = body
+
+    # result = []
+    assignment = _single_assignment(init)
+    if not assignment or not isinstance(_strip(assignment[1]), RivScriptParser.List_exprContext):
+        return None
+    if _strip(assignment[1]).expr():
+        return None
+    result = assignment[0]
+
+    # return result
+    if not isinstance(ret, RivScriptParser.Return_stmtContext) or not ret.expr():
+        return None
+    returned = _strip(ret.expr())
+    if not isinstance(returned, RivScriptParser.IdExprContext) or returned.ID().getText() != result:
+        return None
+
+    # for item in lst:
+    if not isinstance(loop, RivScriptParser.ForInStmtContext):
+        return None
+    source = _strip(loop.expr())
+    if not isinstance(source, RivScriptParser.IdExprContext) or source.ID().getText() != param_name:
+        return None
+    item = loop.ID().getText()
+    if item in (param_name, result):
+        return None
+
+    statements = _statements(loop.statement_block())
+    if not statements:
+        return None
+
+    known = {item}
+    temps = []
+    for statement in statements[:-1]:
+        assignment = _single_assignment(statement)
+        if not assignment or assignment[0] in (item, param_name, result):
+            return None
+        if not _is_simple(assignment[1], known, quiet):
+            return None
+        temps.append(assignment)
+        known.add(assignment[0])
+
+    last = statements[-1]
+    condition = None
+    if isinstance(last, RivScriptParser.If_stmtContext):
+        blocks = last.statement_block()
+        if len(blocks) != 1:
+            return None
+        inner = _statements(blocks[0])
+        if len(inner) != 1:
+            return None
+        condition = last.expr()
+        if not _is_simple(condition, known, quiet):
+            return None
+        last = inner[0]
+
+    value = _appended_value(last, result)
+    if value is None or not _is_simple(value, known, quiet):
+        return None
+
+    return ElementwiseStage(item, temps, condition, value)
+
+
+def _is_simple(ctx: ParserRuleContext, known: Set[str], quiet: '_QuietFunctions') -> bool:
+    """Использует ли выражение только известные имена и функции без вывода"""
+    stack = [ctx]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, RivScriptParser.IdExprContext) and node.ID().getText() not in known:
+            return False
+        if isinstance(node, RivScriptParser.Pipeline_exprContext) and node.getChildCount() > 1:
+            return False
+        if isinstance(node, RivScriptParser.Function_callContext) and not quiet.is_quiet_call(node):
+            return False
+        for child in node.getChildren():
+            if isinstance(child, ParserRuleContext):
+                stack.append(child)
+    return True
+
+
+class _QuietFunctions:
+    """Определяет пользовательские функции, которые (транзитивно) не вызывают write и read"""
+
+    def __init__(self, functions: Dict[str, List[RivScriptParser.Function_defContext]]):
+        self.functions = functions
+        self.cache: Dict[str, bool] = {}
+
+    def is_quiet_call(self, call: RivScriptParser.Function_callContext) -> bool:
+        name = call.ID().getText()
+        if name in IO_BUILTINS:
+            return False
+        return name not in self.functions or self.is_quiet(name)
+
+    def is_quiet(self, name: str) -> bool:
+        if name not in self.cache:
+            # Рекурсия считается выводом: пессимистичная оценка
+            self.cache[name] = False
+            self.cache[name] = all(self._body_is_quiet(f) for f in self.functions[name])
+        return self.cache[name]
+
+    def _body_is_quiet(self, function: RivScriptParser.Function_defContext) -> bool:
+        stack = [function]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, RivScriptParser.Function_callContext) and not self.is_quiet_call(node):
+                return False
+            if isinstance(node, RivScriptParser.Pipeline_exprContext) and node.getChildCount() > 1:
+                return False
+            for child in node.getChildren():
+                if isinstance(child, ParserRuleContext):
+                    stack.append(child)
+        return True
@@ -0,0 +1,56 @@
+"""
+Вызовы в хвостовой позиции
+
+Вызов стоит в хвостовой позиции, если его результат сразу возвращается:
+`return f(args)` (в том числе в скобках). Генератор заменяет такие вызовы
+функции самой себя переходом в начало тела: параметры получают значения
+аргументов, и стек вызовов не растёт. Вызовы других функций в хвостовой
+позиции с опцией --tail-calls компилируются в `return_call` (расширение
+WebAssembly tail calls).
+
+Сбрасывать локальные переменные при переходе не нужно: семантический
+анализ требует, чтобы переменная была присвоена раньше по тексту, чем
+прочитана, поэтому при новом проходе тела она снова присваивается до
+чтения.
+"""
+
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'generated'))
+
+from antlr4 import ParserRuleContext
+from RivScriptParser import RivScriptParser
+
+
+def tail_call(ret: RivScriptParser.Return_stmtContext) -> Optional[RivScriptParser.Function_callContext]:
+    """Вызов, результат которого возвращает `return`"""
+    expr = ret.expr()
+    while expr is not None:
+        if isinstance(expr, RivScriptParser.ParenExprContext):
+            expr = expr.expr()
+        elif isinstance(expr, RivScriptParser.Function_callContext):
+            return expr
+        elif expr.getChildCount() == 1 and isinstance(expr.getChild(0), ParserRuleContext):
+            expr = expr.getChild(0)
+        else:
+            return None
+    return None
+
+
+def find_tail_calls(function: RivScriptParser.Function_defContext) -> List[RivScriptParser.Function_callContext]:
+    """Все вызовы в хвостовой позиции в теле функции"""
+    calls = []
+    stack = [function]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, RivScriptParser.Return_stmtContext):
+            call = tail_call(node)
+            if call is not None:
+                calls.append(call)
+            continue
+        for child in node.getChildren():
+            if isinstance(child, ParserRuleContext):
+                stack.append(child)
+    return calls
@@ -2,6 +2,8 @@
 Генерация встроенных функций WAT
 """
 
+from textwrap import dedent
+
 from .emitter import WATEmitter
 
 
@@ -16,8 +18,12 @@ class WATBuiltins:
         self.emitter.emit(";; Built-in functions")
         self._emit_write()
         self._emit_read()
-        self._emit_alloc()
         self._emit_length()
+        self._emit_element()
+        self._emit_queue()
+        self._emit_sorting()
+        self._emit_list_builtins()
+        self._emit_tree()
     
     def _emit_write(self):
         """write function"""
@@ -37,23 +43,510 @@ class WATBuiltins:
         self.emitter.emit(")")
         self.emitter.emit("")
     
-    def _emit_alloc(self):
-        """alloc function (простой bump allocator)"""
-        self.emitter.emit("(func $alloc (param $size i32) (result i32)")
-        self.emitter.indent()
-        self.emitter.emit("(local $ptr i32)")
-        self.emitter.emit("(local.set $ptr (global.get $heap_ptr))")
-        self.emitter.emit("(global.set $heap_ptr (i32.add (global.get $heap_ptr) (local.get $size)))")
-        self.emitter.emit("(local.get $ptr)")
-        self.emitter.dedent()
-        self.emitter.emit(")")
-        self.emitter.emit("")
-    
     def _emit_length(self):
-        """length function для списков"""
+        """length function для списков, очередей и деревьев (длина по смещению 0)"""
         self.emitter.emit("(func $length (param $list i32) (result i32)")
         self.emitter.indent()
         self.emitter.emit("(i32.load (local.get $list))")
         self.emitter.dedent()
         self.emitter.emit(")")
         self.emitter.emit("")
+
+    def _emit_function(self, code: str):
+        """Выводит функцию, записанную многострочным WAT"""
+        for line in dedent(code).strip("\n").splitlines():
+            self.emitter.emit(line)
+        self.emitter.emit("")
+    
+    def _emit_element(self):
+        """element, get_value, set_value"""
+        self._emit_function("""
+            (func $element (param $value i32) (result i32)
+              (call $element_new (i32.const 0) (local.get $value))
+            )""")
+        self._emit_function("""
+            (func $get_value (param $elem i32) (result i32)
+              (i32.load offset=4 (local.get $elem))
+            )""")
+        self._emit_function("""
+            (func $set_value (param $elem i32) (param $value i32) (result i32)
+              (i32.store offset=4 (local.get $elem) (local.get $value))
+              (local.get $elem)
+            )""")
+    
+    def _emit_queue(self):
+        """queue, enqueue, dequeue (возвращают новую очередь, как `>>` для списков)"""
+        self._emit_function("""
+            (func $queue (result i32)
+              (call $queue_new)
+            )""")
+        self._emit_function("""
+            (func $enqueue (param $q i32) (param $elem i32) (result i32)
+              (call $queue_enqueue (local.get $q) (local.get $elem))
+            )""")
+        self._emit_function("""
+            (func $dequeue (param $q i32) (result i32)
+              (call $queue_dequeue (local.get $q))
+            )""")
+    
+    def _emit_tree(self):
+        """build_tree, balance, height, traverse, merge_trees"""
+        self._emit_tree_helpers()
+        # Дерево последовательных вставок - это декартово дерево пар
+        # (значение, номер вставки): ключ - значение, приоритет - номер.
+        # Пары сортируются устойчиво по значению, затем дерево строится
+        # стеком правой ветви за O(n), без спуска от корня для каждой вставки
+        self._emit_function("""
+            (func $build_tree (param $lst i32) (result i32)
+              (local $n i32)
+              (local $tree i32)
+              (local $items i32)
+              (local $records i32)
+              (local $i i32)
+              (local $ptr i32)
+              (local $end i32)
+              (local $stack i32)
+              (local $sp i32)
+              (local $node i32)
+              (local $last i32)
+              (local $index i32)
+              (local.set $n (i32.load (local.get $lst)))
+              (local.set $tree (call $tree_new))
+              (i32.store (local.get $tree) (local.get $n))
+              (if (i32.eqz (local.get $n))
+                (then (return (local.get $tree))))
+              (local.set $items (call $list_items (local.get $lst)))
+              (local.set $records (call $alloc (i32.shl (local.get $n) (i32.const 3))))
+              (block $filled
+                (loop $fill
+                  (br_if $filled (i32.ge_s (local.get $i) (local.get $n)))
+                  (local.set $ptr (i32.add (local.get $records) (i32.shl (local.get $i) (i32.const 3))))
+                  (i32.store (local.get $ptr) (i32.load (i32.add (local.get $items) (i32.shl (local.get $i) (i32.const 2)))))
+                  (i32.store offset=4 (local.get $ptr) (local.get $i))
+                  (local.set $i (i32.add (local.get $i) (i32.const 1)))
+                  (br $fill)))
+              (local.set $ptr
+                (call $radix_sort
+                  (local.get $records)
+                  (call $alloc (i32.shl (local.get $n) (i32.const 3)))
+                  (local.get $n)
+                  (i32.const 8)))
+              (local.set $end (i32.add (local.get $ptr) (i32.shl (local.get $n) (i32.const 3))))
+              ;; Стек правой ветви: [узел, номер вставки]
+              (local.set $stack (call $alloc (i32.shl (local.get $n) (i32.const 3))))
+              (local.set $sp (local.get $stack))
+              (loop $next
+                (local.set $index (i32.load offset=4 (local.get $ptr)))
+                (local.set $node (call $tree_node_new (i32.load (local.get $ptr))))
+                (local.set $last (i32.const 0))
+                (block $popped
+                  (loop $pop
+                    (br_if $popped (i32.le_u (local.get $sp) (local.get $stack)))
+                    (br_if $popped (i32.lt_s (i32.load offset=4 (i32.sub (local.get $sp) (i32.const 8))) (local.get $index)))
+                    (local.set $sp (i32.sub (local.get $sp) (i32.const 8)))
+                    (local.set $last (i32.load (local.get $sp)))
+                    (br $pop)))
+                (i32.store offset=4 (local.get $node) (local.get $last))
+                (if (i32.gt_u (local.get $sp) (local.get $stack))
+                  (then (i32.store offset=8 (i32.load (i32.sub (local.get $sp) (i32.const 8))) (local.get $node))))
+                (i32.store (local.get $sp) (local.get $node))
+                (i32.store offset=4 (local.get $sp) (local.get $index))
+                (local.set $sp (i32.add (local.get $sp) (i32.const 8)))
+                (local.set $ptr (i32.add (local.get $ptr) (i32.const 8)))
+                (br_if $next (i32.lt_u (local.get $ptr) (local.get $end))))
+              (i32.store offset=4 (local.get $tree) (i32.load (local.get $stack)))
+              (local.get $tree)
+            )""")
+        self._emit_function("""
+            (func $balance (param $tree i32) (result i32)
+              (local $sorted i32)
+              (local.set $sorted (call $tree_inorder (local.get $tree)))
+              (call $tree_from_sorted (call $list_items (local.get $sorted)) (i32.load (local.get $sorted)))
+            )""")
+        self._emit_function("""
+            (func $merge_trees (param $t1 i32) (param $t2 i32) (result i32)
+              (local $sorted i32)
+              (local.set $sorted (call $merge (call $tree_inorder (local.get $t1)) (call $tree_inorder (local.get $t2))))
+              (call $tree_from_sorted (call $list_items (local.get $sorted)) (i32.load (local.get $sorted)))
+            )""")
+        # Порядок обхода: 0 - inorder, 1 - preorder, 2 - postorder
+        # (генератор подставляет код вместо строкового литерала)
+        self._emit_function("""
+            (func $traverse (param $tree i32) (param $order i32) (result i32)
+              (if (i32.eq (local.get $order) (i32.const 1))
+                (then (return (call $tree_preorder (local.get $tree)))))
+              (if (i32.eq (local.get $order) (i32.const 2))
+                (then (return (call $tree_postorder (local.get $tree)))))
+              (call $tree_inorder (local.get $tree))
+            )""")
+        # Обход в ширину по уровням: высота без рекурсии, даже для
+        # вырожденного дерева из отсортированного списка. Очередь узлов
+        # лежит в общем буфере scratch, поэтому повторные вызовы не
+        # расходуют кучу
+        self._emit_function("""
+            (func $height (param $tree i32) (result i32)
+              (local $nodes i32)
+              (local $head i32)
+              (local $tail i32)
+              (local $level_end i32)
+              (local $node i32)
+              (local $height i32)
+              (if (i32.eqz (i32.load offset=4 (local.get $tree)))
+                (then (return (i32.const 0))))
+              (local.set $nodes (call $scratch (i32.shl (i32.load (local.get $tree)) (i32.const 2))))
+              (i32.store (local.get $nodes) (i32.load offset=4 (local.get $tree)))
+              (local.set $head (local.get $nodes))
+              (local.set $tail (i32.add (local.get $nodes) (i32.const 4)))
+              (block $done
+                (loop $levels
+                  (br_if $done (i32.ge_u (local.get $head) (local.get $tail)))
+                  (local.set $height (i32.add (local.get $height) (i32.const 1)))
+                  (local.set $level_end (local.get $tail))
+                  (block $level_done
+                    (loop $level
+                      (br_if $level_done (i32.ge_u (local.get $head) (local.get $level_end)))
+                      (local.set $node (i32.load (local.get $head)))
+                      (local.set $head (i32.add (local.get $head) (i32.const 4)))
+                      (if (i32.load offset=4 (local.get $node))
+                        (then
+                          (i32.store (local.get $tail) (i32.load offset=4 (local.get $node)))
+                          (local.set $tail (i32.add (local.get $tail) (i32.const 4)))))
+                      (if (i32.load offset=8 (local.get $node))
+                        (then
+                          (i32.store (local.get $tail) (i32.load offset=8 (local.get $node)))
+                          (local.set $tail (i32.add (local.get $tail) (i32.const 4)))))
+                      (br $level)))
+                  (br $levels)))
+              (local.get $height)
+            )""")
+    
+    def _emit_sorting(self):
+        """radix_sort: устойчивая LSD-сортировка записей по ключу i32
+        
+        Записи по `stride` (4 или 8) байт, ключ со знаком - первое слово.
+        Четыре прохода по байтам ключа между buf и tmp; проход, в котором
+        все ключи попали в одну корзину, пропускается. Возвращает буфер,
+        в котором оказался результат.
+        """
+        self._emit_function("""
+            (func $radix_sort (param $buf i32) (param $tmp i32) (param $n i32) (param $stride i32) (result i32)
+              (local $counts i32)
+              (local $shift i32)
+              (local $ptr i32)
+              (local $end i32)
+              (local $digit i32)
+              (local $sum i32)
+              (local $count i32)
+              (local $dst i32)
+              (local $swap i32)
+              (if (i32.lt_s (local.get $n) (i32.const 2))
+                (then (return (local.get $buf))))
+              (local.set $counts (call $alloc (i32.const 1024)))
+              (block $done
+                (loop $pass
+                  (br_if $done (i32.ge_u (local.get $shift) (i32.const 32)))
+                  (memory.fill (local.get $counts) (i32.const 0) (i32.const 1024))
+                  (local.set $end (i32.add (local.get $buf) (i32.mul (local.get $n) (local.get $stride))))
+                  (local.set $ptr (local.get $buf))
+                  (loop $count_digits
+                    (local.set $digit
+                      (i32.and
+                        (i32.shr_u (i32.xor (i32.load (local.get $ptr)) (i32.const -2147483648)) (local.get $shift))
+                        (i32.const 255)))
+                    (local.set $dst (i32.add (local.get $counts) (i32.shl (local.get $digit) (i32.const 2))))
+                    (i32.store (local.get $dst) (i32.add (i32.load (local.get $dst)) (i32.const 1)))
+                    (local.set $ptr (i32.add (local.get $ptr) (local.get $stride)))
+                    (br_if $count_digits (i32.lt_u (local.get $ptr) (local.get $end))))
+                  (if (i32.ne (i32.load (local.get $dst)) (local.get $n))
+                    (then
+                      ;; Начальные позиции корзин
+                      (local.set $sum (i32.const 0))
+                      (local.set $digit (i32.const 0))
+                      (loop $prefix
+                        (local.set $dst (i32.add (local.get $counts) (i32.shl (local.get $digit) (i32.const 2))))
+                        (local.set $count (i32.load (local.get $dst)))
+                        (i32.store (local.get $dst) (local.get $sum))
+                        (local.set $sum (i32.add (local.get $sum) (local.get $count)))
+                        (local.set $digit (i32.add (local.get $digit) (i32.const 1)))
+                        (br_if $prefix (i32.lt_u (local.get $digit) (i32.const 256))))
+                      (local.set $ptr (local.get $buf))
+                      (loop $scatter
+                        (local.set $digit
+                          (i32.and
+                            (i32.shr_u (i32.xor (i32.load (local.get $ptr)) (i32.const -2147483648)) (local.get $shift))
+                            (i32.const 255)))
+                        (local.set $count (i32.add (local.get $counts) (i32.shl (local.get $digit) (i32.const 2))))
+                        (local.set $dst (i32.add (local.get $tmp) (i32.mul (i32.load (local.get $count)) (local.get $stride))))
+                        (i32.store (local.get $count) (i32.add (i32.load (local.get $count)) (i32.const 1)))
+                        (if (i32.eq (local.get $stride) (i32.const 8))
+                          (then (i64.store (local.get $dst) (i64.load (local.get $ptr))))
+                          (else (i32.store (local.get $dst) (i32.load (local.get $ptr)))))
+                        (local.set $ptr (i32.add (local.get $ptr) (local.get $stride)))
+                        (br_if $scatter (i32.lt_u (local.get $ptr) (local.get $end))))
+                      (local.set $swap (local.get $buf))
+                      (local.set $buf (local.get $tmp))
+                      (local.set $tmp (local.get $swap))))
+                  (local.set $shift (i32.add (local.get $shift) (i32.const 8)))
+                  (br $pass)))
+              (local.get $buf)
+            )""")
+    
+    def _emit_list_builtins(self):
+        """sort, reverse, unique, merge (всегда возвращают новый список)"""
+        self._emit_function("""
+            (func $sort (param $lst i32) (result i32)
+              (local $n i32)
+              (local $result i32)
+              (local $items i32)
+              (local $sorted i32)
+              (local.set $n (i32.load (local.get $lst)))
+              (local.set $result (call $list_new (local.get $n)))
+              (local.set $items (call $list_items (local.get $result)))
+              (memory.copy (local.get $items) (call $list_items (local.get $lst)) (i32.shl (local.get $n) (i32.const 2)))
+              (local.set $sorted
+                (call $radix_sort
+                  (local.get $items)
+                  (call $alloc (i32.shl (local.get $n) (i32.const 2)))
+                  (local.get $n)
+                  (i32.const 4)))
+              (if (i32.ne (local.get $sorted) (local.get $items))
+                (then (memory.copy (local.get $items) (local.get $sorted) (i32.shl (local.get $n) (i32.const 2)))))
+              (call $list_set_length (local.get $result) (local.get $n))
+              (local.get $result)
+            )""")
+        self._emit_function("""
+            (func $reverse (param $lst i32) (result i32)
+              (local $n i32)
+              (local $result i32)
+              (local $src i32)
+              (local $dst i32)
+              (local.set $n (i32.load (local.get $lst)))
+              (local.set $result (call $list_new (local.get $n)))
+              (local.set $src (call $list_items (local.get $lst)))
+              (local.set $dst (i32.add (call $list_items (local.get $result)) (i32.shl (local.get $n) (i32.const 2))))
+              (block $done
+                (loop $copy
+                  (br_if $done (i32.le_u (local.get $dst) (call $list_items (local.get $result))))
+                  (local.set $dst (i32.sub (local.get $dst) (i32.const 4)))
+                  (i32.store (local.get $dst) (i32.load (local.get $src)))
+                  (local.set $src (i32.add (local.get $src) (i32.const 4)))
+                  (br $copy)))
+              (call $list_set_length (local.get $result) (local.get $n))
+              (local.get $result)
+            )""")
+        # Хеш-множество с открытой адресацией: ячейки [занята, значение],
+        # ёмкость - степень двойки не меньше 2n, хеш Фибоначчи
+        self._emit_function("""
+            (func $unique (param $lst i32) (result i32)
+              (local $n i32)
+              (local $result i32)
+              (local $capacity i32)
+              (local $shift i32)
+              (local $table i32)
+              (local $ptr i32)
+              (local $end i32)
+              (local $value i32)
+              (local $slot i32)
+              (local $entry i32)
+              (local.set $n (i32.load (local.get $lst)))
+              (local.set $result (call $list_new (local.get $n)))
+              (local.set $capacity (i32.const 8))
+              (local.set $shift (i32.const 29))
+              (block $sized
+                (loop $grow
+                  (br_if $sized (i32.ge_u (local.get $capacity) (i32.shl (local.get $n) (i32.const 1))))
+                  (local.set $capacity (i32.shl (local.get $capacity) (i32.const 1)))
+                  (local.set $shift (i32.sub (local.get $shift) (i32.const 1)))
+                  (br $grow)))
+              (local.set $table (call $alloc (i32.shl (local.get $capacity) (i32.const 3))))
+              (memory.fill (local.get $table) (i32.const 0) (i32.shl (local.get $capacity) (i32.const 3)))
+              (local.set $ptr (call $list_items (local.get $lst)))
+              (local.set $end (i32.add (local.get $ptr) (i32.shl (local.get $n) (i32.const 2))))
+              (block $done
+                (loop $next
+                  (br_if $done (i32.ge_u (local.get $ptr) (local.get $end)))
+                  (local.set $value (i32.load (local.get $ptr)))
+                  (local.set $slot (i32.shr_u (i32.mul (local.get $value) (i32.const -1640531535)) (local.get $shift)))
+                  (block $found
+                    (loop $probe
+                      (local.set $entry (i32.add (local.get $table) (i32.shl (local.get $slot) (i32.const 3))))
+                      (if (i32.eqz (i32.load (local.get $entry)))
+                        (then
+                          (i32.store (local.get $entry) (i32.const 1))
+                          (i32.store offset=4 (local.get $entry) (local.get $value))
+                          (drop (call $list_push (local.get $result) (local.get $value)))
+                          (br $found)))
+                      (br_if $found (i32.eq (i32.load offset=4 (local.get $entry)) (local.get $value)))
+                      (local.set $slot (i32.and (i32.add (local.get $slot) (i32.const 1)) (i32.sub (local.get $capacity) (i32.const 1))))
+                      (br $probe)))
+                  (local.set $ptr (i32.add (local.get $ptr) (i32.const 4)))
+                  (br $next)))
+              (local.get $result)
+            )""")
+        # Слияние двух отсортированных списков за O(n + m)
+        self._emit_function("""
+            (func $merge (param $lst1 i32) (param $lst2 i32) (result i32)
+              (local $result i32)
+              (local $out i32)
+              (local $p1 i32)
+              (local $e1 i32)
+              (local $p2 i32)
+              (local $e2 i32)
+              (local $v1 i32)
+              (local $v2 i32)
+              (local.set $result (call $list_new (i32.add (i32.load (local.get $lst1)) (i32.load (local.get $lst2)))))
+              (local.set $out (call $list_items (local.get $result)))
+              (local.set $p1 (call $list_items (local.get $lst1)))
+              (local.set $e1 (i32.add (local.get $p1) (i32.shl (i32.load (local.get $lst1)) (i32.const 2))))
+              (local.set $p2 (call $list_items (local.get $lst2)))
+              (local.set $e2 (i32.add (local.get $p2) (i32.shl (i32.load (local.get $lst2)) (i32.const 2))))
+              (block $done
+                (loop $step
+                  (br_if $done (i32.or
+                    (i32.ge_u (local.get $p1) (local.get $e1))
+                    (i32.ge_u (local.get $p2) (local.get $e2))))
+                  (local.set $v1 (i32.load (local.get $p1)))
+                  (local.set $v2 (i32.load (local.get $p2)))
+                  (if (i32.le_s (local.get $v1) (local.get $v2))
+                    (then
+                      (i32.store (local.get $out) (local.get $v1))
+                      (local.set $p1 (i32.add (local.get $p1) (i32.const 4))))
+                    (else
+                      (i32.store (local.get $out) (local.get $v2))
+                      (local.set $p2 (i32.add (local.get $p2) (i32.const 4)))))
+                  (local.set $out (i32.add (local.get $out) (i32.const 4)))
+                  (br $step)))
+              (memory.copy (local.get $out) (local.get $p1) (i32.sub (local.get $e1) (local.get $p1)))
+              (local.set $out (i32.add (local.get $out) (i32.sub (local.get $e1) (local.get $p1))))
+              (memory.copy (local.get $out) (local.get $p2) (i32.sub (local.get $e2) (local.get $p2)))
+              (call $list_set_length (local.get $result) (i32.add (i32.load (local.get $lst1)) (i32.load (local.get $lst2))))
+              (local.get $result)
+            )""")
+    
+    def _emit_tree_helpers(self):
+        """Построение сбалансированного дерева и обходы без рекурсии"""
+        # Середина отрезка - корень, отрезки слева и справа - поддеревья;
+        # отрезки хранятся в явном стеке [lo, hi, адрес ссылки на узел],
+        # его глубина не превышает высоты дерева (< 64)
+        self._emit_function("""
+            (func $tree_from_sorted (param $items i32) (param $n i32) (result i32)
+              (local $tree i32)
+              (local $stack i32)
+              (local $sp i32)
+              (local $lo i32)
+              (local $hi i32)
+              (local $slot i32)
+              (local $mid i32)
+              (local $node i32)
+              (local.set $tree (call $tree_new))
+              (i32.store (local.get $tree) (local.get $n))
+              (local.set $stack (call $alloc (i32.const 1536)))
+              (i32.store (local.get $stack) (i32.const 0))
+              (i32.store offset=4 (local.get $stack) (local.get $n))
+              (i32.store offset=8 (local.get $stack) (i32.add (local.get $tree) (i32.const 4)))
+              (local.set $sp (i32.add (local.get $stack) (i32.const 12)))
+              (block $done
+                (loop $next
+                  (br_if $done (i32.le_u (local.get $sp) (local.get $stack)))
+                  (local.set $sp (i32.sub (local.get $sp) (i32.const 12)))
+                  (local.set $lo (i32.load (local.get $sp)))
+                  (local.set $hi (i32.load offset=4 (local.get $sp)))
+                  (local.set $slot (i32.load offset=8 (local.get $sp)))
+                  (if (i32.lt_s (local.get $lo) (local.get $hi))
+                    (then
+                      (local.set $mid (i32.shr_u (i32.add (local.get $lo) (local.get $hi)) (i32.const 1)))
+                      (local.set $node
+                        (call $tree_node_new (i32.load (i32.add (local.get $items) (i32.shl (local.get $mid) (i32.const 2))))))
+                      (i32.store (local.get $slot) (local.get $node))
+                      (i32.store (local.get $sp) (i32.add (local.get $mid) (i32.const 1)))
+                      (i32.store offset=4 (local.get $sp) (local.get $hi))
+                      (i32.store offset=8 (local.get $sp) (i32.add (local.get $node) (i32.const 8)))
+                      (i32.store offset=12 (local.get $sp) (local.get $lo))
+                      (i32.store offset=16 (local.get $sp) (local.get $mid))
+                      (i32.store offset=20 (local.get $sp) (i32.add (local.get $node) (i32.const 4)))
+                      (local.set $sp (i32.add (local.get $sp) (i32.const 24)))))
+                  (br $next)))
+              (local.get $tree)
+            )""")
+        # Обходы используют явный стек узлов размером с дерево,
+        # поэтому работают и для вырожденных деревьев (цепочек)
+        self._emit_function("""
+            (func $tree_inorder (param $tree i32) (result i32)
+              (local $result i32)
+              (local $out i32)
+              (local $stack i32)
+              (local $sp i32)
+              (local $node i32)
+              (local.set $result (call $list_new (i32.load (local.get $tree))))
+              (local.set $out (call $list_items (local.get $result)))
+              (local.set $stack (call $alloc (i32.shl (i32.load (local.get $tree)) (i32.const 2))))
+              (local.set $sp (local.get $stack))
+              (local.set $node (i32.load offset=4 (local.get $tree)))
+              (block $done
+                (loop $next
+                  (block $leftmost
+                    (loop $left
+                      (br_if $leftmost (i32.eqz (local.get $node)))
+                      (i32.store (local.get $sp) (local.get $node))
+                      (local.set $sp (i32.add (local.get $sp) (i32.const 4)))
+                      (local.set $node (i32.load offset=4 (local.get $node)))
+                      (br $left)))
+                  (br_if $done (i32.le_u (local.get $sp) (local.get $stack)))
+                  (local.set $sp (i32.sub (local.get $sp) (i32.const 4)))
+                  (local.set $node (i32.load (local.get $sp)))
+                  (i32.store (local.get $out) (i32.load (local.get $node)))
+                  (local.set $out (i32.add (local.get $out) (i32.const 4)))
+                  (local.set $node (i32.load offset=8 (local.get $node)))
+                  (br $next)))
+              (call $list_set_length (local.get $result) (i32.load (local.get $tree)))
+              (local.get $result)
+            )""")
+        self._emit_function(self._stack_traversal("tree_preorder", reverse=False))
+        # postorder - это preorder (узел, правое, левое), записанный с конца
+        self._emit_function(self._stack_traversal("tree_postorder", reverse=True))
+    
+    def _stack_traversal(self, name: str, reverse: bool) -> str:
+        """Обход со стеком: preorder или, с reverse, postorder"""
+        if reverse:
+            start = "(i32.add (call $list_items (local.get $result)) (i32.shl (i32.load (local.get $tree)) (i32.const 2)))"
+            emit = """(local.set $out (i32.sub (local.get $out) (i32.const 4)))
+                  (i32.store (local.get $out) (i32.load (local.get $node)))"""
+            first, second = "offset=4", "offset=8"
+        else:
+            start = "(call $list_items (local.get $result))"
+            emit = """(i32.store (local.get $out) (i32.load (local.get $node)))
+                  (local.set $out (i32.add (local.get $out) (i32.const 4)))"""
+            first, second = "offset=8", "offset=4"
+        return f"""
+            (func ${name} (param $tree i32) (result i32)
+              (local $result i32)
+              (local $out i32)
+              (local $stack i32)
+              (local $sp i32)
+              (local $node i32)
+              (local.set $result (call $list_new (i32.load (local.get $tree))))
+              (local.set $out {start})
+              (local.set $stack (call $alloc (i32.shl (i32.load (local.get $tree)) (i32.const 2))))
+              (local.set $sp (local.get $stack))
+              (if (i32.load offset=4 (local.get $tree))
+                (then
+                  (i32.store (local.get $sp) (i32.load offset=4 (local.get $tree)))
+                  (local.set $sp (i32.add (local.get $sp) (i32.const 4)))))
+              (block $done
+                (loop $next
+                  (br_if $done (i32.le_u (local.get $sp) (local.get $stack)))
+                  (local.set $sp (i32.sub (local.get $sp) (i32.const 4)))
+                  (local.set $node (i32.load (local.get $sp)))
+                  {emit}
+                  (if (i32.load {first} (local.get $node))
+                    (then
+                      (i32.store (local.get $sp) (i32.load {first} (local.get $node)))
+                      (local.set $sp (i32.add (local.get $sp) (i32.const 4)))))
+                  (if (i32.load {second} (local.get $node))
+                    (then
+                      (i32.store (local.get $sp) (i32.load {second} (local.get $node)))
+                      (local.set $sp (i32.add (local.get $sp) (i32.const 4)))))
+                  (br $next)))
+              (call $list_set_length (local.get $result) (i32.load (local.get $tree)))
+              (local.get $result)
+            )"""
@@ -10,17 +10,52 @@ from RivScriptParser import RivScriptParser
 from RivScriptVisitor import RivScriptVisitor
 from .emitter import WATEmitter
 from .wat_builtins import WATBuiltins
+from .memory_manager import MemoryManager, QUEUE_BLOCK_HEADER, KIND_OFFSET, KIND_QUEUE, KIND_TREE
+from .pipeline_fusion import find_elementwise_functions
+from .tail_calls import find_tail_calls, tail_call
+from ..semantic.annotations import TypeAnnotations, binary_result_type
+from ..semantic.types import RivType, SymbolKind
+
+
+# Коды порядка обхода для traverse (строки во время выполнения не хранятся)
+TRAVERSE_ORDERS = {"inorder": 0, "preorder": 1, "postorder": 2}
+
+# Функции, которые выполняют присваивания из анализа владения на месте
+IN_PLACE_CALLS = {
+    "append": "(call $list_push)",
+    "prepend": "(call $list_push_front)",
+    "enqueue": "(call $queue_push)",
+}
 
 
 class WATGenerator(RivScriptVisitor):
     
-    def __init__(self):
+    def __init__(self, in_place_updates: Optional[Dict] = None,
+                 annotations: Optional[TypeAnnotations] = None,
+                 tail_calls: bool = False):
         self.emitter = WATEmitter()
+        # Результат анализа владения: присваивание -> (вид, добавляемый элемент)
+        self.in_place_updates = in_place_updates or {}
+        # Типы выражений и выбранные перегрузки из семантического анализа.
+        # Все значения - i32, поэтому типы выбирают только операции
+        # (list + list, вид цикла for-in), но не типы значений WAT
+        self.annotations = annotations or TypeAnnotations()
         self.builtins = WATBuiltins(self.emitter)
+        self.memory = MemoryManager(self.emitter)
         self.local_vars: Dict[str, int] = {}
         self.local_counter = 0
         self.label_counter = 0
         self.in_function = False
+        # Поэлементные функции для слияния стадий pipeline
+        self.elementwise = {}
+        # Переименования переменных при подстановке тела функции в pipeline
+        self.renames: Dict[str, str] = {}
+        # return_call для хвостовых вызовов других функций (tail-call proposal)
+        self.tail_calls = tail_calls
+        # Текущая функция, её параметры и метка цикла для хвостовой рекурсии
+        self.current_function = None
+        self.current_params = []
+        self.tail_loop_label = None
     
     def generate(self, tree) -> str:
         self.emitter.clear()
@@ -55,20 +90,17 @@ class WATGenerator(RivScriptVisitor):
         self._emit('(import "env" "read_i32" (func $read_i32 (result i32)))')
         self._emit("")
         
-        self._emit(';; Memory (64KB)')
-        self._emit('(memory (export "memory") 1)')
-        self._emit("")
-        
-        self._emit(';; Heap pointer')
-        self._emit('(global $heap_ptr (mut i32) (i32.const 4096))')
-        self._emit("")
+        self.memory.emit_memory()
     
     def _emit_module_footer(self):
+        self.memory.emit_runtime()
         self.builtins.emit_all()
         self.emitter.dedent()
         self._emit_raw(")")
     
     def visitProgram(self, ctx: RivScriptParser.ProgramContext):
+        self.elementwise = find_elementwise_functions(ctx)
+        
         for item in ctx.program_item():
             if item.function_def():
                 self.visit(item.function_def())
@@ -102,8 +134,9 @@ class WATGenerator(RivScriptVisitor):
         return None
     
     def visitFunction_def(self, ctx: RivScriptParser.Function_defContext):
-        """Генерирует функцию"""
-        name = ctx.ID().getText()
+        """Генерирует функцию под именем её перегрузки"""
+        func = self.annotations.definition_of(ctx)
+        name = func.wat_name if func else ctx.ID().getText()
         
         # Сбрасываем локальные переменные
         self.local_vars = {}
@@ -127,10 +160,26 @@ class WATGenerator(RivScriptVisitor):
         locals_placeholder = len(self.emitter.output)
         self._emit(";; locals placeholder")
         
+        # Хвостовая рекурсия: тело оборачивается в цикл, `return f(...)`
+        # становится переходом в его начало
+        self.current_function = func
+        self.current_params = params
+        self.tail_loop_label = None
+        if func and any(self.annotations.call_target(call) is func for call in find_tail_calls(ctx)):
+            self.tail_loop_label = self._new_label("tail")
+            self._emit(f"(loop {self.tail_loop_label}")
+            self.emitter.indent()
+        
         # Генерируем тело
         if ctx.statement_block():
             self.visit(ctx.statement_block())
         
+        if self.tail_loop_label:
+            self.emitter.dedent()
+            self._emit(")")
+        self.current_function = None
+        self.tail_loop_label = None
+        
         # Возвращаем 0 если не было return
         self._emit("(i32.const 0)")
         
@@ -158,18 +207,45 @@ class WATGenerator(RivScriptVisitor):
     
     def visitAssignment_stmt(self, ctx: RivScriptParser.Assignment_stmtContext):
         """Генерирует присваивание"""
-        ids = ctx.id_list().ID()
+        ids = [id_node.getText() for id_node in ctx.id_list().ID()]
         exprs = ctx.expr_list().expr()
         
-        for i, id_node in enumerate(ids):
-            name = id_node.getText()
-            idx = self._get_local(name)
-            
+        if ctx in self.in_place_updates:
+            # x = x >> item / x = item << x / q = enqueue(q, item) /
+            # item, q = dequeue(q): на x и q больше никто не ссылается
+            kind, item = self.in_place_updates[ctx]
+            if kind == "dequeue":
+                self._get_local(ids[0])
+                self._emit(f"(local.set ${ids[0]} (call $queue_pop (local.get ${ids[1]})))")
+                return None
+            self._emit(f"(local.get ${ids[0]})")
+            self.visit(item)
+            self._emit(IN_PLACE_CALLS[kind])
+            self._emit(f"(local.set ${ids[0]})")
+            return None
+        
+        if len(ids) > 1 and len(exprs) == 1:
+            # Распаковка списка: a, b = dequeue(q) / p, q, r = [1, 2, 3]
+            unpack = f"__unpack_{self.label_counter}"
+            self.label_counter += 1
+            self._get_local(unpack)
+            self.visit(exprs[0])
+            self._emit(f"(local.set ${unpack})")
+            for i, name in enumerate(ids):
+                self._get_local(name)
+                self._emit(f"(call $list_get (local.get ${unpack}) (i32.const {i}))")
+                self._emit(f"(local.set ${name})")
+            return None
+        
+        # Сначала вычисляем все значения, затем присваиваем (a, b = b, a)
+        for i, name in enumerate(ids):
+            self._get_local(name)
             if i < len(exprs):
                 self.visit(exprs[i])
             else:
                 self._emit("(i32.const 0)")
-            
+        
+        for name in reversed(ids):
             self._emit(f"(local.set ${name})")
         
         return None
@@ -265,6 +341,183 @@ class WATGenerator(RivScriptVisitor):
         
         return None
     
+    def visitForInStmt(self, ctx: RivScriptParser.ForInStmtContext):
+        """Генерирует for x in <list|tree|queue> без промежуточного списка.
+        
+        Состояние итератора хранится в локальных переменных: указатель на
+        элемент для списка, стек пути для дерева (обход inorder, память
+        O(высоты)), позиция в кольцевом буфере для очереди. Тип коллекции
+        берётся из аннотаций; для значений неизвестного типа (параметров
+        функций) вид коллекции выбирается во время выполнения по метке в
+        заголовке.
+        """
+        self.label_counter += 1
+        n = self.label_counter
+        var_name = ctx.ID().getText()
+        self._get_local(var_name)
+        
+        iterable = ctx.expr()
+        walk = self._lazy_traversal(iterable)
+        if walk:
+            order, tree = walk
+            self.visit(tree)
+            self._emit_tree_loop(ctx, n, var_name, order)
+        elif self.annotations.type_of(iterable) == RivType.TREE:
+            self.visit(iterable)
+            self._emit_tree_loop(ctx, n, var_name, "inorder")
+        elif self.annotations.type_of(iterable) == RivType.QUEUE:
+            self.visit(iterable)
+            self._emit_queue_loop(ctx, n, var_name)
+        elif self.annotations.type_of(iterable) == RivType.LIST:
+            self.visit(iterable)
+            self._emit_list_loop(ctx, n, var_name)
+        else:
+            self.visit(iterable)
+            self._emit_any_loop(ctx, n, var_name)
+        return None
+    
+    def _lazy_traversal(self, expr):
+        """(порядок, дерево) для `traverse(tree, "inorder" | "preorder")`"""
+        while expr.getChildCount() == 1 and hasattr(expr.getChild(0), 'getRuleIndex'):
+            expr = expr.getChild(0)
+        if not isinstance(expr, RivScriptParser.Function_callContext):
+            return None
+        call = expr
+        args = call.arg_list().expr() if call.arg_list() else []
+        if call.ID().getText() != "traverse" or len(args) != 2:
+            return None
+        order = self._traverse_order(args[1])
+        if order == TRAVERSE_ORDERS["inorder"]:
+            return "inorder", args[0]
+        if order == TRAVERSE_ORDERS["preorder"]:
+            return "preorder", args[0]
+        return None
+    
+    def _emit_loop_body(self, ctx, loop_label: str):
+        """Тело цикла и переход к следующей итерации"""
+        self.visit(ctx.statement_block())
+        self._emit(f"(br {loop_label})")
+        self.emitter.dedent()
+        self._emit(")")
+        self.emitter.dedent()
+        self._emit(")")
+    
+    def _emit_list_loop(self, ctx, n: int, var_name: str):
+        """Цикл по списку на стеке: указатель от первого до последнего элемента"""
+        ptr, end = f"__for{n}_ptr", f"__for{n}_end"
+        for local in (ptr, end):
+            self._get_local(local)
+        self._emit(f"(local.set ${ptr} (call $list_items (local.tee ${end})))")
+        self._emit(f"(local.set ${end} (i32.add (local.get ${ptr}) (i32.shl (i32.load (local.get ${end})) (i32.const 2))))")
+        self._emit(f"(block $for_end_{n}")
+        self.emitter.indent()
+        self._emit(f"(loop $for_{n}")
+        self.emitter.indent()
+        self._emit(f"(br_if $for_end_{n} (i32.ge_u (local.get ${ptr}) (local.get ${end})))")
+        self._emit(f"(local.set ${var_name} (i32.load (local.get ${ptr})))")
+        self._emit(f"(local.set ${ptr} (i32.add (local.get ${ptr}) (i32.const 4)))")
+        self._emit_loop_body(ctx, f"$for_{n}")
+    
+    def _emit_queue_loop(self, ctx, n: int, var_name: str):
+        """Цикл по очереди на стеке: элементы, которые были в ней в начале цикла"""
+        queue, items, pos, mask, left = (f"__for{n}_{part}" for part in ("queue", "items", "pos", "mask", "left"))
+        for local in (queue, items, pos, mask, left):
+            self._get_local(local)
+        self._emit(f"(local.set ${queue})")
+        self._emit(f"(local.set ${left} (i32.load (local.get ${queue})))")
+        self._emit(f"(local.set ${mask} (i32.sub (i32.load offset=4 (local.get ${queue})) (i32.const 1)))")
+        self._emit(f"(local.set ${pos} (i32.load offset=8 (local.get ${queue})))")
+        self._emit(f"(local.set ${items} (i32.add (i32.load offset=12 (local.get ${queue})) (i32.const {QUEUE_BLOCK_HEADER})))")
+        self._emit(f"(block $for_end_{n}")
+        self.emitter.indent()
+        self._emit(f"(loop $for_{n}")
+        self.emitter.indent()
+        self._emit(f"(br_if $for_end_{n} (i32.eqz (local.get ${left})))")
+        self._emit(f"(local.set ${var_name} (i32.load (i32.add (local.get ${items}) (i32.shl (i32.and (local.get ${pos}) (local.get ${mask})) (i32.const 2)))))")
+        self._emit(f"(local.set ${pos} (i32.add (local.get ${pos}) (i32.const 1)))")
+        self._emit(f"(local.set ${left} (i32.sub (local.get ${left}) (i32.const 1)))")
+        self._emit_loop_body(ctx, f"$for_{n}")
+    
+    def _emit_any_loop(self, ctx, n: int, var_name: str):
+        """Цикл по коллекции на стеке, вид которой известен только по метке.
+        
+        Дерево сначала обходится inorder в список; список и очередь
+        обходятся одним циклом по кольцу: для списка маска равна -1.
+        Всё, что не помечено как дерево или очередь, обходится как список.
+        """
+        coll, kind, items, pos, mask, left = (
+            f"__for{n}_{part}" for part in ("coll", "kind", "items", "pos", "mask", "left"))
+        for local in (coll, kind, items, pos, mask, left):
+            self._get_local(local)
+        self._emit(f"(local.set ${coll})")
+        self._emit(f"(local.set ${kind} (i32.load offset={KIND_OFFSET} (local.get ${coll})))")
+        self._emit(f"(if (i32.eq (local.get ${kind}) (i32.const {KIND_TREE}))")
+        self._emit(f"  (then (local.set ${coll} (call $tree_inorder (local.get ${coll})))))")
+        self._emit(f"(if (i32.eq (local.get ${kind}) (i32.const {KIND_QUEUE}))")
+        self._emit(f"  (then")
+        self._emit(f"    (local.set ${mask} (i32.sub (i32.load offset=4 (local.get ${coll})) (i32.const 1)))")
+        self._emit(f"    (local.set ${pos} (i32.load offset=8 (local.get ${coll})))")
+        self._emit(f"    (local.set ${items} (i32.add (i32.load offset=12 (local.get ${coll})) (i32.const {QUEUE_BLOCK_HEADER}))))")
+        self._emit(f"  (else")
+        self._emit(f"    (local.set ${mask} (i32.const -1))")
+        self._emit(f"    (local.set ${pos} (i32.const 0))")
+        self._emit(f"    (local.set ${items} (call $list_items (local.get ${coll})))))")
+        self._emit(f"(local.set ${left} (i32.load (local.get ${coll})))")
+        self._emit(f"(block $for_end_{n}")
+        self.emitter.indent()
+        self._emit(f"(loop $for_{n}")
+        self.emitter.indent()
+        self._emit(f"(br_if $for_end_{n} (i32.eqz (local.get ${left})))")
+        self._emit(f"(local.set ${var_name} (i32.load (i32.add (local.get ${items}) (i32.shl (i32.and (local.get ${pos}) (local.get ${mask})) (i32.const 2)))))")
+        self._emit(f"(local.set ${pos} (i32.add (local.get ${pos}) (i32.const 1)))")
+        self._emit(f"(local.set ${left} (i32.sub (local.get ${left}) (i32.const 1)))")
+        self._emit_loop_body(ctx, f"$for_{n}")
+    
+    def _emit_tree_loop(self, ctx, n: int, var_name: str, order: str):
+        """Цикл по дереву на стеке: обход inorder или preorder.
+        
+        Стек пути - служебный список, растущий удвоением, поэтому память
+        пропорциональна высоте дерева, а не числу узлов.
+        """
+        stack, node = f"__for{n}_stack", f"__for{n}_node"
+        for local in (stack, node):
+            self._get_local(local)
+        self._emit(f"(local.set ${node} (i32.load offset=4))")
+        self._emit(f"(local.set ${stack} (call $list_new (i32.const 16)))")
+        pop = [
+            f"(local.set ${node} (call $list_get (local.get ${stack}) (i32.const -1)))",
+            f"(call $list_set_length (local.get ${stack}) (i32.sub (i32.load (local.get ${stack})) (i32.const 1)))",
+        ]
+        if order == "preorder":
+            self._emit(f"(if (local.get ${node}) (then (drop (call $list_push (local.get ${stack}) (local.get ${node})))))")
+        self._emit(f"(block $for_end_{n}")
+        self.emitter.indent()
+        self._emit(f"(loop $for_{n}")
+        self.emitter.indent()
+        if order == "inorder":
+            # Спуск по левой ветви, затем узел и переход в правое поддерево
+            self._emit(f"(block $for_left_end_{n}")
+            self._emit(f"  (loop $for_left_{n}")
+            self._emit(f"    (br_if $for_left_end_{n} (i32.eqz (local.get ${node})))")
+            self._emit(f"    (drop (call $list_push (local.get ${stack}) (local.get ${node})))")
+            self._emit(f"    (local.set ${node} (i32.load offset=4 (local.get ${node})))")
+            self._emit(f"    (br $for_left_{n})))")
+            self._emit(f"(br_if $for_end_{n} (i32.eqz (i32.load (local.get ${stack}))))")
+            for line in pop:
+                self._emit(line)
+            self._emit(f"(local.set ${var_name} (i32.load (local.get ${node})))")
+            self._emit(f"(local.set ${node} (i32.load offset=8 (local.get ${node})))")
+        else:
+            # Узел, затем правое и левое поддеревья в стек (левое - сверху)
+            self._emit(f"(br_if $for_end_{n} (i32.eqz (i32.load (local.get ${stack}))))")
+            for line in pop:
+                self._emit(line)
+            self._emit(f"(local.set ${var_name} (i32.load (local.get ${node})))")
+            for offset in (8, 4):
+                self._emit(f"(if (i32.load offset={offset} (local.get ${node}))")
+                self._emit(f"  (then (drop (call $list_push (local.get ${stack}) (i32.load offset={offset} (local.get ${node}))))))")
+        self._emit_loop_body(ctx, f"$for_{n}")
+    
     def visitForRangeStmt(self, ctx: RivScriptParser.ForRangeStmtContext):
         """Генерирует for i = start to end"""
         var_name = ctx.ID().getText()
@@ -310,6 +563,22 @@ class WATGenerator(RivScriptVisitor):
     
     def visitReturn_stmt(self, ctx: RivScriptParser.Return_stmtContext):
         """Генерирует return"""
+        call = tail_call(ctx) if self.current_function else None
+        target = self.annotations.call_target(call) if call else None
+        if target is not None and target is self.current_function and self.tail_loop_label:
+            # Хвостовая рекурсия: новые значения параметров и переход в начало
+            for arg in call.arg_list().expr() if call.arg_list() else []:
+                self.visit(arg)
+            for param in reversed(self.current_params):
+                self._emit(f"(local.set ${param})")
+            self._emit(f"(br {self.tail_loop_label})")
+            return None
+        if target is not None and target.kind == SymbolKind.FUNCTION and self.tail_calls:
+            for arg in call.arg_list().expr() if call.arg_list() else []:
+                self.visit(arg)
+            self._emit(f"(return_call ${target.wat_name})")
+            return None
+        
         if ctx.expr():
             self.visit(ctx.expr())
         else:
@@ -351,6 +620,7 @@ class WATGenerator(RivScriptVisitor):
     def visitIdExpr(self, ctx: RivScriptParser.IdExprContext):
         """Генерирует чтение переменной"""
         name = ctx.ID().getText()
+        name = self.renames.get(name, name)
         self._get_local(name)  # Убедимся что переменная существует
         self._emit(f"(local.get ${name})")
         return None
@@ -365,8 +635,12 @@ class WATGenerator(RivScriptVisitor):
         
         # Генерируем аргументы
         if ctx.arg_list():
-            for arg in ctx.arg_list().expr():
-                self.visit(arg)
+            for i, arg in enumerate(ctx.arg_list().expr()):
+                order = self._traverse_order(arg) if name == "traverse" and i == 1 else None
+                if order is not None:
+                    self._emit(f"(i32.const {order})")
+                else:
+                    self.visit(arg)
         
         # Вызов
         if name == "write":
@@ -375,11 +649,18 @@ class WATGenerator(RivScriptVisitor):
         elif name == "read":
             self._emit("(call $read)")
         else:
-            arg_count = len(ctx.arg_list().expr()) if ctx.arg_list() else 0
-            self._emit(f"(call ${name})")
+            # Перегрузка выбрана при семантическом анализе
+            self._emit(f"(call ${self._call_target(ctx, name)})")
         
         return None
     
+    def _traverse_order(self, arg) -> Optional[int]:
+        """Код порядка обхода, если аргумент - строковый литерал"""
+        text = arg.getText()
+        if len(text) > 1 and text[0] == text[-1] == '"':
+            return TRAVERSE_ORDERS.get(text[1:-1])
+        return None
+    
     def visitParenExpr(self, ctx: RivScriptParser.ParenExprContext):
         """Генерирует выражение в скобках"""
         return self.visit(ctx.expr())
@@ -390,6 +671,7 @@ class WATGenerator(RivScriptVisitor):
         
         # Первый операнд
         self.visit(children[0])
+        left_type = self.annotations.type_of(children[0])
         
         i = 1
         while i < len(children):
@@ -397,12 +679,20 @@ class WATGenerator(RivScriptVisitor):
             i += 1
             if i < len(children):
                 self.visit(children[i])
+                right_type = self.annotations.type_of(children[i])
                 i += 1
                 
-                if op == '+':
+                if op == '+' and left_type == right_type == RivType.LIST:
+                    self._emit("(call $list_concat)")
+                elif op == '+':
                     self._emit("(i32.add)")
                 elif op == '-':
                     self._emit("(i32.sub)")
+                elif op == '>>':
+                    self._emit("(call $list_append)")
+                elif op == '<<':
+                    self._emit("(call $list_prepend)")
+                left_type = binary_result_type(op, left_type, right_type)
         
         return None
     
@@ -452,6 +742,8 @@ class WATGenerator(RivScriptVisitor):
         
         if op in ops:
             self._emit(f"({ops[op]})")
+        elif op == '@':
+            self._emit("(call $list_contains)")
         
         return None
     
@@ -506,20 +798,24 @@ class WATGenerator(RivScriptVisitor):
     
     def visitListExpr(self, ctx: RivScriptParser.ListExprContext):
         """Генерирует создание списка"""
-        # Простая реализация: выделяем память и записываем элементы
         list_ctx = ctx.list_expr()
         exprs = list_ctx.expr() if list_ctx.expr() else []
-        count = len(exprs)
-        
-        # Выделяем память: 4 байта на длину + 4 байта на каждый элемент
-        size = 4 + count * 4
-        self._emit(f"(i32.const {size})")
-        self._emit("(call $alloc)")
         
-        # TODO: Записать длину и элементы в память
+        # list_push возвращает тот же список, поэтому он остаётся на стеке
+        self._emit(f"(call $list_new (i32.const {len(exprs)}))")
+        for expr in exprs:
+            self.visit(expr)
+            self._emit("(call $list_push)")
         
         return None
     
+    def visitIndexExpr(self, ctx: RivScriptParser.IndexExprContext):
+        """Генерирует обращение по индексу"""
+        self.visit(ctx.primary_expr())
+        self.visit(ctx.expr())
+        self._emit("(call $list_get)")
+        return None
+    
     def visitCastExpr(self, ctx: RivScriptParser.CastExprContext):
         """Генерирует приведение типа"""
         # В WAT все числовые типы - i32, так что cast просто генерирует значение
@@ -535,9 +831,96 @@ class WATGenerator(RivScriptVisitor):
         # Pipeline: передаём результат как аргумент следующей функции
         self.visit(children[0])
         
-        for child in children[1:]:
+        stages = children[1:]
+        i = 0
+        while i < len(stages):
+            name = self._stage_name(stages[i])
+            
+            # Соседние поэлементные стадии выполняются одним циклом
+            fused = []
+            while i < len(stages) and self._stage_name(stages[i]) in self.elementwise:
+                fused.append(self._stage_name(stages[i]))
+                i += 1
+            if fused:
+                self._emit_fused_stages(fused)
+                continue
+            
             # Результат предыдущего выражения уже на стеке
-            # Следующее выражение должно быть вызовом функции
-            self.visit(child)
+            if name == "write":
+                self._emit("(call $write)")
+                self._emit("(i32.const 0)")
+            elif name is not None:
+                self._emit(f"(call ${self._call_target(stages[i], name)})")
+            else:
+                self._emit("(drop)")
+                self.visit(stages[i])
+            i += 1
         
         return None
+    
+    def _call_target(self, ctx, name: str) -> str:
+        """Имя в WAT перегрузки, выбранной для вызова или стадии"""
+        func = self.annotations.call_target(ctx)
+        return func.wat_name if func else name
+    
+    def _stage_name(self, stage) -> Optional[str]:
+        """Имя функции стадии pipeline (`data |> name`)"""
+        while stage.getChildCount() == 1 and hasattr(stage.getChild(0), 'getRuleIndex'):
+            stage = stage.getChild(0)
+        if isinstance(stage, RivScriptParser.IdExprContext):
+            return stage.ID().getText()
+        return None
+    
+    def _emit_fused_stages(self, names):
+        """Генерирует один цикл для цепочки поэлементных стадий.
+        
+        Входной список на стеке; на стек кладётся итоговый список.
+        """
+        self.label_counter += 1
+        n = self.label_counter
+        src, dst, index, value = (f"__pipe{n}_{part}" for part in ("src", "dst", "i", "value"))
+        for local in (src, dst, index, value):
+            self._get_local(local)
+        loop_label, end_label, skip_label = f"$pipe_{n}", f"$pipe_end_{n}", f"$pipe_skip_{n}"
+        
+        self._emit(f";; fused pipeline: {' |> '.join(names)}")
+        self._emit(f"(local.set ${src})")
+        self._emit(f"(local.set ${dst} (call $list_new (i32.load (local.get ${src}))))")
+        self._emit(f"(local.set ${index} (i32.const 0))")
+        self._emit(f"(block {end_label}")
+        self.emitter.indent()
+        self._emit(f"(loop {loop_label}")
+        self.emitter.indent()
+        self._emit(f"(br_if {end_label} (i32.ge_s (local.get ${index}) (i32.load (local.get ${src}))))")
+        self._emit(f"(block {skip_label}")
+        self.emitter.indent()
+        self._emit(f"(local.set ${value} (call $list_get (local.get ${src}) (local.get ${index})))")
+        
+        saved_renames = self.renames
+        for k, name in enumerate(names):
+            stage = self.elementwise[name]
+            self.renames = {stage.item: value}
+            for temp, expr in stage.temps:
+                local = f"__pipe{n}_{k}_{temp}"
+                self._get_local(local)
+                self.visit(expr)
+                self.renames[temp] = local
+                self._emit(f"(local.set ${local})")
+            if stage.condition is not None:
+                self.visit(stage.condition)
+                self._emit("(i32.eqz)")
+                self._emit(f"(br_if {skip_label})")
+            self.visit(stage.value)
+            self._emit(f"(local.set ${value})")
+        self.renames = saved_renames
+        
+        self._emit(f"(drop (call $list_push (local.get ${dst}) (local.get ${value})))")
+        self.emitter.dedent()
+        self._emit(")")
+        self._emit(f"(local.set ${index} (i32.add (local.get ${index}) (i32.const 1)))")
+        self._emit(f"(br {loop_label})")
+        self.emitter.dedent()
+        self._emit(")")
+        self.emitter.dedent()
+        self._emit(")")
+        self._emit(f"(local.get ${dst})")
@@ -4,6 +4,7 @@ Custom Lexer для RivScript с поддержкой Python-style отступ
 """
 
 import sys
+from collections import deque
 from pathlib import Path
 
 # Добавляем путь к сгенерированным файлам
@@ -29,7 +30,7 @@ class RivScriptIndentLexer(RivScriptLexer):
     def __init__(self, input_stream):
         super().__init__(input_stream)
         self.indent_stack = [0]  # Стек уровней отступов
-        self.pending_tokens = []  # Очередь токенов для emit
+        self.pending_tokens = deque()  # Очередь токенов для emit
         self.at_line_start = True  # Флаг начала строки
         self.paren_depth = 0  # Глубина вложенности скобок (игнорируем отступы внутри)
         self.eof_reached = False
@@ -40,7 +41,7 @@ class RivScriptIndentLexer(RivScriptLexer):
         
         # Если есть отложенные токены, возвращаем их
         if self.pending_tokens:
-            return self.pending_tokens.pop(0)
+            return self.pending_tokens.popleft()
         
         # Получаем следующий токен от базового лексера
         token = super().nextToken()
@@ -54,7 +55,7 @@ class RivScriptIndentLexer(RivScriptLexer):
             
             if self.pending_tokens:
                 self.pending_tokens.append(token)
-                return self.pending_tokens.pop(0)
+                return self.pending_tokens.popleft()
             return token
         
         # Отслеживаем скобки (внутри скобок отступы не важны)
@@ -101,44 +102,32 @@ class RivScriptIndentLexer(RivScriptLexer):
                     self.pending_tokens.append(dedent)
                 
                 self.pending_tokens.append(token)
-                return self.pending_tokens.pop(0)
+                return self.pending_tokens.popleft()
         
         return token
     
     def get_indent_count(self, token):
-        """Вычисляет количество пробелов отступа перед токеном"""
-        # Получаем текст от начала строки до текущего токена
-        line_start = token.start
-        while line_start > 0:
-            char = self._input.getText(line_start - 1, line_start - 1)
-            if char in ('\n', '\r'):
-                break
-            line_start -= 1
+        """Вычисляет отступ строки перед её первым токеном
         
-        # Считаем пробелы и табы (таб = 4 пробела)
-        indent_text = self._input.getText(line_start, token.start - 1)
-        indent = 0
-        has_spaces = False
-        has_tabs = False
+        Вызывается один раз на строку. Начало строки находится по позиции
+        токена в строке (token.column), поэтому текст отступа читается одним
+        срезом, без посимвольного поиска перевода строки назад.
+        """
+        indent_text = self._input.getText(token.start - token.column, token.start - 1)
         
-        for char in indent_text:
-            if char == ' ':
-                indent += 1
-                has_spaces = True
-            elif char == '\t':
-                indent += 4
-                has_tabs = True
-            elif char not in ('\r', '\n'):
-                # Не пробельный символ - значит отступа нет
-                break
+        # Считаем пробелы и табы (таб = 4 пробела) до первого непробельного символа
+        leading = indent_text[:len(indent_text) - len(indent_text.lstrip(' \t\r'))]
+        spaces = leading.count(' ')
+        tabs = leading.count('\t')
+        indent = spaces + 4 * tabs
         
         # Проверяем смешивание табов и пробелов в одной строке
-        if has_spaces and has_tabs:
+        if spaces and tabs:
             raise Exception(f"Indentation error at line {token.line}: mixed tabs and spaces")
         
         # Проверяем глобальную консистентность типа отступов
         if indent > 0:
-            current_type = 'tabs' if has_tabs else 'spaces'
+            current_type = 'tabs' if tabs else 'spaces'
             if self.indent_type is None:
                 self.indent_type = current_type
             elif self.indent_type != current_type:
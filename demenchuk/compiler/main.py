@@ -30,7 +30,8 @@ def compile_file(
     input_path: str,
     output_path: str = None,
     check_only: bool = False,
-    debug: bool = False
+    debug: bool = False,
+    tail_calls: bool = False
 ) -> bool:
     """
     Компилирует файл RivScript
@@ -40,6 +41,7 @@ def compile_file(
         output_path: путь к выходному файлу (опционально)
         check_only: только проверить, не генерировать код
         debug: режим отладки
+        tail_calls: return_call для хвостовых вызовов других функций
     
     Returns:
         True если компиляция успешна, False если есть ошибки
@@ -151,7 +153,7 @@ def compile_file(
         print("⚙️  Stage 4: Code generation...")
     
     try:
-        generator = WATGenerator()
+        generator = WATGenerator(analyzer.in_place_updates, analyzer.annotations, tail_calls)
         wat_code = generator.generate(tree)
         
     except Exception as e:
@@ -219,6 +221,12 @@ Examples:
         help='Enable debug output'
     )
     
+    parser.add_argument(
+        '--tail-calls',
+        action='store_true',
+        help='Emit return_call for tail calls to other functions (needs the WebAssembly tail-call proposal)'
+    )
+    
     args = parser.parse_args()
     
     # Проверяем что --output только с одним файлом
@@ -235,7 +243,8 @@ Examples:
             input_file,
             output_path=args.output,
             check_only=args.check,
-            debug=args.debug
+            debug=args.debug,
+            tail_calls=args.tail_calls
         )
         
         if success:
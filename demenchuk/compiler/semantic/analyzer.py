@@ -17,6 +17,9 @@ from RivScriptVisitor import RivScriptVisitor
 from .symbol_table import SymbolTable
 from .symbol import Symbol
 from .types import SymbolKind, RivType
+from .ownership import find_in_place_updates, InPlaceUpdates
+from .annotations import TypeAnnotations, binary_result_type
+from .builtins import UNPACKED_RESULTS
 from ..errors import (
     SourceLocation, SemanticError, UndefinedVariableError, 
     UndefinedFunctionError, TypeMismatchError, WrongArgCountError,
@@ -31,9 +34,15 @@ class SemanticAnalyzer(RivScriptVisitor):
         self.symbols = SymbolTable()
         self.errors: List[SemanticError] = []
         self.current_function: Optional[Symbol] = None
+        # Присваивания `x = x >> item`, которые можно выполнить на месте
+        self.in_place_updates: InPlaceUpdates = {}
+        # Типы выражений и выбранные перегрузки (заполняются при обходе)
+        self.annotations = TypeAnnotations()
     
     def analyze(self, tree) -> List[SemanticError]:
         self.visit(tree)
+        if not self.errors:
+            self.in_place_updates = find_in_place_updates(tree)
         return self.errors
     
     def _location(self, ctx) -> SourceLocation:
@@ -45,50 +54,9 @@ class SemanticAnalyzer(RivScriptVisitor):
     def _add_error(self, error: SemanticError):
         self.errors.append(error)
     
-    def _infer_type(self, ctx) -> RivType:
-        if ctx is None:
-            return RivType.UNKNOWN
-        
-        # Литералы
-        if isinstance(ctx, RivScriptParser.LiteralExprContext):
-            return self._infer_literal_type(ctx.literal())
-        
-        if isinstance(ctx, RivScriptParser.LiteralContext):
-            return self._infer_literal_type(ctx)
-        
-        # Идентификатор
-        if isinstance(ctx, RivScriptParser.IdExprContext):
-            name = ctx.ID().getText()
-            sym = self.symbols.lookup(name)
-            return sym.type if sym else RivType.UNKNOWN
-        
-        # Вызов функции
-        if isinstance(ctx, RivScriptParser.FunctionCallExprContext):
-            return self._infer_call_type(ctx.function_call())
-        
-        # Список
-        if isinstance(ctx, RivScriptParser.ListExprContext):
-            return RivType.LIST
-        
-        # Cast
-        if isinstance(ctx, RivScriptParser.CastExprContext):
-            type_name = ctx.cast_expr().ID().getText()
-            return self._type_from_name(type_name)
-        
-        # Скобки
-        if isinstance(ctx, RivScriptParser.ParenExprContext):
-            return self._infer_type(ctx.expr())
-        
-        # Индексация
-        if isinstance(ctx, RivScriptParser.IndexExprContext):
-            return RivType.ANY  # Элемент списка может быть любого типа
-        
-        # Для выражений с операторами пробуем определить тип
-        if hasattr(ctx, 'getChildCount') and ctx.getChildCount() > 0:
-            first_child = ctx.getChild(0)
-            return self._infer_type(first_child)
-        
-        return RivType.UNKNOWN
+    def _type_of(self, ctx) -> RivType:
+        """Тип уже обработанного выражения"""
+        return self.annotations.type_of(ctx)
     
     def _infer_literal_type(self, ctx) -> RivType:
         """Определяет тип литерала"""
@@ -102,12 +70,6 @@ class SemanticAnalyzer(RivScriptVisitor):
             return RivType.NIL
         return RivType.UNKNOWN
     
-    def _infer_call_type(self, ctx) -> RivType:
-        """Определяет тип возвращаемого значения функции"""
-        name = ctx.ID().getText()
-        func = self.symbols.lookup_function(name)
-        return func.type if func else RivType.UNKNOWN
-    
     def _type_from_name(self, name: str) -> RivType:
         """Преобразует имя типа в RivType"""
         type_map = {
@@ -251,18 +213,18 @@ class SemanticAnalyzer(RivScriptVisitor):
             column=ctx.start.column
         )
         
-        self.symbols.define_function(func)
+        if self.symbols.define_function(func):
+            self.annotations.set_definition(ctx, func)
+        else:
+            # Перегрузка с таким числом параметров уже есть
+            self._add_error(DuplicateDefinitionError(name, self._location(ctx)))
     
     def visitFunction_def(self, ctx: RivScriptParser.Function_defContext):
         """Анализирует определение функции"""
         name = ctx.ID().getText()
         
-        # Получаем зарегистрированную функцию
-        param_count = 0
-        if ctx.param_list():
-            param_count = len(ctx.param_list().param())
-        
-        func = self.symbols.lookup_function(name, param_count)
+        # Перегрузка, зарегистрированная для этого определения
+        func = self.annotations.definition_of(ctx)
         self.current_function = func
         
         # Входим в область видимости функции
@@ -293,15 +255,20 @@ class SemanticAnalyzer(RivScriptVisitor):
             self.visit(expr)
         
         # Затем регистрируем или проверяем переменные
+        unpacked = self._unpacked_types(exprs[0]) if len(exprs) == 1 else []
         for i, id_node in enumerate(ids):
             name = id_node.getText()
             
+            expr_type = RivType.UNKNOWN
+            if len(exprs) == len(ids):
+                expr_type = self._type_of(exprs[i])
+            elif len(exprs) == 1:
+                # Распаковка: элемент списка
+                expr_type = unpacked[i] if i < len(unpacked) else RivType.ANY
+            
             # Если переменная не существует, создаём её
-            if not self.symbols.lookup(name):
-                expr_type = RivType.UNKNOWN
-                if i < len(exprs):
-                    expr_type = self._infer_type(exprs[i])
-                
+            existing = self.symbols.lookup(name)
+            if not existing:
                 sym = Symbol(
                     name=name,
                     kind=SymbolKind.VARIABLE,
@@ -310,46 +277,138 @@ class SemanticAnalyzer(RivScriptVisitor):
                     column=id_node.symbol.column
                 )
                 self.symbols.define(sym)
+            elif existing.kind == SymbolKind.VARIABLE and existing.type != expr_type:
+                # Переменной присваиваются значения разных типов
+                existing.type = RivType.ANY
         
         return None
     
+    def _unpacked_types(self, expr) -> List[RivType]:
+        """Типы элементов результата встроенной функции (`dequeue`)"""
+        while expr.getChildCount() == 1 and hasattr(expr.getChild(0), 'getRuleIndex'):
+            expr = expr.getChild(0)
+        if not isinstance(expr, RivScriptParser.Function_callContext):
+            return []
+        func = self.annotations.call_target(expr)
+        if not func or func.kind != SymbolKind.BUILTIN:
+            return []
+        return UNPACKED_RESULTS.get(func.name, [])
+    
     def visitIdExpr(self, ctx: RivScriptParser.IdExprContext):
         """Проверяет использование идентификатора"""
         name = ctx.ID().getText()
         
         # Проверяем, существует ли переменная или функция
-        if not self.symbols.lookup(name) and not self.symbols.is_function(name):
+        sym = self.symbols.lookup(name)
+        if not sym and not self.symbols.is_function(name):
             self._add_error(UndefinedVariableError(name, self._location(ctx)))
         
-        return self.visitChildren(ctx)
+        return self.annotations.set_type(ctx, sym.type if sym else RivType.UNKNOWN)
+    
+    # =========================================================================
+    # Типы выражений: каждый метод возвращает тип узла и записывает его
+    # в self.annotations после обработки подвыражений
+    # =========================================================================
+    
+    def visitExpr(self, ctx: RivScriptParser.ExprContext):
+        return self.annotations.set_type(ctx, self.visit(ctx.pipeline_expr()))
+    
+    def visitPipeline_expr(self, ctx: RivScriptParser.Pipeline_exprContext):
+        """Тип pipeline - тип результата последней стадии"""
+        stages = ctx.logical_or_expr()
+        result = self.visit(stages[0])
+        for stage in stages[1:]:
+            result = self.visit(stage)
+            func = self._stage_function(stage)
+            if func:
+                self.annotations.set_call(stage, func)
+                result = func.type
+        return self.annotations.set_type(ctx, result)
+    
+    def _stage_function(self, stage) -> Optional[Symbol]:
+        """Перегрузка с одним параметром для стадии `data |> name`"""
+        while stage.getChildCount() == 1 and hasattr(stage.getChild(0), 'getRuleIndex'):
+            stage = stage.getChild(0)
+        if isinstance(stage, RivScriptParser.IdExprContext):
+            return self.symbols.lookup_function(stage.ID().getText(), 1)
+        return None
+    
+    def visitLogical_or_expr(self, ctx: RivScriptParser.Logical_or_exprContext):
+        return self._visit_operands(ctx, ctx.logical_and_expr())
+    
+    def visitLogical_and_expr(self, ctx: RivScriptParser.Logical_and_exprContext):
+        return self._visit_operands(ctx, ctx.logical_not_expr())
+    
+    def visitLogical_not_expr(self, ctx: RivScriptParser.Logical_not_exprContext):
+        if ctx.NOT():
+            self.visit(ctx.logical_not_expr())
+            return self.annotations.set_type(ctx, RivType.BOOL)
+        return self.annotations.set_type(ctx, self.visit(ctx.comparison_expr()))
+    
+    def visitComparison_expr(self, ctx: RivScriptParser.Comparison_exprContext):
+        return self._visit_operands(ctx, ctx.additive_expr())
+    
+    def visitMultiplicative_expr(self, ctx: RivScriptParser.Multiplicative_exprContext):
+        return self._visit_operands(ctx, ctx.unary_expr())
+    
+    def _visit_operands(self, ctx, operands) -> RivType:
+        """Тип цепочки `a op b op c` (операторы левоассоциативны)"""
+        result = self.visit(operands[0])
+        for i, operand in enumerate(operands[1:]):
+            op = ctx.getChild(2 * i + 1).getText()
+            result = binary_result_type(op, result, self.visit(operand))
+        return self.annotations.set_type(ctx, result)
     
     def visitAdditive_expr(self, ctx: RivScriptParser.Additive_exprContext):
         """Проверяет совместимость типов в операциях + и -"""
-        # Если есть оператор (+/-)
-        if ctx.getChildCount() > 1:
-            left = ctx.multiplicative_expr(0) if ctx.multiplicative_expr() else None
-            right = ctx.multiplicative_expr(1) if len(ctx.multiplicative_expr()) > 1 else None
+        operands = ctx.multiplicative_expr()
+        result = self.visit(operands[0])
+        for i, operand in enumerate(operands[1:]):
+            op = ctx.getChild(2 * i + 1).getText()
+            right = self.visit(operand)
             
-            if left and right:
-                left_type = self._infer_type(left)
-                right_type = self._infer_type(right)
-                
-                # INT + STRING или STRING + INT - ошибка
-                if (left_type == RivType.INT and right_type == RivType.STRING) or \
-                   (left_type == RivType.STRING and right_type == RivType.INT):
-                    from errors import TypeMismatchError
-                    self._add_error(TypeMismatchError(
-                        left_type.value, right_type.value, "add", self._location(ctx)
-                    ))
-        
-        return self.visitChildren(ctx)
+            # INT + STRING или STRING + INT - ошибка
+            if op in ('+', '-') and {result, right} == {RivType.INT, RivType.STRING}:
+                self._add_error(TypeMismatchError(
+                    result.value, right.value, "add", self._location(ctx)
+                ))
+            result = binary_result_type(op, result, right)
+        
+        return self.annotations.set_type(ctx, result)
+    
+    def visitUnary_expr(self, ctx: RivScriptParser.Unary_exprContext):
+        if ctx.primary_expr():
+            return self.annotations.set_type(ctx, self.visit(ctx.primary_expr()))
+        operand = self.visit(ctx.unary_expr())
+        return self.annotations.set_type(ctx, RivType.INT if operand == RivType.INT else RivType.ANY)
+    
+    def visitLiteralExpr(self, ctx: RivScriptParser.LiteralExprContext):
+        return self.annotations.set_type(ctx, self.visit(ctx.literal()))
+    
+    def visitLiteral(self, ctx: RivScriptParser.LiteralContext):
+        return self.annotations.set_type(ctx, self._infer_literal_type(ctx))
+    
+    def visitListExpr(self, ctx: RivScriptParser.ListExprContext):
+        for expr in ctx.list_expr().expr():
+            self.visit(expr)
+        self.annotations.set_type(ctx.list_expr(), RivType.LIST)
+        return self.annotations.set_type(ctx, RivType.LIST)
+    
+    def visitParenExpr(self, ctx: RivScriptParser.ParenExprContext):
+        return self.annotations.set_type(ctx, self.visit(ctx.expr()))
+    
+    def visitIndexExpr(self, ctx: RivScriptParser.IndexExprContext):
+        """Элемент списка может быть любого типа"""
+        self.visit(ctx.primary_expr())
+        self.visit(ctx.expr())
+        return self.annotations.set_type(ctx, RivType.ANY)
     
     def visitFunctionCallExpr(self, ctx: RivScriptParser.FunctionCallExprContext):
         """Анализирует вызов функции через primary_expr"""
-        return self.visit(ctx.function_call())
+        return self.annotations.set_type(ctx, self.visit(ctx.function_call()))
     
     def visitFunction_call(self, ctx: RivScriptParser.Function_callContext):
-        """Анализирует вызов функции"""
+        """Анализирует вызов функции и запоминает выбранную перегрузку"""
         name = ctx.ID().getText()
         
         # Считаем аргументы
@@ -389,7 +448,10 @@ class SemanticAnalyzer(RivScriptVisitor):
         for arg in args:
             self.visit(arg)
         
-        return None
+        if not func:
+            return self.annotations.set_type(ctx, RivType.UNKNOWN)
+        self.annotations.set_call(ctx, func)
+        return self.annotations.set_type(ctx, func.type)
     
     def visitCastExpr(self, ctx: RivScriptParser.CastExprContext):
         """Анализирует приведение типа"""
@@ -405,7 +467,7 @@ class SemanticAnalyzer(RivScriptVisitor):
         
         # Анализируем приводимое выражение и проверяем валидность cast
         expr = cast_ctx.expr()
-        from_type = self._infer_type(expr)
+        from_type = self.visit(expr)
         to_type = self._type_from_name(type_name)
         
         # Проверка валидности cast: list/tree/queue не могут быть приведены к простым типам
@@ -423,7 +485,8 @@ class SemanticAnalyzer(RivScriptVisitor):
                 from_type.value, to_type.value, self._location(ctx)
             ))
         
-        return self.visit(expr)
+        self.annotations.set_type(cast_ctx, to_type)
+        return self.annotations.set_type(ctx, to_type)
     
     def visitIf_stmt(self, ctx: RivScriptParser.If_stmtContext):
         """Анализирует if-else"""
@@ -537,7 +600,7 @@ class SemanticAnalyzer(RivScriptVisitor):
     def visitReturn_stmt(self, ctx: RivScriptParser.Return_stmtContext):
         """Анализирует return с проверкой типа"""
         if ctx.expr():
-            expr_type = self._infer_type(ctx.expr())
+            expr_type = self.visit(ctx.expr())
             
             # Если функция объявлена и возвращает строку, а мы пытаемся вернуть что-то другое
             if self.current_function and expr_type != RivType.UNKNOWN:
@@ -548,6 +611,4 @@ class SemanticAnalyzer(RivScriptVisitor):
                         self._add_error(TypeMismatchError(
                             RivType.INT.value, expr_type.value, "return", self._location(ctx)
                         ))
-            
-            self.visit(ctx.expr())
         return None
@@ -0,0 +1,65 @@
+"""
+Таблица типов выражений
+
+Семантический анализатор заполняет её во время своего обхода: каждое
+выражение получает тип после того, как обработаны его подвыражения, так
+что тип узла вычисляется из уже записанных типов потомков, без повторного
+спуска по поддереву. Для вызовов функций и стадий pipeline сохраняется
+выбранная перегрузка, для определений функций - их символ. Таблица
+передаётся генератору кода, который по символам получает имена перегрузок
+в WAT (Symbol.wat_name) и вызывает их напрямую.
+"""
+
+from typing import Dict, Optional
+
+from antlr4 import ParserRuleContext
+
+from .symbol import Symbol
+from .types import RivType
+
+
+class TypeAnnotations:
+    """Типы узлов выражений и перегрузки, выбранные для вызовов"""
+
+    def __init__(self):
+        self.types: Dict[ParserRuleContext, RivType] = {}
+        self.calls: Dict[ParserRuleContext, Symbol] = {}
+        self.definitions: Dict[ParserRuleContext, Symbol] = {}
+
+    def set_type(self, ctx: ParserRuleContext, riv_type: RivType) -> RivType:
+        self.types[ctx] = riv_type
+        return riv_type
+
+    def type_of(self, ctx: Optional[ParserRuleContext]) -> RivType:
+        """Тип выражения (UNKNOWN, если узел не аннотирован)"""
+        return self.types.get(ctx, RivType.UNKNOWN)
+
+    def set_call(self, ctx: ParserRuleContext, func: Symbol):
+        self.calls[ctx] = func
+
+    def call_target(self, ctx: ParserRuleContext) -> Optional[Symbol]:
+        """Перегрузка, выбранная для вызова или стадии pipeline"""
+        return self.calls.get(ctx)
+
+    def set_definition(self, ctx: ParserRuleContext, func: Symbol):
+        self.definitions[ctx] = func
+
+    def definition_of(self, ctx: ParserRuleContext) -> Optional[Symbol]:
+        """Символ перегрузки для определения функции"""
+        return self.definitions.get(ctx)
+
+
+def binary_result_type(op: str, left: RivType, right: RivType) -> RivType:
+    """Тип результата бинарного оператора по типам операндов"""
+    if op in ('>>', '<<'):
+        return RivType.LIST
+    if op in ('==', '!=', '<', '>', '<=', '>=', '@', 'and', 'or'):
+        return RivType.BOOL
+    if left == right == RivType.INT:
+        return RivType.INT
+    if op == '+' and left == right and left in (RivType.STRING, RivType.LIST):
+        return left
+    # Повторение строки: "=" * 20
+    if op == '*' and {left, right} == {RivType.STRING, RivType.INT}:
+        return RivType.STRING
+    return RivType.ANY
@@ -48,6 +48,13 @@ def get_builtin_functions() -> List[Tuple[str, List[Tuple[str, RivType]], RivTyp
     ]
 
 
+# Типы элементов списков, которые возвращают встроенные функции,
+# для распаковки `value, q = dequeue(q)`
+UNPACKED_RESULTS = {
+    "dequeue": [RivType.ANY, RivType.QUEUE],
+}
+
+
 def create_builtin_symbol(name: str, params: List[Tuple[str, RivType]], return_type: RivType) -> Symbol:
     """Создаёт Symbol для встроенной функции"""
     param_symbols = [
@@ -0,0 +1,277 @@
+"""
+Анализ владения списками и очередями
+
+Находит присваивания `x = x >> item`, `x = item << x`, `x = enqueue(x, item)`
+и `item, x = dequeue(x)`, которые можно выполнить на месте (list_push /
+list_push_front / queue_push / queue_pop) вместо создания нового заголовка списка или
+очереди. Это допустимо, если на заголовок `x` не ссылается никто, кроме
+самой переменной:
+- x не параметр функции и не переменная цикла for-in;
+- каждое присваивание x создаёт новый заголовок (литерал списка, `>>`, `<<`,
+  `queue()`, `enqueue`, очередь из результата `dequeue`);
+- значение x нигде не копируется в другую переменную, не кладётся в
+  коллекцию, не передаётся в пользовательскую функцию или pipeline и не
+  обходится циклом for-in.
+
+Блок данных при этом может быть общим с другими списками (`y = x >> 1`):
+list_push проверяет, что ячейка за концом списка свободна, и иначе
+копирует данные, поэтому `y` не меняется. Для очередей то же делает
+queue_push, а queue_pop меняет только заголовок.
+
+Переменные анализируются отдельно для каждой функции и для основной
+программы, как и локальные переменные в генераторе.
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'generated'))
+
+from antlr4 import ParserRuleContext
+from RivScriptParser import RivScriptParser
+
+
+APPEND = "append"
+PREPEND = "prepend"
+ENQUEUE = "enqueue"
+DEQUEUE = "dequeue"
+
+# Встроенные функции, которые не сохраняют ссылку на свой аргумент
+NON_RETAINING_BUILTINS = {
+    "write", "length", "sort", "reverse", "unique", "join",
+    "build_tree", "balance", "height", "traverse", "merge", "merge_trees",
+}
+
+# Встроенные функции и номер аргумента, заголовок которого они не сохраняют,
+# а копируют: результат `enqueue(q, x)` и `dequeue(q)` - новая очередь
+COPYING_BUILTINS = {"enqueue": 0, "dequeue": 0}
+
+# Узлы, через которые значение переменной проходит без изменений
+_TRANSPARENT = (
+    RivScriptParser.ParenExprContext,
+    RivScriptParser.CastExprContext,
+    RivScriptParser.Cast_exprContext,
+)
+
+# Узлы, которые только читают значение переменной
+_READING = (
+    RivScriptParser.Multiplicative_exprContext,
+    RivScriptParser.Comparison_exprContext,
+    RivScriptParser.Logical_not_exprContext,
+    RivScriptParser.Logical_and_exprContext,
+    RivScriptParser.Logical_or_exprContext,
+    RivScriptParser.Unary_exprContext,
+    RivScriptParser.IndexExprContext,
+    RivScriptParser.Return_stmtContext,
+    RivScriptParser.Expr_stmtContext,
+    RivScriptParser.If_stmtContext,
+    RivScriptParser.While_stmtContext,
+    RivScriptParser.Until_stmtContext,
+    RivScriptParser.ForRangeStmtContext,
+    RivScriptParser.ForStepStmtContext,
+)
+
+# Узлы с единственным потомком, на которых подъём по дереву останавливается
+_LISTS = (
+    RivScriptParser.Expr_stmtContext,
+    RivScriptParser.Arg_listContext,
+    RivScriptParser.Expr_listContext,
+)
+
+InPlaceUpdates = Dict[RivScriptParser.Assignment_stmtContext, Tuple[str, Optional[ParserRuleContext]]]
+
+
+def find_in_place_updates(tree: RivScriptParser.ProgramContext) -> InPlaceUpdates:
+    """
+    Возвращает присваивания, которые можно выполнить на месте
+
+    Returns:
+        {assignment_stmt: (APPEND, PREPEND или ENQUEUE, выражение добавляемого
+         элемента) или (DEQUEUE, None)}
+    """
+    user_functions = set()
+    main_statements = []
+    for item in tree.program_item():
+        if item.function_def():
+            user_functions.add(item.function_def().ID().getText())
+        elif item.statement():
+            main_statements.append(item.statement())
+
+    updates: InPlaceUpdates = {}
+    for item in tree.program_item():
+        function = item.function_def()
+        if function and function.statement_block():
+            params = set()
+            if function.param_list():
+                params = {param.ID().getText() for param in function.param_list().param()}
+            _analyze_frame([function.statement_block()], params, user_functions, updates)
+    _analyze_frame(main_statements, set(), user_functions, updates)
+    return updates
+
+
+def _analyze_frame(roots: List[ParserRuleContext], params: Set[str],
+                   user_functions: Set[str], updates: InPlaceUpdates):
+    """Анализирует тело одной функции (или основную программу)"""
+    candidates: Dict[RivScriptParser.Assignment_stmtContext, Tuple[str, str, Optional[ParserRuleContext]]] = {}
+    not_owned = set(params)
+    uses: List[RivScriptParser.IdExprContext] = []
+
+    for node in _walk(roots):
+        if isinstance(node, RivScriptParser.Assignment_stmtContext):
+            ids = [id_node.getText() for id_node in node.id_list().ID()]
+            exprs = node.expr_list().expr()
+            update = _as_self_update(node, user_functions)
+            if update:
+                candidates[node] = update
+                if update[1] == DEQUEUE:
+                    not_owned.add(ids[0])
+                continue
+            for i, name in enumerate(ids):
+                if len(ids) == len(exprs):
+                    fresh = _is_fresh(exprs[i], user_functions)
+                else:
+                    # item, q = dequeue(...): q - новый заголовок
+                    fresh = i == 1 and len(ids) == 2 and len(exprs) == 1 \
+                        and _builtin_call(exprs[0], "dequeue", user_functions) is not None
+                if not fresh:
+                    not_owned.add(name)
+        elif isinstance(node, RivScriptParser.ForInStmtContext):
+            not_owned.add(node.ID().getText())
+        elif isinstance(node, RivScriptParser.IdExprContext):
+            uses.append(node)
+
+    for use in uses:
+        name = use.ID().getText()
+        if name not in not_owned and _escapes(use, user_functions):
+            not_owned.add(name)
+
+    for assignment, (name, kind, item) in candidates.items():
+        if name not in not_owned:
+            updates[assignment] = (kind, item)
+
+
+def _walk(roots: List[ParserRuleContext]):
+    """Обходит все узлы-правила поддеревьев"""
+    stack = list(reversed(roots))
+    while stack:
+        node = stack.pop()
+        yield node
+        for child in reversed(list(node.getChildren())):
+            if isinstance(child, ParserRuleContext):
+                stack.append(child)
+
+
+def _strip(ctx: ParserRuleContext) -> ParserRuleContext:
+    """Спускается по цепочке узлов с единственным подвыражением"""
+    while True:
+        if isinstance(ctx, RivScriptParser.ParenExprContext):
+            ctx = ctx.expr()
+        elif isinstance(ctx, RivScriptParser.CastExprContext):
+            ctx = ctx.cast_expr().expr()
+        elif ctx.getChildCount() == 1 and isinstance(ctx.getChild(0), ParserRuleContext):
+            ctx = ctx.getChild(0)
+        else:
+            return ctx
+
+
+def _id_name(ctx: ParserRuleContext) -> Optional[str]:
+    stripped = _strip(ctx)
+    if isinstance(stripped, RivScriptParser.IdExprContext):
+        return stripped.ID().getText()
+    return None
+
+
+def _builtin_call(ctx: ParserRuleContext, name: str,
+                  user_functions: Set[str]) -> Optional[List[ParserRuleContext]]:
+    """Аргументы, если выражение - вызов встроенной функции `name`"""
+    stripped = _strip(ctx)
+    if not isinstance(stripped, RivScriptParser.Function_callContext) \
+            or stripped.ID().getText() != name or name in user_functions:
+        return None
+    return stripped.arg_list().expr() if stripped.arg_list() else []
+
+
+def _as_self_update(ctx: RivScriptParser.Assignment_stmtContext,
+                    user_functions: Set[str]) -> Optional[Tuple[str, str, Optional[ParserRuleContext]]]:
+    """Распознаёт `x = x >> item`, `x = item << x`, `x = enqueue(x, item)`
+    и `item, x = dequeue(x)`"""
+    ids = ctx.id_list().ID()
+    exprs = ctx.expr_list().expr()
+    if len(ids) == 2 and len(exprs) == 1:
+        args = _builtin_call(exprs[0], "dequeue", user_functions)
+        name = ids[1].getText()
+        if args is not None and len(args) == 1 and _id_name(args[0]) == name \
+                and ids[0].getText() != name:
+            return name, DEQUEUE, None
+        return None
+    if len(ids) != 1 or len(exprs) != 1:
+        return None
+
+    name = ids[0].getText()
+    args = _builtin_call(exprs[0], "enqueue", user_functions)
+    if args is not None:
+        if len(args) == 2 and _id_name(args[0]) == name:
+            return name, ENQUEUE, args[1]
+        return None
+
+    additive = _strip(exprs[0])
+    if not isinstance(additive, RivScriptParser.Additive_exprContext) or additive.getChildCount() != 3:
+        return None
+
+    left, op, right = additive.getChildren()
+    if op.getText() == '>>' and _id_name(left) == name:
+        return name, APPEND, right
+    if op.getText() == '<<' and _id_name(right) == name:
+        return name, PREPEND, left
+    return None
+
+
+def _is_fresh(ctx: ParserRuleContext, user_functions: Set[str]) -> bool:
+    """Создаёт ли выражение новый заголовок списка или очереди"""
+    stripped = _strip(ctx)
+    if isinstance(stripped, RivScriptParser.List_exprContext):
+        return True
+    if isinstance(stripped, RivScriptParser.Function_callContext):
+        name = stripped.ID().getText()
+        return name in ("queue", "enqueue") and name not in user_functions
+    if isinstance(stripped, RivScriptParser.Additive_exprContext):
+        last_op = stripped.getChild(stripped.getChildCount() - 2).getText()
+        return last_op in ('>>', '<<')
+    return False
+
+
+def _escapes(use: RivScriptParser.IdExprContext, user_functions: Set[str]) -> bool:
+    """Может ли значение переменной сохраниться где-то ещё"""
+    node = use
+    parent = node.parentCtx
+    while isinstance(parent, _TRANSPARENT) or (
+            parent is not None and parent.getChildCount() == 1
+            and not isinstance(parent, _LISTS)):
+        node = parent
+        parent = parent.parentCtx
+
+    if isinstance(parent, RivScriptParser.Additive_exprContext):
+        children = list(parent.getChildren())
+        index = children.index(node)
+        # Значение становится элементом списка: `lst >> x`, `x << lst`
+        if index > 0 and children[index - 1].getText() == '>>':
+            return True
+        if index + 1 < len(children) and children[index + 1].getText() == '<<':
+            return True
+        return False
+
+    if isinstance(parent, _READING):
+        return False
+
+    if isinstance(parent, RivScriptParser.Arg_listContext):
+        name = parent.parentCtx.ID().getText()
+        if name in user_functions:
+            return True
+        if COPYING_BUILTINS.get(name) == parent.expr().index(node):
+            return False
+        return name not in NON_RETAINING_BUILTINS
+
+    # Присваивание другой переменной, элемент литерала списка, pipeline,
+    # for-in и всё остальное
+    return True
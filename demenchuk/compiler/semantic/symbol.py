@@ -19,6 +19,21 @@ class Symbol:
     params: List['Symbol'] = field(default_factory=list)
     is_ref: bool = False  # Для ref-параметров
     
+    @property
+    def wat_name(self) -> str:
+        """Имя функции в WAT
+        
+        Перегрузки пользовательских функций получают имя вида
+        `name__арность__типы` (`add__2__any_any`), встроенные функции -
+        собственное имя.
+        """
+        if self.kind != SymbolKind.FUNCTION:
+            return self.name
+        if not self.params:
+            return f"{self.name}__0"
+        types = "_".join(param.type.value for param in self.params)
+        return f"{self.name}__{len(self.params)}__{types}"
+    
     def __repr__(self):
         if self.kind == SymbolKind.FUNCTION:
             param_str = ", ".join(p.name for p in self.params)
@@ -2,7 +2,7 @@
 Таблица символов для отслеживания переменных и функций
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from .types import SymbolKind, RivType
 from .symbol import Symbol
 from .scope import Scope
@@ -17,6 +17,8 @@ class SymbolTable:
         self.current_scope = self.global_scope
         # Для перегрузки функций: имя -> список функций с разным числом параметров
         self.functions: Dict[str, List[Symbol]] = {}
+        # Перегрузки по (имени, числу параметров) для поиска без перебора
+        self.overloads: Dict[Tuple[str, int], Symbol] = {}
         
         # Регистрируем встроенные функции
         self._register_builtins()
@@ -47,12 +49,12 @@ class SymbolTable:
             self.functions[func.name] = []
         
         # Проверяем, нет ли уже функции с таким же количеством параметров
-        param_count = len(func.params)
-        for existing in self.functions[func.name]:
-            if len(existing.params) == param_count:
-                return False  # Дублирование
+        key = (func.name, len(func.params))
+        if key in self.overloads:
+            return False  # Дублирование
         
         self.functions[func.name].append(func)
+        self.overloads[key] = func
         # Также добавляем в глобальную область
         self.global_scope.define(func)
         return True
@@ -71,12 +73,8 @@ class SymbolTable:
         if arg_count is None:
             return funcs[0] if funcs else None
         
-        # Ищем перегрузку с нужным количеством параметров
-        for func in funcs:
-            if len(func.params) == arg_count:
-                return func
-        
-        return None
+        # Перегрузка с нужным количеством параметров
+        return self.overloads.get((name, arg_count))
     
     def is_defined(self, name: str) -> bool:
         """Проверяет, определён ли символ"""
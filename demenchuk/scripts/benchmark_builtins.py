@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Замер встроенных функций над коллекциями
+
+Для каждой функции генерируется программа на RivScript: подготовка
+(список из N псевдослучайных или возрастающих чисел) и сама операция.
+Программа компилируется в WAT и выполняется в wasmtime; из времени
+выполнения вычитается время программы, содержащей только подготовку.
+
+Использование:
+    python scripts/benchmark_builtins.py [--size N] [--runs R]
+
+Требуется пакет wasmtime (pip install wasmtime).
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from compiler.main import compile_file
+
+
+# Подготовка: data - случайные числа, ordered - возрастающие,
+# other - второй случайный список
+SETUP = """
+data = []
+ordered = []
+other = []
+x = 1
+i = 0
+while i < {size}:
+    x = (x * 75 + 74) % 65537
+    data = data >> x
+    other = other >> (x * 31 % 65537)
+    ordered = ordered >> i
+    i = i + 1
+"""
+
+# Имя замера -> (дополнительная подготовка, операция)
+CASES = {
+    "sort": ("", "r = sort(data)"),
+    "unique": ("", "r = unique(data)"),
+    "reverse": ("", "r = reverse(data)"),
+    "merge": ("a = sort(data)\nb = sort(other)", "r = merge(a, b)"),
+    "build_tree (random)": ("", "t = build_tree(data)"),
+    "build_tree (sorted)": ("", "t = build_tree(ordered)"),
+    "balance": ("t = build_tree(ordered)", "b = balance(t)"),
+    "height": ("t = build_tree(ordered)", "h = height(t)"),
+    "traverse inorder": ("t = build_tree(data)", 'r = traverse(t, "inorder")'),
+    "traverse preorder": ("t = build_tree(data)", 'r = traverse(t, "preorder")'),
+    "traverse postorder": ("t = build_tree(data)", 'r = traverse(t, "postorder")'),
+    "merge_trees": ("t1 = build_tree(data)\nt2 = build_tree(other)", "t = merge_trees(t1, t2)"),
+}
+
+
+def load_module(source: str, workdir: Path):
+    """Компилирует программу и возвращает (store, wasmtime.Module)"""
+    import wasmtime
+
+    riv = workdir / "bench.riv"
+    wat = workdir / "bench.wat"
+    riv.write_text(source, encoding="utf-8")
+    # Сообщения компилятора нужны только при ошибке, иначе они
+    # перемешиваются с таблицей результатов
+    messages = io.StringIO()
+    with contextlib.redirect_stdout(messages):
+        compiled = compile_file(str(riv), str(wat))
+    if not compiled:
+        raise RuntimeError(f"не удалось скомпилировать:\n{source}\n{messages.getvalue()}")
+    engine = wasmtime.Engine()
+    return engine, wasmtime.Module(engine, wat.read_text(encoding="utf-8"))
+
+
+def run_once(engine, module) -> float:
+    """Выполняет _start в новом экземпляре, возвращает время в мс"""
+    import wasmtime
+
+    store = wasmtime.Store(engine)
+    host = {
+        "print_i32": wasmtime.Func(store, wasmtime.FuncType([wasmtime.ValType.i32()], []), lambda v: None),
+        "print_str": wasmtime.Func(store, wasmtime.FuncType([wasmtime.ValType.i32()] * 2, []), lambda p, n: None),
+        "read_i32": wasmtime.Func(store, wasmtime.FuncType([], [wasmtime.ValType.i32()]), lambda: 0),
+    }
+    instance = wasmtime.Instance(store, module, [host[imp.name] for imp in module.imports])
+    start = instance.exports(store)["_start"]
+    began = time.perf_counter()
+    start(store)
+    return (time.perf_counter() - began) * 1000
+
+
+def measure(source: str, runs: int, workdir: Path) -> float:
+    """Медиана времени выполнения программы в мс"""
+    engine, module = load_module(source, workdir)
+    return statistics.median(run_once(engine, module) for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер встроенных функций RivScript")
+    parser.add_argument("--size", type=int, default=100_000, help="размер списков (по умолчанию 100000)")
+    parser.add_argument("--runs", type=int, default=5, help="число запусков каждой программы")
+    args = parser.parse_args()
+
+    try:
+        import wasmtime  # noqa: F401
+    except ImportError:
+        print("❌ Для замера нужен пакет wasmtime: pip install wasmtime")
+        return 1
+
+    setup = SETUP.format(size=args.size)
+    print(f"N = {args.size}, запусков: {args.runs}")
+    print(f"{'функция':<22}{'подготовка, мс':>16}{'операция, мс':>16}")
+    print("-" * 54)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for name, (prepare, operation) in CASES.items():
+            base = setup + prepare + "\n"
+            before = measure(base, args.runs, workdir)
+            after = measure(base + operation + "\n", args.runs, workdir)
+            print(f"{name:<22}{before:>16.2f}{max(after - before, 0.0):>16.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
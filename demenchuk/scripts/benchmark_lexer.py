@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Замер скорости лексера RivScriptIndentLexer
+
+Генерирует синтетические программы возрастающего размера (функции,
+вложенные циклы и условия, комментарии, списки в скобках), разбивает
+каждую на токены и выводит число токенов в секунду.
+
+Использование:
+    python scripts/benchmark_lexer.py [--sizes 1000 10000 50000] [--runs R]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'compiler' / 'generated'))
+
+from antlr4 import InputStream, Token
+from compiler.lexer.rivscript_indent_lexer import RivScriptIndentLexer
+
+
+# Блок из 16 строк с отступами до трёх уровней
+BLOCK = """\
+# блок {n}
+def process_{n}(items, limit):
+    total = 0
+    for item in items:
+        if item > limit:
+            total = total + item * {n}
+        else:
+            while total > 100:
+                total = total - 7
+    result = [total, limit, {n}] >> total
+    return result
+
+values_{n} = [1, 2, 3, 4, 5, 6, 7, 8]
+out_{n} = process_{n}(values_{n}, {n} % 5)
+write(length(out_{n}))
+
+"""
+
+
+def generate(lines: int) -> str:
+    """Программа примерно из `lines` строк"""
+    block_lines = BLOCK.count("\n")
+    return "".join(BLOCK.format(n=n) for n in range(max(1, lines // block_lines)))
+
+
+def tokenize(source: str) -> int:
+    """Разбивает программу на токены, возвращает их число"""
+    lexer = RivScriptIndentLexer(InputStream(source))
+    count = 0
+    while lexer.nextToken().type != Token.EOF:
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер скорости лексера RivScript")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000, 100000],
+                        help="размеры программ в строках")
+    parser.add_argument("--runs", type=int, default=3, help="число запусков (берётся лучший)")
+    args = parser.parse_args()
+
+    print(f"{'строк':>10}{'токенов':>12}{'время, с':>12}{'токенов/с':>14}")
+    print("-" * 48)
+    for size in args.sizes:
+        source = generate(size)
+        best = None
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            count = tokenize(source)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        lines = source.count("\n")
+        print(f"{lines:>10}{count:>12}{best:>12.3f}{count / best:>14.0f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,60 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from compiler.main import compile_file
 
 
+# Программы, вывод которых (числа из write) проверяется в wasmtime
+RUNTIME_CASES = {
+    "for-in по дереву-параметру": ("""
+def show(c):
+    for x in c:
+        write(x)
+
+show(build_tree([5, 3, 8, 1, 4]))
+""", [1, 3, 4, 5, 8]),
+    "for-in по очереди-параметру": ("""
+def total(c):
+    s = 0
+    for x in c:
+        s = s + x
+    return s
+
+q = enqueue(enqueue(queue(), 7), 9)
+v, q = dequeue(q)
+q = enqueue(q, 11)
+write(total(q))
+""", [20]),
+    "for-in по списку-параметру": ("""
+def show(c):
+    for x in c:
+        write(x)
+
+show([1, 2, 3])
+""", [1, 2, 3]),
+}
+
+
+def run_program(source: str, workdir: Path):
+    """Компилирует программу и возвращает числа, выведенные _start"""
+    import wasmtime
+
+    riv = workdir / "case.riv"
+    wat = workdir / "case.wat"
+    riv.write_text(source, encoding="utf-8")
+    if not compile_file(str(riv), str(wat)):
+        return None
+    store = wasmtime.Store()
+    module = wasmtime.Module(store.engine, wat.read_text(encoding="utf-8"))
+    output = []
+    i32 = wasmtime.ValType.i32()
+    host = {
+        "print_i32": wasmtime.Func(store, wasmtime.FuncType([i32], []), output.append),
+        "print_str": wasmtime.Func(store, wasmtime.FuncType([i32, i32], []), lambda p, n: None),
+        "read_i32": wasmtime.Func(store, wasmtime.FuncType([], [i32]), lambda: 0),
+    }
+    instance = wasmtime.Instance(store, module, [host[imp.name] for imp in module.imports])
+    instance.exports(store)["_start"](store)
+    return output
+
+
 def main():
     base_dir = Path(__file__).parent.parent
     
@@ -64,6 +118,25 @@ def main():
                 print(f"    Actual:   SUCCESS (no error)")
                 failed += 1
     
+    # Выполнение - только если установлен wasmtime
+    print("\n>>> RUNTIME (wasmtime)")
+    try:
+        import wasmtime  # noqa: F401
+    except ImportError:
+        print("  пропущено: пакет wasmtime не установлен")
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name, (source, expected) in RUNTIME_CASES.items():
+                actual = run_program(source, Path(workdir))
+                if actual == expected:
+                    print(f"✓ {name}")
+                    passed += 1
+                else:
+                    print(f"✗ {name}")
+                    print(f"    Expected: {expected}")
+                    print(f"    Actual:   {actual}")
+                    failed += 1
+    
     print("\n" + "=" * 70)
     print(f"COMPILER: {passed} passed, {failed} failed")
     print("=" * 70)
@@ -50,6 +50,50 @@ def test_semantic(filepath):
         return False, f"Exception: {str(e)[:60]}"
 
 
+# (код, строки присваиваний, которые должны выполняться на месте)
+IN_PLACE_CASES = [
+    ("result = []\nresult = result >> 1\n", [2]),
+    ("lst = [1]\nlst = 0 << lst\n", [2]),
+    ("a = []\nb = a\na = a >> 1\n", []),
+    ("a = []\nq = [a]\na = a >> 1\n", []),
+    ("def f(lst):\n    lst = lst >> 1\n    return lst\n", []),
+    ("def g(x):\n    return x\na = []\nb = g(a)\na = a >> 1\n", []),
+    ("a = [1]\nb = a >> 2\na = a >> 3\nwrite(length(a))\n", [3]),
+]
+
+
+def test_in_place(code):
+    """Возвращает строки присваиваний, найденных анализом владения"""
+    lexer = RivScriptIndentLexer(InputStream(code))
+    tree = RivScriptParserWrapper(lexer).parse()
+    analyzer = SemanticAnalyzer("<test>")
+    analyzer.analyze(tree)
+    return sorted(ctx.start.line for ctx in analyzer.in_place_updates)
+
+
+# (код, тип выражения в последнем присваивании)
+TYPE_CASES = [
+    ("x = 1 + 2 * 3\n", "int"),
+    ("x = [1] + [2]\n", "list"),
+    ("x = \"=\" * 20\n", "string"),
+    ("a = [3, 1]\nx = a |> sort\n", "list"),
+    ("x = build_tree([1]) |> height\n", "int"),
+    ("x = 1 < 2 and true\n", "bool"),
+    ("def f(p):\n    return p\nx = f(1) + 1\n", "any"),
+]
+
+
+def test_type(code):
+    """Возвращает тип выражения последнего присваивания из таблицы аннотаций"""
+    lexer = RivScriptIndentLexer(InputStream(code))
+    tree = RivScriptParserWrapper(lexer).parse()
+    analyzer = SemanticAnalyzer("<test>")
+    analyzer.analyze(tree)
+    item = [i for i in tree.program_item() if i.statement()][-1]
+    expr = item.statement().assignment_stmt().expr_list().expr(0)
+    return analyzer.annotations.type_of(expr).value
+
+
 def main():
     base_dir = Path(__file__).parent.parent
     
@@ -92,6 +136,34 @@ def main():
             print(f"    Actual:   SUCCESS (no error detected)")
             failed += 1
     
+    # Анализ владения для `x = x >> item`
+    print("\n>>> IN-PLACE UPDATES")
+    for code, expected in IN_PLACE_CASES:
+        actual = test_in_place(code)
+        label = code.strip().replace("\n", "; ")
+        if actual == expected:
+            print(f"✓ {label}")
+            passed += 1
+        else:
+            print(f"✗ {label}")
+            print(f"    Expected: {expected}")
+            print(f"    Actual:   {actual}")
+            failed += 1
+    
+    # Типы выражений
+    print("\n>>> EXPRESSION TYPES")
+    for code, expected in TYPE_CASES:
+        actual = test_type(code)
+        label = code.strip().replace("\n", "; ")
+        if actual == expected:
+            print(f"✓ {label}: {actual}")
+            passed += 1
+        else:
+            print(f"✗ {label}")
+            print(f"    Expected: {expected}")
+            print(f"    Actual:   {actual}")
+            failed += 1
+    
     print("\n" + "=" * 70)
     print(f"SEMANTIC: {passed} passed, {failed} failed")
     print("=" * 70)
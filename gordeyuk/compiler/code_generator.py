@@ -1,5 +1,6 @@
-from typing import Dict, List, Optional, Tuple
-from antlr4 import ParseTreeVisitor
+import re
+from typing import Dict, List, Optional, Tuple, Union
+from antlr4 import ParseTreeVisitor, ParserRuleContext
 from parse_antlr.StringLangParser import StringLangParser
 from semantic_analyzer import SemanticAnalyzer
 from models import Variable, Function
@@ -17,6 +18,7 @@ class CodeGenerator(ParseTreeVisitor):
         self.current_function: Optional[str] = None
         self.label_counter: int = 0
         self.loop_label_stack: List[Tuple[str, str]] = []
+        self.accumulators: Dict[str, int] = {}
     
     def get_new_label(self, prefix: str = "L") -> str:
         label = f"{prefix}_{self.label_counter}"
@@ -128,14 +130,17 @@ class CodeGenerator(ParseTreeVisitor):
         lvalues = ctx.lvalue()
         expressions = ctx.expression()
         
+        if len(lvalues) == 1 and lvalues[0].ID().getText() in self.accumulators:
+            self._emit_accumulation(lvalues[0].ID().getText(), self._accumulated_operands(ctx))
+            return
+        
         for lvalue_ctx, expr_ctx in zip(lvalues, expressions):
             var_name = lvalue_ctx.ID().getText()
             
-            var = self.semantic_analyzer.get_variable(var_name)
-            if not var:
+            var_type = self._lookup_var_type(var_name)
+            if var_type == TYPE_UNKNOWN:
                 continue
             
-            var_type = var.var_type
             var_index = self.allocate_local_var(var_name)
             
             if lvalue_ctx.LBRACK():
@@ -176,26 +181,18 @@ class CodeGenerator(ParseTreeVisitor):
         end_label = self.get_new_label("while_end")
         
         self.loop_label_stack.append((loop_label, end_label))
+        accumulators = self._open_accumulators(ctx)
         
         self.emit(f"{loop_label}:")
         self.visitExpression(ctx.expression())
         self.emit(f"ifeq {end_label}")
         
         self.visitBlock(ctx.block())
-        if self.current_function == "repeatNTimes":
-            self.emit("aload 2")
-            self.emit("aload 0")
-            self.emit("invokevirtual java/lang/String/concat(Ljava/lang/String;)Ljava/lang/String;")
-            self.emit("astore 2")
-
-            self.emit("iload 3")
-            self.emit("ldc 1")
-            self.emit("iadd")
-            self.emit("istore 3")
         
         self.emit(f"goto {loop_label}")
         self.emit(f"{end_label}:")
         
+        self._close_accumulators(accumulators)
         self.loop_label_stack.pop()
     
     def visitUntilStmt(self, ctx: StringLangParser.UntilStmtContext):
@@ -203,6 +200,7 @@ class CodeGenerator(ParseTreeVisitor):
         end_label = self.get_new_label("until_end")
         
         self.loop_label_stack.append((loop_label, end_label))
+        accumulators = self._open_accumulators(ctx)
         
         self.emit(f"{loop_label}:")
         self.visitBlock(ctx.block())
@@ -211,6 +209,7 @@ class CodeGenerator(ParseTreeVisitor):
         self.emit(f"ifeq {loop_label}")
         self.emit(f"{end_label}:")
         
+        self._close_accumulators(accumulators)
         self.loop_label_stack.pop()
     
     def visitForInStmt(self, ctx: StringLangParser.ForInStmtContext):
@@ -232,6 +231,7 @@ class CodeGenerator(ParseTreeVisitor):
         end_label = self.get_new_label("for_end")
         
         self.loop_label_stack.append((loop_label, end_label))
+        accumulators = self._open_accumulators(ctx)
         
         self.emit(f"{loop_label}:")
         
@@ -255,6 +255,7 @@ class CodeGenerator(ParseTreeVisitor):
         self.emit(f"goto {loop_label}")
         self.emit(f"{end_label}:")
         
+        self._close_accumulators(accumulators)
         self.loop_label_stack.pop()
     
     def visitReturnStmt(self, ctx: StringLangParser.ReturnStmtContext):
@@ -356,6 +357,10 @@ class CodeGenerator(ParseTreeVisitor):
             self.visitMultiplication(ctx.multiplication(0))
             return
         
+        if self._is_string_chain(ctx):
+            self._emit_string_chain(self._chain_operands(ctx))
+            return
+        
         self.visitMultiplication(ctx.multiplication(0))
         
         for i in range(1, len(ctx.multiplication())):
@@ -503,10 +508,7 @@ class CodeGenerator(ParseTreeVisitor):
             self.emit(f"ldc {value}")
         
         elif ctx.CHAR_LITERAL():
-            char_str = ctx.CHAR_LITERAL().getText()
-            char_literal = char_str[1:-1]
-            escaped = char_literal.replace('\\', '\\\\').replace('"', '\\"')
-            self.emit(f'ldc "{escaped}"')
+            self.emit(f'ldc "{self._char_literal_text(ctx)}"')
         
         elif ctx.STRING_LITERAL():
             string_val = ctx.STRING_LITERAL().getText()
@@ -526,10 +528,7 @@ class CodeGenerator(ParseTreeVisitor):
             var_type = self.semantic_analyzer.type_cache.get(ctx, TYPE_UNKNOWN)
             
             if var_type == TYPE_UNKNOWN:
-                for scope_name, scope_vars in self.semantic_analyzer.variables_map.items():
-                    if var_name in scope_vars:
-                        var_type = scope_vars[var_name].var_type
-                        break
+                var_type = self._lookup_var_type(var_name)
             
             if var_type == TYPE_UNKNOWN:
                 var_type = TYPE_STRING
@@ -551,6 +550,220 @@ class CodeGenerator(ParseTreeVisitor):
             self.visitExpression(expr_ctx)
             self.emit("aastore")
 
+    def _lookup_var_type(self, var_name: str) -> str:
+        var = self.semantic_analyzer.get_variable(var_name)
+        if var:
+            return var.var_type
+        
+        for scope_name, scope_vars in self.semantic_analyzer.variables_map.items():
+            if var_name in scope_vars:
+                return scope_vars[var_name].var_type
+        
+        return TYPE_UNKNOWN
+    
+    def _char_literal_text(self, ctx: StringLangParser.AtomContext) -> str:
+        char_literal = ctx.CHAR_LITERAL().getText()[1:-1]
+        return char_literal.replace('\\', '\\\\').replace('"', '\\"')
+    
+    # String concatenation: a whole chain of string/char operands joined by '+'
+    # (parenthesized sub-chains included) is built with one StringBuilder
+    # instead of a String.concat per operand.
+    
+    def _is_string_chain(self, ctx: StringLangParser.AdditionContext) -> bool:
+        if len(ctx.multiplication()) < 2 or ctx.MINUS():
+            return False
+        
+        return all(self.semantic_analyzer.type_cache.get(mult_ctx, TYPE_UNKNOWN) in CONCAT_TYPES
+                   for mult_ctx in ctx.multiplication())
+    
+    def _single_addition(self, ctx: StringLangParser.ExpressionContext) -> Optional[StringLangParser.AdditionContext]:
+        if ctx.inExpr():
+            return None
+        
+        equality = ctx.equality()
+        if len(equality.comparison()) != 1:
+            return None
+        
+        comparison = equality.comparison(0)
+        if len(comparison.addition()) != 1:
+            return None
+        
+        return comparison.addition(0)
+    
+    def _operand_atom(self, ctx: StringLangParser.MultiplicationContext) -> Optional[StringLangParser.AtomContext]:
+        if len(ctx.unary()) != 1:
+            return None
+        
+        unary = ctx.unary(0)
+        if unary.MINUS() or unary.postfix().LBRACK():
+            return None
+        
+        return unary.postfix().primary().atom()
+    
+    def _chain_operands(self, ctx: StringLangParser.AdditionContext) -> List[StringLangParser.MultiplicationContext]:
+        operands = []
+        
+        for mult_ctx in ctx.multiplication():
+            atom = self._operand_atom(mult_ctx)
+            nested = self._single_addition(atom.expression()) if atom and atom.expression() else None
+            
+            if nested and self._is_string_chain(nested):
+                operands.extend(self._chain_operands(nested))
+            else:
+                operands.append(mult_ctx)
+        
+        return operands
+    
+    def _literal_text(self, ctx: StringLangParser.MultiplicationContext) -> Optional[str]:
+        atom = self._operand_atom(ctx)
+        
+        if atom and atom.STRING_LITERAL():
+            return atom.STRING_LITERAL().getText()[1:-1]
+        if atom and atom.CHAR_LITERAL():
+            return self._char_literal_text(atom)
+        
+        return None
+    
+    def _fold_literals(self, operands: List[StringLangParser.MultiplicationContext]) -> List[Union[str, StringLangParser.MultiplicationContext]]:
+        parts = []
+        
+        for operand in operands:
+            text = self._literal_text(operand)
+            
+            if text is None:
+                parts.append(operand)
+            elif parts and isinstance(parts[-1], str):
+                parts[-1] += text
+            elif text:
+                parts.append(text)
+        
+        return parts or [""]
+    
+    def _emit_chain_part(self, part: Union[str, StringLangParser.MultiplicationContext]):
+        if isinstance(part, str):
+            self.emit(f'ldc "{part}"')
+        else:
+            self.visitMultiplication(part)
+    
+    def _emit_string_chain(self, operands: List[StringLangParser.MultiplicationContext]):
+        parts = self._fold_literals(operands)
+        
+        if len(parts) <= 2:
+            self._emit_chain_part(parts[0])
+            for part in parts[1:]:
+                self._emit_chain_part(part)
+                self.emit("invokevirtual java/lang/String/concat(Ljava/lang/String;)Ljava/lang/String;")
+            return
+        
+        self.emit("new java/lang/StringBuilder")
+        self.emit("dup")
+        self._emit_chain_capacity(parts)
+        self.emit("invokespecial java/lang/StringBuilder/<init>(I)V")
+        self._emit_appends(parts)
+        self.emit("invokevirtual java/lang/StringBuilder/toString()Ljava/lang/String;")
+    
+    def _emit_chain_capacity(self, parts: List[Union[str, StringLangParser.MultiplicationContext]]):
+        known_length = 0
+        variables = []
+        
+        for part in parts:
+            atom = None if isinstance(part, str) else self._operand_atom(part)
+            
+            if isinstance(part, str):
+                known_length += len(re.sub(r'\\.', '_', part))
+            elif atom and atom.ID():
+                variables.append(atom)
+            else:
+                known_length += STRING_BUILDER_DEFAULT_CAPACITY
+        
+        self.emit(f"ldc {known_length}")
+        for atom in variables:
+            self.visitAtom(atom)
+            self.emit("invokevirtual java/lang/String/length()I")
+            self.emit("iadd")
+    
+    def _emit_appends(self, parts: List[Union[str, StringLangParser.MultiplicationContext]]):
+        for part in parts:
+            self._emit_chain_part(part)
+            self.emit("invokevirtual java/lang/StringBuilder/append(Ljava/lang/String;)Ljava/lang/StringBuilder;")
+    
+    # Loop accumulators: while a loop runs, a string variable that is only
+    # ever updated as `s = s + ...` lives in a StringBuilder local and is
+    # written back to `s` once the loop exits.
+    
+    def _accumulated_operands(self, ctx: StringLangParser.AssignmentContext) -> Optional[List[StringLangParser.MultiplicationContext]]:
+        if len(ctx.lvalue()) != 1 or len(ctx.expression()) != 1 or ctx.lvalue(0).LBRACK():
+            return None
+        
+        addition = self._single_addition(ctx.expression(0))
+        if not addition or not self._is_string_chain(addition):
+            return None
+        
+        operands = self._chain_operands(addition)
+        head = self._operand_atom(operands[0])
+        
+        if not head or not head.ID() or head.ID().getText() != ctx.lvalue(0).ID().getText():
+            return None
+        if self.semantic_analyzer.type_cache.get(head, TYPE_UNKNOWN) != TYPE_STRING:
+            return None
+        
+        return operands[1:]
+    
+    def _find_accumulators(self, loop_ctx: ParserRuleContext) -> List[str]:
+        accumulations: Dict[str, int] = {}
+        reads: Dict[str, int] = {}
+        writes: Dict[str, int] = {}
+        
+        stack = [loop_ctx]
+        while stack:
+            node = stack.pop()
+            
+            if isinstance(node, StringLangParser.AssignmentContext) and self._accumulated_operands(node) is not None:
+                name = node.lvalue(0).ID().getText()
+                accumulations[name] = accumulations.get(name, 0) + 1
+            
+            if isinstance(node, StringLangParser.AtomContext) and node.ID():
+                name = node.ID().getText()
+                reads[name] = reads.get(name, 0) + 1
+            elif isinstance(node, (StringLangParser.LvalueContext, StringLangParser.VarDeclContext,
+                                   StringLangParser.ForInStmtContext)):
+                name = node.ID().getText()
+                writes[name] = writes.get(name, 0) + 1
+            
+            for child in node.getChildren():
+                if isinstance(child, ParserRuleContext):
+                    stack.append(child)
+        
+        local_vars = self.get_current_local_vars()
+        return [name for name, count in accumulations.items()
+                if name in local_vars and name not in self.accumulators
+                and reads.get(name) == count and writes.get(name) == count]
+    
+    def _open_accumulators(self, loop_ctx: ParserRuleContext) -> List[str]:
+        names = self._find_accumulators(loop_ctx)
+        
+        for name in names:
+            builder_index = self.allocate_local_var(f"__builder_{name}")
+            self.emit("new java/lang/StringBuilder")
+            self.emit("dup")
+            self.emit(f"aload {self.get_local_var_index(name)}")
+            self.emit("invokespecial java/lang/StringBuilder/<init>(Ljava/lang/String;)V")
+            self.emit(f"astore {builder_index}")
+            self.accumulators[name] = builder_index
+        
+        return names
+    
+    def _close_accumulators(self, names: List[str]):
+        for name in names:
+            self.emit(f"aload {self.accumulators.pop(name)}")
+            self.emit("invokevirtual java/lang/StringBuilder/toString()Ljava/lang/String;")
+            self.emit(f"astore {self.get_local_var_index(name)}")
+    
+    def _emit_accumulation(self, var_name: str, operands: List[StringLangParser.MultiplicationContext]):
+        self.emit(f"aload {self.accumulators[var_name]}")
+        self._emit_appends(self._fold_literals(operands))
+        self.emit("pop")
+    
     def _load_var(self, var_type: str, index: int):
         if var_type == TYPE_INT:
             self.emit(f"iload {index}")
@@ -27,3 +27,6 @@ JVM_TYPE_NAMES = {
     TYPE_ARRAY: '[Ljava/lang/String;',
     TYPE_BOOL: 'boolean',
 }
+
+CONCAT_TYPES = [TYPE_STRING, TYPE_CHAR]
+STRING_BUILDER_DEFAULT_CAPACITY = 16